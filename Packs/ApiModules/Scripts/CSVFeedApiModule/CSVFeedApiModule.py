@@ -3,16 +3,19 @@ from CommonServerPython import *
 from CommonServerUserPython import *
 
 ''' IMPORTS '''
+import codecs
 import csv
-import gzip
 import urllib3
+import zlib
 from dateutil.parser import parse
-from typing import Optional, Pattern, Dict, Any, Tuple, Union, List
+from typing import Optional, Pattern, Dict, Any, Tuple, Union, List, Iterator
 
 # disable insecure warnings
 urllib3.disable_warnings()
 
 # Globals
+CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 2000
 
 
 class Client(BaseClient):
@@ -117,7 +120,8 @@ class Client(BaseClient):
         if not isinstance(urls, list):
             urls = [urls]
         for url in urls:
-            _session = requests.Session()
+            # all the feed urls share the pooled session of the client
+            _session = self._session
 
             prepreq = self._build_request(url)
 
@@ -171,19 +175,75 @@ class Client(BaseClient):
     def get_feed_content_divided_to_lines(self, url, raw_response):
         """Fetch feed data and divides its content to lines
 
+        The content is decompressed, decoded and split while it is read from the response, so the feed is never
+        held in memory as a whole.
+
         Args:
             url: Current feed's url.
             raw_response: The raw response from the feed's url.
 
         Returns:
-            List. List of lines from the feed content.
+            Iterator. The lines of the feed content.
         """
-        if self.feed_url_to_config and self.feed_url_to_config.get(url).get('is_zipped_file'):  # type: ignore
-            response_content = gzip.decompress(raw_response.content)
-        else:
-            response_content = raw_response.content
+        is_zipped_file = self.feed_url_to_config and self.feed_url_to_config.get(url).get('is_zipped_file')  # type: ignore
+        chunks = raw_response.iter_content(chunk_size=CHUNK_SIZE)
+        if is_zipped_file:
+            chunks = gunzip_chunks(chunks)
+        return split_lines(decode_chunks(chunks, self.encoding))
+
+
+def gunzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Decompresses gzip content chunk by chunk, supporting files made of several gzip members
+
+    Args:
+        chunks: The chunks of the gzipped content.
+
+    Returns:
+        Iterator. The chunks of the decompressed content.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk)
+            # the rest of the chunk belongs to the next gzip member
+            chunk = decompressor.unused_data
+            if decompressor.eof:
+                yield decompressor.flush()
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    yield decompressor.flush()
+
+
+def decode_chunks(chunks: Iterator[bytes], encoding: str) -> Iterator[str]:
+    """Decodes content chunk by chunk, characters split between chunks are decoded with the chunk completing them
+
+    Args:
+        chunks: The chunks of the content.
+        encoding: The encoding of the content.
+
+    Returns:
+        Iterator. The decoded chunks.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def split_lines(chunks: Iterator[str]) -> Iterator[str]:
+    """Splits text chunks to lines the way str.split('\\n') splits the whole text
 
-        return response_content.decode(self.encoding).split('\n')
+    Args:
+        chunks: The chunks of the text.
+
+    Returns:
+        Iterator. The lines of the text.
+    """
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        yield from lines
+    yield pending
 
 
 def determine_indicator_type(indicator_type, default_indicator_type, auto_detect, value):
@@ -249,9 +309,11 @@ def create_fields_mapping(raw_json: Dict[str, Any], mapping: Dict[str, Union[Tup
     return fields_mapping
 
 
-def fetch_indicators_command(client: Client, default_indicator_type: str, auto_detect: bool, **kwargs):
+def iterate_indicators(client: Client, default_indicator_type: str, auto_detect: bool, **kwargs):
+    """
+    Yield the indicators of the feeds row by row, as the rows of the feed responses arrive.
+    """
     iterator = client.build_iterator(**kwargs)
-    indicators = []
     config = client.feed_url_to_config or {}
     for url_to_reader in iterator:
         for url, reader in url_to_reader.items():
@@ -278,8 +340,11 @@ def fetch_indicators_command(client: Client, default_indicator_type: str, auto_d
                     if client.tlp_color:
                         indicator['fields']['trafficlightprotocol'] = client.tlp_color
 
-                    indicators.append(indicator)
-    return indicators
+                    yield indicator
+
+
+def fetch_indicators_command(client: Client, default_indicator_type: str, auto_detect: bool, **kwargs):
+    return list(iterate_indicators(client, default_indicator_type, auto_detect, **kwargs))
 
 
 def get_indicators_command(client, args: dict, tags: Optional[List[str]] = None):
@@ -314,14 +379,21 @@ def feed_main(feed_name, params=None, prefix=''):
     }
     try:
         if command == 'fetch-indicators':
-            indicators = fetch_indicators_command(
+            indicators = iterate_indicators(
                 client,
                 params.get('indicator_type'),
                 params.get('auto_detect_type')
             )
-            # we submit the indicators in batches
-            for b in batch(indicators, batch_size=2000):
-                demisto.createIndicators(b)  # type: ignore
+            # we submit the indicators in batches, while the feed is still being read. The batches are built here and
+            # not with batch(), which accepts only lists in older versions of CommonServerPython
+            indicators_batch: List[dict] = []
+            for indicator in indicators:
+                indicators_batch.append(indicator)
+                if len(indicators_batch) == BATCH_SIZE:
+                    demisto.createIndicators(indicators_batch)  # type: ignore
+                    indicators_batch = []
+            if indicators_batch:
+                demisto.createIndicators(indicators_batch)  # type: ignore
         else:
             args = demisto.args()
             args['feed_name'] = feed_name
@@ -1,3 +1,6 @@
+import gzip
+
+import pytest
 import requests_mock
 from CSVFeedApiModule import *
 
@@ -146,7 +149,75 @@ def test_get_feed_content():
             m.get(url, content=feed_url_to_config.get(url).get('content'))
             raw_response = requests.get(url)
 
-            assert client.get_feed_content_divided_to_lines(url, raw_response) == expected_output
+            assert list(client.get_feed_content_divided_to_lines(url, raw_response)) == expected_output
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 1024])
+def test_get_feed_content_chunk_boundaries(mocker, chunk_size):
+    """
+    Given
+    - A gzipped feed made of two gzip members, with multi-byte characters
+
+    When
+    - Reading it in chunks splitting lines, characters and gzip members
+
+    Then
+    - The same lines as decompressing, decoding and splitting the whole content are returned
+    """
+    text = 'value,name\n1.1.1.1,caf\u00e9\n2.2.2.2,\u65e5\u672c\n'
+    content = gzip.compress(text[:20].encode('utf8')) + gzip.compress(text[20:].encode('utf8'))
+    mocker.patch('CSVFeedApiModule.CHUNK_SIZE', chunk_size)
+    url = 'https://ipstack.com'
+    client = Client(url=url, feed_url_to_config={url: {'is_zipped_file': True}}, encoding='utf8')
+    with requests_mock.Mocker() as m:
+        m.get(url, content=content)
+        lines = client.get_feed_content_divided_to_lines(url, requests.get(url, stream=True))
+        assert list(lines) == text.split('\n')
+
+
+def test_build_iterator_shared_session(mocker):
+    """
+    Given
+    - A client of two feed urls
+
+    When
+    - Building the iterators of the feeds
+
+    Then
+    - Both feeds are requested with the session of the client, and their rows are read lazily
+    """
+    urls = ['https://ipstack1.com', 'https://ipstack2.com']
+    client = Client(url=urls, fieldnames='value')
+    with requests_mock.Mocker() as m:
+        send = mocker.spy(client._session, 'send')
+        m.get(urls[0], content=b'1.1.1.1\n2.2.2.2\n')
+        m.get(urls[1], content=b'3.3.3.3\n')
+        iterators = client.build_iterator()
+        assert send.call_count == 2
+        assert [[row['value'] for row in reader] for iterator in iterators for reader in iterator.values()] == [
+            ['1.1.1.1', '2.2.2.2'], ['3.3.3.3']
+        ]
+
+
+def test_feed_main_fetch_indicators_in_batches(mocker):
+    """
+    Given
+    - A feed of 5 indicators and a batch size of 2
+
+    When
+    - Fetching indicators
+
+    Then
+    - The indicators are created in batches of 2, 2 and 1
+    """
+    url = 'https://ipstack.com'
+    mocker.patch('CSVFeedApiModule.BATCH_SIZE', 2)
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    create_indicators = mocker.patch.object(demisto, 'createIndicators')
+    with requests_mock.Mocker() as m:
+        m.get(url, content='\n'.join('1.1.1.{}'.format(i) for i in range(5)).encode('utf8'))
+        feed_main('CSV Feed', params={'url': url, 'fieldnames': 'value', 'indicator_type': 'IP'})
+    assert [len(call[0][0]) for call in create_indicators.call_args_list] == [2, 2, 1]
 
 
 def test_date_format_parsing():
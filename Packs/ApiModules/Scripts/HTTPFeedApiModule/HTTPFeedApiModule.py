@@ -5,9 +5,10 @@ from CommonServerUserPython import *
 ''' IMPORTS '''
 import urllib3
 import requests
+import itertools
 import traceback
 from dateutil.parser import parse
-from typing import Optional, Pattern, List
+from typing import Optional, Pattern, List, Dict
 
 # disable insecure warnings
 urllib3.disable_warnings()
@@ -15,6 +16,7 @@ urllib3.disable_warnings()
 ''' GLOBALS '''
 TAGS = 'feedTags'
 TLP_COLOR = 'trafficlightprotocol'
+BATCH_SIZE = 2000
 
 
 class Client(BaseClient):
@@ -137,6 +139,7 @@ class Client(BaseClient):
         if custom_fields_mapping is None:
             custom_fields_mapping = {}
         self.custom_fields_mapping = custom_fields_mapping
+        self.extractors: Dict[str, FeedExtractor] = {}
 
     def get_feed_config(self, fields_json: str = '', indicator_json: str = ''):
         """
@@ -246,6 +249,18 @@ class Client(BaseClient):
                 results.append({url: result})
         return results
 
+    def get_extractor(self, url: str) -> 'FeedExtractor':
+        """
+        Get the extractor of the feed URL, compiled once from the feed configuration of the URL.
+        :param url: The feed URL
+        :return: The feed extractor
+        """
+        extractor = self.extractors.get(url)
+        if extractor is None:
+            extractor = FeedExtractor(self.feed_url_to_config.get(url, {}), self.indicator_type)
+            self.extractors[url] = extractor
+        return extractor
+
     def custom_fields_creator(self, attributes: dict):
         created_custom_fields = {}
         for attribute in attributes.keys():
@@ -258,65 +273,54 @@ class Client(BaseClient):
         return created_custom_fields
 
 
-def datestring_to_millisecond_timestamp(datestring):
-    date = parse(str(datestring))
-    return int(date.timestamp() * 1000)
-
-
-def get_indicator_fields(line, url, feed_tags: list, tlp_color: Optional[str], client: Client):
-    """
-    Extract indicators according to the feed type
-    :param line: The current line in the feed
-    :param url: The feed URL
-    :param client: The client
-    :param feed_tags: The indicator tags.
-    :param tlp_color: Traffic Light Protocol color.
-    :return: The indicator
-    """
-    attributes = None
-    value: str = ''
-    indicator = None
-    fields_to_extract = []
-    feed_config = client.feed_url_to_config.get(url, {})
-    if feed_config:
-        if 'indicator' in feed_config:
-            indicator = feed_config['indicator']
-            if 'regex' in indicator:
-                indicator['regex'] = re.compile(indicator['regex'])
-            if 'transform' not in indicator:
-                indicator['transform'] = r'\g<0>'
-
-    if 'fields' in feed_config:
-        fields = feed_config['fields']
-        for field in fields:
+class FeedExtractor:
+    def __init__(self, feed_config: dict, default_indicator_type: str = ''):
+        """
+        The extraction dictionaries of a feed URL, compiled once and applied to every line of the feed.
+        :param feed_config: The feed configuration of the URL, see feed_url_to_config in Client.
+        :param default_indicator_type: The indicator type if the feed configuration has none.
+        """
+        self.indicator_type = feed_config.get('indicator_type', default_indicator_type)
+        self.indicator_regex: Optional[Pattern] = None
+        self.indicator_transform = r'\g<0>'
+        indicator = feed_config.get('indicator')
+        if indicator and 'regex' in indicator:
+            self.indicator_regex = re.compile(indicator['regex'])
+            self.indicator_transform = indicator.get('transform', r'\g<0>')
+
+        self.fields: List[tuple] = []
+        for field in feed_config.get('fields', []):
             for f, fattrs in field.items():
-                field = {f: {}}
                 if 'regex' in fattrs:
-                    field[f]['regex'] = re.compile(fattrs['regex'])
-                if 'transform' not in fattrs:
-                    field[f]['transform'] = r'\g<0>'
-                else:
-                    field[f]['transform'] = fattrs['transform']
-                fields_to_extract.append(field)
-
-    line = line.strip()
-    if line:
-        extracted_indicator = line.split()[0]
-        if indicator:
-            extracted_indicator = indicator['regex'].search(line)
-            if extracted_indicator is None:
-                return attributes, value
-            if 'transform' in indicator:
-                extracted_indicator = extracted_indicator.expand(indicator['transform'])
-        attributes = {}
-        for field in fields_to_extract:
-            for f, fattrs in field.items():
-                m = fattrs['regex'].search(line)
+                    self.fields.append((f, re.compile(fattrs['regex']), fattrs.get('transform', r'\g<0>')))
+
+    def extract(self, line: str, feed_tags: list, tlp_color: Optional[str]):
+        """
+        Extract the indicator and its fields from a line of the feed
+        :param line: The current line in the feed
+        :param feed_tags: The indicator tags.
+        :param tlp_color: Traffic Light Protocol color.
+        :return: The indicator attributes and value
+        """
+        attributes = None
+        value: str = ''
+        line = line.strip()
+        if line:
+            if self.indicator_regex:
+                match = self.indicator_regex.search(line)
+                if match is None:
+                    return attributes, value
+                extracted_indicator = match.expand(self.indicator_transform)
+            else:
+                extracted_indicator = line.split()[0]
+            attributes = {}
+            for f, regex, transform in self.fields:
+                m = regex.search(line)
 
                 if m is None:
                     continue
 
-                attributes[f] = m.expand(fattrs['transform'])
+                attributes[f] = m.expand(transform)
 
                 try:
                     i = int(attributes[f])
@@ -324,23 +328,45 @@ def get_indicator_fields(line, url, feed_tags: list, tlp_color: Optional[str], c
                     pass
                 else:
                     attributes[f] = i
-        attributes['value'] = value = extracted_indicator
-        attributes['type'] = feed_config.get('indicator_type', client.indicator_type)
-        attributes['tags'] = feed_tags
+            attributes['value'] = value = extracted_indicator
+            attributes['type'] = self.indicator_type
+            attributes['tags'] = feed_tags
 
-        if tlp_color:
-            attributes['trafficlightprotocol'] = tlp_color
+            if tlp_color:
+                attributes['trafficlightprotocol'] = tlp_color
 
-    return attributes, value
+        return attributes, value
 
 
-def fetch_indicators_command(client, feed_tags, tlp_color, itype, auto_detect, **kwargs):
+def datestring_to_millisecond_timestamp(datestring):
+    date = parse(str(datestring))
+    return int(date.timestamp() * 1000)
+
+
+def get_indicator_fields(line, url, feed_tags: list, tlp_color: Optional[str], client: Client):
+    """
+    Extract indicators according to the feed type
+    :param line: The current line in the feed
+    :param url: The feed URL
+    :param client: The client
+    :param feed_tags: The indicator tags.
+    :param tlp_color: Traffic Light Protocol color.
+    :return: The indicator
+    """
+    return client.get_extractor(url).extract(line, feed_tags, tlp_color)
+
+
+def iterate_indicators(client, feed_tags, tlp_color, itype, auto_detect, **kwargs):
+    """
+    Yield the indicators of the feeds line by line, as the lines of the feed responses arrive.
+    """
     iterators = client.build_iterator(**kwargs)
-    indicators = []
+    custom_fields_mapping = len(client.custom_fields_mapping.keys()) > 0
     for iterator in iterators:
         for url, lines in iterator.items():
+            extractor = client.get_extractor(url)
             for line in lines:
-                attributes, value = get_indicator_fields(line, url, feed_tags, tlp_color, client)
+                attributes, value = extractor.extract(line, feed_tags, tlp_color)
                 if value:
                     if 'lastseenbysource' in attributes.keys():
                         attributes['lastseenbysource'] = datestring_to_millisecond_timestamp(
@@ -357,12 +383,15 @@ def fetch_indicators_command(client, feed_tags, tlp_color, itype, auto_detect, *
                         "rawJSON": attributes,
                     }
 
-                    if len(client.custom_fields_mapping.keys()) > 0 or TAGS in attributes.keys():
+                    if custom_fields_mapping or TAGS in attributes.keys():
                         custom_fields = client.custom_fields_creator(attributes)
                         indicator_data["fields"] = custom_fields
 
-                    indicators.append(indicator_data)
-    return indicators
+                    yield indicator_data
+
+
+def fetch_indicators_command(client, feed_tags, tlp_color, itype, auto_detect, **kwargs):
+    return list(iterate_indicators(client, feed_tags, tlp_color, itype, auto_detect, **kwargs))
 
 
 def determine_indicator_type(indicator_type, default_indicator_type, auto_detect, value):
@@ -389,7 +418,8 @@ def get_indicators_command(client: Client, args):
     feed_tags = args.get('feedTags')
     tlp_color = args.get('tlp_color')
     auto_detect = demisto.params().get('auto_detect_type')
-    indicators_list = fetch_indicators_command(client, feed_tags, tlp_color, itype, auto_detect)[:limit]
+    indicators_list = list(itertools.islice(iterate_indicators(client, feed_tags, tlp_color, itype, auto_detect),
+                                            limit))
     entry_result = camelize(indicators_list)
     hr = tableToMarkdown('Indicators', entry_result, headers=['Value', 'Type', 'Rawjson'])
     return hr, {}, indicators_list
@@ -430,11 +460,18 @@ def feed_main(feed_name, params=None, prefix=''):
     }
     try:
         if command == 'fetch-indicators':
-            indicators = fetch_indicators_command(client, feed_tags, tlp_color, params.get('indicator_type'),
-                                                  params.get('auto_detect_type'))
-            # we submit the indicators in batches
-            for b in batch(indicators, batch_size=2000):
-                demisto.createIndicators(b)
+            indicators = iterate_indicators(client, feed_tags, tlp_color, params.get('indicator_type'),
+                                            params.get('auto_detect_type'))
+            # we submit the indicators in batches, as the feed lines arrive. The batches are built here and not with
+            # batch(), which accepts only lists in older versions of CommonServerPython
+            indicators_batch: List[dict] = []
+            for indicator in indicators:
+                indicators_batch.append(indicator)
+                if len(indicators_batch) == BATCH_SIZE:
+                    demisto.createIndicators(indicators_batch)
+                    indicators_batch = []
+            if indicators_batch:
+                demisto.createIndicators(indicators_batch)
         else:
             args = demisto.args()
             args['feed_name'] = feed_name
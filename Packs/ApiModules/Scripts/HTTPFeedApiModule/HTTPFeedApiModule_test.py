@@ -232,6 +232,78 @@ def test_feed_main_fetch_indicators(mocker, requests_mock):
     } in indicators
 
 
+def test_feed_main_fetch_indicators_in_batches(mocker, requests_mock):
+    """
+    Given
+    - A feed of 466 indicators and a batch size of 200.
+
+    When
+    - Fetching indicators.
+
+    Then
+    - Ensure createIndicators is called with batches of 200, 200 and 66 indicators.
+    - Ensure the feed configuration is compiled once.
+    """
+    import HTTPFeedApiModule
+    feed_url = 'https://www.spamhaus.org/drop/asndrop.txt'
+    mocker.patch.object(HTTPFeedApiModule, 'BATCH_SIZE', 200)
+    mocker.patch.object(
+        demisto, 'params',
+        return_value={
+            'url': feed_url,
+            'ignore_regex': '^;.*',
+            'feed_url_to_config': {feed_url: {'indicator_type': 'ASN', 'indicator': {'regex': '^AS[0-9]+'}}},
+        }
+    )
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+    compile_spy = mocker.spy(HTTPFeedApiModule.re, 'compile')
+
+    with open('test_data/asn_ranges.txt') as asn_ranges_txt:
+        requests_mock.get(feed_url, content=asn_ranges_txt.read().encode('utf8'))
+    feed_main('great_feed_name')
+
+    assert [len(call[0][0]) for call in demisto.createIndicators.call_args_list] == [200, 200, 66]
+    assert [call[0][0] for call in compile_spy.call_args_list].count('^AS[0-9]+') == 1
+
+
+def test_feed_extractor():
+    """
+    Given
+    - A feed configuration with an indicator regex and transform, and fields with and without a transform.
+
+    When
+    - Extracting lines with the compiled feed extractor.
+
+    Then
+    - Ensure the indicator and fields are extracted, numeric fields are converted to int.
+    - Ensure lines not matching the indicator regex and empty lines are skipped.
+    """
+    from HTTPFeedApiModule import FeedExtractor
+    extractor = FeedExtractor({
+        'indicator': {'regex': r'^([0-9.]+)\t([0-9.]+)', 'transform': r'\1-\2'},
+        'fields': [
+            {'attacks': {'regex': r'^.*\t.*\t([0-9]+)', 'transform': r'\1'}},
+            {'whole_line': {'regex': r'^.*$'}},
+            {'missing': {'regex': r'not in the line'}}
+        ]
+    }, 'IP')
+    attributes, value = extractor.extract('1.1.1.0\t1.1.1.255\t42\n', ['tag'], 'RED')
+    assert value == '1.1.1.0-1.1.1.255'
+    assert attributes == {
+        'attacks': 42,
+        'whole_line': '1.1.1.0\t1.1.1.255\t42',
+        'value': '1.1.1.0-1.1.1.255',
+        'type': 'IP',
+        'tags': ['tag'],
+        'trafficlightprotocol': 'RED'
+    }
+    assert extractor.extract('# comment', [], None) == (None, '')
+    assert extractor.extract('   ', [], None) == (None, '')
+    assert FeedExtractor({}, 'Domain').extract('example.com some text', [], None) == (
+        {'value': 'example.com', 'type': 'Domain', 'tags': []}, 'example.com')
+
+
 def test_feed_main_test_module(mocker, requests_mock):
     """
     Given
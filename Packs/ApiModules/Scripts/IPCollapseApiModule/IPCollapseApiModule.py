@@ -0,0 +1,151 @@
+import operator
+import socket
+import sys
+from array import array
+from functools import partial
+from itertools import compress, islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+IP_VERSION_TO_FAMILY_AND_BITS = {
+    4: (socket.AF_INET, 32),
+    6: (socket.AF_INET6, 128),
+}
+
+
+def ip_to_int(ip: str) -> Optional[Tuple[int, int]]:
+    """Encode an IP address as an integer.
+
+    Args:
+        ip (str): an IPv4 or IPv6 address.
+
+    Returns:
+        tuple. the IP version and the integer value of the address, None if the address is not valid.
+    """
+    for version, (family, _) in IP_VERSION_TO_FAMILY_AND_BITS.items():
+        try:
+            return version, int.from_bytes(socket.inet_pton(family, ip), 'big')
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def int_to_ip(value: int, version: int) -> str:
+    """Decode an integer encoded IP address.
+
+    Args:
+        value (int): the integer value of the address.
+        version (int): the IP version, 4 or 6.
+
+    Returns:
+        str. the IP address.
+    """
+    family, bits = IP_VERSION_TO_FAMILY_AND_BITS[version]
+    return socket.inet_ntop(family, value.to_bytes(bits // 8, 'big'))
+
+
+def collapse_ip_ints(values: Iterable[int]) -> List[Tuple[int, int]]:
+    """Collapse integer encoded IP addresses of the same version to ranges of consecutive addresses.
+
+    Args:
+        values (Iterable[int]): the integer values of the addresses, duplicates are ignored.
+
+    Returns:
+        list. the sorted (first, last) ranges of consecutive addresses.
+    """
+    values = sorted(values)
+    if not values:
+        return []
+    # a range ends wherever the next address is more than one address away, the differences are computed with map
+    # so the pass over the addresses does not run python code for every address
+    differences = map(operator.sub, islice(values, 1, None), values)
+    range_ends = list(compress(range(len(values) - 1), map((1).__lt__, differences)))
+    firsts = [values[0]] + [values[end + 1] for end in range_ends]
+    lasts = [values[end] for end in range_ends] + [values[-1]]
+    return list(zip(firsts, lasts))
+
+
+def ip_range_to_cidrs(first: int, last: int, bits: int) -> List[Tuple[int, int]]:
+    """Split a range of integer encoded IP addresses to the fewest CIDRs covering exactly the range.
+
+    Args:
+        first (int): the first address of the range.
+        last (int): the last address of the range.
+        bits (int): the address size, 32 for IPv4 and 128 for IPv6.
+
+    Returns:
+        list. the (network address, prefix length) CIDRs.
+    """
+    cidrs = []
+    while first <= last:
+        # the block can't be larger than the alignment of its first address, or than the rest of the range
+        block_bits = min((first & -first).bit_length() - 1 if first else bits, (last - first + 1).bit_length() - 1)
+        cidrs.append((first, bits - block_bits))
+        first += 1 << block_bits
+    return cidrs
+
+
+def _group_ips_by_version(ips: Iterable[str]) -> Tuple[Dict[int, List[int]], List[str]]:
+    ips = list(ips)
+    try:
+        # fast path for lists of IPv4 addresses only
+        packed_ips = array('I', b''.join(map(partial(socket.inet_pton, socket.AF_INET), ips)))
+    except (OSError, ValueError, TypeError):
+        pass
+    else:
+        if packed_ips.itemsize == 4:
+            if sys.byteorder == 'little':
+                packed_ips.byteswap()
+            return {4: packed_ips.tolist(), 6: []}, []
+
+    ip_ints = {4: [], 6: []}  # type:Dict[int, List[int]]
+    invalid_ips = []
+    for ip in ips:
+        encoded_ip = ip_to_int(ip)
+        if encoded_ip is None:
+            invalid_ips.append(ip)
+        else:
+            ip_ints[encoded_ip[0]].append(encoded_ip[1])
+    return ip_ints, invalid_ips
+
+
+def collapse_ips_to_ranges(ips: Iterable[str]) -> List[str]:
+    """Collapse IPs to ranges of consecutive addresses, e.g. 1.1.1.1-1.1.1.3. Single addresses are kept as they are.
+
+    Args:
+        ips (Iterable[str]): IPv4 and IPv6 addresses.
+
+    Returns:
+        list. the sorted IPv4 ranges, then the sorted IPv6 ranges, then the values which are not valid addresses.
+    """
+    ip_ints, invalid_ips = _group_ips_by_version(ips)
+    ranges = []
+    for version, values in ip_ints.items():
+        for first, last in collapse_ip_ints(values):
+            if first == last:
+                ranges.append(int_to_ip(first, version))
+            else:
+                ranges.append(int_to_ip(first, version) + '-' + int_to_ip(last, version))
+    return ranges + invalid_ips
+
+
+def collapse_ips_to_cidrs(ips: Iterable[str]) -> List[str]:
+    """Collapse IPs to the fewest CIDRs covering exactly the addresses, e.g. 1.1.1.2/31. Single addresses are kept as
+    they are.
+
+    Args:
+        ips (Iterable[str]): IPv4 and IPv6 addresses.
+
+    Returns:
+        list. the sorted IPv4 CIDRs, then the sorted IPv6 CIDRs, then the values which are not valid addresses.
+    """
+    ip_ints, invalid_ips = _group_ips_by_version(ips)
+    cidrs = []
+    for version, values in ip_ints.items():
+        bits = IP_VERSION_TO_FAMILY_AND_BITS[version][1]
+        for first, last in collapse_ip_ints(values):
+            for network, prefix_length in ip_range_to_cidrs(first, last, bits):
+                if prefix_length == bits:
+                    cidrs.append(int_to_ip(network, version))
+                else:
+                    cidrs.append(int_to_ip(network, version) + '/' + str(prefix_length))
+    return cidrs + invalid_ips
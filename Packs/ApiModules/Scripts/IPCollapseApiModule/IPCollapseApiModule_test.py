@@ -0,0 +1,77 @@
+import ipaddress
+import random
+
+import pytest
+from IPCollapseApiModule import *
+
+IPS = ['1.1.1.1', '25.24.23.22', '22.21.20.19', '1.1.1.2', '1.2.3.4', '1.1.1.3', '2.2.2.2', '1.2.3.5', '1.1.1.2']
+
+
+def test_collapse_ips_to_ranges():
+    """
+    Given
+    - Unsorted IPv4 addresses with duplicates, some of them consecutive
+
+    When
+    - Collapsing them to ranges
+
+    Then
+    - Consecutive addresses are returned as sorted ranges and single addresses are kept as they are
+    """
+    assert collapse_ips_to_ranges(IPS) == ['1.1.1.1-1.1.1.3', '1.2.3.4-1.2.3.5', '2.2.2.2', '22.21.20.19',
+                                           '25.24.23.22']
+
+
+def test_collapse_ips_to_cidrs():
+    """
+    Given
+    - Unsorted IPv4 addresses with duplicates, some of them consecutive
+
+    When
+    - Collapsing them to CIDRs
+
+    Then
+    - Every range of consecutive addresses is covered exactly by aligned CIDRs
+    """
+    assert collapse_ips_to_cidrs(IPS) == ['1.1.1.1', '1.1.1.2/31', '1.2.3.4/31', '2.2.2.2', '22.21.20.19',
+                                          '25.24.23.22']
+    assert collapse_ips_to_cidrs(['10.0.0.{}'.format(i) for i in range(256)]) == ['10.0.0.0/24']
+    assert collapse_ips_to_cidrs(['0.0.0.0', '0.0.0.1', '255.255.255.255']) == ['0.0.0.0/31', '255.255.255.255']
+
+
+def test_collapse_ipv6_and_invalid_values():
+    """
+    Given
+    - IPv6 and IPv4 addresses mixed with a value which is not an address
+
+    When
+    - Collapsing them to ranges and CIDRs
+
+    Then
+    - IPv4 results come first, then IPv6 results, then the invalid value as it is
+    """
+    ips = ['2001:db8::3', 'not an ip', '2001:db8::2', '8.8.8.8', '2001:db8::1']
+    assert collapse_ips_to_ranges(ips) == ['8.8.8.8', '2001:db8::1-2001:db8::3', 'not an ip']
+    assert collapse_ips_to_cidrs(ips) == ['8.8.8.8', '2001:db8::1', '2001:db8::2/127', 'not an ip']
+
+
+@pytest.mark.parametrize('version, bits', [(4, 32), (6, 128)])
+def test_ip_range_to_cidrs_matches_ipaddress(version, bits):
+    """
+    Given
+    - Random ranges of addresses
+
+    When
+    - Splitting them to CIDRs
+
+    Then
+    - The CIDRs are the ones the ipaddress module computes
+    """
+    address = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+    randomizer = random.Random(version)
+    for _ in range(200):
+        first = randomizer.randrange(2 ** bits - 5000)
+        last = first + randomizer.randrange(5000)
+        expected = [(int(network.network_address), network.prefixlen)
+                    for network in ipaddress.summarize_address_range(address(first), address(last))]
+        assert ip_range_to_cidrs(first, last, bits) == expected
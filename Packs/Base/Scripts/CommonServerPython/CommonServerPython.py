@@ -6,12 +6,14 @@ Note that adding code to CommonServerUserPython can override functions in Common
 from __future__ import print_function
 
 import base64
+import itertools
 import json
 import logging
 import os
 import re
 import socket
 import sys
+import threading
 import time
 import traceback
 from random import randint
@@ -1370,17 +1372,22 @@ def tableToMarkdown(name, t, headers=None, headerTransform=None, removeNull=Fals
         mdResult += '|\n'
         sep = '---'
         mdResult += '|' + '|'.join([sep] * len(headers)) + '|\n'
+        # The rows are joined once, appending unicode rows to the result one by one is quadratic in python 2
+        rows = []
         for entry in t:
             vals = [stringEscapeMD((formatCell(entry.get(h, ''), False) if entry.get(h) is not None else ''),
                                    True, True) for h in headers]
-            # this pipe is optional
-            mdResult += '| '
             try:
-                mdResult += ' | '.join(vals)
+                row = ' | '.join(vals)
             except UnicodeDecodeError:
                 vals = [str(v) for v in vals]
-                mdResult += ' | '.join(vals)
-            mdResult += ' |\n'
+                row = ' | '.join(vals)
+            # this pipe is optional
+            rows.append('| ' + row + ' |\n')
+        try:
+            mdResult += ''.join(rows)
+        except UnicodeDecodeError:
+            mdResult += ''.join(str(row) for row in rows)
 
     else:
         mdResult += '**No entries.**\n'
@@ -2776,6 +2783,10 @@ def return_results(results):
         demisto.results(results.extract_for_local())
         return
 
+    if isinstance(results, GetModifiedRemoteDataResponse):
+        demisto.results(results.to_entry())
+        return
+
     demisto.results(results)
 
 
@@ -3631,8 +3642,58 @@ H || val.SSDeep && val.SSDeep == obj.SSDeep)': {'Malicious': {'Vendor': 'Vendor'
                                .format(indicator_type, INDICATOR_TYPE_TO_CONTEXT_KEY.keys()))
 
 
+class TokenBucket(object):
+    """Thread safe token bucket rate limiter
+
+    :type rate: ``float``
+    :param rate: The number of tokens (requests) added to the bucket per second.
+
+    :type capacity: ``int``
+    :param capacity: The maximum number of tokens the bucket holds (the burst size). Defaults to ``rate``, minimum 1.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError('The rate of a token bucket must be positive, got {}'.format(rate))
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self._tokens = self.capacity
+        self._timestamp = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes a token from the bucket, waits until one is available if the bucket is empty
+
+        :return: The number of seconds waited for a token.
+        :rtype: ``float``
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(self.capacity, self._tokens + (now - self._timestamp) * self.rate)
+                self._timestamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+            waited += wait_time
+
+
 # Will add only if 'requests' module imported
 if 'requests' in sys.modules:
+    class _TooManyRequests(Exception):
+        """Raised by the concurrent requests of BaseClient to retry a request after a 429 response"""
+
+        def __init__(self, response, retry_after):
+            super(_TooManyRequests, self).__init__('Error in API call [429] - {}'.format(response.reason))
+            self.response = response
+            self.retry_after = retry_after
+
     class BaseClient(object):
         """Client to use in integrations with powerful _http_request
         :type base_url: ``str``
@@ -3659,11 +3720,23 @@ if 'requests' in sys.modules:
             The request authorization, for example: (username, password).
             Can be None.
 
+        :type pool_connections: ``int``
+        :param pool_connections: The number of connection pools (one per host) to keep per retry configuration.
+
+        :type pool_maxsize: ``int``
+        :param pool_maxsize: The maximum number of connections to keep open in each pool.
+
+        :type rate_limit: ``float``
+        :param rate_limit:
+            The maximum number of requests per second the client sends (token bucket, shared by all threads).
+            If None, the requests are not rate limited.
+
         :return: No data returned
         :rtype: ``None``
         """
 
-        def __init__(self, base_url, verify=True, proxy=False, ok_codes=tuple(), headers=None, auth=None):
+        def __init__(self, base_url, verify=True, proxy=False, ok_codes=tuple(), headers=None, auth=None,
+                     pool_connections=10, pool_maxsize=10, rate_limit=None):
             self._base_url = base_url
             self._verify = verify
             self._ok_codes = ok_codes
@@ -3672,6 +3745,13 @@ if 'requests' in sys.modules:
             self._session = requests.Session()
             if not proxy:
                 self._session.trust_env = False
+            self._pool_connections = pool_connections
+            self._pool_maxsize = pool_maxsize
+            # adapters by retry configuration, reusing an adapter keeps its connection pools (keep-alive) alive
+            self._adapters = {}
+            # connection counters of pools which were already closed
+            self._closed_pools_stats = {'requests': 0, 'new_connections': 0}
+            self._rate_limiter = TokenBucket(rate_limit) if rate_limit else None
 
         def _implement_retry(self, retries=0,
                              status_list_to_retry=None,
@@ -3715,24 +3795,95 @@ if 'requests' in sys.modules:
                 if status falls in ``status_forcelist`` range and retries have
                 been exhausted.
             """
+            retry_key = (retries, tuple(status_list_to_retry) if status_list_to_retry else None, backoff_factor,
+                         raise_on_redirect, raise_on_status)
+            adapter = self._adapters.get(retry_key)
+            if adapter is not None and self._session.adapters.get('http://') is adapter \
+                    and self._session.adapters.get('https://') is adapter:
+                return
             try:
-                retry = Retry(
-                    total=retries,
-                    read=retries,
-                    connect=retries,
-                    backoff_factor=backoff_factor,
-                    status=retries,
-                    status_forcelist=status_list_to_retry,
-                    method_whitelist=frozenset(['GET', 'POST', 'PUT']),
-                    raise_on_status=raise_on_status,
-                    raise_on_redirect=raise_on_redirect
-                )
-                adapter = HTTPAdapter(max_retries=retry)
+                if adapter is None:
+                    retry = Retry(
+                        total=retries,
+                        read=retries,
+                        connect=retries,
+                        backoff_factor=backoff_factor,
+                        status=retries,
+                        status_forcelist=status_list_to_retry,
+                        method_whitelist=frozenset(['GET', 'POST', 'PUT']),
+                        raise_on_status=raise_on_status,
+                        raise_on_redirect=raise_on_redirect
+                    )
+                    adapter = HTTPAdapter(max_retries=retry,
+                                          pool_connections=self._pool_connections,
+                                          pool_maxsize=self._pool_maxsize)
+                    self._track_adapter_pools(adapter)
+                    self._adapters[retry_key] = adapter
                 self._session.mount('http://', adapter)
                 self._session.mount('https://', adapter)
             except NameError:
                 pass
 
+        def _track_adapter_pools(self, adapter):
+            """
+            Tracks the pools of the adapter pool manager and of every proxy manager it creates later on
+
+            :type adapter: ``requests.adapters.HTTPAdapter``
+            :param adapter: The adapter to track.
+            """
+            self._track_closed_pools(adapter.poolmanager)
+            proxy_manager_for = adapter.proxy_manager_for
+
+            def tracked_proxy_manager_for(proxy, **proxy_kwargs):
+                is_new_proxy = proxy not in adapter.proxy_manager
+                proxy_manager = proxy_manager_for(proxy, **proxy_kwargs)
+                if is_new_proxy:
+                    self._track_closed_pools(proxy_manager)
+                return proxy_manager
+
+            adapter.proxy_manager_for = tracked_proxy_manager_for
+
+        def _track_closed_pools(self, pool_manager):
+            """
+            Keeps the connection counters of pools the pool manager evicts (more hosts than ``pool_connections``)
+
+            :type pool_manager: ``urllib3.PoolManager`` or ``urllib3.ProxyManager``
+            :param pool_manager: The pool manager to track.
+            """
+            dispose_pool = pool_manager.pools.dispose_func
+
+            def dispose_func(pool):
+                self._closed_pools_stats['requests'] += pool.num_requests
+                self._closed_pools_stats['new_connections'] += pool.num_connections
+                if dispose_pool:
+                    dispose_pool(pool)
+
+            pool_manager.pools.dispose_func = dispose_func
+
+        def _get_connection_stats(self):
+            """
+            Counts the requests sent by the client and how many of them opened a new TCP/TLS connection
+            rather than reusing a kept-alive one.
+
+            :return: The counters ``requests``, ``new_connections`` and ``reused_connections``.
+            :rtype: ``dict``
+            """
+            sent_requests = self._closed_pools_stats['requests']
+            new_connections = self._closed_pools_stats['new_connections']
+            for adapter in self._adapters.values():
+                pool_managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+                for pool_manager in pool_managers:
+                    for pool_key in pool_manager.pools.keys():
+                        pool = pool_manager.pools.get(pool_key)
+                        if pool is not None:
+                            sent_requests += pool.num_requests
+                            new_connections += pool.num_connections
+            return {
+                'requests': sent_requests,
+                'new_connections': new_connections,
+                'reused_connections': max(sent_requests - new_connections, 0)
+            }
+
         def _http_request(self, method, url_suffix, full_url=None, headers=None, auth=None, json_data=None,
                           params=None, data=None, files=None, timeout=10, resp_type='json', ok_codes=None,
                           return_empty_response=False, retries=0, status_list_to_retry=None,
@@ -3835,6 +3986,8 @@ if 'requests' in sys.modules:
                 headers = headers if headers else self._headers
                 auth = auth if auth else self._auth
                 self._implement_retry(retries, status_list_to_retry, backoff_factor, raise_on_redirect, raise_on_status)
+                if self._rate_limiter:
+                    self._rate_limiter.acquire()
                 # Execute
                 res = self._session.request(
                     method,
@@ -3854,16 +4007,7 @@ if 'requests' in sys.modules:
                     if error_handler:
                         error_handler(res)
                     else:
-                        err_msg = 'Error in API call [{}] - {}' \
-                            .format(res.status_code, res.reason)
-                        try:
-                            # Try to parse json error response
-                            error_entry = res.json()
-                            err_msg += '\n{}'.format(json.dumps(error_entry))
-                            raise DemistoException(err_msg)
-                        except ValueError:
-                            err_msg += '\n{}'.format(res.text)
-                            raise DemistoException(err_msg)
+                        self._handle_error_response(res)
 
                 is_response_empty_and_successful = (res.status_code == 204)
                 if is_response_empty_and_successful and return_empty_response:
@@ -3912,6 +4056,125 @@ if 'requests' in sys.modules:
                 err_msg = 'Max Retries Error- Request attempts with {} retries failed. \n{}'.format(retries, reason)
                 raise DemistoException(err_msg, exception)
 
+        def _http_requests_concurrently(self, requests_kwargs, max_workers=10, max_retry_after_attempts=3,
+                                        default_retry_after=1, max_retry_after=60):
+            """Sends many requests concurrently on a bounded thread pool, over the client session.
+
+            Each request is sent with ``_http_request``, so every request is subject to the client rate limit.
+            A request answered with 429 (Too Many Requests) is sent again after the time given in
+            its ``Retry-After`` header.
+
+            :type requests_kwargs: ``list``
+            :param requests_kwargs: The keyword arguments of ``_http_request`` for each request,
+                for example: [{'method': 'GET', 'url_suffix': '/ip/1.1.1.1'}, ...].
+
+            :type max_workers: ``int``
+            :param max_workers: The maximum number of requests sent at the same time.
+                Set ``pool_maxsize`` of the client to at least this number to keep all the connections alive.
+
+            :type max_retry_after_attempts: ``int``
+            :param max_retry_after_attempts: How many times a request answered with 429 is sent again.
+
+            :type default_retry_after: ``float``
+            :param default_retry_after: The seconds to wait after a 429 response without a valid ``Retry-After``.
+
+            :type max_retry_after: ``float``
+            :param max_retry_after: The maximum seconds to wait after a 429 response.
+
+            :return: A ``(result, error)`` tuple per request, in the order of ``requests_kwargs``.
+                ``result`` is the return value of ``_http_request`` and ``error`` is None,
+                or ``result`` is None and ``error`` is the exception the request raised.
+            :rtype: ``list``
+            """
+            from multiprocessing.pool import ThreadPool
+
+            def send_request(request_kwargs):
+                try:
+                    return self._send_with_retry_after(request_kwargs, max_retry_after_attempts,
+                                                       default_retry_after, max_retry_after), None
+                except Exception as exception:
+                    return None, exception
+
+            if not requests_kwargs:
+                return []
+            pool = ThreadPool(min(max_workers, len(requests_kwargs)))
+            try:
+                return pool.map(send_request, requests_kwargs)
+            finally:
+                pool.close()
+                pool.join()
+
+        def _send_with_retry_after(self, request_kwargs, max_retry_after_attempts, default_retry_after,
+                                   max_retry_after):
+            request_kwargs = dict(request_kwargs)
+            error_handler = request_kwargs.pop('error_handler', None)
+
+            def retry_after_error_handler(res):
+                if res.status_code == 429:
+                    raise _TooManyRequests(res, self._get_retry_after(res, default_retry_after, max_retry_after))
+                if error_handler:
+                    error_handler(res)
+                else:
+                    self._handle_error_response(res)
+
+            attempt = 0
+            while True:
+                try:
+                    return self._http_request(error_handler=retry_after_error_handler, **request_kwargs)
+                except _TooManyRequests as exception:
+                    if attempt >= max_retry_after_attempts:
+                        if error_handler:
+                            return error_handler(exception.response)
+                        self._handle_error_response(exception.response)
+                    attempt += 1
+                    time.sleep(exception.retry_after)
+
+        @staticmethod
+        def _get_retry_after(res, default_retry_after=1, max_retry_after=60):
+            """Returns the seconds to wait according to the Retry-After header of a response
+
+            :type res: ``requests.Response``
+            :param res: The 429 (Too Many Requests) response.
+
+            :type default_retry_after: ``float``
+            :param default_retry_after: The seconds to wait if the header is missing or can not be parsed.
+
+            :type max_retry_after: ``float``
+            :param max_retry_after: The maximum seconds to wait.
+
+            :return: The seconds to wait before sending the request again.
+            :rtype: ``float``
+            """
+            retry_after = res.headers.get('Retry-After', '')
+            try:
+                seconds = float(retry_after)
+            except ValueError:
+                try:
+                    # HTTP-date format, for example: Wed, 21 Oct 2015 07:28:00 GMT
+                    from email.utils import mktime_tz, parsedate_tz
+                    seconds = mktime_tz(parsedate_tz(retry_after)) - time.time()
+                except Exception:
+                    seconds = default_retry_after
+            return min(max(seconds, 0), max_retry_after)
+
+        @staticmethod
+        def _handle_error_response(res):
+            """Raises a DemistoException describing an error response, used when no error handler is given.
+
+            :type res: ``requests.Response``
+            :param res: The error response.
+            """
+            err_msg = 'Error in API call [{}] - {}' \
+                .format(res.status_code, res.reason)
+            try:
+                # Try to parse json error response
+                error_entry = res.json()
+                err_msg += '\n{}'.format(json.dumps(error_entry))
+                raise DemistoException(err_msg)
+            except ValueError:
+                err_msg += '\n{}'.format(res.text)
+                raise DemistoException(err_msg)
+
         def _is_status_code_valid(self, response, ok_codes=None):
             """If the status code is OK, return 'True'.
 
@@ -3933,8 +4196,10 @@ if 'requests' in sys.modules:
             return response.ok
 
 
-def batch(iterable, batch_size=1):
+def batch(iterable, batch_size=1, max_batch_bytes=None, item_size=None):
     """Gets an iterable and yields slices of it.
+    Sequences (for example a list) are sliced, any other iterable (for example a generator) is consumed lazily
+    and yielded as lists, without materializing it.
 
     :type iterable: ``list``
     :param iterable: list or other iterable object.
@@ -3942,15 +4207,48 @@ def batch(iterable, batch_size=1):
     :type batch_size: ``int``
     :param batch_size: the size of batches to fetch
 
+    :type max_batch_bytes: ``int``
+    :param max_batch_bytes: If given, a batch is also closed before its items exceed this size in bytes.
+        An item bigger than the limit is yielded in a batch of its own. The batches are yielded as lists.
+
+    :type item_size: ``callable``
+    :param item_size: Returns the size in bytes of an item, used with ``max_batch_bytes``.
+        Default: the length of the item serialized to JSON.
+
     :rtype: ``list``
     :return:: Iterable slices of given
     """
-    current_batch = iterable[:batch_size]
-    not_batched = iterable[batch_size:]
-    while current_batch:
+    if batch_size < 1:
+        return
+    if max_batch_bytes is None and hasattr(iterable, '__getitem__') and hasattr(iterable, '__len__'):
+        for i in range(0, len(iterable), batch_size):
+            yield iterable[i:i + batch_size]
+        return
+
+    if max_batch_bytes is None:
+        iterator = iter(iterable)
+        current_batch = list(itertools.islice(iterator, batch_size))
+        while current_batch:
+            yield current_batch
+            current_batch = list(itertools.islice(iterator, batch_size))
+        return
+
+    if item_size is None:
+        def item_size(item):
+            return len(json.dumps(item).encode('utf-8'))
+
+    current_batch = []
+    current_batch_bytes = 0
+    for item in iterable:
+        size = item_size(item)
+        if current_batch and (len(current_batch) == batch_size or current_batch_bytes + size > max_batch_bytes):
+            yield current_batch
+            current_batch = []
+            current_batch_bytes = 0
+        current_batch.append(item)
+        current_batch_bytes += size
+    if current_batch:
         yield current_batch
-        current_batch = not_batched[:batch_size]
-        not_batched = not_batched[batch_size:]
 
 
 def dict_safe_get(dict_object, keys, default_return_value=None, return_type=None, raise_return_type=True):
@@ -4269,6 +4567,80 @@ class GetRemoteDataResponse:
             return [self.mirrored_object] + self.entries
 
 
+class GetModifiedRemoteDataArgs:
+    """get-modified-remote-data args parser
+    :type args: ``dict``
+    :param args: arguments for the command of the command.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+
+    def __init__(self, args):
+        self.last_update = args['lastUpdate']
+
+
+class GetModifiedRemoteDataResponse:
+    """get-modified-remote-data response parser
+    :type modified_incident_ids: ``list``
+    :param modified_incident_ids: The IDs of the remote incidents which were modified since the last update,
+        only these incidents are refreshed with get-remote-data.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+
+    def __init__(self, modified_incident_ids):
+        self.modified_incident_ids = modified_incident_ids
+
+    def to_entry(self):
+        """Extracts the response into the entry of the command.
+
+        :return: The entry of the modified incident IDs.
+        :rtype: ``dict``
+        """
+        demisto.info('Modified incidents: {}'.format(self.modified_incident_ids))
+        return {'Contents': self.modified_incident_ids, 'Type': EntryType.NOTE, 'ContentsFormat': EntryFormat.JSON}
+
+
+def get_modified_remote_ids(get_page, page_size=100, id_key='id', max_ids=None):
+    """Collects the IDs of the remote incidents which were modified since the last update, a page at a time.
+
+    The pages should be sorted by a field which does not change when an incident is modified (e.g. the ID), so an
+    incident modified while paging is not skipped, an incident returned in two pages is collected once.
+
+    :type get_page: ``Callable``
+    :param get_page: Called with the ``offset`` and ``limit`` keyword arguments, returns the page of the modified
+        incidents (dicts with the ID in ``id_key``, or the IDs). A page shorter than ``page_size`` is the last page.
+
+    :type page_size: ``int``
+    :param page_size: The number of incidents asked for in a page.
+
+    :type id_key: ``str``
+    :param id_key: The key of the ID in the incidents.
+
+    :type max_ids: ``int``
+    :param max_ids: The maximum number of IDs to collect, None to collect all of them.
+
+    :return: The IDs of the modified incidents, in the order they were returned.
+    :rtype: ``list``
+    """
+    modified_ids = []  # type: list
+    collected_ids = set()  # type: set
+    offset = 0
+    while not max_ids or len(modified_ids) < max_ids:
+        page = get_page(offset=offset, limit=page_size) or []
+        for incident in page:
+            incident_id = incident.get(id_key) if isinstance(incident, dict) else incident
+            if incident_id is not None and incident_id not in collected_ids:
+                collected_ids.add(incident_id)
+                modified_ids.append(incident_id)
+        if len(page) < page_size:
+            break
+        offset += len(page)
+    return modified_ids[:max_ids] if max_ids else modified_ids
+
+
 class SchemeTypeMapping:
     """Scheme type mappings builder.
 
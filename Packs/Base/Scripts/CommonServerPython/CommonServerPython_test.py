@@ -15,7 +15,9 @@ from CommonServerPython import xml2json, json2xml, entryTypes, formats, tableToM
     IntegrationLogger, parse_date_string, IS_PY3, DebugLogger, b64_encode, parse_date_range, return_outputs, \
     argToBoolean, ipv4Regex, ipv4cidrRegex, ipv6cidrRegex, ipv6Regex, batch, FeedIndicatorType, \
     encode_string_results, safe_load_json, remove_empty_elements, aws_table_to_markdown, is_demisto_version_ge, \
-    appendContext, auto_detect_indicator_type, handle_proxy, get_demisto_version_as_str, get_x_content_info_headers
+    appendContext, auto_detect_indicator_type, handle_proxy, get_demisto_version_as_str, get_x_content_info_headers, \
+    EntryType, EntryFormat, return_results, GetModifiedRemoteDataArgs, GetModifiedRemoteDataResponse, \
+    get_modified_remote_ids
 
 try:
     from StringIO import StringIO
@@ -1588,6 +1590,198 @@ class TestBaseClient:
         with raises(DemistoException, match='- {}\n.*{}'.format(reason, json_response["error"])):
             self.client._http_request('get', 'event', resp_type='text')
 
+    def test_http_request_reuses_adapter(self, requests_mock):
+        """
+            Given
+            - A base client
+
+            When
+            - Making several http requests with the same and then a different retry configuration
+
+            Then
+            - Ensure the adapter is created once per retry configuration and the cached one is mounted again
+        """
+        from CommonServerPython import BaseClient
+        requests_mock.get('http://example.com/api/v2/event', text=json.dumps(self.text))
+        client = BaseClient('http://example.com/api/v2/', pool_maxsize=20)
+        client._http_request('get', 'event')
+        adapter = client._session.get_adapter('http://example.com')
+        client._http_request('get', 'event')
+        assert client._session.get_adapter('http://example.com') is adapter
+        assert adapter._pool_maxsize == 20
+
+        client._http_request('get', 'event', retries=2, status_list_to_retry=[500])
+        assert client._session.get_adapter('http://example.com') is not adapter
+        client._http_request('get', 'event')
+        assert client._session.get_adapter('http://example.com') is adapter
+        assert len(client._adapters) == 2
+
+        # an adapter mounted on the session in between is replaced as before
+        client._session.mount('http://', requests.adapters.HTTPAdapter())
+        client._http_request('get', 'event')
+        assert client._session.get_adapter('http://example.com') is adapter
+
+    def test_connection_stats_evicted_proxy_pools(self):
+        """
+            Given
+            - A base client with a single pool per manager and a proxy manager created by its adapter
+
+            When
+            - The proxy manager evicts a pool in favor of a pool for another host
+
+            Then
+            - Ensure the counters of the evicted pool are kept in the connection stats
+        """
+        from CommonServerPython import BaseClient
+        client = BaseClient('http://example.com/api/v2/', pool_connections=1)
+        client._implement_retry()
+        adapter = client._session.get_adapter('http://example.com')
+        proxy_manager = adapter.proxy_manager_for('http://proxy.example.com:8080')
+        pool = proxy_manager.connection_from_url('https://first.example.com')
+        pool.num_requests = 3
+        pool.num_connections = 1
+        proxy_manager.connection_from_url('https://second.example.com')
+        assert len(proxy_manager.pools) == 1
+        assert client._get_connection_stats() == {'requests': 3, 'new_connections': 1, 'reused_connections': 2}
+
+    def test_connection_stats_keep_alive(self):
+        """
+            Given
+            - A base client and a local HTTP/1.1 server supporting keep-alive
+
+            When
+            - Making several http requests
+
+            Then
+            - Ensure only the first request opened a connection and the rest reused it
+        """
+        import threading
+        from CommonServerPython import BaseClient
+        if IS_PY3:
+            from http.server import BaseHTTPRequestHandler, HTTPServer
+        else:
+            from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # type: ignore
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                body = b'{"status": "ok"}'
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            client = BaseClient('http://127.0.0.1:{}/'.format(server.server_address[1]))
+            for _ in range(5):
+                assert client._http_request('get', 'event') == self.text
+            assert client._get_connection_stats() == {'requests': 5, 'new_connections': 1, 'reused_connections': 4}
+            # the server handles a single connection at a time, release the kept-alive one
+            client._session.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_http_requests_concurrently_order_and_errors(self, requests_mock):
+        """
+            Given
+            - A base client and an API failing for one of the requested indicators
+
+            When
+            - Sending the requests concurrently
+
+            Then
+            - Ensure the results are in the input order and only the failing request has an error
+        """
+        from CommonServerPython import BaseClient, DemistoException
+        for i in range(20):
+            requests_mock.get('http://example.com/api/v2/ip/{}'.format(i), json={'ip': i})
+        requests_mock.get('http://example.com/api/v2/ip/7', status_code=404, reason='Not Found')
+        client = BaseClient('http://example.com/api/v2/')
+        results = client._http_requests_concurrently(
+            [{'method': 'GET', 'url_suffix': 'ip/{}'.format(i)} for i in range(20)], max_workers=5)
+        assert [result for result, _ in results] == [{'ip': i} if i != 7 else None for i in range(20)]
+        assert [i for i, (_, error) in enumerate(results) if error] == [7]
+        assert isinstance(results[7][1], DemistoException)
+        assert '[404]' in str(results[7][1])
+        assert client._http_requests_concurrently([]) == []
+
+    def test_http_requests_concurrently_retry_after(self, requests_mock, mocker):
+        """
+            Given
+            - An API answering 429 with a Retry-After header before answering successfully
+
+            When
+            - Sending the requests concurrently
+
+            Then
+            - Ensure the request is sent again after the Retry-After time and succeeds
+            - Ensure a request rate limited more times than allowed returns the 429 error
+        """
+        import time
+        import CommonServerPython
+        from CommonServerPython import BaseClient
+        # only the time of CommonServerPython is patched, the thread pool sleeps as well on python 2
+        csp_time = mocker.patch.object(CommonServerPython, 'time', wraps=time)
+        sleep = csp_time.sleep = mocker.Mock()
+        requests_mock.get('http://example.com/api/v2/ip/1', [
+            {'status_code': 429, 'headers': {'Retry-After': '2'}},
+            {'json': {'ip': 1}}
+        ])
+        requests_mock.get('http://example.com/api/v2/ip/2', status_code=429, reason='Too Many Requests')
+        client = BaseClient('http://example.com/api/v2/')
+        results = client._http_requests_concurrently(
+            [{'method': 'GET', 'url_suffix': 'ip/1'}, {'method': 'GET', 'url_suffix': 'ip/2'}],
+            max_retry_after_attempts=2)
+        assert results[0] == ({'ip': 1}, None)
+        assert results[1][0] is None
+        assert '[429]' in str(results[1][1])
+        assert sorted(call[0][0] for call in sleep.call_args_list) == [1, 1, 2]
+
+    RETRY_AFTER_INPUTS = [
+        ({'Retry-After': '3'}, 3),
+        ({'Retry-After': 'not a date'}, 1),
+        ({}, 1),
+        ({'Retry-After': '3600'}, 60),
+        ({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}, 0),
+    ]
+
+    @pytest.mark.parametrize('headers, expected', RETRY_AFTER_INPUTS)
+    def test_get_retry_after(self, headers, expected):
+        from CommonServerPython import BaseClient
+        response = requests.Response()
+        response.status_code = 429
+        response.headers.update(headers)
+        assert BaseClient._get_retry_after(response) == expected
+
+    def test_http_request_rate_limit(self, requests_mock, mocker):
+        """
+            Given
+            - A base client limited to 2 requests per second
+
+            When
+            - Sending 4 requests
+
+            Then
+            - Ensure every request took a token of the client rate limiter
+        """
+        from CommonServerPython import BaseClient
+        requests_mock.get('http://example.com/api/v2/event', json=self.text)
+        client = BaseClient('http://example.com/api/v2/', rate_limit=2)
+        acquire = mocker.patch.object(client._rate_limiter, 'acquire', return_value=0)
+        for _ in range(4):
+            client._http_request('get', 'event')
+        assert acquire.call_count == 4
+
     def test_is_valid_ok_codes_empty(self):
         from requests import Response
         from CommonServerPython import BaseClient
@@ -1682,6 +1876,31 @@ def test_http_client_debug(mocker):
     assert debug_log is not None
 
 
+def test_token_bucket(mocker):
+    """
+        Given
+        - A token bucket of 2 tokens per second
+
+        When
+        - Acquiring 4 tokens at once
+
+        Then
+        - Ensure the burst is served at once and the next tokens wait for the bucket to refill
+    """
+    from CommonServerPython import TokenBucket
+    now = [1000.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    mocker.patch('time.time', side_effect=lambda: now[0])
+    mocker.patch('time.sleep', side_effect=sleep)
+    bucket = TokenBucket(2)
+    assert [bucket.acquire() for _ in range(4)] == [0, 0, 0.5, 0.5]
+    with raises(ValueError):
+        TokenBucket(0)
+
+
 class TestParseDateRange:
     @staticmethod
     def test_utc_time_sanity():
@@ -1904,6 +2123,78 @@ batch_params = [
 def test_batch(iterable, sz, expected):
     for i, item in enumerate(batch(iterable, sz)):
         assert expected[i] == item
+    assert list(batch(iterable, sz)) == expected
+    # iterators are batched lazily into lists
+    assert list(batch(iter(iterable), sz)) == expected
+    assert list(batch((item for item in iterable), sz)) == expected
+
+
+def test_batch_keeps_sequence_type():
+    assert list(batch((1, 2, 3), 2)) == [(1, 2), (3,)]
+    assert list(batch('abcde', 2)) == ['ab', 'cd', 'e']
+
+
+def test_batch_is_lazy():
+    """
+        Given
+        - An infinite generator
+
+        When
+        - Taking the first two batches
+
+        Then
+        - Ensure only the items of these batches were consumed
+    """
+    consumed = []
+
+    def infinite():
+        i = 0
+        while True:
+            consumed.append(i)
+            yield i
+            i += 1
+
+    batches = batch(infinite(), 3)
+    assert [next(batches), next(batches)] == [[0, 1, 2], [3, 4, 5]]
+    assert consumed == [0, 1, 2, 3, 4, 5]
+
+
+batch_bytes_params = [
+    # the byte size closes the batches before the batch size
+    (['aa', 'bb', 'cc', 'dd'], 10, 4, None, [['aa'], ['bb'], ['cc'], ['dd']]),
+    (['aa', 'bb', 'cc', 'dd'], 10, 8, None, [['aa', 'bb'], ['cc', 'dd']]),
+    # the batch size closes the batches before the byte size
+    (['aa', 'bb', 'cc', 'dd'], 3, 1000, None, [['aa', 'bb', 'cc'], ['dd']]),
+    # an item bigger than the limit gets a batch of its own
+    (['a', 'bbbbbbbbbb', 'c'], 10, 6, None, [['a'], ['bbbbbbbbbb'], ['c']]),
+    # custom item size
+    ([1, 2, 3, 4, 5], 10, 5, lambda item: item, [[1, 2], [3], [4], [5]]),
+    ([], 10, 5, None, []),
+]
+
+
+@pytest.mark.parametrize('iterable, sz, max_bytes, item_size, expected', batch_bytes_params)
+def test_batch_by_bytes(iterable, sz, max_bytes, item_size, expected):
+    assert list(batch(iterable, sz, max_batch_bytes=max_bytes, item_size=item_size)) == expected
+    assert list(batch(iter(iterable), sz, max_batch_bytes=max_bytes, item_size=item_size)) == expected
+
+
+def test_batch_linear_time():
+    """
+        Given
+        - A list of 2M items
+
+        When
+        - Batching it in batches of 10
+
+        Then
+        - Ensure the batching does not copy the rest of the list for every batch
+    """
+    import time
+    items = list(range(2000000))
+    start = time.time()
+    assert sum(1 for _ in batch(items, 10)) == 200000
+    assert time.time() - start < 5
 
 
 regexes_test = [
@@ -2517,3 +2808,71 @@ def test_get_x_content_info_headers(mocker):
     headers = get_x_content_info_headers()
     assert headers['X-Content-LicenseID'] == test_license
     assert headers['X-Content-Name'] == test_brand
+
+
+def test_get_modified_remote_ids():
+    """
+    Given
+    - 250 modified incidents, the incident '99' is returned again in the third page.
+
+    When
+    - collecting the modified incident IDs in pages of 100.
+
+    Then
+    - the pages are asked for until the short page, the IDs are collected once each.
+    """
+    incident_ids = [str(i) for i in range(250)]
+    pages = []
+
+    def get_page(offset, limit):
+        pages.append((offset, limit))
+        page = [{'sys_id': incident_id} for incident_id in incident_ids[offset:offset + limit]]
+        if offset == 200:
+            page.insert(0, {'sys_id': '99'})
+        return page
+
+    modified_ids = get_modified_remote_ids(get_page, page_size=100, id_key='sys_id')
+
+    assert modified_ids == incident_ids
+    assert pages == [(0, 100), (100, 100), (200, 100)]
+
+
+def test_get_modified_remote_ids_max_ids(mocker):
+    """
+    Given
+    - 250 modified incidents, returned as IDs.
+
+    When
+    - collecting at most 120 modified incident IDs in pages of 100.
+
+    Then
+    - only two pages are asked for and 120 IDs are returned.
+    """
+    def get_page(offset, limit):
+        return list(range(250))[offset:offset + limit]
+
+    get_page = mocker.Mock(side_effect=get_page)
+
+    assert get_modified_remote_ids(get_page, page_size=100, max_ids=120) == list(range(120))
+    assert get_page.call_count == 2
+
+
+def test_return_results_get_modified_remote_data_response(mocker):
+    """
+    Given
+    - the arguments of get-modified-remote-data and the modified incident IDs.
+
+    When
+    - returning a GetModifiedRemoteDataResponse with return_results.
+
+    Then
+    - the entry has the modified incident IDs in JSON.
+    """
+    mocker.patch.object(demisto, 'results')
+    args = GetModifiedRemoteDataArgs({'lastUpdate': '2020-08-16T17:54:15Z'})
+
+    return_results(GetModifiedRemoteDataResponse(['1', '2']))
+
+    assert args.last_update == '2020-08-16T17:54:15Z'
+    demisto.results.assert_called_once_with({'Contents': ['1', '2'], 'Type': EntryType.NOTE,
+                                             'ContentsFormat': EntryFormat.JSON})
@@ -8,6 +8,8 @@ import requests
 import base64
 import email
 import hashlib
+import threading
+import time
 from typing import List
 from dateutil.parser import parse
 from typing import Dict, Tuple, Any, Optional, Union
@@ -33,9 +35,19 @@ HEADERS = {
     'Accept': 'application/json',
     'Authorization': 'Basic {}'.format(base64.b64encode(BYTE_CREDS).decode())
 }
-# Note: True life time of token is actually 30 mins
-TOKEN_LIFE_TIME = 28
+# Life time of the token when the token response has no expires_in, in seconds
+TOKEN_LIFE_TIME = 30 * 60
+# The token is refreshed this many seconds before it expires
+TOKEN_REFRESH_AHEAD = 2 * 60
+# The token of this execution, so a command does not read the integration context for every request
+TOKEN_CACHE: Dict[str, Any] = {}
+TOKEN_LOCK = threading.Lock()
+# Shared session, so the requests of an execution are sent on kept-alive connections
+SESSION = requests.Session()
 INCIDENTS_PER_FETCH = int(demisto.params().get('incidents_per_fetch', 15))
+# Maximal number of IDs the entities endpoints accept in a request
+DETECTIONS_ENTITIES_BATCH_SIZE = 1000
+INCIDENTS_ENTITIES_BATCH_SIZE = 500
 # Remove proxy if not set to true in params
 handle_proxy()
 
@@ -156,12 +168,14 @@ def http_request(method, url_suffix, params=None, data=None, files=None, headers
         :return: Returns the http request response json
         :rtype: ``dict``
     """
+    # The headers are copied so the Basic authorization of the global HEADERS is not overridden by the token
+    headers = dict(headers or {})
     if get_token_flag:
         token = get_token()
         headers['Authorization'] = 'Bearer {}'.format(token)
     url = SERVER + url_suffix
     try:
-        res = requests.request(
+        res = SESSION.request(
             method,
             url,
             verify=USE_SSL,
@@ -191,12 +205,13 @@ def http_request(method, url_suffix, params=None, data=None, files=None, headers
                 code=res.status_code,
                 reason=reason
             )
-            # try to create a new token
-            if res.status_code == 403 and get_token_flag:
+            # try once more with a new token
+            if res.status_code in (401, 403) and get_token_flag:
                 LOG(err_msg)
                 token = get_token(new_token=True)
                 headers['Authorization'] = 'Bearer {}'.format(token)
-                return http_request(method, url_suffix, params, data, headers, safe, get_token_flag=False)
+                return http_request(method, url_suffix, params=params, data=data, files=files, headers=headers,
+                                    safe=safe, get_token_flag=False, no_json=no_json)
             elif safe:
                 return None
             return_error(err_msg)
@@ -326,15 +341,17 @@ def extract_transformed_dict_with_split(old_dict, transformation_dict_arr):
     return new_dict
 
 
-def get_passed_mins(start_time, end_time_str):
+def is_token_valid(token_ctx, now):
     """
-        Returns the time passed in mins
-        :param start_time: Start time in datetime
-        :param end_time_str: End time in str
-        :return: The passed mins in int
+        Returns whether a cached token can still be used, a token which is about to expire can not
+        :param token_ctx: The cached token, with the auth_token, the time it was created and its expires_in
+        :param now: The current time in seconds since the epoch
+        :return: True if the token is valid
     """
-    time_delta = start_time - datetime.fromtimestamp(end_time_str)
-    return time_delta.seconds / 60
+    if not token_ctx or not token_ctx.get('auth_token') or not token_ctx.get('time'):
+        return False
+    expires_in = token_ctx.get('expires_in') or TOKEN_LIFE_TIME
+    return now < token_ctx['time'] + expires_in - TOKEN_REFRESH_AHEAD
 
 
 ''' COMMAND SPECIFIC FUNCTIONS '''
@@ -779,37 +796,40 @@ def list_files() -> Dict:
 
 def get_token(new_token=False):
     """
-        Retrieves the token from the server if it's expired and updates the global HEADERS to include it
+        Retrieves the token from the memory of the execution or from the integration context, and requests a new token
+        from the server if the token is about to expire
 
         :param new_token: If set to True will generate a new token regardless of time passed
 
         :rtype: ``str``
         :return: Token
     """
-    now = datetime.now()
-    ctx = demisto.getIntegrationContext()
-    if ctx and not new_token:
-        passed_mins = get_passed_mins(now, ctx.get('time'))
-        if passed_mins >= TOKEN_LIFE_TIME:
-            # token expired
-            auth_token = get_token_request()
-            demisto.setIntegrationContext({'auth_token': auth_token, 'time': date_to_timestamp(now) / 1000})
-        else:
-            # token hasn't expired
-            auth_token = ctx.get('auth_token')
-    else:
-        # there is no token
-        auth_token = get_token_request()
-        demisto.setIntegrationContext({'auth_token': auth_token, 'time': date_to_timestamp(now) / 1000})
-    return auth_token
+    with TOKEN_LOCK:
+        now = time.time()
+        if not new_token and is_token_valid(TOKEN_CACHE, now):
+            return TOKEN_CACHE['auth_token']
+        ctx = demisto.getIntegrationContext() or {}
+        if not new_token and is_token_valid(ctx, now):
+            TOKEN_CACHE.update({key: ctx.get(key) for key in ('auth_token', 'time', 'expires_in')})
+            return TOKEN_CACHE['auth_token']
+        # there is no token, or it is about to expire
+        token_res = get_token_request()
+        TOKEN_CACHE.update({
+            'auth_token': token_res.get('access_token'),
+            'time': now,
+            'expires_in': token_res.get('expires_in') or TOKEN_LIFE_TIME
+        })
+        ctx.update(TOKEN_CACHE)
+        demisto.setIntegrationContext(ctx)
+        return TOKEN_CACHE['auth_token']
 
 
 def get_token_request():
     """
         Sends token request
 
-        :rtype ``str``
-        :return: Access token
+        :rtype ``dict``
+        :return: The token response, with the access token and the seconds it expires in
     """
     body = {
         'client_id': CLIENT_ID,
@@ -824,7 +844,7 @@ def get_token_request():
         err_msg = 'Authorization Error: User has no authorization to create a token. Please make sure you entered the' \
                   ' credentials correctly.'
         raise Exception(err_msg)
-    return token_res.get('access_token')
+    return token_res
 
 
 def get_detections(last_behavior_time=None, behavior_id=None, filter_arg=None):
@@ -922,6 +942,20 @@ def get_incidents_entities(incidents_ids):
     return response
 
 
+def get_entities_in_chunks(ids, get_entities, batch_size):
+    """
+        Gets the entities of the IDs in chunks of batch_size
+        :param ids: IDs of the requested entities, in the order of the fetch.
+        :param get_entities: Sends the entities request of a chunk of IDs.
+        :param batch_size: Maximal number of IDs in a chunk.
+        :return: Generator of the chunks and their response json, in the order of the IDs, so the entities of the
+            chunks before a failed request are kept.
+    """
+    for i in range(0, len(ids), batch_size):
+        chunk = ids[i:i + batch_size]
+        yield chunk, get_entities(chunk)
+
+
 def create_ioc():
     """
         UNTESTED - Creates an IoC
@@ -1202,29 +1236,40 @@ def fetch_incidents():
                                          'resources')
 
         if detections_ids:
-            raw_res = get_detections_entities(detections_ids)
-
-            if "resources" in raw_res:
-                raw_res['type'] = "detections"
-                for detection in demisto.get(raw_res, "resources"):
-                    incident = detection_to_incident(detection)
-                    incident_date = incident['occurred']
-
-                    incident_date_timestamp = int(parse(incident_date).timestamp() * 1000)
-
-                    # make sure that the two timestamps are in the same length
-                    if len(str(incident_date_timestamp)) != len(str(last_fetch_timestamp)):
-                        incident_date_timestamp, last_fetch_timestamp = timestamp_length_equalization(
-                            incident_date_timestamp, last_fetch_timestamp)
-
-                    # Update last run and add incident if the incident is newer than last fetch
-                    if incident_date_timestamp > last_fetch_timestamp:
-                        last_fetch_time = incident_date
-                        last_fetch_timestamp = incident_date_timestamp
-
-                    incidents.append(incident)
-
-            if len(incidents) == INCIDENTS_PER_FETCH:
+            detections = []  # type:List
+            fetched_ids = 0
+            try:
+                for chunk, raw_res in get_entities_in_chunks(detections_ids, get_detections_entities,
+                                                             DETECTIONS_ENTITIES_BATCH_SIZE):
+                    for detection in demisto.get(raw_res, "resources") or []:
+                        incident = detection_to_incident(detection)
+                        incident_date = incident['occurred']
+
+                        incident_date_timestamp = int(parse(incident_date).timestamp() * 1000)
+
+                        # make sure that the two timestamps are in the same length
+                        if len(str(incident_date_timestamp)) != len(str(last_fetch_timestamp)):
+                            incident_date_timestamp, last_fetch_timestamp = timestamp_length_equalization(
+                                incident_date_timestamp, last_fetch_timestamp)
+
+                        # Update last run and add incident if the incident is newer than last fetch
+                        if incident_date_timestamp > last_fetch_timestamp:
+                            last_fetch_time = incident_date
+                            last_fetch_timestamp = incident_date_timestamp
+
+                        detections.append(incident)
+                    fetched_ids += len(chunk)
+            except Exception as e:
+                if not fetched_ids:
+                    raise
+                demisto.error(f'Fetched {fetched_ids} of {len(detections_ids)} detections: {e}')
+            incidents.extend(detections)
+
+            if fetched_ids < len(detections_ids):
+                # the next fetch continues from the first detection which was not fetched
+                demisto.setLastRun({'first_behavior_detection_time': prev_fetch,
+                                    'detection_offset': offset + fetched_ids})
+            elif len(detections) == INCIDENTS_PER_FETCH:
                 demisto.setLastRun({'first_behavior_detection_time': prev_fetch,
                                     'detection_offset': offset + INCIDENTS_PER_FETCH})
             else:
@@ -1246,28 +1291,40 @@ def fetch_incidents():
                                         'resources')
 
         if incidents_ids:
-            raw_res = get_incidents_entities(incidents_ids)
-            if "resources" in raw_res:
-                raw_res['type'] = "incidents"
-                for incident in demisto.get(raw_res, "resources"):
-                    incident_to_context = incident_to_incident_context(incident)
-                    incident_date = incident_to_context['occurred']
-
-                    incident_date_timestamp = int(parse(incident_date).timestamp() * 1000)
-
-                    # make sure that the two timestamps are in the same length
-                    if len(str(incident_date_timestamp)) != len(str(last_fetch_timestamp)):
-                        incident_date_timestamp, last_fetch_timestamp = timestamp_length_equalization(
-                            incident_date_timestamp, last_fetch_timestamp)
-
-                    # Update last run and add incident if the incident is newer than last fetch
-                    if incident_date_timestamp > last_fetch_timestamp:
-                        last_fetch_time = incident_date
-                        last_fetch_timestamp = incident_date_timestamp
-
-                    incidents.append(incident_to_context)
-
-            if len(incidents) == INCIDENTS_PER_FETCH:
+            fetched_incidents = []  # type:List
+            fetched_ids = 0
+            try:
+                for chunk, raw_res in get_entities_in_chunks(incidents_ids, get_incidents_entities,
+                                                             INCIDENTS_ENTITIES_BATCH_SIZE):
+                    for incident in demisto.get(raw_res, "resources") or []:
+                        incident_to_context = incident_to_incident_context(incident)
+                        incident_date = incident_to_context['occurred']
+
+                        incident_date_timestamp = int(parse(incident_date).timestamp() * 1000)
+
+                        # make sure that the two timestamps are in the same length
+                        if len(str(incident_date_timestamp)) != len(str(last_fetch_timestamp)):
+                            incident_date_timestamp, last_fetch_timestamp = timestamp_length_equalization(
+                                incident_date_timestamp, last_fetch_timestamp)
+
+                        # Update last run and add incident if the incident is newer than last fetch
+                        if incident_date_timestamp > last_fetch_timestamp:
+                            last_fetch_time = incident_date
+                            last_fetch_timestamp = incident_date_timestamp
+
+                        fetched_incidents.append(incident_to_context)
+                    fetched_ids += len(chunk)
+            except Exception as e:
+                if not fetched_ids:
+                    raise
+                demisto.error(f'Fetched {fetched_ids} of {len(incidents_ids)} incidents: {e}')
+            incidents.extend(fetched_incidents)
+
+            if fetched_ids < len(incidents_ids):
+                # the next fetch continues from the first incident which was not fetched
+                demisto.setLastRun({'first_behavior_incident_time': prev_fetch,
+                                    'incident_offset': offset + fetched_ids})
+            elif len(fetched_incidents) == INCIDENTS_PER_FETCH:
                 demisto.setLastRun({'first_behavior_incident_time': prev_fetch,
                                     'incident_offset': offset + INCIDENTS_PER_FETCH})
             else:
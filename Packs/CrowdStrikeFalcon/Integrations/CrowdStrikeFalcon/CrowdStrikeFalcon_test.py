@@ -1,6 +1,10 @@
 import pytest
 import os
 import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
 import demistomock as demisto
 from CommonServerPython import outputPaths, entryTypes
 
@@ -2243,6 +2247,96 @@ class TestFetch:
         fetch_incidents()
         assert demisto.setLastRun.mock_calls[0][1][0] == {'first_behavior_detection_time': '2020-09-04T09:16:11Z'}
 
+    @pytest.fixture()
+    def chunked_detections(self, requests_mock, mocker):
+        """ Sets up 5 detections to fetch, in chunks of 2, the chunk of ldt:3 fails if failing_detection is set.
+        """
+        import CrowdStrikeFalcon
+        mocker.patch.object(CrowdStrikeFalcon, 'INCIDENTS_PER_FETCH', 5)
+        mocker.patch.object(CrowdStrikeFalcon, 'DETECTIONS_ENTITIES_BATCH_SIZE', 2)
+        mocker.patch.object(demisto, 'command', return_value='fetch-incidents')
+        mocker.patch.object(demisto, 'params', return_value={'url': SERVER_URL,
+                                                             'fetch_incidents_or_detections': ['Detections']})
+        requests_mock.get(f'{SERVER_URL}/detects/queries/detects/v1',
+                          json={'resources': [f'ldt:{i}' for i in range(1, 6)]})
+        failing_detection = []
+
+        def summaries(request, context):
+            ids = request.json()['ids']
+            if set(ids) & set(failing_detection):
+                context.status_code = 500
+                context.reason = 'Internal Server Error'
+                return {'errors': [{'code': 500, 'message': 'internal error'}]}
+            return {'resources': [{'detection_id': detection_id,
+                                   'created_timestamp': f'2020-09-04T09:16:1{detection_id[-1]}Z',
+                                   'max_severity_displayname': 'Low'} for detection_id in ids]}
+
+        summaries_mock = requests_mock.post(f'{SERVER_URL}/detects/entities/summaries/GET/v1', json=summaries)
+        return summaries_mock, failing_detection
+
+    def test_fetch_in_chunks(self, set_up_mocks, chunked_detections, mocker):
+        """
+        Given:
+            5 detections (which equals the FETCH_LIMIT) and entities requests of 2 IDs at most
+        When:
+            Fetching the detections
+        Then:
+            The entities are requested in 3 chunks and the incidents are in the order of the IDs.
+            The `first_behavior_time` doesn't change and an `offset` of 5 is added.
+        """
+        from CrowdStrikeFalcon import fetch_incidents
+        mocker.patch.object(demisto, 'getLastRun', return_value={'first_behavior_detection_time': '2020-09-04T09:16:10Z'})
+        summaries_mock, _ = chunked_detections
+
+        incidents = fetch_incidents()
+
+        assert [incident['name'] for incident in incidents] == [f'Detection ID: ldt:{i}' for i in range(1, 6)]
+        assert sorted(request.json()['ids'] for request in summaries_mock.request_history) == [
+            ['ldt:1', 'ldt:2'], ['ldt:3', 'ldt:4'], ['ldt:5']]
+        assert demisto.setLastRun.mock_calls[0][1][0] == {'first_behavior_detection_time': '2020-09-04T09:16:10Z',
+                                                          'detection_offset': 5}
+
+    def test_fetch_cut_short(self, set_up_mocks, chunked_detections, mocker):
+        """
+        Given:
+            5 detections in chunks of 2 IDs, the request of the second chunk fails
+        When:
+            Fetching the detections
+        Then:
+            Only the detections of the first chunk are returned, also if the third chunk was returned.
+            The `first_behavior_time` doesn't change and the `offset` of the second chunk is saved.
+        """
+        from CrowdStrikeFalcon import fetch_incidents
+        mocker.patch.object(demisto, 'getLastRun', return_value={'first_behavior_detection_time': '2020-09-04T09:16:10Z',
+                                                                 'detection_offset': 4})
+        mocker.patch.object(demisto, 'error')
+        _, failing_detection = chunked_detections
+        failing_detection.append('ldt:3')
+
+        incidents = fetch_incidents()
+
+        assert [incident['name'] for incident in incidents] == ['Detection ID: ldt:1', 'Detection ID: ldt:2']
+        assert demisto.setLastRun.mock_calls[0][1][0] == {'first_behavior_detection_time': '2020-09-04T09:16:10Z',
+                                                          'detection_offset': 6}
+
+    def test_fetch_first_chunk_fails(self, set_up_mocks, chunked_detections, mocker):
+        """
+        Given:
+            5 detections in chunks of 2 IDs, the request of the first chunk fails
+        When:
+            Fetching the detections
+        Then:
+            The error is raised and the last run is not changed.
+        """
+        from CrowdStrikeFalcon import fetch_incidents
+        mocker.patch.object(demisto, 'getLastRun', return_value={'first_behavior_detection_time': '2020-09-04T09:16:10Z'})
+        _, failing_detection = chunked_detections
+        failing_detection.append('ldt:1')
+
+        with pytest.raises(Exception, match='internal error'):
+            fetch_incidents()
+        assert not demisto.setLastRun.called
+
 
 class TestIncidentFetch:
     """ Test the logic of the fetch
@@ -2331,3 +2425,116 @@ def test_build_error_message():
 
     res_error_data_with_specific_error = build_error_message({'errors': [{"code": 1234, "message": "hi"}]})
     assert res_error_data_with_specific_error == 'Error: error code: 1234, error_message: hi.'
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FalconStandInHandler(BaseHTTPRequestHandler):
+    """Stand-in of the token and device APIs, counts the token requests and the connections of the clients"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self, status, body):
+        body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.connections.add(self.client_address)
+        self.server.token_requests += 1
+        token = 'token-{}'.format(self.server.token_requests)
+        self.server.valid_tokens.add(token)
+        self.respond(201, {'access_token': token, 'expires_in': 1799})
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        if self.headers.get('Authorization', '')[len('Bearer '):] not in self.server.valid_tokens:
+            self.respond(401, {'errors': [{'code': 401, 'message': 'access denied, invalid bearer token'}]})
+        elif self.path.startswith('/devices/queries/devices/v1'):
+            self.respond(200, {'resources': ['device_id']})
+        else:
+            self.respond(200, {'resources': [{'device_id': 'device_id', 'hostname': 'host'}]})
+
+
+@pytest.fixture
+def falcon_stand_in():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FalconStandInHandler)
+    server.token_requests = 0
+    server.valid_tokens = set()
+    server.connections = set()
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_token_requests_across_commands(requests_mock, mocker, falcon_stand_in):
+    """
+    Given:
+        - A stand-in of the CrowdStrike Falcon API, which revokes the tokens after the 50th command.
+    When:
+        - Running 100 cs-falcon-search-device commands, every one in a new execution sharing the integration context.
+    Then:
+        - A token is requested for the first command and once more after the token was revoked, which is answered
+          with 401 and retried once.
+        - The requests are sent on a single kept-alive connection.
+    """
+    import CrowdStrikeFalcon
+    requests_mock.real_http = True
+    integration_context = {}
+    mocker.patch.object(CrowdStrikeFalcon, 'SERVER', 'http://{}:{}'.format(*falcon_stand_in.server_address))
+    mocker.patch.object(CrowdStrikeFalcon, 'CLIENT_ID', 'client_id')
+    mocker.patch.object(CrowdStrikeFalcon, 'SECRET', 'secret')
+    mocker.patch.object(CrowdStrikeFalcon, 'SESSION', CrowdStrikeFalcon.requests.Session())
+    mocker.patch.object(CrowdStrikeFalcon, 'TOKEN_CACHE', {})
+    mocker.patch.object(demisto, 'getIntegrationContext', side_effect=lambda: dict(integration_context))
+    mocker.patch.object(demisto, 'setIntegrationContext', side_effect=integration_context.update)
+    mocker.patch.object(demisto, 'command', return_value='cs-falcon-search-device')
+    mocker.patch.object(demisto, 'args', return_value={'hostname': 'host'})
+    results = mocker.patch.object(demisto, 'results')
+
+    for i in range(100):
+        if i == 50:
+            falcon_stand_in.valid_tokens.clear()
+        # a new execution starts without the token in memory
+        CrowdStrikeFalcon.TOKEN_CACHE.clear()
+        CrowdStrikeFalcon.main()
+        assert results.call_args[0][0]['EntryContext']['CrowdStrike.Device(val.ID === obj.ID)'][0]['ID'] == 'device_id'
+
+    assert falcon_stand_in.token_requests == 2
+    assert integration_context['auth_token'] == 'token-2'
+    assert len(falcon_stand_in.connections) == 1
+
+
+def test_get_token_refresh_ahead_of_expiry(mocker):
+    """
+    Given:
+        - A token in the integration context which expires in less than TOKEN_REFRESH_AHEAD seconds.
+    When:
+        - Getting the token.
+    Then:
+        - A new token is requested, and saved in the integration context and in memory.
+    """
+    import CrowdStrikeFalcon
+    now = time.time()
+    mocker.patch.object(CrowdStrikeFalcon, 'TOKEN_CACHE', {})
+    mocker.patch.object(demisto, 'getIntegrationContext', return_value={
+        'auth_token': 'old', 'time': now - 1799 + CrowdStrikeFalcon.TOKEN_REFRESH_AHEAD - 1, 'expires_in': 1799})
+    mocker.patch.object(demisto, 'setIntegrationContext')
+    mocker.patch.object(CrowdStrikeFalcon, 'get_token_request', return_value={'access_token': 'new', 'expires_in': 1799})
+
+    assert CrowdStrikeFalcon.get_token() == 'new'
+    assert CrowdStrikeFalcon.get_token() == 'new'
+
+    assert CrowdStrikeFalcon.get_token_request.call_count == 1
+    assert demisto.setIntegrationContext.call_args[0][0]['auth_token'] == 'new'
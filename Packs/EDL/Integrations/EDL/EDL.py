@@ -8,7 +8,6 @@ from multiprocessing import Process
 from gevent.pywsgi import WSGIServer
 from tempfile import NamedTemporaryFile
 from flask import Flask, Response, request
-from netaddr import IPAddress, iprange_to_cidrs
 from typing import Callable, List, Any, Dict, cast, Tuple
 from ssl import SSLContext, SSLError, PROTOCOL_TLSv1_2
 
@@ -31,6 +30,9 @@ EDL_COLLAPSE_ERR_MSG: str = 'The Collapse parameter can only get the following:
                             '1 - Collapse to Ranges, 2 - Collapse to CIDRS'
 EDL_MISSING_REFRESH_ERR_MSG: str = 'Refresh Rate must be "number date_range_unit", examples: (2 hours, 4 minutes, ' \
                                    '6 months, 1 day, etc.)'
+MODIFIED_QUERY_TIME_FORMAT: str = '%Y-%m-%dT%H:%M:%SZ'
+# number of cached values searched by a single query when looking for removed indicators
+VALUES_QUERY_CHUNK_SIZE: int = 100
 ''' REFORMATTING REGEXES '''
 _PROTOCOL_REMOVAL = re.compile('^(?:[a-z]+:)*//')
 _PORT_REMOVAL = re.compile(r'^((?:[a-z]+:)*//([a-z0-9\-\.]+)|([a-z0-9\-\.]+))(?:\:[0-9]+)*')
@@ -145,12 +147,99 @@ def refresh_edl_context(request_args: RequestArguments) -> str:
         # reformat the output
         out_dict, actual_indicator_amount = create_values_for_returned_dict(iocs, request_args)
 
-    out_dict["last_run"] = date_to_timestamp(now)
-    out_dict["current_iocs"] = iocs
-    demisto.setIntegrationContext(out_dict)
+    save_edl_context(request_args, out_dict, iocs, now, actual_indicator_amount < request_args.limit)
     return out_dict[EDL_VALUES_KEY]
 
 
+def refresh_edl_context_incrementally(request_args: RequestArguments, integration_context: dict) -> str:
+    """
+    Refresh the cache values with the indicators modified since the last refresh, instead of polling all the
+    indicators of the query again. Indicators which were modified and no longer match the query are removed.
+    Falls back to a full refresh when the EDL reaches its size limit, as the indicators beyond it are unknown.
+
+    Parameters:
+        request_args: Request arguments
+        integration_context: The integration context saved by the last refresh
+
+    Returns: List(IoCs in output format)
+    """
+    now = datetime.now()
+    modified_query = 'modified:>="{}"'.format(
+        timestamp_to_datestring(integration_context['last_run'], MODIFIED_QUERY_TIME_FORMAT, is_utc=True))
+    query = f'({request_args.query}) and {modified_query}' if request_args.query else modified_query
+    matching_iocs, _ = find_indicators_to_limit_loop(query, sys.maxsize)
+
+    iocs_by_value = {ioc.get('value'): ioc for ioc in integration_context.get('current_iocs', [])}
+    matching_values = {ioc.get('value') for ioc in matching_iocs}
+    # cached indicators which were modified and are not in the matching ones no longer match the query
+    removed_values = find_modified_values([value for value in iocs_by_value if value and value not in matching_values],
+                                          modified_query)
+    if not matching_iocs and not removed_values:
+        # nothing changed - keep the formatted output
+        integration_context['last_run'] = date_to_timestamp(now)
+        demisto.setIntegrationContext(integration_context)
+        return integration_context.get('last_output', {}).get(EDL_VALUES_KEY, '')
+
+    for value in removed_values:
+        del iocs_by_value[value]
+    for ioc in matching_iocs:
+        iocs_by_value[ioc.get('value')] = ioc
+
+    iocs = list(iocs_by_value.values())
+    out_dict, actual_indicator_amount = create_values_for_returned_dict(iocs, request_args)
+    if actual_indicator_amount >= request_args.limit:
+        return refresh_edl_context(request_args)
+
+    save_edl_context(request_args, out_dict, iocs, now, True)
+    return out_dict[EDL_VALUES_KEY]
+
+
+def find_modified_values(values: list, modified_query: str) -> list:
+    """
+    Finds which of the given indicator values were modified, by searching the values in chunks of
+    VALUES_QUERY_CHUNK_SIZE together with the modified query, instead of all the modified indicators
+
+    Parameters:
+        values: The indicator values to check
+        modified_query: The query of the indicators modified since the last refresh
+
+    Returns: The modified values, in the order of the given values
+    """
+    modified_values = set()
+    for i in range(0, len(values), VALUES_QUERY_CHUNK_SIZE):
+        values_query = ' or '.join('value:"{}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+                                   for value in values[i:i + VALUES_QUERY_CHUNK_SIZE])
+        iocs, _ = find_indicators_to_limit_loop(f'({values_query}) and {modified_query}', sys.maxsize)
+        modified_values.update(ioc.get('value') for ioc in iocs)
+    return [value for value in values if value in modified_values]
+
+
+def save_edl_context(request_args: RequestArguments, out_dict: dict, iocs: list, last_run: datetime,
+                     all_iocs_fetched: bool):
+    """
+    Saves the formatted EDL values, the indicators they were formatted from and the request they were refreshed for
+
+    Parameters:
+        request_args: Request arguments
+        out_dict: The formatted EDL values
+        iocs: The indicators the values were formatted from
+        last_run: The time the refresh started
+        all_iocs_fetched: Whether all the indicators matching the query are in the EDL
+    """
+    demisto.setIntegrationContext({
+        'last_output': out_dict,
+        'last_run': date_to_timestamp(last_run),
+        'last_limit': request_args.limit,
+        'last_offset': request_args.offset,
+        'last_query': request_args.query,
+        'current_iocs': iocs,
+        'all_iocs_fetched': all_iocs_fetched,
+        'drop_invalids': request_args.drop_invalids,
+        'url_port_stripping': request_args.url_port_stripping,
+        'collapse_ips': request_args.collapse_ips
+    })
+
+
 def find_indicators_to_limit(indicator_query: str, limit: int, offset: int = 0) -> list:
     """
     Finds indicators using demisto.searchIndicators
@@ -212,73 +301,6 @@ def find_indicators_to_limit_loop(indicator_query: str, limit: int, total_fetche
     return iocs, next_page
 
 
-def ip_groups_to_cidrs(ip_range_groups: list):
-    """Collapse ip groups list to CIDRs
-
-    Args:
-        ip_range_groups (list): a list of lists containing connected IPs
-
-    Returns:
-        list. a list of CIDRs.
-    """
-    ip_ranges = []  # type:List
-    for group in ip_range_groups:
-        # handle single ips
-        if len(group) == 1:
-            ip_ranges.append(str(group[0]))
-            continue
-
-        min_ip = group[0]
-        max_ip = group[-1]
-        moved_ip = False
-        # CIDR must begin with an even LSB
-        # if the first ip does not - separate it from the rest of the range
-        if (int(str(min_ip).split('.')[-1]) % 2) != 0:
-            ip_ranges.append(str(min_ip))
-            min_ip = group[1]
-            moved_ip = True
-
-        # CIDR must end with uneven LSB
-        # if the last ip does not - separate it from the rest of the range
-        if (int(str(max_ip).split('.')[-1]) % 2) == 0:
-            ip_ranges.append(str(max_ip))
-            max_ip = group[-2]
-            moved_ip = True
-
-        # if both min and max ips were shifted and there are only 2 ips in the range
-        # we added both ips by the shift and now we move to the next  range
-        if moved_ip and len(group) == 2:
-            continue
-
-        else:
-            ip_ranges.append(str(iprange_to_cidrs(min_ip, max_ip)[0].cidr))
-
-    return ip_ranges
-
-
-def ip_groups_to_ranges(ip_range_groups: list):
-    """Collapse ip groups list to ranges.
-
-    Args:
-        ip_range_groups (list): a list of lists containing connected IPs
-
-    Returns:
-        list. a list of Ranges.
-    """
-    ip_ranges = []  # type:List
-    for group in ip_range_groups:
-        # handle single ips
-        if len(group) == 1:
-            ip_ranges.append(str(group[0]))
-            continue
-
-        min_ip = group[0]
-        max_ip = group[-1]
-        ip_ranges.append(str(min_ip) + "-" + str(max_ip))
-
-    return ip_ranges
-
-
 def ips_to_ranges(ips: list, collapse_ips):
     """Collapse IPs to Ranges or CIDRs.
 
@@ -289,30 +311,12 @@ def ips_to_ranges(ips: list, collapse_ips):
     Returns:
         list. a list to Ranges or CIDRs.
     """
-    ips_range_groups = []  # type:List
-    ips = sorted(ips)
-
-    if len(ips) > 0:
-        ips_range_groups.append([ips[0]])
-
-    if len(ips) > 1:
-        for ip in ips[1:]:
-            appended = False
-
-            for group in ips_range_groups:
-                if IPAddress(int(ip) + 1) in group or IPAddress(int(ip) - 1) in group:
-                    group.append(ip)
-                    sorted(group)
-                    appended = True
-
-            if not appended:
-                ips_range_groups.append([ip])
-
+    ips = [str(ip) for ip in ips]
     if collapse_ips == COLLAPSE_TO_RANGES:
-        return ip_groups_to_ranges(ips_range_groups)
+        return collapse_ips_to_ranges(ips)
 
     else:
-        return ip_groups_to_cidrs(ips_range_groups)
+        return collapse_ips_to_cidrs(ips)
 
 
 def create_values_for_returned_dict(iocs: list, request_args: RequestArguments) -> Tuple[dict, int]:
@@ -354,10 +358,10 @@ def create_values_for_returned_dict(iocs: list, request_args: RequestArguments)
             formatted_indicators.append(indicator.lstrip('*.'))
 
         if request_args.collapse_ips != DONT_COLLAPSE and ioc_type == 'IP':
-            ipv4_formatted_indicators.append(IPAddress(indicator))
+            ipv4_formatted_indicators.append(indicator)
 
         elif request_args.collapse_ips != DONT_COLLAPSE and ioc_type == 'IPv6':
-            ipv6_formatted_indicators.append(IPAddress(indicator))
+            ipv6_formatted_indicators.append(indicator)
 
         else:
             formatted_indicators.append(indicator)
@@ -375,7 +379,8 @@ def create_values_for_returned_dict(iocs: list, request_args: RequestArguments)
 def get_edl_ioc_values(on_demand: bool,
                        request_args: RequestArguments,
                        integration_context: dict,
-                       cache_refresh_rate: str = None) -> str:
+                       cache_refresh_rate: str = None,
+                       incremental_refresh: bool = False) -> str:
     """
     Get the ioc list to return in the edl
 
@@ -384,6 +389,7 @@ def get_edl_ioc_values(on_demand: bool,
         request_args: the request arguments
         integration_context: The integration context
         cache_refresh_rate: The cache_refresh_rate configuration value
+        incremental_refresh: Whether to refresh the cache with the indicators modified since the last refresh only
 
     Returns:
         string representation of the iocs
@@ -402,9 +408,13 @@ def get_edl_ioc_values(on_demand: bool,
     else:
         if last_run:
             cache_time, _ = parse_date_range(cache_refresh_rate, to_timestamp=True)
-            if last_run <= cache_time or request_args.is_request_change(integration_context) or \
-                    request_args.query != last_query:
+            if request_args.is_request_change(integration_context) or request_args.query != last_query:
                 values_str = refresh_edl_context(request_args)
+            elif last_run <= cache_time:
+                if incremental_refresh and not request_args.offset and integration_context.get('all_iocs_fetched'):
+                    values_str = refresh_edl_context_incrementally(request_args, integration_context)
+                else:
+                    values_str = refresh_edl_context(request_args)
             else:
                 values_str = get_ioc_values_str_from_context(integration_context, request_args=request_args)
         else:
@@ -500,6 +510,7 @@ def route_edl_values() -> Response:
         request_args=request_args,
         integration_context=demisto.getIntegrationContext(),
         cache_refresh_rate=params.get('cache_refresh_rate'),
+        incremental_refresh=params.get('incremental_refresh', False),
     )
     return Response(values, status=200, mimetype='text/plain')
 
@@ -690,5 +701,7 @@ def main():
         return_error(err_msg)
 
 
+from IPCollapseApiModule import *  # noqa: E402
+
 if __name__ in ['__main__', '__builtin__', 'builtins']:
     main()
@@ -20,7 +20,8 @@ import exchangelib
 from exchangelib.errors import ErrorItemNotFound, ResponseMessageError, TransportError, RateLimitError, \
     ErrorInvalidIdMalformed, \
     ErrorFolderNotFound, ErrorMailboxStoreUnavailable, ErrorMailboxMoveInProgress, \
-    AutoDiscoverFailed, ErrorNameResolutionNoResults, ErrorInvalidPropertyRequest, ErrorIrresolvableConflict
+    AutoDiscoverFailed, ErrorNameResolutionNoResults, ErrorInvalidPropertyRequest, ErrorIrresolvableConflict, \
+    ErrorInvalidSyncStateData
 from exchangelib.items import Item, Message, Contact
 from exchangelib.services import EWSService, EWSAccountService
 from exchangelib.util import create_element, add_xml_child
@@ -84,6 +85,8 @@ CONTEXT_UPDATE_FOLDER = "EWS.Folders(val.{0} == obj.{0})".format(FOLDER_ID)
 LAST_RUN_TIME = "lastRunTime"
 LAST_RUN_IDS = "ids"
 LAST_RUN_FOLDER = "folderName"
+LAST_RUN_SYNC_STATE = "syncState"
+LAST_RUN_SYNC_QUEUE = "syncQueue"
 ERROR_COUNTER = "errorCounter"
 
 ITEMS_RESULTS_HEADERS = ['sender', 'subject', 'hasAttachments', 'datetimeReceived', 'receivedBy', 'author',
@@ -107,6 +110,8 @@ SERVER_BUILD = ""
 MARK_AS_READ = demisto.params().get('markAsRead', False)
 MAX_FETCH = min(50, int(demisto.params().get('maxFetch', 50)))
 LAST_RUN_IDS_QUEUE_SIZE = 500
+INCREMENTAL_FETCH = demisto.params().get('incrementalFetch', False)
+SYNC_PAGE_SIZE = 512  # The maximal number of changes SyncFolderItems returns
 
 START_COMPLIANCE = """
 [CmdletBinding()]
@@ -840,6 +845,68 @@ class ExpandGroup(EWSService):
                     non_dl_emails[member['mailbox']] = member
 
 
+class SyncFolderItems(EWSAccountService):
+    SERVICE_NAME = 'SyncFolderItems'
+    ADDITIONAL_FIELDS = ('item:DateTimeReceived', 'message:InternetMessageId')
+
+    def _get_element_container(self, message, name=None):
+        # The sync state is a sibling of the changes, so the response message itself is the container
+        container_or_exc = super(SyncFolderItems, self)._get_element_container(message=message)
+        return message if container_or_exc is True else container_or_exc
+
+    @staticmethod
+    def parse_element(element):
+        # Create and Update changes contain the item, Delete and ReadFlagChange changes contain only its ID
+        item = element[0]
+        item_id = item if item.tag == '{%s}ItemId' % TNS else item.find('{%s}ItemId' % TNS)
+        return {
+            ACTION: element.tag.split('}')[-1],
+            'itemType': item.tag.split('}')[-1],
+            ITEM_ID: item_id.get('Id') if item_id is not None else None,
+            'datetimeReceived': item.find("{%s}DateTimeReceived" % TNS).text if item.find(
+                "{%s}DateTimeReceived" % TNS) is not None else None,
+            MESSAGE_ID: item.find("{%s}InternetMessageId" % TNS).text if item.find(
+                "{%s}InternetMessageId" % TNS) is not None else None
+        }
+
+    def call(self, folder, sync_state=None, max_changes_returned=SYNC_PAGE_SIZE):
+        result = {
+            LAST_RUN_SYNC_STATE: sync_state,
+            'includesLastItemInRange': True,
+            'changes': []
+        }
+        for element in self._get_elements(payload=self.get_payload(folder, sync_state, max_changes_returned)):
+            if isinstance(element, Exception):
+                raise element
+            if element.tag == '{%s}SyncState' % MNS:
+                result[LAST_RUN_SYNC_STATE] = element.text
+            elif element.tag == '{%s}IncludesLastItemInRange' % MNS:
+                result['includesLastItemInRange'] = element.text == 'true'
+            elif element.tag == '{%s}Changes' % MNS:
+                result['changes'] = [self.parse_element(change) for change in element if len(change)]
+        return result
+
+    def get_payload(self, folder, sync_state, max_changes_returned):
+        element = create_element('m:%s' % self.SERVICE_NAME)
+
+        item_shape = create_element('m:ItemShape')
+        add_xml_child(item_shape, 't:BaseShape', 'IdOnly')
+        additional_properties = create_element('t:AdditionalProperties')
+        for field_uri in self.ADDITIONAL_FIELDS:
+            additional_properties.append(create_element('t:FieldURI', FieldURI=field_uri))
+        item_shape.append(additional_properties)
+        element.append(item_shape)
+
+        sync_folder_id = create_element('m:SyncFolderId')
+        sync_folder_id.append(create_element('t:FolderId', Id=folder.id))
+        element.append(sync_folder_id)
+        if sync_state:
+            add_xml_child(element, 'm:SyncState', sync_state)
+        add_xml_child(element, 'm:MaxChangesReturned', max_changes_returned)
+
+        return element
+
+
 def get_expanded_group(protocol, email_address, recursive_expansion=False):
     group_members = ExpandGroup(protocol=protocol).call(email_address, recursive_expansion)
     group_details = {
@@ -928,6 +995,62 @@ def fetch_last_emails(account, folder_name='Inbox', since_datetime=None, exclude
     return result
 
 
+def get_first_sync_start_time(last_run):
+    # The first sync goes over the whole folder, the emails received before the last fetch are skipped
+    if last_run.get(LAST_RUN_TIME):
+        return last_run[LAST_RUN_TIME]
+    if not FETCH_ALL_HISTORY:
+        return EWSDateTime.now(tz=EWSTimeZone.timezone('UTC')) - timedelta(minutes=10)
+    return None
+
+
+def fetch_last_emails_incrementally(account, folder_name, last_run):
+    """
+    Gets up to MAX_FETCH emails created in the folder since the last sync. The folder is synced with the item IDs only,
+    and only the emails returned are fetched with all their fields, the IDs of the rest are queued for the next fetch.
+
+    :return: The emails, the new sync state and the queued email IDs
+    """
+    folder = get_folder_by_path(account, folder_name, is_public=IS_PUBLIC_FOLDER)
+    sync_state = last_run.get(LAST_RUN_SYNC_STATE)
+    queue = list(last_run.get(LAST_RUN_SYNC_QUEUE) or [])
+    exclude_ids = set(last_run.get(LAST_RUN_IDS) or [])
+    start_time = None if sync_state else get_first_sync_start_time(last_run)
+
+    includes_last_item = False
+    while len(queue) < MAX_FETCH and not includes_last_item:
+        try:
+            result = SyncFolderItems(account=account).call(folder, sync_state)
+        except ErrorInvalidSyncStateData:
+            if not sync_state:
+                raise
+            demisto.debug('The sync state of folder {} is invalid, syncing it from the start'.format(folder_name))
+            sync_state = None
+            start_time = get_first_sync_start_time(last_run)
+            continue
+        sync_state = result[LAST_RUN_SYNC_STATE]
+        includes_last_item = result['includesLastItemInRange']
+        for change in result['changes']:
+            if change[ACTION] != 'Create' or change['itemType'] != Message.ELEMENT_NAME \
+                    or change[MESSAGE_ID] in exclude_ids:
+                continue
+            if start_time and change['datetimeReceived'] \
+                    and EWSDateTime.from_string(change['datetimeReceived']) < start_time:
+                continue
+            queue.append(change[ITEM_ID])
+
+    item_ids, queue = queue[:MAX_FETCH], queue[MAX_FETCH:]
+    result = []
+    if item_ids:
+        items = account.fetch(ids=[(item_id, None) for item_id in item_ids], folder=folder,
+                              only_fields=map(lambda x: x.name, Message.FIELDS))
+        # Emails deleted since they were synced are not found
+        result = [x for x in items if isinstance(x, Message)]
+        for item in result:
+            item.folder = folder
+    return result, sync_state, queue
+
+
 def keys_to_camel_case(value):
     def str_to_camel_case(snake_str):
         components = snake_str.split('_')
@@ -1208,7 +1331,12 @@ def fetch_emails_as_incidents(account_email, folder_name):
 
     try:
         account = get_account(account_email)
-        last_emails = fetch_last_emails(account, folder_name, last_run.get(LAST_RUN_TIME), last_run.get(LAST_RUN_IDS))
+        incremental_fetch = INCREMENTAL_FETCH and not IS_PUBLIC_FOLDER
+        if incremental_fetch:
+            last_emails, sync_state, sync_queue = fetch_last_emails_incrementally(account, folder_name, last_run)
+        else:
+            last_emails = fetch_last_emails(account, folder_name, last_run.get(LAST_RUN_TIME),
+                                            last_run.get(LAST_RUN_IDS))
 
         ids = deque(last_run.get(LAST_RUN_IDS, []), maxlen=LAST_RUN_IDS_QUEUE_SIZE)
         incidents = []
@@ -1232,6 +1360,9 @@ def fetch_emails_as_incidents(account_email, folder_name):
             LAST_RUN_IDS: list(ids),
             ERROR_COUNTER: 0
         }
+        if incremental_fetch:
+            new_last_run[LAST_RUN_SYNC_STATE] = sync_state
+            new_last_run[LAST_RUN_SYNC_QUEUE] = sync_queue
 
         demisto.setLastRun(new_last_run)
         return incidents
@@ -18,3 +18,167 @@ def test_start_logging():
     EWSv2.start_logging()
     logging.getLogger().debug("test this")
     assert "test this" in EWSv2.log_stream.getvalue()
+
+
+SYNC_FOLDER_ITEMS_RESPONSE = '''<m:SyncFolderItemsResponseMessage ResponseClass="Success"
+    xmlns:m="http://schemas.microsoft.com/exchange/services/2006/messages"
+    xmlns:t="http://schemas.microsoft.com/exchange/services/2006/types">
+  <m:ResponseCode>NoError</m:ResponseCode>
+  <m:SyncState>H4sIAAAAAAAEAO29B2AcSZYlJi9</m:SyncState>
+  <m:IncludesLastItemInRange>false</m:IncludesLastItemInRange>
+  <m:Changes>
+    <t:Create>
+      <t:Message>
+        <t:ItemId Id="AAMkAGY1" ChangeKey="CQAAABYA"/>
+        <t:DateTimeReceived>2020-05-01T10:00:00Z</t:DateTimeReceived>
+        <t:InternetMessageId>&lt;1@example.com&gt;</t:InternetMessageId>
+      </t:Message>
+    </t:Create>
+    <t:ReadFlagChange>
+      <t:ItemId Id="AAMkAGY0" ChangeKey="CQAAABYB"/>
+      <t:IsRead>true</t:IsRead>
+    </t:ReadFlagChange>
+    <t:Delete>
+      <t:ItemId Id="AAMkAGY2" ChangeKey="CQAAABYC"/>
+    </t:Delete>
+  </m:Changes>
+</m:SyncFolderItemsResponseMessage>'''
+
+
+def test_sync_folder_items(mocker):
+    """
+    Given:
+        - A SyncFolderItems response with a created email, a read flag change and a deletion.
+    When:
+        - Syncing a folder from a sync state.
+    Then:
+        - Ensure the request asks for the item IDs only, from the sync state.
+        - Ensure the new sync state and the changes are parsed.
+    """
+    from lxml import etree
+    from EWSv2 import SyncFolderItems, MNS, TNS
+
+    account = mocker.MagicMock()
+    folder = mocker.MagicMock(id='AQMkADAwATM0MDAA')
+    mocker.patch.object(SyncFolderItems, '_get_response_xml',
+                        return_value=[etree.fromstring(SYNC_FOLDER_ITEMS_RESPONSE)])
+
+    result = SyncFolderItems(account=account).call(folder, 'H4sIAAAAAAAEAO29B2AcSZY', 10)
+
+    payload = SyncFolderItems._get_response_xml.call_args[1]['payload']
+    assert payload.find('{%s}ItemShape/{%s}BaseShape' % (MNS, TNS)).text == 'IdOnly'
+    assert payload.find('{%s}SyncFolderId/{%s}FolderId' % (MNS, TNS)).get('Id') == 'AQMkADAwATM0MDAA'
+    assert payload.find('{%s}SyncState' % MNS).text == 'H4sIAAAAAAAEAO29B2AcSZY'
+    assert payload.find('{%s}MaxChangesReturned' % MNS).text == '10'
+    assert result['syncState'] == 'H4sIAAAAAAAEAO29B2AcSZYlJi9'
+    assert result['includesLastItemInRange'] is False
+    assert result['changes'] == [
+        {'action': 'Create', 'itemType': 'Message', 'itemId': 'AAMkAGY1', 'datetimeReceived': '2020-05-01T10:00:00Z',
+         'messageId': '<1@example.com>'},
+        {'action': 'ReadFlagChange', 'itemType': 'ItemId', 'itemId': 'AAMkAGY0', 'datetimeReceived': None,
+         'messageId': None},
+        {'action': 'Delete', 'itemType': 'ItemId', 'itemId': 'AAMkAGY2', 'datetimeReceived': None, 'messageId': None},
+    ]
+
+
+def sync_change(i, action='Create', item_type='Message', received='2020-05-01T10:00:00Z'):
+    return {'action': action, 'itemType': item_type, 'itemId': 'id{}'.format(i), 'datetimeReceived': received,
+            'messageId': '<{}@example.com>'.format(i)}
+
+
+def test_fetch_last_emails_incrementally(mocker):
+    """
+    Given:
+        - A folder synced before, with new emails, a meeting request, an email fetched before and read flag changes.
+    When:
+        - Fetching the emails incrementally, with max fetch 3.
+    Then:
+        - Ensure the folder is synced until there are 3 new emails, and only the first 3 are fetched.
+        - Ensure the rest are queued for the next fetch, and the new sync state is returned.
+    """
+    from exchangelib.items import Message
+    import EWSv2
+
+    pages = [
+        {'syncState': 'state1', 'includesLastItemInRange': False,
+         'changes': [sync_change(1), sync_change(2, item_type='MeetingRequest'), sync_change(3),
+                     sync_change(1, action='ReadFlagChange', item_type='ItemId')]},
+        {'syncState': 'state2', 'includesLastItemInRange': False,
+         'changes': [sync_change(4), sync_change(5), sync_change(6)]},
+    ]
+    mocker.patch.object(EWSv2, 'MAX_FETCH', 3)
+    mocker.patch.object(EWSv2, 'get_folder_by_path')
+    sync = mocker.patch.object(EWSv2.SyncFolderItems, 'call', side_effect=pages)
+    account = mocker.MagicMock()
+    account.fetch.side_effect = lambda ids, **kwargs: [Message(item_id=item_id) for item_id, _ in ids]
+    last_run = {'syncState': 'state0', 'syncQueue': [], 'ids': ['<4@example.com>']}
+
+    emails, sync_state, queue = EWSv2.fetch_last_emails_incrementally(account, 'Inbox', last_run)
+
+    assert [call[0][1] for call in sync.call_args_list] == ['state0', 'state1']
+    assert [email.item_id for email in emails] == ['id1', 'id3', 'id5']
+    assert account.fetch.call_count == 1
+    assert sync_state == 'state2'
+    assert queue == ['id6']
+
+
+def test_fetch_last_emails_incrementally_first_sync(mocker):
+    """
+    Given:
+        - A folder which was never synced, with emails received before and after the last fetch time.
+    When:
+        - Fetching the emails incrementally.
+    Then:
+        - Ensure the folder is synced to its end and only the emails received since the last fetch are fetched.
+    """
+    from exchangelib import EWSDateTime
+    import EWSv2
+
+    pages = [
+        {'syncState': 'state1', 'includesLastItemInRange': False,
+         'changes': [sync_change(1, received='2020-04-30T10:00:00Z'), sync_change(2, received='2020-04-30T11:00:00Z')]},
+        {'syncState': 'state2', 'includesLastItemInRange': True,
+         'changes': [sync_change(3, received='2020-05-01T10:00:00Z')]},
+    ]
+    mocker.patch.object(EWSv2, 'get_folder_by_path')
+    sync = mocker.patch.object(EWSv2.SyncFolderItems, 'call', side_effect=pages)
+    account = mocker.MagicMock()
+    account.fetch.return_value = []
+    last_run = {'lastRunTime': EWSDateTime.from_string('2020-05-01T00:00:00Z'), 'ids': []}
+
+    emails, sync_state, queue = EWSv2.fetch_last_emails_incrementally(account, 'Inbox', last_run)
+
+    assert [call[0][1] for call in sync.call_args_list] == [None, 'state1']
+    assert account.fetch.call_args[1]['ids'] == [('id3', None)]
+    assert sync_state == 'state2'
+    assert queue == []
+
+
+def test_fetch_emails_as_incidents_incremental(mocker):
+    """
+    Given:
+        - Incremental fetch is enabled.
+    When:
+        - Fetching incidents.
+    Then:
+        - Ensure the sync state and the queued email IDs are saved in the last run along with the fetched email IDs.
+    """
+    from exchangelib.items import Message
+    import EWSv2
+
+    email = Message(item_id='id1', message_id='<1@example.com>')
+    mocker.patch.object(EWSv2, 'INCREMENTAL_FETCH', True)
+    mocker.patch.object(EWSv2, 'get_account')
+    mocker.patch.object(EWSv2, 'fetch_last_emails_incrementally', return_value=([email], 'state1', ['id2']))
+    mocker.patch.object(EWSv2, 'parse_incident_from_item', return_value={'occurred': '2020-05-01T10:00:00Z'})
+    mocker.patch.object(EWSv2.demisto, 'getLastRun', return_value={})
+    mocker.patch.object(EWSv2.demisto, 'setLastRun')
+
+    incidents = EWSv2.fetch_emails_as_incidents('test@example.com', 'Inbox')
+
+    assert incidents == [{'occurred': '2020-05-01T10:00:00Z'}]
+    last_run = EWSv2.demisto.setLastRun.call_args[0][0]
+    assert last_run['syncState'] == 'state1'
+    assert last_run['syncQueue'] == ['id2']
+    assert last_run['ids'] == ['<1@example.com>']
+    assert last_run['lastRunTime'] == '2020-05-01T10:00:00Z'
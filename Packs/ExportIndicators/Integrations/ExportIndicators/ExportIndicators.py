@@ -10,7 +10,6 @@ from multiprocessing import Process
 from gevent.pywsgi import WSGIServer
 from tempfile import NamedTemporaryFile
 from flask import Flask, Response, request
-from netaddr import IPAddress, iprange_to_cidrs
 from ssl import SSLContext, SSLError, PROTOCOL_TLSv1_2
 from typing import Callable, List, Any, cast, Dict, Tuple
 
@@ -59,6 +58,9 @@ CTX_COLLAPSE_ERR_MSG: str = 'The Collapse parameter can only get the following:
 CTX_MISSING_REFRESH_ERR_MSG: str = 'Refresh Rate must be "number date_range_unit", examples: (2 hours, 4 minutes, ' \
                                    '6 months, 1 day, etc.)'
 CTX_NO_URLS_IN_PROXYSG_FORMAT = 'ProxySG format only outputs URLs - no URLs found in the current query'
+MODIFIED_QUERY_TIME_FORMAT: str = '%Y-%m-%dT%H:%M:%SZ'
+# number of cached values searched by a single query when looking for removed indicators
+VALUES_QUERY_CHUNK_SIZE: int = 100
 
 MIMETYPE_JSON_SEQ: str = 'application/json-seq'
 MIMETYPE_JSON: str = 'application/json'
@@ -205,6 +207,72 @@ def refresh_outbound_context(request_args: RequestArguments) -> str:
         if request_args.out_format == FORMAT_CSV:
             actual_indicator_amount = actual_indicator_amount - 1
 
+    save_outbound_context(request_args, out_dict, iocs, now, actual_indicator_amount < request_args.limit)
+    return out_dict[CTX_VALUES_KEY]
+
+
+def refresh_outbound_context_incrementally(request_args: RequestArguments, last_update_data: dict) -> str:
+    """
+    Refresh the cache values with the indicators modified since the last refresh, instead of polling all the
+    indicators of the query again. Indicators which were modified and no longer match the query are removed.
+    Falls back to a full refresh when the list reaches its size limit, as the indicators beyond it are unknown.
+    Returns: List(IoCs in output format)
+    """
+    now = datetime.now()
+    modified_query = 'modified:>="{}"'.format(
+        timestamp_to_datestring(last_update_data['last_run'], MODIFIED_QUERY_TIME_FORMAT, is_utc=True))
+    query = f'({request_args.query}) and {modified_query}' if request_args.query else modified_query
+    matching_iocs, _ = find_indicators_with_limit_loop(query, sys.maxsize)
+
+    iocs_by_value = {ioc.get('value'): ioc for ioc in last_update_data.get('current_iocs', [])}
+    matching_values = {ioc.get('value') for ioc in matching_iocs}
+    # cached indicators which were modified and are not in the matching ones no longer match the query
+    removed_values = find_modified_values([value for value in iocs_by_value if value and value not in matching_values],
+                                          modified_query)
+    if not matching_iocs and not removed_values:
+        # nothing changed - keep the formatted output
+        last_update_data['last_run'] = date_to_timestamp(now)
+        demisto.setIntegrationContext(last_update_data)
+        return last_update_data.get('last_output', {}).get(CTX_VALUES_KEY, '')
+
+    for value in removed_values:
+        del iocs_by_value[value]
+    for ioc in matching_iocs:
+        iocs_by_value[ioc.get('value')] = ioc
+
+    iocs = list(iocs_by_value.values())
+    out_dict, actual_indicator_amount = create_values_for_returned_dict(iocs, request_args)
+    # if in CSV format - the "indicator" header
+    if request_args.out_format in [FORMAT_CSV, FORMAT_XSOAR_CSV]:
+        actual_indicator_amount = actual_indicator_amount - 1
+
+    if actual_indicator_amount >= request_args.limit:
+        return refresh_outbound_context(request_args)
+
+    save_outbound_context(request_args, out_dict, iocs, now, True)
+    return out_dict[CTX_VALUES_KEY]
+
+
+def find_modified_values(values: list, modified_query: str) -> list:
+    """
+    Finds which of the given indicator values were modified, by searching the values in chunks of
+    VALUES_QUERY_CHUNK_SIZE together with the modified query, instead of all the modified indicators.
+    Returns: The modified values, in the order of the given values
+    """
+    modified_values = set()
+    for i in range(0, len(values), VALUES_QUERY_CHUNK_SIZE):
+        values_query = ' or '.join('value:"{}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+                                   for value in values[i:i + VALUES_QUERY_CHUNK_SIZE])
+        iocs, _ = find_indicators_with_limit_loop(f'({values_query}) and {modified_query}', sys.maxsize)
+        modified_values.update(ioc.get('value') for ioc in iocs)
+    return [value for value in values if value in modified_values]
+
+
+def save_outbound_context(request_args: RequestArguments, out_dict: dict, iocs: list, last_run: datetime,
+                          all_iocs_fetched: bool):
+    """
+    Saves the formatted values, the indicators they were formatted from and the request they were refreshed for
+    """
     if request_args.out_format == FORMAT_JSON:
         out_dict[CTX_MIMETYPE_KEY] = MIMETYPE_JSON
 
@@ -223,12 +291,13 @@ def refresh_outbound_context(request_args: RequestArguments) -> str:
 
     demisto.setIntegrationContext({
         "last_output": out_dict,
-        'last_run': date_to_timestamp(now),
+        'last_run': date_to_timestamp(last_run),
         'last_limit': request_args.limit,
         'last_offset': request_args.offset,
         'last_format': request_args.out_format,
         'last_query': request_args.query,
         'current_iocs': iocs,
+        'all_iocs_fetched': all_iocs_fetched,
         'mwg_type': request_args.mwg_type,
         'drop_invalids': request_args.drop_invalids,
         'strip_port': request_args.strip_port,
@@ -237,7 +306,6 @@ def refresh_outbound_context(request_args: RequestArguments) -> str:
         'collapse_ips': request_args.collapse_ips,
         'csv_text': request_args.csv_text
     })
-    return out_dict[CTX_VALUES_KEY]
 
 
 def find_indicators_with_limit(indicator_query: str, limit: int, offset: int) -> list:
@@ -281,73 +349,6 @@ def find_indicators_with_limit_loop(indicator_query: str, limit: int, total_fetc
     return iocs, next_page
 
 
-def ip_groups_to_cidrs(ip_range_groups: list):
-    """Collapse ip groups list to CIDRs
-
-    Args:
-        ip_range_groups (list): a list of lists containing connected IPs
-
-    Returns:
-        list. a list of CIDRs.
-    """
-    ip_ranges = []  # type:List
-    for group in ip_range_groups:
-        # handle single ips
-        if len(group) == 1:
-            ip_ranges.append(str(group[0]))
-            continue
-
-        min_ip = group[0]
-        max_ip = group[-1]
-        moved_ip = False
-        # CIDR must begin with an even LSB
-        # if the first ip does not - separate it from the rest of the range
-        if (int(str(min_ip).split('.')[-1]) % 2) != 0:
-            ip_ranges.append(str(min_ip))
-            min_ip = group[1]
-            moved_ip = True
-
-        # CIDR must end with uneven LSB
-        # if the last ip does not - separate it from the rest of the range
-        if (int(str(max_ip).split('.')[-1]) % 2) == 0:
-            ip_ranges.append(str(max_ip))
-            max_ip = group[-2]
-            moved_ip = True
-
-        # if both min and max ips were shifted and there are only 2 ips in the range
-        # we added both ips by the shift and now we move to the next  range
-        if moved_ip and len(group) == 2:
-            continue
-
-        else:
-            ip_ranges.append(str(iprange_to_cidrs(min_ip, max_ip)[0].cidr))
-
-    return ip_ranges
-
-
-def ip_groups_to_ranges(ip_range_groups: list):
-    """Collapse ip groups list to ranges
-
-    Args:
-        ip_range_groups (list): a list of lists containing connected IPs
-
-    Returns:
-        list. a list of Ranges.
-    """
-    ip_ranges = []  # type:List
-    for group in ip_range_groups:
-        # handle single ips
-        if len(group) == 1:
-            ip_ranges.append(str(group[0]))
-            continue
-
-        min_ip = group[0]
-        max_ip = group[-1]
-        ip_ranges.append(str(min_ip) + "-" + str(max_ip))
-
-    return ip_ranges
-
-
 def ips_to_ranges(ips: list, collapse_ips):
     """Collapse IPs to Ranges or CIDRs.
 
@@ -358,36 +359,12 @@ def ips_to_ranges(ips: list, collapse_ips):
     Returns:
         list. a list to Ranges or CIDRs.
     """
-    ips_range_groups = []  # type:List
-    ips = sorted(ips)
-    if len(ips) > 0:
-        ips_range_groups.append([ips[0]])
-
-    if len(ips) > 1:
-        for ip in ips[1:]:
-            appended = False
-
-            if len(ips_range_groups) == 0:
-                ips_range_groups.append([ip])
-                continue
-
-            for group in ips_range_groups:
-                if IPAddress(int(ip) + 1) in group or IPAddress(int(ip) - 1) in group:
-                    group.append(ip)
-                    sorted(group)
-                    appended = True
-
-            if not appended:
-                ips_range_groups.append([ip])
-
-    for group in ips_range_groups:
-        sorted(group)
-
+    ips = [str(ip) for ip in ips]
     if collapse_ips == COLLAPSE_TO_RANGES:
-        return ip_groups_to_ranges(ips_range_groups)
+        return collapse_ips_to_ranges(ips)
 
     else:
-        return ip_groups_to_cidrs(ips_range_groups)
+        return collapse_ips_to_cidrs(ips)
 
 
 def panos_url_formatting(iocs: list, drop_invalids: bool, strip_port: bool):
@@ -558,10 +535,10 @@ def create_values_for_returned_dict(iocs: list, request_args: RequestArguments)
             if value:
                 if request_args.out_format in [FORMAT_TEXT, FORMAT_CSV]:
                     if type == 'IP' and request_args.collapse_ips != DONT_COLLAPSE:
-                        ipv4_formatted_indicators.append(IPAddress(value))
+                        ipv4_formatted_indicators.append(value)
 
                     elif type == 'IPv6' and request_args.collapse_ips != DONT_COLLAPSE:
-                        ipv6_formatted_indicators.append(IPAddress(value))
+                        ipv6_formatted_indicators.append(value)
 
                     else:
                         formatted_indicators.append(value)
@@ -596,7 +573,7 @@ def get_outbound_mimetype() -> str:
 
 
 def get_outbound_ioc_values(on_demand, request_args: RequestArguments,
-                            last_update_data={}, cache_refresh_rate=None) -> str:
+                            last_update_data={}, cache_refresh_rate=None, incremental_refresh=False) -> str:
     """
     Get the ioc list to return in the list
     """
@@ -616,9 +593,13 @@ def get_outbound_ioc_values(on_demand, request_args: RequestArguments,
         if last_update:
             # takes the cache_refresh_rate amount of time back since run time.
             cache_time, _ = parse_date_range(cache_refresh_rate, to_timestamp=True)
-            if last_update <= cache_time or request_args.is_request_change(last_update_data) or \
-                    request_args.query != last_query:
+            if request_args.is_request_change(last_update_data) or request_args.query != last_query:
                 values_str = refresh_outbound_context(request_args=request_args)
+            elif last_update <= cache_time:
+                if incremental_refresh and not request_args.offset and last_update_data.get('all_iocs_fetched'):
+                    values_str = refresh_outbound_context_incrementally(request_args, last_update_data)
+                else:
+                    values_str = refresh_outbound_context(request_args=request_args)
             else:
                 values_str = get_ioc_values_str_from_context(request_args=request_args)
         else:
@@ -780,7 +761,8 @@ def route_list_values() -> Response:
             on_demand=params.get('on_demand'),
             last_update_data=demisto.getIntegrationContext(),
             cache_refresh_rate=params.get('cache_refresh_rate'),
-            request_args=request_args
+            request_args=request_args,
+            incremental_refresh=params.get('incremental_refresh', False)
         )
 
         if not demisto.getIntegrationContext() and params.get('on_demand'):
@@ -961,5 +943,7 @@ def main():
         return_error(err_msg)
 
 
+from IPCollapseApiModule import *  # noqa: E402
+
 if __name__ in ['__main__', '__builtin__', 'builtins']:
     main()
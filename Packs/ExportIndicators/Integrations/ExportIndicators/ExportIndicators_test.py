@@ -1,6 +1,7 @@
 """Imports"""
 import json
 import pytest
+from datetime import datetime
 import demistomock as demisto
 from netaddr import IPAddress
 
@@ -136,6 +137,67 @@ class TestHelperFunctions:
             for ioc_row in ioc_list:
                 assert ioc_row in iocs_text_dict
 
+    @pytest.mark.parametrize('limit, searched, expected_values, full_refresh', [
+        # 2.2.2.2 stopped matching the query, 3.3.3.3 was added
+        (10, {'matching': ['1.1.1.1', '3.3.3.3'], 'modified': ['1.1.1.1', '2.2.2.2', '3.3.3.3']},
+         '1.1.1.1\n3.3.3.3', False),
+        # nothing was modified
+        (10, {'matching': [], 'modified': []}, '1.1.1.1\n2.2.2.2', False),
+        # the list reached its size, the indicators beyond it are unknown
+        (3, {'matching': ['3.3.3.3', '4.4.4.4'], 'modified': ['3.3.3.3', '4.4.4.4']}, 'full refresh', True),
+    ])
+    def test_incremental_refresh(self, mocker, limit, searched, expected_values, full_refresh):
+        """
+        Given
+        - A cache of 1.1.1.1 and 2.2.2.2 which expired, with incremental refresh enabled
+
+        When
+        - Getting the values
+
+        Then
+        - Only the indicators modified since the last refresh are searched and applied to the cache
+        - Only the cached values are searched for removed indicators, in chunks
+        """
+        import ExportIndicators as ei
+        mocker.patch.object(ei, 'parse_date_range', return_value=(1578383899000, 1578383899000))
+        refresh = mocker.patch.object(ei, 'refresh_outbound_context', return_value='full refresh')
+        set_context = mocker.patch.object(demisto, 'setIntegrationContext')
+        request_args = ei.RequestArguments(query='type:IP', limit=limit)
+        iocs = [{'value': '1.1.1.1', 'indicator_type': 'IP'}, {'value': '2.2.2.2', 'indicator_type': 'IP'}]
+        last_run = datetime.fromtimestamp(1578383898)
+        ei.save_outbound_context(request_args, {ei.CTX_VALUES_KEY: '1.1.1.1\n2.2.2.2'}, iocs, last_run, True)
+        integration_context = set_context.call_args[0][0]
+
+        removal_queries = []
+
+        def search_indicators(query, page, size):
+            assert query.endswith(' and modified:>="2020-01-07T07:58:18Z"')
+            if query.startswith('(type:IP) and '):
+                values = searched['matching']
+            else:
+                removal_queries.append(query)
+                values = [value for value in searched['modified'] if f'value:"{value}"' in query]
+            return {'iocs': [{'value': value, 'indicator_type': 'IP'} for value in values]}
+
+        mocker.patch.object(demisto, 'searchIndicators', side_effect=search_indicators)
+        mocker.patch.object(ei, 'VALUES_QUERY_CHUNK_SIZE', 1)
+        values = ei.get_outbound_ioc_values(
+            on_demand=False,
+            request_args=request_args,
+            last_update_data=integration_context,
+            cache_refresh_rate='1 minute',
+            incremental_refresh=True
+        )
+        assert values == expected_values
+        assert refresh.called == full_refresh
+        # only the cached values which are not matching are searched, one value per query
+        assert removal_queries == ['(value:"{}") and modified:>="2020-01-07T07:58:18Z"'.format(value)
+                                   for value in ('1.1.1.1', '2.2.2.2') if value not in searched['matching']]
+        if not full_refresh:
+            saved_context = set_context.call_args[0][0]
+            assert saved_context['last_output'][ei.CTX_VALUES_KEY] == expected_values
+            assert saved_context['last_run'] > 1578383898000
+
     @pytest.mark.list_to_str
     def test_list_to_str_1(self):
         """Test invalid"""
@@ -567,6 +629,24 @@ class TestHelperFunctions:
         assert "2.2.2.2" in ip_range_list
         assert "25.24.23.22" in ip_range_list
 
+    @pytest.mark.ips_to_cidrs
+    def test_ips_to_ranges_cidr_long_range(self):
+        """
+        Given
+        - A range of consecutive IPv4 addresses which doesn't fit one CIDR, and consecutive IPv6 addresses
+
+        When
+        - Collapsing them to CIDRs
+
+        Then
+        - The whole range is covered by CIDRs, not only its first CIDR
+        """
+        from ExportIndicators import ips_to_ranges, COLLAPSE_TO_CIDR
+        ip_list = ['10.0.0.{}'.format(i) for i in range(1, 12)] + ['2001:db8::1', '2001:db8::0']
+
+        ip_range_list = ips_to_ranges(ip_list, COLLAPSE_TO_CIDR)
+        assert ip_range_list == ['10.0.0.1', '10.0.0.2/31', '10.0.0.4/30', '10.0.0.8/30', '2001:db8::/127']
+
     def test_empty_integartion_context_mimtype(self, mocker):
         from ExportIndicators import get_outbound_mimetype
         mocker.patch.object(demisto, 'getIntegrationContext', return_value={})
@@ -2,7 +2,8 @@ import demistomock as demisto
 from CommonServerPython import *
 from CommonServerUserPython import *
 
-from typing import Any, Tuple, Dict, List, Callable
+from typing import Any, Tuple, Dict, List, Callable, Optional
+import re
 import sqlalchemy
 import pymysql
 import traceback
@@ -22,6 +23,15 @@ pymysql.install_as_MySQLdb()
 
 GLOBAL_CACHE_ATTR = '_generic_sql_engine_cache'
 DEFAULT_POOL_TTL = 600
+# Number of rows read from the cursor at a time
+FETCH_CHUNK_SIZE = 1000
+# Queries which return rows, these are limited in the database (unless they are ordered) and their rows are streamed
+SELECT_QUERY_PATTERN = re.compile(r'^\s*(select|with)\b', re.IGNORECASE)
+# String literals, quoted identifiers and comments, these are removed before looking for the ORDER BY of a query
+QUOTED_OR_COMMENT_PATTERN = re.compile(r"'(?:[^']|'')*'|\"[^\"]*\"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/", re.DOTALL)
+# Innermost parentheses, these are removed until only the top level of the query is left
+PARENTHESES_PATTERN = re.compile(r'\([^()]*\)')
+ORDER_BY_PATTERN = re.compile(r'\border\s+by\b', re.IGNORECASE)
 
 
 class Client:
@@ -113,17 +123,86 @@ class Client:
                                               poolclass=sqlalchemy.pool.NullPool)
         return engine.connect()
 
-    def sql_query_execute_request(self, sql_query: str, bind_vars: Any) -> Tuple[Dict, List]:
+    @staticmethod
+    def _is_ordered_query(sql_query: str) -> bool:
+        """
+        Checks whether a query has an ORDER BY at its top level (not in a subquery or a window function)
+        :param sql_query: the SQL query
+        :return: True if the query sorts its rows
+        """
+        top_level = QUOTED_OR_COMMENT_PATTERN.sub(' ', sql_query)
+        previous = None
+        while previous != top_level:
+            previous = top_level
+            top_level = PARENTHESES_PATTERN.sub(' ', top_level)
+        return bool(ORDER_BY_PATTERN.search(top_level))
+
+    def _limit_query(self, sql_query: str, limit: Optional[int], skip: int) -> Tuple[Any, int]:
+        """
+        Selects only the requested rows of a query which returns rows, SQLAlchemy renders the limit and the offset in
+        the syntax of the dialect (e.g. LIMIT and OFFSET, TOP or ROWNUM).
+        Ordered queries are not limited: MySQL and MariaDB may ignore the ORDER BY of a subquery and Microsoft SQL
+        Server rejects it, so their rows are streamed until the requested rows are read.
+        :param sql_query: the SQL query
+        :param limit: the maximal number of rows to return, None to return all the rows
+        :param skip: the number of rows to skip
+        :return: the select of the requested rows (None if the query can't be limited), the rows left to skip
+        """
+        sql_query = sql_query.strip().rstrip(';').rstrip()
+        if limit is None or ';' in sql_query or not SELECT_QUERY_PATTERN.match(sql_query) or \
+                self._is_ordered_query(sql_query):
+            return None, skip
+        # the columns of the query are unknown, the rows are keyed by the names the database returns
+        query = sqlalchemy.select([text('*')]).select_from(text(sql_query).columns().alias('generic_sql_query'))
+        # Oracle and Microsoft SQL Server can't skip rows without an ORDER BY, only the rows up to the last one are
+        # limited and the rows are skipped when they are read
+        if self.dialect == "Oracle":
+            # the ROWNUM limit of SQLAlchemy selects the columns of the query by name
+            return query.where(text('ROWNUM <= :generic_sql_rows').bindparams(generic_sql_rows=skip + limit)), skip
+        if self.dialect == "Microsoft SQL Server":
+            return query.limit(skip + limit), skip
+        return query.limit(limit).offset(skip or None), 0
+
+    def sql_query_execute_request(self, sql_query: str, bind_vars: Any, limit: Optional[int] = None,
+                                  skip: int = 0) -> Tuple[List, List]:
         """Execute query in DB via engine
         :param bind_vars: in case there are names and values - a bind_var dict, in case there are only values - list
         :param sql_query: the SQL query
+        :param limit: the maximal number of rows to return, None to return all the rows
+        :param skip: the number of rows to skip
         :return: results of query, table headers
         """
+        result = None
+        rows_to_skip = skip
         if type(bind_vars) is dict:
-            sql_query = text(sql_query)
+            query, rows_to_skip = self._limit_query(sql_query, limit, skip)
+            if query is not None:
+                try:
+                    result = self.connection.execute(query.execution_options(stream_results=True), bind_vars)
+                except sqlalchemy.exc.SQLAlchemyError as err:
+                    # e.g. a query which is not valid as a subquery, the query is executed as is
+                    demisto.debug(f'Failed to execute the query with the limit, executing it without: {err}')
+                    rows_to_skip = skip
+        if result is None:
+            streamed = bool(SELECT_QUERY_PATTERN.match(sql_query))
+            if type(bind_vars) is dict:
+                result = self.connection.execute(text(sql_query).execution_options(stream_results=streamed),
+                                                 bind_vars)
+            else:
+                result = self.connection.execution_options(stream_results=streamed).execute(sql_query, bind_vars)
 
-        result = self.connection.execute(sql_query, bind_vars)
-        results = result.fetchall()
+        # the rows are read in chunks, so rows which are not returned are not read into memory at once
+        rows_to_fetch = None if limit is None else rows_to_skip + limit
+        results: List = []
+        fetched = 0
+        while rows_to_fetch is None or fetched < rows_to_fetch:
+            chunk_size = FETCH_CHUNK_SIZE if rows_to_fetch is None else min(FETCH_CHUNK_SIZE, rows_to_fetch - fetched)
+            chunk = result.fetchmany(chunk_size)
+            if not chunk:
+                break
+            results.extend(chunk[max(rows_to_skip - fetched, 0):])
+            fetched += len(chunk)
+        result.close()
         headers = []
         if results:
             # if the table isn't empty
@@ -188,12 +267,11 @@ def sql_query_execute(client: Client, args: dict, *_) -> Tuple[str, Dict[str, An
         bind_variables_values = args.get('bind_variables_values', "")
         bind_variables = generate_bind_vars(bind_variables_names, bind_variables_values)
 
-        result, headers = client.sql_query_execute_request(sql_query, bind_variables)
+        result, headers = client.sql_query_execute_request(sql_query, bind_variables, limit=limit, skip=skip)
         # converting an sqlalchemy object to a table
         converted_table = [dict(row) for row in result]
         # converting b'' and datetime objects to readable ones
         table = [{str(key): str(value) for key, value in dictionary.items()} for dictionary in converted_table]
-        table = table[skip:skip + limit]
         human_readable = tableToMarkdown(name="Query result:", t=table, headers=headers,
                                          removeNull=True)
         context = {
@@ -2,6 +2,7 @@ from GenericSQL import Client, sql_query_execute, generate_default_port_by_diale
 import pytest
 import sqlalchemy
 import os
+from sqlalchemy.dialects import mssql, mysql, oracle, postgresql
 
 
 class ResultMock:
@@ -11,6 +12,12 @@ class ResultMock:
     def fetchall(self):
         return []
 
+    def fetchmany(self, size):
+        return []
+
+    def close(self):
+        pass
+
 
 ARGS1 = {
     'query': "select Name from city",
@@ -239,3 +246,144 @@ def test_mysql_integration():
     client = Client(dialect, host, 'root', 'password', generate_default_port_by_dialect(dialect), 'mysql', "", False, True)
     res = client.sql_query_execute_request('show processlist', {})
     assert len(res) >= 1
+
+
+@pytest.fixture
+def sqlite_client(mocker):
+    """Client connected to an in memory SQLite database with 100 rows in the city table, the executed statements are
+    saved in its statements attribute"""
+    engine = sqlalchemy.create_engine('sqlite://')
+    connection = engine.connect()
+    connection.execute('create table city (id integer primary key, name text)')
+    connection.execute('insert into city (id, name) values (?, ?)', [(i, f'city{i}') for i in range(100)])
+    statements = []
+    sqlalchemy.event.listen(engine, 'before_cursor_execute',
+                            lambda conn, cursor, statement, *args: statements.append(statement))
+    mocker.patch.object(Client, '_create_engine_and_connect', return_value=connection)
+    client = Client('SQLite', 'server_url', 'username', 'password', 'port', 'database', "", False)
+    client.statements = statements
+    return client
+
+
+@pytest.mark.parametrize('args', [
+    {'query': 'select id, name from city order by id;', 'limit': 5, 'skip': 10},
+    # positional bind variables are not limited in the database, the rows are streamed
+    {'query': 'select id, name from city where id >= ? order by id', 'limit': 5, 'skip': 5,
+     'bind_variables_values': '5'},
+])
+def test_sql_queries_limit_and_skip(sqlite_client, args):
+    """Unit test
+    Given
+    - select query with limit and skip
+    When
+    - executing the query against a database
+    Then
+    - only the requested rows are returned
+    """
+    result = sql_query_execute(sqlite_client, args)
+
+    assert result[2] == [{'id': str(i), 'name': f'city{i}'} for i in range(10, 15)]
+
+
+def test_sql_queries_limit_pushed_to_database(sqlite_client):
+    """Unit test
+    Given
+    - select query with limit and skip, and named bind variables
+    When
+    - executing the query against a database
+    Then
+    - the limit and the offset are in the executed query
+    """
+    args = {'query': 'select name from city where id >= :min_id', 'limit': 2, 'skip': 3,
+            'bind_variables_names': 'min_id', 'bind_variables_values': '90'}
+
+    result = sql_query_execute(sqlite_client, args)
+
+    assert result[2] == [{'name': 'city93'}, {'name': 'city94'}]
+    assert sqlite_client.statements[-1] == 'SELECT * \nFROM (select name from city where id >= ?) AS ' \
+                                           'generic_sql_query\n LIMIT ? OFFSET ?'
+
+
+def test_sql_queries_not_limited(sqlite_client):
+    """Unit test
+    Given
+    - a query which is not valid as a subquery (its comment comments out the end of the subquery), and a statement
+      which does not return rows
+    When
+    - executing them against a database
+    Then
+    - the query is executed as is and the rows are returned
+    - the statement is executed
+    """
+    result = sql_query_execute(sqlite_client, {'query': 'select name from city where id < 5 -- the first cities',
+                                               'limit': 2, 'skip': 1})
+    assert result[2] == [{'name': 'city1'}, {'name': 'city2'}]
+    assert sqlite_client.statements[-1] == 'select name from city where id < 5 -- the first cities'
+
+    result = sql_query_execute(sqlite_client, {'query': 'delete from city where id = 1'})
+    assert result[0] == 'Command executed'
+    assert sqlite_client.connection.execute('select count(*) from city').scalar() == 99
+
+
+@pytest.mark.parametrize('dialect', ['MySQL', 'PostgreSQL', 'Oracle', 'Microsoft SQL Server', 'SQLite'])
+def test_sql_queries_ordered_limit_and_skip(sqlite_client, dialect):
+    """Unit test
+    Given
+    - select query with an ORDER BY, limit and skip, in each of the supported dialects
+    When
+    - executing the query against a database
+    Then
+    - the query is executed as is (MySQL ignores the ORDER BY of a subquery and Microsoft SQL Server rejects it)
+    - the requested rows are returned in the order of the query
+    """
+    sqlite_client.dialect = dialect
+    query = 'select id, name from city where id in (select id from city order by id) order by id desc'
+
+    result = sql_query_execute(sqlite_client, {'query': query, 'limit': 5, 'skip': 10})
+
+    assert result[2] == [{'id': str(i), 'name': f'city{i}'} for i in range(89, 84, -1)]
+    assert sqlite_client.statements[-1] == query
+
+
+@pytest.mark.parametrize('query, is_ordered', [
+    ('select name from city ORDER  BY name', True),
+    ('with c as (select name from city) select name from c order by 1', True),
+    ('select name from (select name from city order by name) c', False),
+    ('select name, row_number() over (order by id) from city', False),
+    ("select name from city where name = 'order by' -- order by", False),
+])
+def test_is_ordered_query(query, is_ordered):
+    """Unit test
+    Given
+    - queries with an ORDER BY at the top level, in a subquery, in a window function, in a literal or in a comment
+    When
+    - checking whether the query is ordered
+    Then
+    - only an ORDER BY at the top level of the query is found
+    """
+    assert Client._is_ordered_query(query) is is_ordered
+
+
+@pytest.mark.parametrize('dialect, sql_dialect, expected_limit', [
+    ('MySQL', mysql.dialect(), 'LIMIT %s, %s'),
+    ('PostgreSQL', postgresql.dialect(), 'LIMIT %(param_1)s OFFSET %(param_2)s'),
+    ('Oracle', oracle.dialect(), 'generic_sql_query \nWHERE ROWNUM <= :generic_sql_rows'),
+    ('Microsoft SQL Server', mssql.dialect(), 'TOP 15'),
+])
+def test_limit_query_by_dialect(dialect, sql_dialect, expected_limit, mocker):
+    """Unit test
+    Given
+    - select query with limit 5 and skip 10
+    When
+    - limiting the query in each of the supported dialects
+    Then
+    - the limit is in the syntax of the dialect, Oracle and Microsoft SQL Server limit the rows up to the last one and
+      the rows are skipped after they are read
+    """
+    mocker.patch.object(Client, '_create_engine_and_connect')
+    client = Client(dialect, 'server_url', 'username', 'password', 'port', 'database', "", False)
+
+    query, rows_to_skip = client._limit_query('select name from city', limit=5, skip=10)
+
+    assert expected_limit in str(query.compile(dialect=sql_dialect))
+    assert rows_to_skip == (10 if dialect in ('Oracle', 'Microsoft SQL Server') else 0)
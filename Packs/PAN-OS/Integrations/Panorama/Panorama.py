@@ -4,8 +4,10 @@ from CommonServerPython import *
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 import uuid
+import io
 import json
 import requests
+import xml.etree.ElementTree as ET
 
 # disable insecure warnings
 requests.packages.urllib3.disable_warnings()
@@ -18,6 +20,8 @@ URL = demisto.params()['server'].rstrip('/:') + ':' + demisto.params().get('port
 API_KEY = str(demisto.params().get('key'))
 USE_SSL = not demisto.params().get('insecure')
 USE_URL_FILTERING = demisto.params().get('use_url_filtering')
+# A single session keeps the connection to the device alive between the API calls of a command
+SESSION = requests.Session()
 
 # determine a vsys or a device-group
 VSYS = demisto.params().get('vsys')
@@ -122,30 +126,143 @@ class PAN_OS_Not_Found(Exception):
         pass
 
 
-def http_request(uri: str, method: str, headers: Dict = {},
-                 body: Dict = {}, params: Dict = {}, files=None, is_pcap: bool = False) -> Any:
+# The number of streamed elements removed together from their parent element
+STREAMED_ELEMENTS_BATCH = 1000
+
+
+def xml_element_value(value: Dict, text: Optional[str], tail: Optional[str]) -> Any:
     """
-    Makes an API call with the given arguments
+    Returns the dictionary value of a parsed XML element the way xml2json converts it, given its attributes and
+    children, its text and its tail.
+    """
+    text = text.strip() if text else text
+    tail = tail.strip() if tail else tail
+    if tail:
+        value['#tail'] = tail
+    if value:
+        if text:
+            value['#text'] = text
+        return value
+    return text or None
+
+
+def add_xml_child(value: Dict, tag: str, child_value: Any):
     """
-    result = requests.request(
+    Adds the value of a child element to the value of its parent, the values of repeated tags are merged to a list.
+    """
+    if tag not in value:
+        value[tag] = child_value
+    elif isinstance(value[tag], list):
+        value[tag].append(child_value)
+    else:
+        value[tag] = [value[tag], child_value]
+
+
+class XMLStreamParser:
+    """
+    Parses an XML document into the dictionary json.loads(xml2json(text)) returns, with iterparse and without building
+    an element tree or a JSON string. The elements at stream_path (the tags from the root to the element) are not added
+    to the document, iterating the parser yields their values as they are parsed. The document is set once the parsing
+    is done.
+    """
+
+    def __init__(self, source: Any, stream_path: Tuple[str, ...] = ()):
+        if isinstance(source, str):
+            source = io.StringIO(source)
+        elif isinstance(source, bytes):
+            source = io.BytesIO(source)
+        self.source = source
+        self.stream_path = list(stream_path)
+        self.document: Dict = {}
+
+    def __iter__(self):
+        path: List[str] = []
+        # The attributes, the pending children and the number of leading streamed children of every open element. The
+        # value of a closed child is added to its parent when the parent is closed, as only then the tail of the child
+        # is surely parsed.
+        open_elements: List[Tuple[Any, Dict, List, List[int]]] = []
+        for event, element in ET.iterparse(self.source, events=('start', 'end')):
+            if event == 'start':
+                path.append(strip_tag(element.tag))
+                open_elements.append((element, {'@' + key: val for key, val in element.attrib.items()}, [], [0]))
+                continue
+
+            _, value, children, _ = open_elements.pop()
+            for child, child_tag, child_value, child_text in children:
+                add_xml_child(value, child_tag, xml_element_value(child_value, child_text, child.tail))
+            # The children are not needed anymore, the text and tail of the element itself are kept
+            del element[:]
+
+            if path == self.stream_path:
+                # The tail of a streamed element is dropped, it is not parsed yet
+                yield xml_element_value(value, element.text, None)
+                if open_elements:
+                    # The streamed elements are removed from their parent in batches
+                    parent, _, _, streamed = open_elements[-1]
+                    if len(parent) > streamed[0] and parent[streamed[0]] is element:
+                        streamed[0] += 1
+                        if streamed[0] == STREAMED_ELEMENTS_BATCH:
+                            del parent[:STREAMED_ELEMENTS_BATCH]
+                            streamed[0] = 0
+            elif open_elements:
+                open_elements[-1][2].append((element, path[-1], value, element.text))
+            else:
+                self.document = {path[-1]: xml_element_value(value, element.text, None)}
+            path.pop()
+
+
+def parse_xml(source: Any) -> Dict:
+    """
+    Parses an XML document from a string, bytes or a file object into the dictionary json.loads(xml2json(text)) returns.
+    """
+    parser = XMLStreamParser(source)
+    for _ in parser:
+        pass
+    return parser.document
+
+
+def send_request(uri: str, method: str, headers: Dict = {}, body: Dict = {}, params: Dict = {}, files=None,
+                 stream: bool = False) -> requests.Response:
+    """
+    Sends an API request with the pooled session and checks its status. When stream is set, the response content is
+    not read, it can be parsed from response.raw.
+    """
+    result = SESSION.request(
         method,
         uri,
         headers=headers,
         data=body,
         verify=USE_SSL,
         params=params,
-        files=files
+        files=files,
+        stream=stream
     )
 
     if result.status_code < 200 or result.status_code >= 300:
+        result.close()
         raise Exception(
             'Request Failed. with status: ' + str(result.status_code) + '. Reason is: ' + str(result.reason))
 
+    if stream:
+        # decompress a gzip encoded response while it is parsed
+        result.raw.decode_content = True
+    return result
+
+
+def http_request(uri: str, method: str, headers: Dict = {},
+                 body: Dict = {}, params: Dict = {}, files=None, is_pcap: bool = False) -> Any:
+    """
+    Makes an API call with the given arguments
+    """
     # if pcap download
     if is_pcap:
-        return result
+        return send_request(uri, method, headers=headers, body=body, params=params, files=files)
 
-    json_result = json.loads(xml2json(result.text))
+    result = send_request(uri, method, headers=headers, body=body, params=params, files=files, stream=True)
+    try:
+        json_result = parse_xml(result.raw)
+    finally:
+        result.close()
 
     # handle raw response that doe not contain the response key, e.g xonfiguration export
     if 'response' not in json_result or '@code' not in json_result['response']:
@@ -3126,7 +3243,7 @@ def panorama_list_pcaps_command():
         raise Exception('can not provide dlp-pcap without password')
 
     result = http_request(URL, 'GET', params=params, is_pcap=True)
-    json_result = json.loads(xml2json(result.text))['response']
+    json_result = parse_xml(result.content)['response']
     if json_result['@status'] != 'success':
         raise Exception('Request to get list of Pcaps Failed.\nStatus code: ' + str(
             json_result['response']['@code']) + '\nWith message: ' + str(json_result['response']['msg']['line']))
@@ -4421,17 +4538,81 @@ def prettify_logs(logs):
     return pretty_logs_arr
 
 
+LOG_ENTRY_PATH = ('response', 'result', 'log', 'logs', 'entry')
+LOGS_TABLE_HEADERS = ['TimeGenerated', 'SourceAddress', 'DestinationAddress', 'Application', 'Action', 'Rule',
+                      'URLOrFilename']
+
+
+def panorama_stream_logs(job_id: str, log_type: str, logs_per_entry: int,
+                         ignore_auto_extract: bool) -> Tuple[Dict, List[Dict]]:
+    """
+    Gets the data of a logs query and returns the logs in War Room entries of logs_per_entry logs, each entry is
+    returned as soon as its logs are parsed from the response.
+
+    Returns:
+        The response without the log entries, and the prettified logs.
+    """
+    params = {
+        'action': 'get',
+        'type': 'log',
+        'job-id': job_id,
+        'key': API_KEY
+    }
+    result = send_request(URL, 'GET', params=params, stream=True)
+    parser = XMLStreamParser(result.raw, stream_path=LOG_ENTRY_PATH)
+    pretty_logs: List[Dict] = []
+    logs: List[Dict] = []
+    try:
+        for log in parser:
+            logs.append(log)
+            if len(logs) == logs_per_entry:
+                pretty_logs.extend(return_logs_entry(logs, log_type, len(pretty_logs), ignore_auto_extract))
+                logs = []
+        if logs:
+            pretty_logs.extend(return_logs_entry(logs, log_type, len(pretty_logs), ignore_auto_extract))
+    finally:
+        result.close()
+
+    return parser.document, pretty_logs
+
+
+def return_logs_entry(logs: List[Dict], log_type: str, offset: int, ignore_auto_extract: bool) -> List[Dict]:
+    """
+    Returns a War Room entry of streamed logs, offset is the number of logs returned before them.
+
+    Returns:
+        The prettified logs.
+    """
+    pretty_logs = [prettify_log(log) for log in logs]
+    demisto.results({
+        'Type': entryTypes['note'],
+        'ContentsFormat': formats['json'],
+        'Contents': logs,
+        'ReadableContentsFormat': formats['markdown'],
+        'HumanReadable': tableToMarkdown(f'Query {log_type} Logs {offset + 1}-{offset + len(logs)}:', pretty_logs,
+                                         LOGS_TABLE_HEADERS, removeNull=True),
+        'IgnoreAutoExtract': ignore_auto_extract
+    })
+    return pretty_logs
+
+
 def panorama_get_logs_command():
     ignore_auto_extract = demisto.args().get('ignore_auto_extract') == 'true'
+    logs_per_entry = int(demisto.args().get('logs_per_entry') or 0)
     job_ids = argToList(demisto.args().get('job_id'))
     for job_id in job_ids:
-        result = panorama_get_traffic_logs(job_id)
         log_type_dt = demisto.dt(demisto.context(), f'Panorama.Monitor(val.JobID === "{job_id}").LogType')
         if isinstance(log_type_dt, list):
             log_type = log_type_dt[0]
         else:
             log_type = log_type_dt
 
+        streamed_logs: List[Dict] = []
+        if logs_per_entry > 0:
+            result, streamed_logs = panorama_stream_logs(job_id, log_type, logs_per_entry, ignore_auto_extract)
+        else:
+            result = panorama_get_traffic_logs(job_id)
+
         if result['response']['@status'] == 'error':
             if 'msg' in result['response'] and 'line' in result['response']['msg']:
                 message = '. Reason is: ' + result['response']['msg']['line']
@@ -4468,12 +4649,15 @@ def panorama_get_logs_command():
             logs = result['response']['result']['log']['logs']
             if logs['@count'] == '0':
                 human_readable = f'No {log_type} logs matched the query.'
+            elif logs_per_entry > 0:
+                # the logs were returned in the entries above
+                query_logs_output['Logs'] = streamed_logs
+                human_readable = f'Retrieved {len(streamed_logs)} {log_type} logs.'
             else:
                 pretty_logs = prettify_logs(logs['entry'])
                 query_logs_output['Logs'] = pretty_logs
                 human_readable = tableToMarkdown('Query ' + log_type + ' Logs:', query_logs_output['Logs'],
-                                                 ['TimeGenerated', 'SourceAddress', 'DestinationAddress', 'Application',
-                                                  'Action', 'Rule', 'URLOrFilename'], removeNull=True)
+                                                 LOGS_TABLE_HEADERS, removeNull=True)
             demisto.results({
                 'Type': entryTypes['note'],
                 'ContentsFormat': formats['json'],
@@ -245,3 +245,99 @@ def test_validate_search_time():
     with pytest.raises(Exception):
         assert validate_search_time('219/12/26 00:00:00')
         assert validate_search_time('219/10/35')
+
+
+LOGS_RESPONSE_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<response status="success">
+    <result>
+        <job>
+            <id>1234</id>
+            <status>FIN</status>
+        </job>
+        <log>
+            <logs count="3" progress="100">
+                <entry logid="1"><action>allow</action><rule>rule1</rule><dst>1.1.1.1</dst></entry>
+                <entry logid="2"><action>deny</action><rule>rule2</rule><dst>2.2.2.2</dst></entry>
+                <entry logid="3"><action>allow</action><rule>rule1</rule><dst>3.3.3.3</dst></entry>
+            </logs>
+        </log>
+    </result>
+</response>
+"""
+
+
+@pytest.mark.parametrize('xml', [
+    LOGS_RESPONSE_XML,
+    '<response status="success" code="19"><result total-count="0" count="0"/></response>',
+    '<response status="error"><msg><line>No such node</line></msg></response>',
+    '<config><entry name="a">text<member>1</member>tail<member>2</member></entry><entry name="b"/></config>',
+    '<root><a x="1">value</a><a>second</a><b>  </b><c><d/></c></root>',
+])
+def test_parse_xml(xml):
+    """
+    Given
+    - XML responses with attributes, repeated tags, mixed text and empty elements
+
+    When
+    - Parsing the responses with iterparse
+
+    Then
+    - The result is the same as the conversion of the response to JSON and back
+    """
+    import json
+    from CommonServerPython import xml2json
+    from Panorama import parse_xml
+    assert parse_xml(xml) == json.loads(xml2json(xml))
+    assert parse_xml(xml.encode('utf-8')) == json.loads(xml2json(xml))
+
+
+def test_xml_stream_parser():
+    """
+    Given
+    - A logs query response with 3 logs
+
+    When
+    - Streaming the log entries of the response
+
+    Then
+    - The logs are yielded one by one and are left out of the parsed document
+    """
+    from Panorama import XMLStreamParser, LOG_ENTRY_PATH
+    parser = XMLStreamParser(LOGS_RESPONSE_XML, stream_path=LOG_ENTRY_PATH)
+    logs = list(parser)
+    assert [log['@logid'] for log in logs] == ['1', '2', '3']
+    assert logs[1] == {'@logid': '2', 'action': 'deny', 'rule': 'rule2', 'dst': '2.2.2.2'}
+    assert parser.document['response']['result']['job']['status'] == 'FIN'
+    assert parser.document['response']['result']['log']['logs'] == {'@count': '3', '@progress': '100'}
+
+
+def test_panorama_get_logs_command_stream(mocker, requests_mock):
+    """
+    Given
+    - A finished logs query with 3 logs
+
+    When
+    - Getting the logs with 2 logs per entry
+
+    Then
+    - The logs are returned in 2 entries, and the last entry holds all the logs in the context
+    """
+    import Panorama
+    base_url = "{}:{}/api/".format(integration_params['server'], integration_params['port'])
+    requests_mock.get(base_url, text=LOGS_RESPONSE_XML)
+    mocker.patch.object(demisto, 'args', return_value={'job_id': '1234', 'logs_per_entry': '2'})
+    mocker.patch.object(demisto, 'dt', return_value='traffic')
+    mocker.patch.object(demisto, 'context', return_value={})
+    results = mocker.patch.object(demisto, 'results')
+
+    Panorama.panorama_get_logs_command()
+
+    entries = [call[0][0] for call in results.call_args_list]
+    assert len(entries) == 3
+    assert [log['@logid'] for log in entries[0]['Contents']] == ['1', '2']
+    assert [log['@logid'] for log in entries[1]['Contents']] == ['3']
+    assert 'Query traffic Logs 3-3' in entries[1]['HumanReadable']
+    output = entries[2]['EntryContext']['Panorama.Monitor(val.JobID == obj.JobID)']
+    assert output['Status'] == 'Completed'
+    assert [log['DestinationAddress'] for log in output['Logs']] == ['1.1.1.1', '2.2.2.2', '3.3.3.3']
+    assert 'entry' not in entries[2]['Contents']['response']['result']['log']['logs']
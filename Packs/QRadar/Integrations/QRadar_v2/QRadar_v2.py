@@ -2,6 +2,7 @@ import concurrent.futures
 import json
 import time
 import traceback
+from collections import OrderedDict
 from copy import deepcopy
 from threading import Lock
 from typing import Callable, Dict, List, Optional
@@ -19,7 +20,10 @@ from CommonServerUserPython import *
 urllib3.disable_warnings()
 
 """ ADVANCED GLOBAL PARAMETERS """
-EVENTS_INTERVAL_SECS = 15           # interval between events polling
+EVENTS_INTERVAL_SECS = 15           # max interval between events polling
+EVENTS_MIN_INTERVAL_SECS = 1        # first interval between events polling, doubled up to EVENTS_INTERVAL_SECS
+EVENTS_SEARCH_BATCH_SIZE = 1        # amount of offenses whose events are fetched by a single search
+EVENTS_PAGE_SIZE = 1000             # amount of events retrieved per search results request
 EVENTS_FAILURE_LIMIT = 3            # amount of consecutive failures events fetch will tolerate
 FETCH_SLEEP = 60                    # sleep between fetches
 BATCH_SIZE = 100                    # batch size used for offense ip enrichment
@@ -28,9 +32,14 @@ LOCK_WAIT_TIME = 0.5                # time to wait for lock.acquire
 MAX_WORKERS = 8                     # max concurrent workers used for events enriching
 DOMAIN_ENRCH_FLG = "True"           # when set to true, will try to enrich offense and assets with domain names
 RULES_ENRCH_FLG = "True"            # when set to true, will try to enrich offense with rule names
+ENRICHMENT_CACHE_TTL_SECS = 3600    # time an enrichment object (domain, rule, address, asset) is cached between fetches
+ENRICHMENT_CACHE_SIZE = 10000       # max amount of cached enrichment objects
 
 ADVANCED_PARAMETER_NAMES = [
     "EVENTS_INTERVAL_SECS",
+    "EVENTS_MIN_INTERVAL_SECS",
+    "EVENTS_SEARCH_BATCH_SIZE",
+    "EVENTS_PAGE_SIZE",
     "EVENTS_FAILURE_LIMIT",
     "FETCH_SLEEP",
     "BATCH_SIZE",
@@ -38,15 +47,22 @@ ADVANCED_PARAMETER_NAMES = [
     "MAX_WORKERS",
     "DOMAIN_ENRCH_FLG",
     "RULES_ENRCH_FLG",
+    "ENRICHMENT_CACHE_TTL_SECS",
+    "ENRICHMENT_CACHE_SIZE",
 ]
 
 """ GLOBAL VARS """
 SYNC_CONTEXT = True
 RESET_KEY = "reset"
 LAST_FETCH_KEY = "id"
+ENRICHMENT_CACHE_KEY = "enrichment_cache"
+# enrichment objects kept in the integration context, assets are too large and are cached in memory only
+PERSISTED_ENRICHMENT_KINDS = {"offense_types", "closing_reasons", "domain", "rule", "source_address",
+                              "destination_address"}
 API_USERNAME = "_api_token_key"
 TERMINATING_SEARCH_STATUSES = {"CANCELED", "ERROR", "COMPLETED"}
 EVENT_TIME_FIELDS = ["starttime"]
+OFFENSE_MEMBERSHIP_COLUMN = "_in_offense_"
 ASSET_TIME_FIELDS = ['created', 'last_reported', 'first_seen_scanner', 'last_seen_scanner']
 EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS)
 
@@ -172,6 +188,93 @@ class FetchMode:
     correlations_only = "Fetch Correlation Events Only"
 
 
+class EnrichmentCache:
+    """
+    LRU cache of the objects offenses are enriched with (domains, rules, addresses and assets), which keeps them
+    between the fetches of the long running process. Entries expire after ENRICHMENT_CACHE_TTL_SECS, and up to
+    ENRICHMENT_CACHE_SIZE entries are kept.
+    """
+
+    def __init__(self):
+        # (kind, key) -> (expiry time, value)
+        self._entries: OrderedDict = OrderedDict()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def get_many(self, kind, keys):
+        """
+        Returns the cached values of the given keys, and the keys which are not cached
+        """
+        now = time.time()
+        found = {}
+        missing = []
+        for key in keys:
+            entry = self._entries.get((kind, key))
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end((kind, key))
+                found[key] = entry[1]
+            else:
+                missing.append(key)
+        self.hits[kind] = self.hits.get(kind, 0) + len(found)
+        self.misses[kind] = self.misses.get(kind, 0) + len(missing)
+        return found, missing
+
+    def set_many(self, kind, values, expiry=None):
+        """
+        Caches the given key->value dict, least recently used entries are evicted above ENRICHMENT_CACHE_SIZE
+        """
+        if expiry is None:
+            expiry = time.time() + ENRICHMENT_CACHE_TTL_SECS
+        for key, value in values.items():
+            self._entries[(kind, key)] = (expiry, value)
+            self._entries.move_to_end((kind, key))
+        while len(self._entries) > ENRICHMENT_CACHE_SIZE:
+            self._entries.popitem(last=False)
+
+    def get_or_load(self, kind, key, load: Callable):
+        """
+        Returns the cached value of the key, loads and caches it if it is not cached
+        """
+        found, missing = self.get_many(kind, [key])
+        if missing:
+            found[key] = load()
+            self.set_many(kind, found)
+        return found[key]
+
+    def to_context(self):
+        """
+        Returns the entries of the persisted kinds which did not expire, as a list the integration context can keep
+        """
+        now = time.time()
+        return [[kind, key, expiry, value] for (kind, key), (expiry, value) in self._entries.items()
+                if kind in PERSISTED_ENRICHMENT_KINDS and expiry > now]
+
+    def load_context(self, entries):
+        """
+        Warms the cache with entries kept in the integration context
+        """
+        now = time.time()
+        for kind, key, expiry, value in entries or []:
+            if expiry > now:
+                self.set_many(kind, {key: value}, expiry)
+
+    def report_stats(self, lock: Lock = None):
+        """
+        Prints the hits and misses since the previous report
+        """
+        hits = sum(self.hits.values())
+        misses = sum(self.misses.values())
+        per_kind = ", ".join(f"{kind}: {self.hits.get(kind, 0)}/{self.misses.get(kind, 0)}"
+                             for kind in sorted(set(self.hits) | set(self.misses)))
+        print_debug_msg(f"Enrichment cache: {hits} hits, {misses} misses ({per_kind}), {len(self._entries)} entries.",
+                        lock)
+        self.hits = {}
+        self.misses = {}
+
+
+ENRICHMENT_CACHE = EnrichmentCache()
+
+
 class QRadarClient:
     """
     Client for sending QRadar requests
@@ -799,6 +902,84 @@ def perform_offense_events_enrichment(
         return offense
 
 
+def enrich_offenses_batch_with_events(
+    client: QRadarClient, offenses, fetch_mode, events_columns, events_limit
+):
+    """
+    Enriches a batch of offenses with their events using a single search. When the search returns as many events as
+    its limit, every offense with less than events_limit events is searched again on its own
+    """
+    additional_where = (
+        "AND LOGSOURCETYPENAME(devicetype) = 'Custom Rule Engine'"
+        if fetch_mode == FetchMode.correlations_only
+        else ""
+    )
+    offense_ids = ", ".join(str(offense["id"]) for offense in offenses)
+    try:
+        if is_reset_triggered(client.lock):
+            return offenses
+
+        events_query = {
+            "headers": "",
+            "query_expression": build_offenses_events_query(offenses, additional_where, events_columns, events_limit),
+        }
+        print_debug_msg(f"Starting events fetch for offenses {offense_ids}.", client.lock)
+        query_status, search_id = create_search_with_retry(client, events_query, f"offenses: {offense_ids}")
+        events = poll_search_events_with_retry(client, f"offenses {offense_ids}", query_status, search_id)
+        split_events_by_offense(events, offenses, events_limit)
+        if len(events) >= events_limit * len(offenses):
+            # the search reached its limit, the other offenses may have taken the events of the short offenses
+            for offense in offenses:
+                if len(offense["events"]) < events_limit:
+                    batch_events = offense["events"]
+                    perform_offense_events_enrichment(offense, additional_where, events_columns, events_limit, client)
+                    if len(offense.get("events", [])) < len(batch_events):
+                        offense["events"] = batch_events
+    except Exception as e:
+        print_debug_msg(
+            f"Failed events fetch for offenses {offense_ids}: {str(e)}.", client.lock,
+        )
+    return offenses
+
+
+def build_offenses_events_query(offenses, additional_where, events_columns, events_limit):
+    """
+    Builds an AQL query of the events of several offenses. An INOFFENSE membership column is selected for every offense,
+    so the events can be split to the offenses. The query is limited to events_limit times the number of offenses events
+    in total, so an offense with many events may leave less than events_limit events to the others. The query starts
+    at the start time of the earliest offense.
+    """
+    offense_ids = [offense["id"] for offense in offenses]
+    membership_columns = ", ".join(
+        f'CASE WHEN INOFFENSE({offense_id}) THEN 1 ELSE 0 END AS "{OFFENSE_MEMBERSHIP_COLUMN}{offense_id}"'
+        for offense_id in offense_ids
+    )
+    in_offenses = " OR ".join(f"INOFFENSE({offense_id})" for offense_id in offense_ids)
+    start_time = min(offense["start_time"] for offense in offenses)
+    return (
+        f"SELECT {events_columns}, {membership_columns} FROM events WHERE ({in_offenses})"
+        f"{' ' + additional_where if additional_where else ''} limit {events_limit * len(offenses)} "
+        f"START '{start_time}'"
+    )
+
+
+def split_events_by_offense(events, offenses, events_limit):
+    """
+    Sets the events of every offense, up to events_limit events, by the membership columns of the events
+    """
+    membership_columns = {offense["id"]: f"{OFFENSE_MEMBERSHIP_COLUMN}{offense['id']}" for offense in offenses}
+    offenses_events: Dict = {offense_id: [] for offense_id in membership_columns}
+    for event in events:
+        event_offenses = [offense_id for offense_id, column in membership_columns.items()
+                          if event.pop(column, None) in (1, "1")]
+        for offense_id in event_offenses:
+            if len(offenses_events[offense_id]) < events_limit:
+                offenses_events[offense_id].append(event)
+
+    for offense in offenses:
+        offense["events"] = offenses_events[offense["id"]]
+
+
 def try_poll_offense_events_with_retry(
     client, offense_id, query_status, search_id, max_retries=None
 ):
@@ -806,10 +987,23 @@ def try_poll_offense_events_with_retry(
     Polls search until the search is done (completed/canceled/error), and then returns the search result
     will retry up to max_retries consecutive failures
     """
+    return poll_search_events_with_retry(client, f"offense {offense_id}", query_status, search_id, max_retries)
+
+
+def poll_search_events_with_retry(
+    client, searched, query_status, search_id, max_retries=None
+):
+    """
+    Polls search until the search is done (completed/canceled/error), and then returns the search result
+    will retry up to max_retries consecutive failures.
+    The polling interval starts at EVENTS_MIN_INTERVAL_SECS and is doubled up to EVENTS_INTERVAL_SECS, so short
+    searches are not delayed and long ones are not polled too often.
+    """
     if not max_retries:
         max_retries = EVENTS_FAILURE_LIMIT
     failures = 0
     start_time = time.time()
+    interval = min(EVENTS_MIN_INTERVAL_SECS, EVENTS_INTERVAL_SECS)
     while not (query_status in TERMINATING_SEARCH_STATUSES or failures >= max_retries):
         try:
             if is_reset_triggered(client.lock):
@@ -820,37 +1014,58 @@ def try_poll_offense_events_with_retry(
             # failures are relevant only when consecutive
             failures = 0
             if query_status in TERMINATING_SEARCH_STATUSES:
-                raw_search_results = client.get_search_results(search_id)
+                events = get_search_events(client, search_id, raw_search.get("record_count"))
                 print_debug_msg(
-                    f"Events fetched for offense {offense_id}.", client.lock
+                    f"Events fetched for {searched}.", client.lock
                 )
-                events = raw_search_results.get("events", [])
-                for event in events:
-                    try:
-                        for time_field in EVENT_TIME_FIELDS:
-                            if time_field in event:
-                                event[time_field] = epoch_to_iso(event[time_field])
-                    except TypeError:
-                        continue
                 return events
             else:
                 # prepare next run
                 elapsed = time.time() - start_time
                 if elapsed >= FETCH_SLEEP:  # print status debug every fetch sleep (or after)
                     print_debug_msg(
-                        f"Still fetching offense {offense_id} events, search_id: {search_id}.",
+                        f"Still fetching {searched} events, search_id: {search_id}.",
                         client.lock,
                     )
                     start_time = time.time()
-                time.sleep(EVENTS_INTERVAL_SECS)
+                time.sleep(interval)
+                interval = min(interval * 2, EVENTS_INTERVAL_SECS)
         except Exception as e:
-            print_debug_msg(f"Error while fetching offense {offense_id} events, search_id: {search_id}. "
+            print_debug_msg(f"Error while fetching {searched} events, search_id: {search_id}. "
                             f"Error details: {str(e)}")
             failures += 1
     return []
 
 
+def get_search_events(client: QRadarClient, search_id, record_count=None):
+    """
+    Retrieves the events of a done search with Range requests of EVENTS_PAGE_SIZE events, until a page is not full
+    or record_count events were retrieved
+    """
+    events: List[Dict] = []
+    while True:
+        page = client.get_search_results(
+            search_id, _range=f"{len(events)}-{len(events) + EVENTS_PAGE_SIZE - 1}"
+        ).get("events", [])
+        events.extend(page)
+        if len(page) < EVENTS_PAGE_SIZE or (record_count is not None and len(events) >= record_count):
+            break
+
+    for event in events:
+        try:
+            for time_field in EVENT_TIME_FIELDS:
+                if time_field in event:
+                    event[time_field] = epoch_to_iso(event[time_field])
+        except TypeError:
+            continue
+    return events
+
+
 def try_create_search_with_retry(client, events_query, offense, max_retries=None):
+    return create_search_with_retry(client, events_query, f"offense: {offense['id']}", max_retries)
+
+
+def create_search_with_retry(client, events_query, searched, max_retries=None):
     if max_retries is None:
         max_retries = EVENTS_FAILURE_LIMIT
     failures = 0
@@ -873,7 +1088,7 @@ def try_create_search_with_retry(client, events_query, offense, max_retries=None
             err = str(e)
             failures += 1
     if failures >= max_retries:
-        raise DemistoException(f"Unable to create search for offense: {offense['id']}. Error: {err}")
+        raise DemistoException(f"Unable to create search for {searched}. Error: {err}")
     return query_status, search_id
 
 
@@ -956,7 +1171,8 @@ def is_reset_triggered(lock, handle_reset=False):
             if handle_reset:
                 print_debug_msg("Reset fetch-incidents.")
                 set_integration_context(
-                    {"samples": ctx.get("samples", [])}, sync=SYNC_CONTEXT
+                    {"samples": ctx.get("samples", []), ENRICHMENT_CACHE_KEY: ctx.get(ENRICHMENT_CACHE_KEY, [])},
+                    sync=SYNC_CONTEXT
                 )
             lock.release()
             return True
@@ -988,19 +1204,34 @@ def fetch_incidents_long_running_events(
     enriched_offenses = []
 
     futures = []
-    for offense in raw_offenses:
-        futures.append(
-            EXECUTOR.submit(
-                enrich_offense_with_events,
-                client=client,
-                offense=offense,
-                fetch_mode=fetch_mode,
-                events_columns=events_columns,
-                events_limit=events_limit,
+    if EVENTS_SEARCH_BATCH_SIZE > 1:
+        for i in range(0, len(raw_offenses), EVENTS_SEARCH_BATCH_SIZE):
+            futures.append(
+                EXECUTOR.submit(
+                    enrich_offenses_batch_with_events,
+                    client=client,
+                    offenses=raw_offenses[i:i + EVENTS_SEARCH_BATCH_SIZE],
+                    fetch_mode=fetch_mode,
+                    events_columns=events_columns,
+                    events_limit=events_limit,
+                )
             )
-        )
-    for future in concurrent.futures.as_completed(futures):
-        enriched_offenses.append(future.result())
+        for future in concurrent.futures.as_completed(futures):
+            enriched_offenses.extend(future.result())
+    else:
+        for offense in raw_offenses:
+            futures.append(
+                EXECUTOR.submit(
+                    enrich_offense_with_events,
+                    client=client,
+                    offense=offense,
+                    fetch_mode=fetch_mode,
+                    events_columns=events_columns,
+                    events_limit=events_limit,
+                )
+            )
+        for future in concurrent.futures.as_completed(futures):
+            enriched_offenses.append(future.result())
 
     if is_reset_triggered(client.lock, handle_reset=True):
         return
@@ -1010,12 +1241,14 @@ def fetch_incidents_long_running_events(
         print_debug_msg("Enriching offenses")
         enrich_offense_result(client, enriched_offenses, ip_enrich, asset_enrich)
         print_debug_msg("Enriched offenses successfully.")
+        ENRICHMENT_CACHE.report_stats()
     new_incidents_samples = create_incidents(enriched_offenses, incident_type)
     incidents_batch_for_sample = (
         new_incidents_samples if new_incidents_samples else last_run.get("samples", [])
     )
 
-    context = {LAST_FETCH_KEY: offense_id, "samples": incidents_batch_for_sample}
+    context = {LAST_FETCH_KEY: offense_id, "samples": incidents_batch_for_sample,
+               ENRICHMENT_CACHE_KEY: ENRICHMENT_CACHE.to_context()}
     set_integration_context(context, sync=SYNC_CONTEXT)
 
 
@@ -1050,6 +1283,7 @@ def fetch_incidents_long_running_no_events(
         print_debug_msg("Enriching offenses")
         enrich_offense_result(client, raw_offenses, ip_enrich, asset_enrich)
         print_debug_msg("Enriched offenses successfully.")
+        ENRICHMENT_CACHE.report_stats()
 
     # handle reset signal
     if is_reset_triggered(client.lock, handle_reset=True):
@@ -1060,7 +1294,8 @@ def fetch_incidents_long_running_no_events(
         incidents_batch if incidents_batch else last_run.get("samples", [])
     )
 
-    context = {LAST_FETCH_KEY: offense_id, "samples": incidents_batch_for_sample}
+    context = {LAST_FETCH_KEY: offense_id, "samples": incidents_batch_for_sample,
+               ENRICHMENT_CACHE_KEY: ENRICHMENT_CACHE.to_context()}
     set_integration_context(context, sync=SYNC_CONTEXT)
 
 
@@ -1131,9 +1366,10 @@ def enrich_offense_result(
     domain_ids = set()
     rule_ids = set()
     if isinstance(response, list):
-        type_dict = client.get_offense_types()
-        closing_reason_dict = client.get_closing_reasons(
-            include_deleted=True, include_reserved=True
+        type_dict = ENRICHMENT_CACHE.get_or_load("offense_types", "all", client.get_offense_types)
+        closing_reason_dict = ENRICHMENT_CACHE.get_or_load(
+            "closing_reasons", "all",
+            lambda: client.get_closing_reasons(include_deleted=True, include_reserved=True)
         )
         for offense in response:
             enrich_offense_timestamps_and_closing_reason(
@@ -1169,9 +1405,14 @@ def enrich_offense_res_with_domain_names(client, domain_ids, response):
     """
     Add domain_name to the offense and assets results
     """
-    domain_filter = 'id=' + 'or id='.join(str(domain_ids).replace(' ', '').split(','))[1:-1]
-    domains = client.get_devices(_filter=domain_filter)
-    domain_names = {d['id']: d['name'] for d in domains}
+    domain_names, missing_ids = ENRICHMENT_CACHE.get_many("domain", domain_ids)
+    if missing_ids:
+        domain_filter = 'id=' + 'or id='.join(str(set(missing_ids)).replace(' ', '').split(','))[1:-1]
+        domains = client.get_devices(_filter=domain_filter)
+        fetched_names = {d['id']: d['name'] for d in domains}
+        missing_names = {domain_id: fetched_names.get(domain_id, '') for domain_id in missing_ids}
+        ENRICHMENT_CACHE.set_many("domain", missing_names)
+        domain_names.update(missing_names)
     for offense in response:
         if 'domain_id' in offense:
             offense['domain_name'] = domain_names.get(offense['domain_id'], '')
@@ -1185,9 +1426,14 @@ def enrich_offense_res_with_rule_names(client, rule_ids, response):
     """
     Add name to the offense rules
     """
-    rule_filter = 'id=' + 'or id='.join(str(rule_ids).replace(' ', '').split(','))[1:-1]
-    rules = client.get_rules(_filter=rule_filter)
-    rule_names = {r['id']: r['name'] for r in rules}
+    rule_names, missing_ids = ENRICHMENT_CACHE.get_many("rule", rule_ids)
+    if missing_ids:
+        rule_filter = 'id=' + 'or id='.join(str(set(missing_ids)).replace(' ', '').split(','))[1:-1]
+        rules = client.get_rules(_filter=rule_filter)
+        fetched_names = {r['id']: r['name'] for r in rules}
+        missing_names = {rule_id: fetched_names.get(rule_id, '') for rule_id in missing_ids}
+        ENRICHMENT_CACHE.set_many("rule", missing_names)
+        rule_names.update(missing_names)
     for offense in response:
         if 'rules' in offense and isinstance(offense['rules'], list):
             for rule in offense['rules']:
@@ -1222,9 +1468,9 @@ def enrich_offenses_with_assets_and_source_destination_addresses(
     # This command might encounter HTML error page in certain cases instead of JSON result. Fallback: cancel operation
     try:
         if src_adrs:
-            client.enrich_source_addresses_dict(src_adrs)
+            enrich_addresses_dict_with_cache("source_address", src_adrs, client.enrich_source_addresses_dict)
         if dst_adrs:
-            client.enrich_destination_addresses_dict(dst_adrs)
+            enrich_addresses_dict_with_cache("destination_address", dst_adrs, client.enrich_destination_addresses_dict)
         if isinstance(offenses, list) and (ip_enrich or asset_enrich):
             for offense in offenses:
                 # calling this function changes given offenses IP ids to IP values
@@ -1239,33 +1485,72 @@ def enrich_offenses_with_assets_and_source_destination_addresses(
         return offenses
 
 
+def enrich_addresses_dict_with_cache(kind, adrs, enrich_adrs: Callable):
+    """
+    Enriches an address ids dictionary with the cached address values, and with enrich_adrs for the ids which are not
+    cached
+    """
+    cached_adrs, missing_ids = ENRICHMENT_CACHE.get_many(kind, list(adrs))
+    adrs.update(cached_adrs)
+    if missing_ids:
+        missing_adrs = {adr_id: adr_id for adr_id in missing_ids}
+        enrich_adrs(missing_adrs)
+        adrs.update(missing_adrs)
+        # ids which were not resolved are not cached
+        ENRICHMENT_CACHE.set_many(kind, {adr_id: adr for adr_id, adr in missing_adrs.items() if adr != adr_id})
+    return adrs
+
+
 def get_assets_for_offense(client: QRadarClient, assets_ips):
     """
-    Get the assets that correlate to the given asset_ip_ids in the expected offense result format
+    Get the assets that correlate to the given asset_ip_ids in the expected offense result format.
+    The assets of every IP are cached, including IPs without assets.
     """
+    ip_assets, missing_ips = ENRICHMENT_CACHE.get_many("asset", assets_ips)
+    for ips_batch in batch(missing_ips, batch_size=BATCH_SIZE):
+        ip_assets.update(query_assets_by_ips(client, ips_batch))
+
     assets = []
-    for ips_batch in batch(list(assets_ips), batch_size=BATCH_SIZE):
-        query = ""
-        for ip in ips_batch:
-            query = (f"{query} or " if query else "") + f'interfaces contains ip_addresses contains value="{ip}"'
-        if query:
-            assets = client.get_assets(_filter=query)
-            if assets:
-                transform_asset_time_fields_recursive(assets)
-                for asset in assets:
-                    # flatten properties
-                    if isinstance(asset.get('properties'), list):
-                        properties = {p['name']: p['value'] for p in asset['properties'] if
-                                      ('name' in p and 'value' in p)}
-                        asset.update(properties)
-                        # remove previous format of properties
-                        asset.pop('properties')
-                    # simplify interfaces
-                    if isinstance(asset.get('interfaces'), list):
-                        asset['interfaces'] = get_simplified_asset_interfaces(asset['interfaces'])
+    asset_ids = set()
+    for ip in assets_ips:
+        for asset in ip_assets.get(ip, []):
+            if asset.get('id') not in asset_ids:
+                asset_ids.add(asset.get('id'))
+                assets.append(asset)
     return assets
 
 
+def query_assets_by_ips(client: QRadarClient, ips):
+    """
+    Queries the assets of the given IPs, caches and returns the assets of every IP
+    """
+    ip_assets: Dict = {ip: [] for ip in ips}
+    query = ""
+    for ip in ips:
+        query = (f"{query} or " if query else "") + f'interfaces contains ip_addresses contains value="{ip}"'
+    if query:
+        assets = client.get_assets(_filter=query)
+        if assets:
+            transform_asset_time_fields_recursive(assets)
+            for asset in assets:
+                # flatten properties
+                if isinstance(asset.get('properties'), list):
+                    properties = {p['name']: p['value'] for p in asset['properties'] if
+                                  ('name' in p and 'value' in p)}
+                    asset.update(properties)
+                    # remove previous format of properties
+                    asset.pop('properties')
+                # simplify interfaces
+                if isinstance(asset.get('interfaces'), list):
+                    asset['interfaces'] = get_simplified_asset_interfaces(asset['interfaces'])
+                    asset_ips = {ip_adrs.get('value') for interface in asset['interfaces']
+                                 for ip_adrs in interface.get('ip_addresses', [])}
+                    for ip in asset_ips & set(ip_assets):
+                        ip_assets[ip].append(asset)
+    ENRICHMENT_CACHE.set_many("asset", ip_assets)
+    return ip_assets
+
+
 def get_simplified_asset_interfaces(interfaces):
     """
     Get a simplified version of asset interfaces with just the following fields:
@@ -2019,6 +2304,7 @@ def long_running_main(
     events_limit,
 ):
     print_debug_msg(f'Starting fetch with "{fetch_mode}".')
+    ENRICHMENT_CACHE.load_context((get_integration_context(SYNC_CONTEXT) or {}).get(ENRICHMENT_CACHE_KEY))
     if fetch_mode in (FetchMode.all_events, FetchMode.correlations_only):
         fetch_loop_with_events(
             client,
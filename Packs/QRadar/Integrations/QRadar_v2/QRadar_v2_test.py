@@ -31,6 +31,16 @@ with open("TestData/raw_responses.json", "r") as f:
     RAW_RESPONSES = json.load(f)
 
 
+@pytest.fixture(autouse=True)
+def enrichment_cache(mocker):
+    """
+    A new enrichment cache for every test
+    """
+    cache = QRadar_v2.EnrichmentCache()
+    mocker.patch.object(QRadar_v2, "ENRICHMENT_CACHE", cache)
+    return cache
+
+
 command_tests = [
     ("qradar-searches", search_command, {"query_expression": "SELECT sourceip AS 'MY Source IPs' FROM events"},),
     ("qradar-get-search", get_search_command, {"search_id": "6212b614-074e-41c1-8fcf-1492834576b8"},),
@@ -519,3 +529,274 @@ class TestGetCustomProperties:
         )
         resp = get_custom_properties_command(self.client, like_name='trol')
         assert resp['EntryContext']['QRadar.Properties'][0]['name'] == 'bloop'
+
+
+def test_build_offenses_events_query():
+    """
+    Given:
+        - Two offenses and a correlations only fetch
+    When:
+        - Building the query of the events of both offenses
+    Then:
+        - Assert a membership column is selected for every offense, and the query starts at the earliest offense
+    """
+    offenses = [{"id": 450, "start_time": 1600000002000}, {"id": 451, "start_time": 1600000001000}]
+    additional_where = "AND LOGSOURCETYPENAME(devicetype) = 'Custom Rule Engine'"
+    query = QRadar_v2.build_offenses_events_query(offenses, additional_where, "QIDNAME(qid), sourceip", 20)
+    assert query == (
+        'SELECT QIDNAME(qid), sourceip, CASE WHEN INOFFENSE(450) THEN 1 ELSE 0 END AS "_in_offense_450", '
+        'CASE WHEN INOFFENSE(451) THEN 1 ELSE 0 END AS "_in_offense_451" FROM events '
+        "WHERE (INOFFENSE(450) OR INOFFENSE(451)) AND LOGSOURCETYPENAME(devicetype) = 'Custom Rule Engine' "
+        "limit 40 START '1600000001000'"
+    )
+
+
+def test_split_events_by_offense():
+    """
+    Given:
+        - Events of a search of two offenses, one of them is in both offenses
+    When:
+        - Splitting the events to the offenses with a limit of 2 events per offense
+    Then:
+        - Assert every offense gets its events up to the limit, without the membership columns
+    """
+    offenses = [{"id": 450}, {"id": 451}]
+    events = [
+        {"sourceip": "1.1.1.1", "_in_offense_450": 1, "_in_offense_451": 0},
+        {"sourceip": "2.2.2.2", "_in_offense_450": 1, "_in_offense_451": 1},
+        {"sourceip": "3.3.3.3", "_in_offense_450": 1, "_in_offense_451": 0},
+    ]
+    QRadar_v2.split_events_by_offense(events, offenses, 2)
+    assert offenses[0]["events"] == [{"sourceip": "1.1.1.1"}, {"sourceip": "2.2.2.2"}]
+    assert offenses[1]["events"] == [{"sourceip": "2.2.2.2"}]
+
+
+def test_get_search_events_pages(mocker):
+    """
+    Given:
+        - A done search with 5 events
+    When:
+        - Retrieving the events in pages of 2 events
+    Then:
+        - Assert the events are retrieved with consecutive ranges until a page is not full
+    """
+    client = QRadarClient("", {}, {"identifier": "*", "password": "*"})
+    events = [{"sourceip": str(i), "starttime": 1600000000000} for i in range(5)]
+    results_mock = mocker.patch.object(client, "get_search_results", side_effect=[
+        {"events": events[0:2]}, {"events": events[2:4]}, {"events": events[4:]}
+    ])
+    mocker.patch.object(QRadar_v2, "EVENTS_PAGE_SIZE", 2)
+
+    actual = QRadar_v2.get_search_events(client, "1")
+    assert [event["sourceip"] for event in actual] == ["0", "1", "2", "3", "4"]
+    assert actual[0]["starttime"] == "2020-09-13T12:26:40.000000Z"
+    assert [call[1]["_range"] for call in results_mock.call_args_list] == ["0-1", "2-3", "4-5"]
+
+
+def test_poll_search_events_adaptive_interval(mocker):
+    """
+    Given:
+        - A search which is done on the fifth poll
+    When:
+        - Polling the search
+    Then:
+        - Assert the polling interval is doubled up to EVENTS_INTERVAL_SECS
+    """
+    client = QRadarClient("", {}, {"identifier": "*", "password": "*"})
+    mocker.patch.object(QRadar_v2, "is_reset_triggered", return_value=False)
+    mocker.patch.object(client, "get_search", side_effect=[{"status": "EXECUTE"}] * 4 + [{"status": "COMPLETED"}])
+    mocker.patch.object(client, "get_search_results", return_value={"events": [{"sourceip": "8.8.8.8"}]})
+    mocker.patch.object(demisto, "debug")
+    sleep_mock = mocker.patch.object(QRadar_v2.time, "sleep")
+    mocker.patch.object(QRadar_v2, "EVENTS_MIN_INTERVAL_SECS", 2)
+    mocker.patch.object(QRadar_v2, "EVENTS_INTERVAL_SECS", 10)
+
+    actual = QRadar_v2.poll_search_events_with_retry(client, "offense 450", "EXECUTE", "1")
+    assert actual == [{"sourceip": "8.8.8.8"}]
+    assert [call[0][0] for call in sleep_mock.call_args_list] == [2, 4, 8, 10]
+
+
+def test_fetch_incidents_long_running_events_batched(mocker):
+    """
+    Given:
+        - Fetch incidents is set to: FetchMode.all_events, with 2 offenses per events search
+        - There are 3 offenses to fetch
+    When:
+        - Fetch loop is triggered
+    Then:
+        - Assert 2 events searches are created, and every offense gets its events
+    """
+    client = QRadarClient("", {}, {"identifier": "*", "password": "*"})
+    offenses = [{"id": offense_id, "start_time": 1600000000000} for offense_id in (452, 451, 450)]
+    mocker.patch.object(QRadar_v2, "EVENTS_SEARCH_BATCH_SIZE", 2)
+    mocker.patch.object(QRadar_v2, "get_integration_context", return_value={})
+    mocker.patch.object(QRadar_v2, "fetch_raw_offenses", return_value=offenses)
+    mocker.patch.object(QRadar_v2, "is_reset_triggered", return_value=False)
+    mocker.patch.object(QRadar_v2, "create_incident_from_offense", side_effect=lambda offense, _: offense)
+    mocker.patch.object(demisto, "createIncidents")
+    mocker.patch.object(demisto, "debug")
+    sic_mock = mocker.patch.object(QRadar_v2, "set_integration_context")
+    queries = {}
+
+    def create_search(events_query):
+        search_id = str(len(queries))
+        queries[search_id] = events_query["query_expression"]
+        return {"search_id": search_id, "status": "WAIT"}
+
+    def search_results(search_id, _range=None):
+        ids = [offense["id"] for offense in offenses if f"INOFFENSE({offense['id']})" in queries[search_id]]
+        return {"events": [{"sourceip": str(offense_id), f"_in_offense_{offense_id}": 1} for offense_id in ids]}
+
+    search_mock = mocker.patch.object(client, "search", side_effect=create_search)
+    mocker.patch.object(client, "get_search", return_value={"status": "COMPLETED"})
+    mocker.patch.object(client, "get_search_results", side_effect=search_results)
+
+    fetch_incidents_long_running_events(client, "", "", False, False, FetchMode.all_events, "sourceip", 20)
+
+    assert search_mock.call_count == 2
+    assert sic_mock.call_args[0][0]['id'] == 452
+    samples = sic_mock.call_args[0][0]['samples']
+    assert [(sample["id"], sample["events"]) for sample in samples] == [
+        (450, [{"sourceip": "450"}]), (451, [{"sourceip": "451"}]), (452, [{"sourceip": "452"}])
+    ]
+
+
+def test_enrich_offenses_batch_requeries_short_offenses(mocker):
+    """
+    Given:
+        - A batch of 2 offenses with a limit of 2 events per offense, and offense 450 has more events than the limit
+    When:
+        - The events search of the batch returns only events of offense 450
+    Then:
+        - Assert offense 451 is searched again on its own with its own limit, and both offenses get their events
+    """
+    client = QRadarClient("", {}, {"identifier": "*", "password": "*"})
+    offenses = [{"id": 450, "start_time": 1600000000000}, {"id": 451, "start_time": 1600000000000}]
+    mocker.patch.object(QRadar_v2, "is_reset_triggered", return_value=False)
+    mocker.patch.object(demisto, "debug")
+    queries = []
+
+    def create_search(events_query):
+        queries.append(events_query["query_expression"])
+        return {"search_id": str(len(queries) - 1), "status": "WAIT"}
+
+    def search_results(search_id, _range=None):
+        if search_id == "0":
+            return {"events": [{"sourceip": str(i), "_in_offense_450": 1, "_in_offense_451": 0} for i in range(4)]}
+        return {"events": [{"sourceip": "451"}]}
+
+    mocker.patch.object(client, "search", side_effect=create_search)
+    mocker.patch.object(client, "get_search", return_value={"status": "COMPLETED"})
+    mocker.patch.object(client, "get_search_results", side_effect=search_results)
+
+    QRadar_v2.enrich_offenses_batch_with_events(client, offenses, FetchMode.all_events, "sourceip", 2)
+
+    assert len(queries) == 2
+    assert "INOFFENSE(451) limit 2 START" in queries[1]
+    assert offenses[0]["events"] == [{"sourceip": "0"}, {"sourceip": "1"}]
+    assert offenses[1]["events"] == [{"sourceip": "451"}]
+
+
+def test_enrichment_cache_ttl_and_size(mocker):
+    """
+    Given:
+        - An enrichment cache of up to 2 entries, with a TTL of 10 seconds
+    When:
+        - Caching 3 entries, reading them and reading them again after they expire
+    Then:
+        - Assert the least recently used entry is evicted, and expired entries are missing
+    """
+    mocker.patch.object(QRadar_v2, "ENRICHMENT_CACHE_SIZE", 2)
+    mocker.patch.object(QRadar_v2, "ENRICHMENT_CACHE_TTL_SECS", 10)
+    time_mock = mocker.patch.object(QRadar_v2.time, "time", return_value=1000)
+    cache = QRadar_v2.EnrichmentCache()
+
+    cache.set_many("domain", {1: "domain1", 2: "domain2"})
+    assert cache.get_many("domain", [1]) == ({1: "domain1"}, [])
+    cache.set_many("domain", {3: "domain3"})
+    assert cache.get_many("domain", [1, 2, 3]) == ({1: "domain1", 3: "domain3"}, [2])
+    assert cache.hits == {"domain": 3} and cache.misses == {"domain": 1}
+
+    time_mock.return_value = 1010
+    assert cache.get_many("domain", [1, 3]) == ({}, [1, 3])
+
+
+def test_enrichment_cache_context(mocker):
+    """
+    Given:
+        - An enrichment cache with domains and assets
+    When:
+        - Keeping the cache in the integration context and warming a new cache from it
+    Then:
+        - Assert the domains are warmed and the assets are not kept in the context
+    """
+    cache = QRadar_v2.EnrichmentCache()
+    cache.set_many("domain", {1: "domain1"})
+    cache.set_many("asset", {"8.8.8.8": [{"id": 1928}]})
+
+    context = json.loads(json.dumps(cache.to_context()))
+    warmed_cache = QRadar_v2.EnrichmentCache()
+    warmed_cache.load_context(context)
+
+    assert warmed_cache.get_many("domain", [1]) == ({1: "domain1"}, [])
+    assert warmed_cache.get_many("asset", ["8.8.8.8"]) == ({}, ["8.8.8.8"])
+
+
+def test_enrich_offense_result_cached(mocker, enrichment_cache):
+    """
+    Given:
+        - Offenses with a domain, rules and source and destination addresses, which were already enriched once
+    When:
+        - Enriching the offenses again
+    Then:
+        - Assert the enrichment objects are taken from the cache without API calls
+    """
+    client = QRadarClient("", {}, {"identifier": "*", "password": "*"})
+    api_mocks = [
+        mocker.patch.object(client, "get_closing_reasons", return_value=[]),
+        mocker.patch.object(client, "get_offense_types", return_value=[]),
+        mocker.patch.object(client, "get_devices", return_value=[{"id": 0, "name": "Default Domain"}]),
+        mocker.patch.object(client, "get_rules", return_value=[{"id": 100452, "name": "Outbound port scan"}]),
+        mocker.patch.object(client, "send_request", side_effect=[
+            [{"id": 1, "source_ip": "1.1.1.1"}], [{"id": 2, "local_destination_ip": "2.2.2.2"}]
+        ]),
+    ]
+    mocker.patch.object(demisto, "debug")
+
+    def offenses():
+        return [{"id": 450, "domain_id": 0, "rules": [{"id": 100452}], "source_address_ids": [1],
+                 "local_destination_address_ids": [2]}]
+
+    first = enrich_offense_result(client, offenses(), ip_enrich=True)
+    assert [api_mock.call_count for api_mock in api_mocks] == [1, 1, 1, 1, 2]
+
+    second = enrich_offense_result(client, offenses(), ip_enrich=True)
+    assert [api_mock.call_count for api_mock in api_mocks] == [1, 1, 1, 1, 2]
+    assert second == first
+    assert second[0]["domain_name"] == "Default Domain"
+    assert second[0]["rules"][0]["name"] == "Outbound port scan"
+    assert second[0]["source_address_ids"] == ["1.1.1.1"]
+    assert second[0]["local_destination_address_ids"] == ["2.2.2.2"]
+
+    enrichment_cache.report_stats()
+    assert enrichment_cache.hits == {}
+
+
+def test_get_assets_for_offense_cached(mocker):
+    """
+    Given:
+        - Assets were queried for 2 IPs, one of them without assets
+    When:
+        - Getting the assets of the IPs again
+    Then:
+        - Assert the assets of both IPs are taken from the cache without API calls
+    """
+    from QRadar_v2 import get_assets_for_offense
+    client = QRadarClient("", {}, {"identifier": "*", "password": "*"})
+    assets_mock = mocker.patch.object(client, "get_assets", return_value=[
+        {"id": 1928, "interfaces": [{"id": 1915, "ip_addresses": [{"type": "IPV4", "value": "8.8.8.8"}]}]}
+    ])
+
+    assert [asset["id"] for asset in get_assets_for_offense(client, ["8.8.8.8", "1.1.1.1"])] == [1928]
+    assert [asset["id"] for asset in get_assets_for_offense(client, ["1.1.1.1", "8.8.8.8"])] == [1928]
+    assert assets_mock.call_count == 1
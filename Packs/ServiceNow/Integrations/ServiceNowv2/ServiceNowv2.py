@@ -1,6 +1,8 @@
 import shutil
 import dateparser
+from multiprocessing.pool import ThreadPool
 from typing import List, Tuple, Dict, Callable, Any, Union
+from requests.adapters import HTTPAdapter
 
 from CommonServerPython import *
 
@@ -96,6 +98,10 @@ MIRROR_DIRECTION = {
     'Incoming And Outgoing': 'Both'
 }
 
+ATTACHMENTS_MAX_WORKERS = 5
+ATTACHMENT_CHUNK_SIZE = 1024 * 1024
+MODIFIED_RECORDS_PAGE_SIZE = 1000
+
 
 def arg_to_timestamp(arg: Any, arg_name: str, required: bool = False) -> int:
     """
@@ -441,6 +447,12 @@ class Client(BaseClient):
             get_attachments: whether to get ticket attachments by default
             incident_name: the ServiceNow ticket field to be set as the incident name
         """
+        super().__init__(base_url=server_url, verify=verify, proxy=demisto.params().get('proxy', False),
+                         auth=(username, password))
+        # The session of the base client is used to download attachments, its pool keeps a connection per download
+        adapter = HTTPAdapter(pool_maxsize=ATTACHMENTS_MAX_WORKERS)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
         self._base_url = server_url
         self._sc_server_url = sc_server_url
         self._verify = verify
@@ -586,31 +598,71 @@ class Client(BaseClient):
         """
         return self.send_request('attachment', 'GET', params={'sysparm_query': f'table_sys_id={ticket_id}'})
 
-    def get_ticket_attachment_entries(self, ticket_id: str) -> list:
+    def get_attachment_file_entry(self, attachment: dict) -> dict:
+        """Download an attachment to a file of the investigation, streaming its content in chunks.
+
+        Args:
+            attachment: the attachment, as returned by get_ticket_attachments
+
+        Returns:
+            A file entry of the attachment, like the one fileResult returns.
+        """
+        start = time.time()
+        file_id = demisto.uniqueFile()
+        size = 0
+        res = self._http_request('GET', '', full_url=attachment.get('download_link', ''), resp_type='response',
+                                 stream=True, proxies=self._proxies)
+        try:
+            with open(f'{demisto.investigation()["id"]}_{file_id}', 'wb') as file_:
+                for chunk in res.iter_content(chunk_size=ATTACHMENT_CHUNK_SIZE):
+                    file_.write(chunk)
+                    size += len(chunk)
+        finally:
+            res.close()
+        demisto.debug(f'Downloaded attachment {attachment.get("sys_id")} ({attachment.get("file_name")}): '
+                      f'{size} bytes in {time.time() - start:.2f} seconds')
+
+        return {'Contents': '', 'ContentsFormat': formats['text'], 'Type': entryTypes['file'],
+                'File': attachment.get('file_name', ''), 'FileID': file_id}
+
+    def get_ticket_attachment_entries(self, ticket_id: str, skip_sys_ids: set = None) -> list:
         """Get ticket attachments, including file attachments
         by sending a GET request and using the get_ticket_attachments class function.
+        The files are downloaded concurrently, every file is downloaded once even if it is listed more than once.
 
         Args:
             ticket_id: ticket id
+            skip_sys_ids: sys IDs of attachments which should not be downloaded
 
         Returns:
             Array of attachments entries.
         """
-        entries = []
-        links = []  # type: List[Tuple[str, str]]
+        attachments = []
+        seen_sys_ids = set(skip_sys_ids or [])
         attachments_res = self.get_ticket_attachments(ticket_id)
         if 'result' in attachments_res and len(attachments_res['result']) > 0:
-            attachments = attachments_res['result']
-            links = [(attachment.get('download_link', ''), attachment.get('file_name', ''))
-                     for attachment in attachments]
-
-        for link in links:
-            file_res = requests.get(link[0], auth=(self._username, self._password), verify=self._verify,
-                                    proxies=self._proxies)
-            if file_res is not None:
-                entries.append(fileResult(link[1], file_res.content))
+            for attachment in attachments_res['result']:
+                sys_id = attachment.get('sys_id')
+                if sys_id and sys_id in seen_sys_ids:
+                    continue
+                seen_sys_ids.add(sys_id)
+                attachments.append(attachment)
+        if not attachments:
+            return []
+
+        def get_entry(attachment: dict) -> dict:
+            try:
+                return self.get_attachment_file_entry(attachment)
+            except Exception as err:
+                return {'Type': entryTypes['error'], 'ContentsFormat': formats['text'],
+                        'Contents': f'Failed to download the attachment {attachment.get("file_name")}: {err}'}
 
-        return entries
+        pool = ThreadPool(min(ATTACHMENTS_MAX_WORKERS, len(attachments)))
+        try:
+            return pool.map(get_entry, attachments)
+        finally:
+            pool.close()
+            pool.join()
 
     def get(self, table_name: str, record_id: str, custom_fields: dict = {}, number: str = None) -> dict:
         """Get a ticket by sending a GET request.
@@ -1936,24 +1988,24 @@ def get_remote_data_command(client: Client, args: Dict[str, Any], params: Dict)
 
     # get latest comments and files
     entries = []
-    attachments_res = client.get_ticket_attachments(ticket_id)
-    file_entries = client.get_ticket_attachment_entries(ticket.get('sys_id', ''))
-    if 'result' in attachments_res:
-        attachments = attachments_res['result']
-        for attachment in attachments:
-            entry_time = arg_to_timestamp(
-                arg=attachment.get('sys_created_on'),
-                arg_name='sys_created_on',
-                required=False
-            )
-
-            if file_entries:
-                for file_ in file_entries:
-                    if file_.get('File') == attachment.get('file_name'):
-                        if last_update > entry_time:
-                            continue
-                        else:
-                            entries.append(file_)
+    if ticket.get('sys_id'):
+        # Attachments created before the last update were already mirrored, they are not downloaded again
+        attachments_res = client.get_ticket_attachments(ticket_id)
+        mirrored_sys_ids = set()
+        if 'result' in attachments_res:
+            for attachment in attachments_res['result']:
+                entry_time = arg_to_timestamp(
+                    arg=attachment.get('sys_created_on'),
+                    arg_name='sys_created_on',
+                    required=False
+                )
+                if last_update > entry_time:
+                    mirrored_sys_ids.add(attachment.get('sys_id'))
+        for file_entry in client.get_ticket_attachment_entries(ticket['sys_id'], mirrored_sys_ids):
+            if file_entry.get('Type') == entryTypes['error']:
+                demisto.error(file_entry.get('Contents'))
+            else:
+                entries.append(file_entry)
 
     sys_param_limit = args.get('limit', client.sys_param_limit)
     sys_param_offset = args.get('offset', client.sys_param_offset)
@@ -2027,6 +2079,38 @@ def get_remote_data_command(client: Client, args: Dict[str, Any], params: Dict)
     return [ticket] + entries
 
 
+def get_modified_remote_data_command(client: Client, args: Dict[str, Any]) -> GetModifiedRemoteDataResponse:
+    """
+    get-modified-remote-data command: Returns the IDs of the tickets which were updated since the last update, so only
+    these incidents are refreshed with get-remote-data.
+    Args:
+        client: XSOAR client to use
+        args:
+            lastUpdate: when was the last time we retrieved data
+
+    Returns:
+        GetModifiedRemoteDataResponse: the sys_ids of the updated tickets.
+    """
+    remote_args = GetModifiedRemoteDataArgs(args)
+    last_update = arg_to_timestamp(
+        arg=remote_args.last_update,
+        arg_name='lastUpdate',
+        required=True
+    )
+    # sys_updated_on is compared in UTC, the tickets are sorted by sys_id which does not change when a ticket is updated
+    last_update_utc = datetime.utcfromtimestamp(last_update).strftime('%Y-%m-%d %H:%M:%S')  # type: ignore
+    sys_param_query = f'sys_updated_on>{last_update_utc}^ORDERBYsys_id'
+    demisto.debug(f'Getting the tickets updated since {last_update_utc}')
+
+    def get_page(offset: int, limit: int) -> List[Dict[str, Any]]:
+        result = client.query(client.ticket_type, str(limit), str(offset), sys_param_query, {'sysparm_fields': 'sys_id'})
+        return result.get('result', []) if result else []
+
+    modified_ids = get_modified_remote_ids(get_page, page_size=MODIFIED_RECORDS_PAGE_SIZE, id_key='sys_id')
+    demisto.debug(f'{len(modified_ids)} tickets were updated since {last_update_utc}')
+    return GetModifiedRemoteDataResponse(modified_ids)
+
+
 def update_remote_system_command(client: Client, args: Dict[str, Any], params: Dict[str, Any]) -> str:
     """
     This command pushes local changes to the remote system.
@@ -2178,6 +2262,8 @@ def main():
             demisto.results(get_ticket_command(client, args))
         elif command == 'get-remote-data':
             return_results(get_remote_data_command(client, demisto.args(), demisto.params()))
+        elif command == 'get-modified-remote-data':
+            return_results(get_modified_remote_data_command(client, demisto.args()))
         elif command == 'update-remote-system':
             return_results(update_remote_system_command(client, demisto.args(), demisto.params()))
         elif demisto.command() == 'get-mapping-fields':
@@ -5,7 +5,7 @@ from ServiceNowv2 import get_server_url, get_ticket_context, get_ticket_human_re
     get_record_command, update_record_command, create_record_command, delete_record_command, query_table_command, \
     list_table_fields_command, query_computers_command, get_table_name_command, add_tag_command, query_items_command, \
     get_item_details_command, create_order_item_command, document_route_to_table, fetch_incidents, main, \
-    get_mapping_fields_command, get_remote_data_command
+    get_mapping_fields_command, get_remote_data_command, get_modified_remote_data_command, ATTACHMENTS_MAX_WORKERS
 from ServiceNowv2 import test_module as module
 from test_data.response_constants import RESPONSE_TICKET, RESPONSE_MULTIPLE_TICKET, RESPONSE_UPDATE_TICKET, \
     RESPONSE_UPDATE_TICKET_SC_REQ, RESPONSE_CREATE_TICKET, RESPONSE_QUERY_TICKETS, RESPONSE_ADD_LINK, \
@@ -521,3 +521,150 @@ def test_get_remote_data_no_attachment(mocker):
     res = get_remote_data_command(client, args, params)
     assert res[1]['Contents'] == 'This is a comment'
     assert len(res) == 2
+
+
+def test_get_ticket_attachment_entries(mocker, requests_mock, tmp_path, monkeypatch):
+    """
+    Given:
+        - A ticket with 4 attachments: one which was seen before, and one listed twice.
+    When:
+        - Getting the ticket attachment entries.
+    Then:
+        - Ensure every attachment which was not seen is downloaded once, to a file of the investigation.
+        - Ensure a failed download returns an error entry.
+        - Ensure the session keeps a connection per concurrent download.
+    """
+    monkeypatch.chdir(tmp_path)
+    mocker.patch.object(demisto, 'investigation', return_value={'id': '1'})
+    mocker.patch.object(demisto, 'uniqueFile', side_effect=['file_a', 'file_b', 'file_c'])
+    client = Client(server_url='https://server_url.com/', sc_server_url='sc_server_url', username='username',
+                    password='password', verify=False, fetch_time='fetch_time',
+                    sysparm_query='sysparm_query', sysparm_limit=10, timestamp_field='opened_at',
+                    ticket_type='incident', get_attachments=True, incident_name='description')
+    attachments = [
+        {'sys_id': sys_id, 'file_name': f'{sys_id}.txt',
+         'download_link': f'https://server_url.com/attachment/{sys_id}/file'}
+        for sys_id in ('seen', 'a', 'a', 'b', 'missing')
+    ]
+    requests_mock.get('https://server_url.com/attachment', json={'result': attachments})
+    requests_mock.get('https://server_url.com/attachment/a/file', content=b'a' * 3000000)
+    requests_mock.get('https://server_url.com/attachment/b/file', content=b'b' * 10)
+    requests_mock.get('https://server_url.com/attachment/missing/file', status_code=404, json={})
+
+    assert client._session.adapters['https://']._pool_maxsize == ATTACHMENTS_MAX_WORKERS
+
+    entries = client.get_ticket_attachment_entries('ticket_id', {'seen'})
+
+    assert [entry.get('File') for entry in entries] == ['a.txt', 'b.txt', None]
+    assert entries[2]['Type'] == 4
+    assert 'Failed to download the attachment missing.txt' in entries[2]['Contents']
+    contents = {entry['File']: (tmp_path / f'1_{entry["FileID"]}').read_bytes() for entry in entries[:2]}
+    assert contents == {'a.txt': b'a' * 3000000, 'b.txt': b'b' * 10}
+    downloaded = [request.url for request in requests_mock.request_history if request.url.endswith('/file')]
+    assert sorted(downloaded) == ['https://server_url.com/attachment/a/file', 'https://server_url.com/attachment/b/file',
+                                  'https://server_url.com/attachment/missing/file']
+
+
+class MirroredTicketsServer:
+    """Stand-in of the ServiceNow table and attachment APIs for mirrored tickets, counts the requests it answers"""
+
+    def __init__(self, tickets: int, modified: int):
+        self.tickets = {}
+        for i in range(tickets):
+            sys_id = f'{i:032x}'
+            updated_on = '2020-08-16 12:00:00' if i % (tickets // modified) == 0 else '2020-08-16 10:00:00'
+            self.tickets[sys_id] = {'sys_id': sys_id, 'number': f'INC{i:07}', 'sys_updated_on': updated_on}
+        self.requests = []
+
+    def send_request(self, path, method='GET', body=None, params=None, headers=None, file=None, sc_api=False):
+        self.requests.append(path)
+        params = params or {}
+        if path.startswith('table/incident/'):
+            return {'result': self.tickets[path.split('/')[-1]]}
+        if path == 'table/incident':
+            updated_after = params['sysparm_query'].split('^')[0].split('>')[1]
+            offset, limit = int(params['sysparm_offset']), int(params['sysparm_limit'])
+            modified = sorted(sys_id for sys_id, ticket in self.tickets.items()
+                              if ticket['sys_updated_on'] > updated_after)
+            return {'result': [{'sys_id': sys_id} for sys_id in modified[offset:offset + limit]]}
+        return {'result': []}
+
+
+def run_mirroring_cycle(mocker, server, last_update, get_modified_remote_data):
+    """Runs the mirroring commands the way the server does in a cycle, returns the updated ticket IDs"""
+    mocker.patch.object(Client, 'send_request', side_effect=server.send_request)
+    mocker.patch.object(demisto, 'params', return_value={
+        'url': 'https://test.service-now.com', 'credentials': {'identifier': 'admin', 'password': 'admin'}})
+    results = mocker.patch.object(demisto, 'results')
+    command = mocker.patch.object(demisto, 'command')
+    args = mocker.patch.object(demisto, 'args')
+
+    incident_ids = list(server.tickets)
+    if get_modified_remote_data:
+        command.return_value = 'get-modified-remote-data'
+        args.return_value = {'lastUpdate': last_update}
+        main()
+        incident_ids = results.call_args[0][0]['Contents']
+
+    updated_ids = []
+    for incident_id in incident_ids:
+        command.return_value = 'get-remote-data'
+        args.return_value = {'id': incident_id, 'lastUpdate': last_update}
+        main()
+        if results.call_args[0][0][0]:
+            updated_ids.append(incident_id)
+    return updated_ids
+
+
+@pytest.mark.parametrize('get_modified_remote_data, requests', [(False, 2020), (True, 41)])
+def test_mirroring_cycle_requests(mocker, get_modified_remote_data, requests):
+    """
+    Given:
+        - 1,000 mirrored tickets, 10 of them were updated since the last update.
+    When
+        - running a mirroring cycle with get-remote-data for every mirrored incident, or with
+          get-modified-remote-data and get-remote-data for the modified incidents only.
+    Then
+        - the same tickets are updated.
+        - without get-modified-remote-data, the ticket and its notes are requested for every mirrored incident (2,000
+          requests) and the attachments of the updated tickets are requested too.
+        - with get-modified-remote-data, a single query returns the updated tickets and only they are requested.
+    """
+    server = MirroredTicketsServer(tickets=1000, modified=10)
+
+    updated_ids = run_mirroring_cycle(mocker, server, '2020-08-16T11:00:00Z', get_modified_remote_data)
+
+    assert updated_ids == [sys_id for sys_id, ticket in server.tickets.items()
+                           if ticket['sys_updated_on'] == '2020-08-16 12:00:00']
+    assert len(updated_ids) == 10
+    assert len(server.requests) == requests
+
+
+def test_get_modified_remote_data(mocker):
+    """
+    Given:
+        - ServiceNow client
+        - 2,500 tickets updated since the last update.
+    When
+        - running get_modified_remote_data_command.
+    Then
+        - the sys_ids of the updated tickets are returned, queried in pages sorted by sys_id.
+    """
+    client = Client(server_url='https://server_url.com/', sc_server_url='sc_server_url', username='username',
+                    password='password', verify=False, fetch_time='fetch_time',
+                    sysparm_query='sysparm_query', sysparm_limit=10, timestamp_field='opened_at',
+                    ticket_type='incident', get_attachments=False, incident_name='description')
+    sys_ids = [str(i) for i in range(2500)]
+
+    def query(table_name, sys_param_limit, sys_param_offset, sys_param_query, system_params):
+        offset = int(sys_param_offset)
+        return {'result': [{'sys_id': sys_id} for sys_id in sys_ids[offset:offset + int(sys_param_limit)]]}
+
+    mocker.patch.object(client, 'query', side_effect=query)
+
+    res = get_modified_remote_data_command(client, {'lastUpdate': '2020-08-16T11:00:00Z'})
+
+    assert res.modified_incident_ids == sys_ids
+    assert client.query.call_count == 3
+    assert client.query.call_args[0][3] == 'sys_updated_on>2020-08-16 11:00:00^ORDERBYsys_id'
+    assert client.query.call_args[0][4] == {'sysparm_fields': 'sys_id'}
@@ -53,9 +53,11 @@ DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 OBJECTS_TO_KEYS = {
     'mirrors': 'investigation_id',
     'questions': 'entitlement',
-    'users': 'id'
+    'users': 'id',
+    'conversations': 'id'
 }
 SYNC_CONTEXT = True
+DIRECTORY_REFRESH_INTERVAL_SECONDS = 12 * 60 * 60
 
 ''' GLOBALS '''
 
@@ -79,6 +81,153 @@ BOT_ICON_URL: str
 MAX_LIMIT_TIME: int
 PAGINATED_COUNT: int
 
+''' DIRECTORY '''
+
+
+class SlackDirectory:
+    """
+    An in-memory directory of the slack users and conversations, indexed by ID and by name (and by email and real name
+    for users). It is loaded from the integration context, and only the objects added to it are saved back - right
+    away, or by flush() when write_behind is set, as done in the long running execution.
+    """
+
+    KINDS = ('users', 'conversations')
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.write_behind = False
+        self.last_refresh = 0.0
+        self._loaded: Dict[str, str] = {}
+        self._by_id: Dict[str, Dict[str, dict]] = {kind: {} for kind in self.KINDS}
+        self._by_name: Dict[str, Dict[str, str]] = {kind: {} for kind in self.KINDS}
+        self._persisted: Dict[str, set] = {kind: set() for kind in self.KINDS}
+        self._pending: Dict[str, Dict[str, dict]] = {kind: {} for kind in self.KINDS}
+
+    @staticmethod
+    def _names(kind: str, slack_object: dict) -> List[str]:
+        names = [slack_object.get('name')]
+        if kind == 'users':
+            names += [(slack_object.get('profile') or {}).get('email'), slack_object.get('real_name')]
+        return [name.lower() for name in names if name]
+
+    def _index(self, kind: str, slack_object: dict):
+        object_id = slack_object['id']
+        by_id = self._by_id[kind]
+        by_name = self._by_name[kind]
+        by_id[object_id] = slack_object
+        for name in self._names(kind, slack_object):
+            # The first object with a name keeps it, unless it was renamed
+            current_id = by_name.get(name)
+            if current_id is None or name not in self._names(kind, by_id[current_id]):
+                by_name[name] = object_id
+
+    def _sync(self):
+        """
+        Indexes the users and conversations of the integration context, if they changed since they were last loaded.
+        """
+        integration_context = get_integration_context(SYNC_CONTEXT)
+        for kind in self.KINDS:
+            raw_objects = integration_context.get(kind)
+            if not raw_objects or raw_objects == self._loaded.get(kind):
+                continue
+            self._loaded[kind] = raw_objects
+            for slack_object in json.loads(raw_objects):
+                if slack_object.get('id') and slack_object['id'] not in self._pending[kind]:
+                    self._index(kind, slack_object)
+                    self._persisted[kind].add(slack_object['id'])
+
+    def _find(self, kind: str, object_id: str = '', name: str = '') -> dict:
+        if object_id:
+            return self._by_id[kind].get(object_id, {})
+        slack_object = self._by_id[kind].get(self._by_name[kind].get(name, ''), {})
+        return slack_object if name in self._names(kind, slack_object) else {}
+
+    def get(self, kind: str, object_id: str = '', name: str = '') -> dict:
+        """
+        Gets a user or a conversation by its ID or by its name, loading the integration context only when the object
+        is not in the directory.
+
+        Args:
+            kind: users or conversations
+            object_id: The slack ID of the object
+            name: The name of the object, or the email or real name of a user (case insensitive)
+
+        Returns:
+            The slack object, or an empty dict if it is not in the directory
+        """
+        name = name.lower()
+        with self.lock:
+            slack_object = self._find(kind, object_id, name)
+            if not slack_object:
+                self._sync()
+                slack_object = self._find(kind, object_id, name)
+        return slack_object
+
+    def add(self, kind: str, slack_objects: list, persist: bool = True):
+        """
+        Adds users or conversations to the directory.
+
+        Args:
+            kind: users or conversations
+            slack_objects: The slack objects to add
+            persist: Whether to save the objects to the integration context
+        """
+        with self.lock:
+            for slack_object in slack_objects:
+                if slack_object and slack_object.get('id'):
+                    self._index(kind, slack_object)
+                    if persist:
+                        self._pending[kind][slack_object['id']] = slack_object
+        if persist and not self.write_behind:
+            self.flush()
+
+    def refresh_users(self, users: list):
+        """
+        Indexes the users of the workspace, and saves to the integration context the ones in it which changed.
+
+        Args:
+            users: All the users of the workspace
+        """
+        with self.lock:
+            for user in users:
+                user_id = user.get('id')
+                if not user_id:
+                    continue
+                if user_id in self._persisted['users'] and self._by_id['users'].get(user_id) != user:
+                    self._pending['users'][user_id] = user
+                self._index('users', user)
+            self.last_refresh = time.time()
+        if not self.write_behind:
+            self.flush()
+
+    def flush(self, context: dict = None):
+        """
+        Saves the users and conversations added since the last flush to the integration context.
+
+        Args:
+            context: Other keys to save to the integration context along with them
+        """
+        with self.lock:
+            pending = {kind: objects for kind, objects in self._pending.items() if objects}
+            self._pending = {kind: {} for kind in self.KINDS}
+        updated_context = {kind: list(objects.values()) for kind, objects in pending.items()}
+        updated_context.update(context or {})
+        if not updated_context:
+            return
+        try:
+            set_to_integration_context_with_retries(updated_context, OBJECTS_TO_KEYS, SYNC_CONTEXT)
+        except Exception:
+            with self.lock:
+                for kind, objects in pending.items():
+                    self._pending[kind] = {**objects, **self._pending[kind]}
+            raise
+        with self.lock:
+            for kind, objects in pending.items():
+                self._persisted[kind].update(objects)
+
+
+DIRECTORY = SlackDirectory()
+
 ''' HELPER FUNCTIONS '''
 
 
@@ -135,18 +284,8 @@ def get_user_by_name(user_to_search: str, add_to_context: bool = True) -> dict:
         A slack user object
     """
 
-    user: dict = {}
-    users: list = []
-    integration_context = get_integration_context(SYNC_CONTEXT)
-
     user_to_search = user_to_search.lower()
-    if integration_context.get('users'):
-        users = json.loads(integration_context['users'])
-        users_filter = list(filter(lambda u: u.get('name', '').lower() == user_to_search
-                                             or u.get('profile', {}).get('email', '').lower() == user_to_search
-                                             or u.get('real_name', '').lower() == user_to_search, users))
-        if users_filter:
-            user = users_filter[0]
+    user = DIRECTORY.get('users', name=user_to_search)
     if not user:
         body = {
             'limit': PAGINATED_COUNT
@@ -168,9 +307,7 @@ def get_user_by_name(user_to_search: str, add_to_context: bool = True) -> dict:
 
         if users_filter:
             user = users_filter[0]
-            if add_to_context:
-                users.append(user)
-                set_to_integration_context_with_retries({'users': users}, OBJECTS_TO_KEYS, SYNC_CONTEXT)
+            DIRECTORY.add('users', [user], persist=add_to_context)
         else:
             return {}
 
@@ -345,18 +482,12 @@ async def get_slack_name(slack_id: str, client) -> str:
     if not slack_id:
         return ''
 
-    integration_context = get_integration_context(SYNC_CONTEXT)
     prefix = slack_id[0]
     slack_name = ''
 
     if prefix in ['C', 'D', 'G']:
         slack_id = slack_id.split('|')[0]
-        conversation: dict = {}
-        if integration_context.get('conversations'):
-            conversations = list(filter(lambda c: c['id'] == slack_id,
-                                        json.loads(integration_context['conversations'])))
-            if conversations:
-                conversation = conversations[0]
+        conversation = DIRECTORY.get('conversations', slack_id)
         if not conversation:
             body = {
                 'channel': slack_id
@@ -364,19 +495,17 @@ async def get_slack_name(slack_id: str, client) -> str:
 
             conversation = (await send_slack_request_async(client, 'conversations.info', http_verb='GET',
                                                            body=body)).get('channel', {})
+            DIRECTORY.add('conversations', [conversation], persist=False)
         slack_name = conversation.get('name', '')
     elif prefix == 'U':
-        user: dict = {}
-        if integration_context.get('users'):
-            users = list(filter(lambda u: u['id'] == slack_id, json.loads(integration_context['users'])))
-            if users:
-                user = users[0]
+        user = DIRECTORY.get('users', slack_id)
         if not user:
             body = {
                 'user': slack_id
             }
             user = (await send_slack_request_async(client, 'users.info', http_verb='GET',
                                                            body=body)).get('user', {})
+            DIRECTORY.add('users', [user], persist=False)
 
         slack_name = user.get('name', '')
 
@@ -606,6 +735,7 @@ def long_running_loop():
         try:
             check_for_mirrors()
             check_for_answers()
+            DIRECTORY.flush()
         except requests.exceptions.ConnectionError as e:
             error = f'Could not connect to the Slack endpoint: {str(e)}'
         except Exception as e:
@@ -624,11 +754,8 @@ def check_for_answers():
 
     integration_context = get_integration_context(SYNC_CONTEXT)
     questions = integration_context.get('questions', [])
-    users = integration_context.get('users', [])
     if questions:
         questions = json.loads(questions)
-    if users:
-        users = json.loads(users)
     now = get_current_utc_time()
     now_string = datetime.strftime(now, DATE_FORMAT)
     updated_questions = []
@@ -683,20 +810,18 @@ def check_for_answers():
         if actions:
             demisto.info(f'Slack - received answer from user for entitlement {entitlement}.')
             user_id = payload.get('user', {}).get('id')
-            user_filter = list(filter(lambda u: u['id'] == user_id, users))
-            if user_filter:
-                user = user_filter[0]
-            else:
+            user = DIRECTORY.get('users', user_id)
+            if not user:
                 body = {
                     'user': user_id
                 }
                 user = send_slack_request_sync(CLIENT, 'users.info', http_verb='GET', body=body).get('user', {})
-                users.append(user)
+                DIRECTORY.add('users', [user])
 
             answer_question(actions[0].get('text', {}).get('text'), question, user.get('profile', {}).get('email'))
 
     if updated_questions:
-        set_to_integration_context_with_retries({'users': users, 'questions': questions}, OBJECTS_TO_KEYS, SYNC_CONTEXT)
+        DIRECTORY.flush({'questions': questions})
 
 
 def get_poll_minutes(current_time: datetime, sent: Optional[str]) -> float:
@@ -848,10 +973,38 @@ def extract_entitlement(entitlement: str, text: str) -> Tuple[str, str, str, str
     return content, guid, incident_id, task_id
 
 
+async def refresh_directory(client: slack.WebClient):
+    """
+    Gets all the users of the workspace and refreshes the directory with them.
+
+    Args:
+        client: The slack client
+    """
+    users: list = []
+    body = {
+        'limit': PAGINATED_COUNT
+    }
+    try:
+        while True:
+            response = await send_slack_request_async(client, 'users.list', http_verb='GET', body=body)
+            users.extend(response.get('members', []))
+            cursor = response.get('response_metadata', {}).get('next_cursor')
+            if not cursor:
+                break
+            body = body.copy()
+            body.update({'cursor': cursor})
+        DIRECTORY.refresh_users(users)
+        demisto.info(f'Slack - refreshed the directory with {len(users)} users')
+    except Exception as e:
+        demisto.error(f'Slack - failed to refresh the directory: {e}')
+
+
 async def slack_loop():
     """
     Starts a Slack RTM client while checking the connection.
     """
+    web_client = slack.WebClient(token=BOT_TOKEN, run_async=True, proxy=PROXY_URL, ssl=SSL_CONTEXT)
+    refresh_task: Optional[asyncio.Future] = None
     while True:
         loop = asyncio.get_running_loop()
         rtm_client = None
@@ -868,6 +1021,10 @@ async def slack_loop():
             client_future = rtm_client.start()
             while True:
                 await asyncio.sleep(10)
+                if (not refresh_task or refresh_task.done()) \
+                        and time.time() - DIRECTORY.last_refresh > DIRECTORY_REFRESH_INTERVAL_SECONDS:
+                    DIRECTORY.last_refresh = time.time()
+                    refresh_task = asyncio.ensure_future(refresh_directory(web_client))
                 if rtm_client._websocket is None or rtm_client._websocket.closed or client_future.done():
                     ex = client_future.exception()
                     if ex:
@@ -1151,21 +1308,13 @@ async def get_user_by_id_async(client: slack.WebClient, user_id: str) -> dict:
     Returns:
         The slack user.
     """
-    user: dict = {}
-    users: list = []
-    integration_context = get_integration_context(SYNC_CONTEXT)
-    if integration_context.get('users'):
-        users = json.loads(integration_context['users'])
-        user_filter = list(filter(lambda u: u['id'] == user_id, users))
-        if user_filter:
-            user = user_filter[0]
+    user = DIRECTORY.get('users', user_id)
     if not user:
         body = {
             'user': user_id
         }
         user = (await send_slack_request_async(client, 'users.info', http_verb='GET', body=body)).get('user', {})
-        users.append(user)
-        set_to_integration_context_with_retries({'users': users}, OBJECTS_TO_KEYS, SYNC_CONTEXT)
+        DIRECTORY.add('users', [user])
 
     return user
 
@@ -1244,21 +1393,10 @@ def get_conversation_by_name(conversation_name: str) -> dict:
     Returns:
         The slack conversation
     """
-    integration_context = get_integration_context(SYNC_CONTEXT)
-
-    conversation_to_search = conversation_name.lower()
-    # Find conversation in the cache
-    conversations = integration_context.get('conversations')
-    if conversations:
-        conversations = json.loads(conversations)
-        conversation_filter = list(
-            filter(
-                lambda c: conversation_to_search == c.get('name', '').lower(),
-                conversations
-            )
-        )
-        if conversation_filter:
-            return conversation_filter[0]
+    # Find conversation in the directory
+    conversation = DIRECTORY.get('conversations', name=conversation_name)
+    if conversation:
+        return conversation
 
     # If not found in cache, search for it
     body = {
@@ -1266,7 +1404,6 @@ def get_conversation_by_name(conversation_name: str) -> dict:
         'limit': PAGINATED_COUNT
     }
     response = send_slack_request_sync(CLIENT, 'conversations.list', http_verb='GET', body=body)
-    conversation: dict = {}
     while True:
         conversations = response['channels'] if response and response.get('channels') else []
         cursor = response.get('response_metadata', {}).get('next_cursor')
@@ -1282,15 +1419,8 @@ def get_conversation_by_name(conversation_name: str) -> dict:
     if conversation_filter:
         conversation = conversation_filter[0]
 
-    # Save conversations to cache
-    if conversation:
-        conversations = integration_context.get('conversations')
-        if conversations:
-            conversations = json.loads(conversations)
-            conversations.append(conversation)
-        else:
-            conversations = [conversation]
-        set_to_integration_context_with_retries({'conversations': conversations}, OBJECTS_TO_KEYS, SYNC_CONTEXT)
+        # Save the conversation to the directory
+        DIRECTORY.add('conversations', [conversation])
 
     return conversation
 
@@ -1891,6 +2021,7 @@ def long_running_main():
     """
     Starts the long running thread.
     """
+    DIRECTORY.write_behind = True
     asyncio.run(start_listening())
 
 
@@ -1900,7 +2031,7 @@ def init_globals(command_name: str = ''):
     """
     global BOT_TOKEN, ACCESS_TOKEN, PROXY_URL, PROXIES, DEDICATED_CHANNEL, CLIENT, CHANNEL_CLIENT
     global SEVERITY_THRESHOLD, ALLOW_INCIDENTS, NOTIFY_INCIDENTS, INCIDENT_TYPE, VERIFY_CERT
-    global BOT_NAME, BOT_ICON_URL, MAX_LIMIT_TIME, PAGINATED_COUNT, SSL_CONTEXT
+    global BOT_NAME, BOT_ICON_URL, MAX_LIMIT_TIME, PAGINATED_COUNT, SSL_CONTEXT, DIRECTORY
 
     VERIFY_CERT = not demisto.params().get('unsecure', False)
     if not VERIFY_CERT:
@@ -1933,6 +2064,7 @@ def init_globals(command_name: str = ''):
     BOT_ICON_URL = demisto.params().get('bot_icon')  # Bot default icon url defined by the slack plugin (3-rd party)
     MAX_LIMIT_TIME = int(demisto.params().get('max_limit_time', '60'))
     PAGINATED_COUNT = int(demisto.params().get('paginated_count', '200'))
+    DIRECTORY = SlackDirectory()
 
 
 def print_thread_dump():
@@ -533,7 +533,7 @@ class TestGetConversationByName:
 
 
 def test_get_user_by_name(mocker):
-    from Slack import get_user_by_name
+    from Slack import get_user_by_name, init_globals
     # Set
 
     def api_call(method: str, http_verb: str = 'POST', file: str = None, params=None, json=None, data=None):
@@ -579,6 +579,8 @@ def test_get_user_by_name(mocker):
         'conversations': CONVERSATIONS,
         'bot_id': 'W12345678'
     })
+    # A new command execution starts with an empty directory
+    init_globals()
 
     # User email doesn't exist in integration context
     email = 'perikles@acropoli.com'
@@ -629,6 +631,121 @@ def test_get_user_by_name_paging(mocker):
     assert slack.WebClient.api_call.call_count == 2
 
 
+def test_directory_loads_context_once(mocker):
+    """
+    Given:
+        - Users and conversations in the integration context.
+    When:
+        - Getting users and conversations from the directory by ID, name, email and real name.
+    Then:
+        - Ensure the integration context is loaded only when an object is not in the directory.
+        - Ensure the names are case insensitive and the missing objects are not found.
+    """
+    import Slack
+
+    mocker.patch.object(demisto, 'getIntegrationContext', side_effect=get_integration_context)
+
+    assert Slack.DIRECTORY.get('users', 'U012A3CDE')['name'] == 'spengler'
+    assert Slack.DIRECTORY.get('users', name='Spengler@Ghostbusters.example.com')['id'] == 'U012A3CDE'
+    assert Slack.DIRECTORY.get('conversations', name='General')['id'] == 'C012AB3CD'
+    assert demisto.getIntegrationContext.call_count == 1
+
+    assert Slack.DIRECTORY.get('users', 'U0000000') == {}
+    assert Slack.DIRECTORY.get('users', name='alexios') == {}
+    assert demisto.getIntegrationContext.call_count == 3
+
+
+def test_directory_renamed_conversation(mocker):
+    """
+    Given:
+        - A conversation in the directory which was renamed.
+    When:
+        - Getting the conversation by its old and new names.
+    Then:
+        - Ensure it is found only by its new name.
+    """
+    import Slack
+
+    mocker.patch.object(demisto, 'getIntegrationContext', side_effect=get_integration_context)
+    mocker.patch.object(demisto, 'setIntegrationContext', side_effect=set_integration_context)
+    conversation = Slack.DIRECTORY.get('conversations', 'C012AB3CD')
+
+    Slack.DIRECTORY.add('conversations', [dict(conversation, name='renamed')])
+
+    assert Slack.DIRECTORY.get('conversations', name='renamed')['id'] == 'C012AB3CD'
+    assert Slack.DIRECTORY.get('conversations', name=conversation['name']) == {}
+
+
+@pytest.mark.asyncio
+async def test_get_user_by_id_async_write_behind(mocker):
+    """
+    Given:
+        - The directory of the long running execution, which saves the added users by flush.
+    When:
+        - Getting a user which is not in the directory, and flushing the directory.
+    Then:
+        - Ensure the integration context is updated only by the flush, with the new user merged into the users.
+    """
+    import Slack
+
+    new_user = {'id': 'U012B3CUI', 'name': 'perikles'}
+
+    async def api_call(method: str, http_verb: str = 'POST', file: str = None, params=None, json=None, data=None):
+        return {'user': new_user}
+
+    mocker.patch.object(demisto, 'getIntegrationContext', side_effect=get_integration_context)
+    mocker.patch.object(demisto, 'setIntegrationContext', side_effect=set_integration_context)
+    mocker.patch.object(slack.WebClient, 'api_call', side_effect=api_call)
+    Slack.DIRECTORY.write_behind = True
+
+    user = await Slack.get_user_by_id_async(slack.WebClient, 'U012B3CUI')
+    assert user == new_user
+    assert demisto.setIntegrationContext.call_count == 0
+
+    Slack.DIRECTORY.flush()
+    Slack.DIRECTORY.flush()
+
+    assert demisto.setIntegrationContext.call_count == 1
+    users = js.loads(get_integration_context()['users'])
+    assert [u['id'] for u in users] == [u['id'] for u in js.loads(USERS)] + ['U012B3CUI']
+
+
+@pytest.mark.asyncio
+async def test_refresh_directory(mocker):
+    """
+    Given:
+        - A workspace in which a user of the integration context changed and a user was added.
+    When:
+        - Refreshing the directory with the users of the workspace.
+    Then:
+        - Ensure both users are in the directory.
+        - Ensure only the changed user is saved to the integration context.
+    """
+    import Slack
+
+    changed_user = dict(js.loads(USERS)[0], real_name='Egon')
+    new_user = {'id': 'U248918AB', 'name': 'alexios'}
+
+    async def api_call(method: str, http_verb: str = 'POST', file: str = None, params=None, json=None, data=None):
+        if 'cursor' not in params:
+            return {'members': [changed_user], 'response_metadata': {'next_cursor': 'dGVhbTpDQ0M3UENUTks='}}
+        return {'members': [new_user], 'response_metadata': {'next_cursor': ''}}
+
+    mocker.patch.object(demisto, 'getIntegrationContext', side_effect=get_integration_context)
+    mocker.patch.object(demisto, 'setIntegrationContext', side_effect=set_integration_context)
+    mocker.patch.object(slack.WebClient, 'api_call', side_effect=api_call)
+    Slack.DIRECTORY.get('users', 'U012A3CDE')
+
+    await Slack.refresh_directory(slack.WebClient)
+
+    assert slack.WebClient.api_call.call_count == 2
+    assert Slack.DIRECTORY.get('users', name='egon') == changed_user
+    assert Slack.DIRECTORY.get('users', name='alexios') == new_user
+    assert demisto.setIntegrationContext.call_count == 1
+    assert js.loads(get_integration_context()['users'])[0] == changed_user
+    assert 'U248918AB' not in get_integration_context()['users']
+
+
 def test_mirror_investigation_new_mirror(mocker):
     from Slack import mirror_investigation
 
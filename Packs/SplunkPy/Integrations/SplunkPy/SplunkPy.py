@@ -11,8 +11,14 @@ import ssl
 from StringIO import StringIO
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 import io
 import re
+import zlib
+from collections import deque
+from itertools import islice
+from multiprocessing.pool import ThreadPool
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # Define utf8 as default encoding
@@ -28,35 +34,17 @@ REPLACE_WITH = '_'
 REPLACE_FLAG = params.get('replaceKeys', False)
 FETCH_TIME = demisto.params().get('fetch_time')
 PROXIES = handle_proxy()
+SEARCH_RESULTS_MAX_WORKERS = 4
+KV_STORE_BATCH_SAVE_SIZE = 1000  # the default max_documents_per_batch_save of the KV store
+HEC_BATCH_SIZE = 1000
+HEC_BATCH_MAX_BYTES = 1000000  # the default max_content_length of HEC in older Splunk versions
+HEC_MAX_RETRIES = 3
+HEC_BACKOFF_FACTOR = 0.5
+HEC_SESSION = None
 TIME_UNIT_TO_MINUTES = {'minute': 1, 'hour': 60, 'day': 24 * 60, 'week': 7 * 24 * 60, 'month': 30 * 24 * 60,
                         'year': 365 * 24 * 60}
 
 
-class ResponseReaderWrapper(io.RawIOBase):
-    """ This class was supplied as a solution for a bug in Splunk causing the search to run slowly.
-    """
-
-    def __init__(self, responseReader):
-        self.responseReader = responseReader
-
-    def readable(self):
-        return True
-
-    def close(self):
-        self.responseReader.close()
-
-    def read(self, n):
-        return self.responseReader.read(n)
-
-    def readinto(self, b):
-        sz = len(b)
-        data = self.responseReader.read(sz)
-        for idx, ch in enumerate(data):
-            b[idx] = ch
-
-        return len(data)
-
-
 def get_current_splunk_time(splunk_service):
     t = datetime.utcnow() - timedelta(days=3)
     time = t.strftime(SPLUNK_TIME_FORMAT)
@@ -341,38 +329,78 @@ def update_headers_from_field_names(search_result, chosen_fields):
     return headers
 
 
-def get_current_results_batch(search_job, batch_size, results_offset):
-    current_batch_kwargs = {
-        "count": batch_size,
-        "offset": results_offset
-    }
+def get_search_results_windows(num_of_results, results_limit, batch_size):
+    """Splits the results of a search job to (offset, count) windows of at most batch_size results each"""
+    total_results = min(num_of_results, results_limit)
+    batch_size = batch_size or total_results
+    windows = []
+    results_offset = 0
+    while results_offset < total_results:
+        count = int(min(batch_size, total_results - results_offset))
+        windows.append((results_offset, count))
+        results_offset += count
+    return windows
+
+
+def get_results_window(search_job, window):
+    """Gets a window of the results of a search job in JSON output mode, which is much cheaper to parse than the
+    default Atom/XML output mode"""
+    results_offset, count = window
+    # Reading the whole response closes it
+    return json.loads(search_job.results(output_mode='json', count=count, offset=results_offset).read())
+
+
+def parse_json_results(results_page, app):
+    parsed_results = []
+    for message in results_page.get('messages') or []:
+        text = message.get('text', '')
+        if "Error in" in text:
+            raise ValueError(text)
+        parsed_results.append(convert_to_str(text))
+
+    for item in results_page.get('results') or []:
+        if app:
+            item['app'] = app
+        # Normal events are returned as dicts
+        parsed_results.append(item)
+    return parsed_results
+
+
+def iter_search_results(search_job, windows, app, max_workers):
+    """Yields the parsed results of every window in order, while up to max_workers windows are retrieved
+    concurrently, so that no more than max_workers windows are held in memory at a time."""
+    pool = ThreadPool(max(1, min(max_workers, len(windows))))
+    try:
+        pending = deque()
+        windows_iter = iter(windows)
+        for window in islice(windows_iter, max_workers):
+            pending.append(pool.apply_async(get_results_window, (search_job, window)))
+        while pending:
+            results_page = pending.popleft().get()
+            for window in islice(windows_iter, 1):
+                pending.append(pool.apply_async(get_results_window, (search_job, window)))
+            yield parse_json_results(results_page, app)
+    finally:
+        pool.terminate()
+        pool.join()
 
-    results_batch = search_job.results(**current_batch_kwargs)
-    return results_batch
 
+def build_dbot_scores(parsed_search_results):
+    return [{'Indicator': item['host'], 'Type': 'hostname', 'Vendor': 'Splunk', 'Score': 0, 'isTypedIndicator': True}
+            for item in parsed_search_results if isinstance(item, dict) and demisto.get(item, 'host')]
 
-def parse_batch_of_results(current_batch_of_results, max_results_to_add, app):
-    parsed_batch_results = []
-    batch_dbot_scores = []
-    results_reader = results.ResultsReader(io.BufferedReader(ResponseReaderWrapper(current_batch_of_results)))
-    for item in results_reader:
-        if isinstance(item, results.Message):
-            if "Error in" in item.message:
-                raise ValueError(item.message)
-            parsed_batch_results.append(convert_to_str(item.message))
-
-        elif isinstance(item, dict):
-            if demisto.get(item, 'host'):
-                batch_dbot_scores.append({'Indicator': item['host'], 'Type': 'hostname',
-                                          'Vendor': 'Splunk', 'Score': 0, 'isTypedIndicator': True})
-            if app:
-                item['app'] = app
-            # Normal events are returned as dicts
-            parsed_batch_results.append(item)
-
-        if len(parsed_batch_results) >= max_results_to_add:
-            break
-    return parsed_batch_results, batch_dbot_scores
+
+def return_search_results_entry(args, parsed_search_results):
+    entry_context = create_entry_context(args, parsed_search_results, build_dbot_scores(parsed_search_results))
+    human_readable = build_search_human_readable(args, parsed_search_results)
+
+    demisto.results({
+        "Type": 1,
+        "Contents": parsed_search_results,
+        "ContentsFormat": "json",
+        "EntryContext": entry_context,
+        "HumanReadable": human_readable
+    })
 
 
 def splunk_search_command(service):
@@ -381,38 +409,37 @@ def splunk_search_command(service):
     query = build_search_query(args)
     search_kwargs = build_search_kwargs(args)
     search_job = service.jobs.create(query, **search_kwargs)  # type: ignore
-    num_of_results_from_query = search_job["resultCount"]
+    num_of_results_from_query = int(search_job["resultCount"])
 
     results_limit = float(demisto.args().get("event_limit", 100))
     if results_limit == 0.0:
         # In Splunk, a result limit of 0 means no limit.
         results_limit = float("inf")
     batch_size = int(demisto.args().get("batch_limit", 25000))
+    max_workers = int(demisto.args().get("max_concurrent_requests") or SEARCH_RESULTS_MAX_WORKERS)
+    # When set, the results are returned in entries of at most results_per_entry results as soon as they are
+    # retrieved, instead of being held in memory until the last window is retrieved
+    results_per_entry = int(demisto.args().get("results_per_entry") or 0)
+
+    windows = get_search_results_windows(num_of_results_from_query, results_limit, batch_size)
+    entry_results = []  # type: List[Any]
+    total_results = 0
+    returned_entries = 0
+    for parsed_batch_results in iter_search_results(search_job, windows, search_kwargs.get('app', ''), max_workers):
+        if total_results + len(parsed_batch_results) > results_limit:
+            # Messages are returned as results too
+            parsed_batch_results = parsed_batch_results[:int(results_limit - total_results)]
+        total_results += len(parsed_batch_results)
+        entry_results.extend(parsed_batch_results)
+        while results_per_entry and len(entry_results) >= results_per_entry:
+            return_search_results_entry(args, entry_results[:results_per_entry])
+            entry_results = entry_results[results_per_entry:]
+            returned_entries += 1
+        if total_results >= results_limit:
+            break
 
-    results_offset = 0
-    total_parsed_results = []  # type: List[Dict[str,Any]]
-    dbot_scores = []  # type: List[Dict[str,Any]]
-
-    while len(total_parsed_results) < int(num_of_results_from_query) and len(total_parsed_results) < results_limit:
-        current_batch_of_results = get_current_results_batch(search_job, batch_size, results_offset)
-        max_results_to_add = results_limit - len(total_parsed_results)
-        parsed_batch_results, batch_dbot_scores = parse_batch_of_results(current_batch_of_results, max_results_to_add,
-                                                                         search_kwargs.get('app', ''))
-        total_parsed_results.extend(parsed_batch_results)
-        dbot_scores.extend(batch_dbot_scores)
-
-        results_offset += batch_size
-
-    entry_context = create_entry_context(args, total_parsed_results, dbot_scores)
-    human_readable = build_search_human_readable(args, total_parsed_results)
-
-    demisto.results({
-        "Type": 1,
-        "Contents": total_parsed_results,
-        "ContentsFormat": "json",
-        "EntryContext": entry_context,
-        "HumanReadable": human_readable
-    })
+    if entry_results or not returned_entries:
+        return_search_results_entry(args, entry_results)
 
 
 def splunk_job_create_command(service):
@@ -554,11 +581,25 @@ def splunk_submit_event_command(service):
         demisto.results('Event was created in Splunk index: ' + r.name)
 
 
-def splunk_submit_event_hec(hec_token, baseurl, event, fields, host, index, source_type, source, time_):
+def get_hec_session():
+    """Returns the session the HEC events are sent with, its connections are kept alive between the batches of
+    events and a batch answered with 503 (the HEC queue is full) is sent again after a backoff"""
+    global HEC_SESSION
+    if HEC_SESSION is None:
+        retry = Retry(
+            total=HEC_MAX_RETRIES,
+            backoff_factor=HEC_BACKOFF_FACTOR,
+            status_forcelist=[503],
+            method_whitelist=frozenset(['POST']),
+            raise_on_status=False
+        )
+        HEC_SESSION = requests.Session()
+        HEC_SESSION.mount('http://', HTTPAdapter(max_retries=retry))
+        HEC_SESSION.mount('https://', HTTPAdapter(max_retries=retry))
+    return HEC_SESSION
 
-    if hec_token is None:
-        raise Exception('The HEC Token was not provided')
 
+def build_hec_event(event, fields, host, index, source_type, source, time_):
     parsed_fields = None
     if fields:
         try:
@@ -566,7 +607,7 @@ def splunk_submit_event_hec(hec_token, baseurl, event, fields, host, index, sour
         except Exception:
             parsed_fields = {'fields': fields}
 
-    args = assign_params(
+    return assign_params(
         event=event,
         host=host,
         fields=parsed_fields,
@@ -576,14 +617,76 @@ def splunk_submit_event_hec(hec_token, baseurl, event, fields, host, index, sour
         time=time_
     )
 
+
+def build_batch_hec_events(batch_event_data, defaults):
+    """Yields the HEC event of every item of batch_event_data. An item is either an HEC event, with the event key
+    and optionally any of the fields, host, index, sourcetype, source and time keys, or the event itself. The keys
+    missing from an item are taken from defaults"""
+    for item in batch_event_data:
+        hec_event = dict(defaults)
+        if isinstance(item, dict) and 'event' in item:
+            hec_event.update(item)
+        else:
+            hec_event['event'] = item
+        yield hec_event
+
+
+def iter_hec_payloads(hec_events, batch_size, max_bytes=HEC_BATCH_MAX_BYTES):
+    """Concatenates the HEC events to payloads of at most batch_size events and max_bytes bytes (unless a single
+    event is larger), as the HEC event endpoint accepts. Yields a (payload, number of events) tuple per payload"""
+    current_payload = []  # type: List[str]
+    current_bytes = 0
+    for hec_event in hec_events:
+        data = json.dumps(hec_event)
+        if current_payload and (len(current_payload) >= batch_size or current_bytes + len(data) > max_bytes):
+            yield ''.join(current_payload), len(current_payload)
+            current_payload = []
+            current_bytes = 0
+        current_payload.append(data)
+        current_bytes += len(data)
+    if current_payload:
+        yield ''.join(current_payload), len(current_payload)
+
+
+def gzip_compress(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def post_hec_payload(hec_token, baseurl, payload):
     headers = {
         'Authorization': 'Splunk {}'.format(hec_token),
-        'Content-Type': 'application/json'
+        'Content-Type': 'application/json',
+        'Content-Encoding': 'gzip'
     }
 
-    response = requests.post(baseurl + '/services/collector/event', data=json.dumps(args), headers=headers,
-                             verify=VERIFY_CERTIFICATE)
-    return response
+    return get_hec_session().post(baseurl + '/services/collector/event', data=gzip_compress(payload),
+                                  headers=headers, verify=VERIFY_CERTIFICATE)
+
+
+def splunk_submit_event_hec(hec_token, baseurl, event, fields, host, index, source_type, source, time_):
+
+    if hec_token is None:
+        raise Exception('The HEC Token was not provided')
+
+    args = build_hec_event(event, fields, host, index, source_type, source, time_)
+    return post_hec_payload(hec_token, baseurl, json.dumps(args))
+
+
+def splunk_submit_batch_event_hec(hec_token, baseurl, batch_event_data, defaults, batch_size):
+    """Sends the events in gzip compressed batches, returns the number of events that were sent and the response of
+    the last batch. Stops at the first batch that was not sent successfully"""
+    if hec_token is None:
+        raise Exception('The HEC Token was not provided')
+
+    sent_events = 0
+    response = None
+    for payload, events_count in iter_hec_payloads(build_batch_hec_events(batch_event_data, defaults), batch_size):
+        response = post_hec_payload(hec_token, baseurl, payload)
+        if 'Success' not in response.text:
+            break
+        sent_events += events_count
+    return sent_events, response
 
 
 def splunk_submit_event_hec_command():
@@ -600,6 +703,26 @@ def splunk_submit_event_hec_command():
     source_type = demisto.args().get('source_type')
     source = demisto.args().get('source')
     time_ = demisto.args().get('time')
+    batch_event_data = demisto.args().get('batch_event_data')
+
+    if batch_event_data:
+        if isinstance(batch_event_data, STRING_TYPES):
+            batch_event_data = json.loads(batch_event_data)
+        if not isinstance(batch_event_data, list):
+            batch_event_data = [batch_event_data]
+        defaults = build_hec_event(None, fields, host, index, source_type, source, time_)
+        batch_size = int(demisto.args().get('batch_size') or HEC_BATCH_SIZE)
+        sent_events, response_info = splunk_submit_batch_event_hec(hec_token, baseurl, batch_event_data, defaults,
+                                                                   batch_size)
+        if sent_events < len(batch_event_data):
+            return_error('Could not send events to Splunk, {} of {} events were sent. {}'.format(
+                sent_events, len(batch_event_data), response_info.text.encode('utf8')))
+        else:
+            demisto.results('{} events were sent successfully to Splunk.'.format(sent_events))
+        return
+
+    if not event:
+        raise ValueError('Either the event or the batch_event_data argument must be provided.')
 
     response_info = splunk_submit_event_hec(hec_token, baseurl, event, fields, host, index, source_type, source, time_)
 
@@ -735,13 +858,26 @@ def kv_store_collection_config(service):
 
 def kv_store_collection_add_entries(service):
     args = demisto.args()
-    kv_store_data = args.get('kv_store_data', '').encode('utf-8')
+    kv_store_data = args.get('kv_store_data', '')
     kv_store_collection_name = args['kv_store_collection_name']
     indicator_path = args.get('indicator_path')
-    service.kvstore[kv_store_collection_name].data.insert(kv_store_data)
+    if isinstance(kv_store_data, list):
+        documents = kv_store_data
+    else:
+        kv_store_data = kv_store_data.encode('utf-8')
+        documents = json.loads(kv_store_data)
+    store_data = service.kvstore[kv_store_collection_name].data
+    if isinstance(documents, list):
+        # A list of documents is saved in batches, with a request per batch instead of a request per document
+        batch_size = int(args.get('batch_size') or KV_STORE_BATCH_SAVE_SIZE)
+        for documents_batch in batch(documents, batch_size=batch_size):
+            store_data.batch_save(*documents_batch)
+    else:
+        store_data.insert(kv_store_data)
+        documents = [documents]
     timeline = None
     if indicator_path:
-        indicator = extract_indicator(indicator_path, [json.loads(kv_store_data)])
+        indicator = extract_indicator(indicator_path, documents)
         timeline = {
             'Value': indicator,
             'Message': 'Indicator added to {} store in Splunk'.format(kv_store_collection_name),
@@ -1,4 +1,6 @@
 from copy import deepcopy
+from StringIO import StringIO
+import json
 import pytest
 import SplunkPy as splunk
 import demistomock as demisto
@@ -468,3 +470,194 @@ EXPECTED_OUTPUT = {
 def test_create_mapping_dict():
     mapping_dict = splunk.create_mapping_dict(SPLUNK_RESULTS, type_field='source')
     assert mapping_dict == EXPECTED_OUTPUT
+
+
+@pytest.mark.parametrize('num_of_results, results_limit, batch_size, expected_windows', [
+    (0, 100, 25000, []),
+    (10, 100, 25000, [(0, 10)]),
+    (10, 4, 25000, [(0, 4)]),
+    (10, float('inf'), 4, [(0, 4), (4, 4), (8, 2)]),
+    (10, 7, 3, [(0, 3), (3, 3), (6, 1)]),
+    (10, 100, 0, [(0, 10)]),
+])
+def test_get_search_results_windows(num_of_results, results_limit, batch_size, expected_windows):
+    assert splunk.get_search_results_windows(num_of_results, results_limit, batch_size) == expected_windows
+
+
+class SearchJobMock:
+    """A finished search job, its results are returned in JSON output mode"""
+
+    def __init__(self, num_of_results, messages=None):
+        self.results_list = [{'_raw': 'event {}'.format(i), 'host': 'host{}'.format(i)} for i in range(num_of_results)]
+        self.messages = messages or []
+        self.windows = []
+
+    def __getitem__(self, key):
+        assert key == 'resultCount'
+        return str(len(self.results_list))
+
+    def results(self, output_mode, count, offset):
+        assert output_mode == 'json'
+        self.windows.append((offset, count))
+        return StringIO(json.dumps({'messages': self.messages, 'results': self.results_list[offset:offset + count]}))
+
+
+@pytest.mark.parametrize('args, expected_entries_sizes', [
+    ({'event_limit': '0', 'batch_limit': '3'}, [10]),
+    ({'event_limit': '8', 'batch_limit': '3', 'max_concurrent_requests': '2'}, [8]),
+    ({'event_limit': '0', 'batch_limit': '3', 'results_per_entry': '4'}, [4, 4, 2]),
+    ({'event_limit': '0', 'batch_limit': '2', 'results_per_entry': '5'}, [5, 5]),
+])
+def test_splunk_search_command(mocker, args, expected_entries_sizes):
+    """
+    Given:
+        - A search job with 10 results, searched with several limits, batch sizes and entry sizes
+    When:
+        - running the splunk-search command
+    Then:
+        - The results are retrieved in windows of batch_limit results and returned in order, in entries of at most
+        results_per_entry results, with a DBot score per host
+    """
+    search_job = SearchJobMock(10)
+    service = mocker.Mock()
+    service.jobs.create.return_value = search_job
+    args['query'] = 'index=main'
+    mocker.patch.object(demisto, 'args', return_value=args)
+    mocker.patch.object(demisto, 'results')
+
+    splunk.splunk_search_command(service)
+
+    entries = [call[0][0] for call in demisto.results.call_args_list]
+    assert [len(entry['Contents']) for entry in entries] == expected_entries_sizes
+    returned_results = [result for entry in entries for result in entry['Contents']]
+    assert returned_results == search_job.results_list[:len(returned_results)]
+    for entry in entries:
+        assert entry['EntryContext']['Splunk.Result'] == entry['Contents']
+        assert [score['Indicator'] for score in entry['EntryContext']['DBotScore']] == \
+            [result['host'] for result in entry['Contents']]
+    batch_size = int(args['batch_limit'])
+    assert sorted(search_job.windows) == [(offset, min(batch_size, len(returned_results) - offset))
+                                          for offset in range(0, len(returned_results), batch_size)]
+
+
+def test_splunk_search_command_error_message(mocker):
+    """
+    Given:
+        - A search job whose results contain an error message
+    When:
+        - running the splunk-search command
+    Then:
+        - The error message is raised
+    """
+    service = mocker.Mock()
+    service.jobs.create.return_value = SearchJobMock(3, [{'type': 'FATAL', 'text': 'Error in \'search\' command'}])
+    mocker.patch.object(demisto, 'args', return_value={'query': 'index=main'})
+    mocker.patch.object(demisto, 'results')
+
+    with pytest.raises(ValueError, match='Error in'):
+        splunk.splunk_search_command(service)
+
+
+@pytest.mark.parametrize('batch_size, max_bytes, expected_batches', [
+    (1000, 1000000, [5]),
+    (2, 1000000, [2, 2, 1]),
+    (1000, 50, [2, 2, 1]),
+    (1000, 10, [1, 1, 1, 1, 1]),
+])
+def test_iter_hec_payloads(batch_size, max_bytes, expected_batches):
+    hec_events = [{'event': 'event {}'.format(i)} for i in range(5)]
+
+    payloads = list(splunk.iter_hec_payloads(iter(hec_events), batch_size, max_bytes))
+
+    assert [events_count for _, events_count in payloads] == expected_batches
+    assert ''.join(payload for payload, _ in payloads) == ''.join(json.dumps(hec_event) for hec_event in hec_events)
+
+
+def test_splunk_submit_event_hec_command_batch(mocker, requests_mock):
+    """
+    Given:
+        - 5 events to send to HEC in batches of 2, two of them with their own host
+    When:
+        - running the splunk-submit-event-hec command
+    Then:
+        - The events are sent in 3 gzip compressed requests of concatenated events, the host argument is used for the
+        events without a host
+    """
+    import zlib
+    mocker.patch.object(demisto, 'params', return_value={'hec_token': 'token', 'hec_url': 'https://splunk:8088'})
+    batch_event_data = [{'event': 'event 0', 'host': 'host0'}, 'event 1', {'event': 'event 2', 'host': 'host2'},
+                        'event 3', 'event 4']
+    mocker.patch.object(demisto, 'args', return_value={'batch_event_data': json.dumps(batch_event_data),
+                                                       'batch_size': '2', 'host': 'default', 'index': 'main'})
+    mocker.patch.object(demisto, 'results')
+    requests_mock.post('https://splunk:8088/services/collector/event', json={'text': 'Success', 'code': 0})
+
+    splunk.splunk_submit_event_hec_command()
+
+    assert demisto.results.call_args[0][0] == '5 events were sent successfully to Splunk.'
+    payloads = []
+    for request in requests_mock.request_history:
+        assert request.headers['Content-Encoding'] == 'gzip'
+        assert request.headers['Authorization'] == 'Splunk token'
+        payloads.append(zlib.decompress(request.body, 16 + zlib.MAX_WBITS))
+    assert len(payloads) == 3
+    sent_events = json.loads('[{}]'.format(''.join(payloads).replace('}{', '},{')))
+    assert [(event['event'], event['host'], event['index']) for event in sent_events] == [
+        ('event 0', 'host0', 'main'), ('event 1', 'default', 'main'), ('event 2', 'host2', 'main'),
+        ('event 3', 'default', 'main'), ('event 4', 'default', 'main')]
+
+
+def test_splunk_submit_event_hec_command_batch_failure(mocker, requests_mock):
+    """
+    Given:
+        - 3 events to send to HEC in batches of 2, the second batch fails
+    When:
+        - running the splunk-submit-event-hec command
+    Then:
+        - An error with the number of events that were sent is returned
+    """
+    mocker.patch.object(demisto, 'params', return_value={'hec_token': 'token', 'hec_url': 'https://splunk:8088'})
+    mocker.patch.object(demisto, 'args', return_value={'batch_event_data': '["a", "b", "c"]', 'batch_size': '2'})
+    return_error = mocker.patch.object(splunk, 'return_error')
+    requests_mock.post('https://splunk:8088/services/collector/event', [
+        {'json': {'text': 'Success', 'code': 0}}, {'json': {'text': 'Server is busy', 'code': 9}, 'status_code': 503}])
+
+    splunk.splunk_submit_event_hec_command()
+
+    assert return_error.call_args[0][0].startswith('Could not send events to Splunk, 2 of 3 events were sent.')
+
+
+def test_hec_session_retries_busy_server():
+    retry = splunk.get_hec_session().get_adapter('https://splunk:8088').max_retries
+    assert retry.total == splunk.HEC_MAX_RETRIES
+    assert retry.is_retry('POST', 503)
+    assert not retry.is_retry('POST', 400)
+
+
+@pytest.mark.parametrize('kv_store_data, expected_batch_saves, expected_inserts', [
+    ('{"addr": "1.1.1.1"}', [], ['{"addr": "1.1.1.1"}']),
+    (json.dumps([{'addr': '1.1.1.{}'.format(i)} for i in range(5)]), [2, 2, 1], []),
+    ([{'addr': '1.1.1.{}'.format(i)} for i in range(3)], [2, 1], []),
+])
+def test_kv_store_collection_add_entries(mocker, kv_store_data, expected_batch_saves, expected_inserts):
+    """
+    Given:
+        - A document, a JSON list of documents, or a list of documents to add to a KV store in batches of 2
+    When:
+        - running the splunk-kv-store-collection-add-entries command
+    Then:
+        - A document is inserted, a list of documents is saved in batches with batch_save
+    """
+    service = mocker.MagicMock()
+    store_data = service.kvstore.__getitem__.return_value.data
+    mocker.patch.object(demisto, 'args', return_value={'kv_store_data': kv_store_data, 'batch_size': '2',
+                                                       'kv_store_collection_name': 'store', 'indicator_path': 'addr'})
+    return_outputs = mocker.patch.object(splunk, 'return_outputs')
+
+    splunk.kv_store_collection_add_entries(service)
+
+    assert [len(call[0]) for call in store_data.batch_save.call_args_list] == expected_batch_saves
+    assert [call[0][0] for call in store_data.insert.call_args_list] == expected_inserts
+    saved_documents = [document for call in store_data.batch_save.call_args_list for document in call[0]]
+    expected_indicators = [document['addr'] for document in saved_documents] or ['1.1.1.1']
+    assert return_outputs.call_args[1]['timeline']['Value'] == expected_indicators
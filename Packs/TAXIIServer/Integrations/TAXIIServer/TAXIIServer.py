@@ -5,7 +5,8 @@ from gevent.pywsgi import WSGIServer
 from urllib.parse import urlparse, ParseResult
 from tempfile import NamedTemporaryFile
 from base64 import b64decode
-from typing import Callable, List, Generator
+from typing import Callable, List, Generator, Iterator, Optional, Union
+from collections import OrderedDict
 from ssl import SSLContext, SSLError, PROTOCOL_TLSv1_2
 from multiprocessing import Process
 
@@ -17,6 +18,7 @@ from libtaxii.messages_11 import (
     CollectionInformation,
     CollectionInformationResponse,
     PollRequest,
+    PollFulfillmentRequest,
     PollingServiceInstance,
     ServiceInstance,
     ContentBlock,
@@ -26,6 +28,7 @@ from libtaxii.constants import (
     MSG_COLLECTION_INFORMATION_REQUEST,
     MSG_DISCOVERY_REQUEST,
     MSG_POLL_REQUEST,
+    MSG_POLL_FULFILLMENT_REQUEST,
     SVC_DISCOVERY,
     SVC_COLLECTION_MANAGEMENT,
     SVC_POLL,
@@ -55,9 +58,12 @@ import pytz
 ''' GLOBAL VARIABLES '''
 INTEGRATION_NAME: str = 'TAXII Server'
 PAGE_SIZE = 200
+STIX_CACHE_SIZE = 10000
+POLL_RESULTS_CACHE_SIZE = 100
 APP: Flask = Flask('demisto-taxii')
 NAMESPACE_URI = 'https://www.paloaltonetworks.com/cortex'
 NAMESPACE = 'cortex'
+STIX_CACHE: OrderedDict = OrderedDict()
 
 
 ''' Log Handler '''
@@ -80,7 +86,7 @@ class Handler:
 
 class TAXIIServer:
     def __init__(self, host: str, port: int, collections: dict, certificate: str, private_key: str,
-                 http_server: bool, credentials: dict):
+                 http_server: bool, credentials: dict, result_part_size: int = 0):
         """
         Class for a TAXII Server configuration.
         Args:
@@ -91,6 +97,7 @@ class TAXIIServer:
             private_key: The private key for SSL.
             http_server: Whether to use HTTP server (not SSL).
             credentials: The user credentials.
+            result_part_size: The maximum number of indicators in a poll response part, 0 to return all of them.
         """
         self.host = host
         self.port = port
@@ -98,6 +105,8 @@ class TAXIIServer:
         self.certificate = certificate
         self.private_key = private_key
         self.http_server = http_server
+        self.result_part_size = result_part_size
+        self.poll_results: OrderedDict = OrderedDict()
         self.auth = None
         if credentials:
             self.auth = (credentials.get('identifier', ''), credentials.get('password', ''))
@@ -189,28 +198,64 @@ class TAXIIServer:
 
         return collection_info_response
 
-    def get_poll_response(self, taxii_message: PollRequest) -> Response:
+    def get_poll_response(self, taxii_message: Union[PollRequest, PollFulfillmentRequest]) -> Response:
         """
-        Handle poll request.
+        Handle poll request and poll fulfillment request.
         Args:
-            taxii_message: The poll request message.
+            taxii_message: The poll request or poll fulfillment request message.
 
         Returns:
             The poll response.
         """
+        taxii_feeds = list(self.collections.keys())
+        collection_name = taxii_message.collection_name
+
+        if taxii_message.message_type == MSG_POLL_FULFILLMENT_REQUEST:
+            poll_result = self.poll_results.get(taxii_message.result_id)
+            if not poll_result or poll_result['collection_name'] != collection_name:
+                raise ValueError('Invalid message, unknown result ID')
+
+            return self.stream_stix_data_feed(taxii_feeds, taxii_message.message_id, collection_name,
+                                              poll_result['exclusive_begin_time'], poll_result['inclusive_end_time'],
+                                              result_id=taxii_message.result_id,
+                                              result_part_number=int(taxii_message.result_part_number))
+
         if taxii_message.message_type != MSG_POLL_REQUEST:
             raise ValueError('Invalid message, invalid Message Type')
 
-        taxii_feeds = list(self.collections.keys())
-        collection_name = taxii_message.collection_name
         exclusive_begin_time = taxii_message.exclusive_begin_timestamp_label
         inclusive_end_time = taxii_message.inclusive_end_timestamp_label
 
         return self.stream_stix_data_feed(taxii_feeds, taxii_message.message_id, collection_name,
                                           exclusive_begin_time, inclusive_end_time)
 
+    def save_poll_result(self, collection_name: str, exclusive_begin_time: datetime,
+                         inclusive_end_time: datetime) -> str:
+        """
+        Save the time frame of a multi-part poll result, so its next parts are queried by the same time frame.
+        Only the latest poll results are kept.
+        Args:
+            collection_name: The collection name of the poll result.
+            exclusive_begin_time: The query exclusive begin time.
+            inclusive_end_time: The query inclusive end time.
+
+        Returns:
+            The result ID to request the next parts by.
+        """
+        result_id = generate_message_id()
+        self.poll_results[result_id] = {
+            'collection_name': collection_name,
+            'exclusive_begin_time': exclusive_begin_time,
+            'inclusive_end_time': inclusive_end_time
+        }
+        while len(self.poll_results) > POLL_RESULTS_CACHE_SIZE:
+            self.poll_results.popitem(last=False)
+
+        return result_id
+
     def stream_stix_data_feed(self, taxii_feeds: list, message_id: str, collection_name: str,
-                              exclusive_begin_time: datetime, inclusive_end_time: datetime) -> Response:
+                              exclusive_begin_time: datetime, inclusive_end_time: datetime,
+                              result_id: Optional[str] = None, result_part_number: int = 1) -> Response:
         """
         Get the indicator query results in STIX data feed format.
         Args:
@@ -219,6 +264,8 @@ class TAXIIServer:
             collection_name: The collection name to get the indicator query from.
             exclusive_begin_time: The query exclusive begin time.
             inclusive_end_time: The query inclusive end time.
+            result_id: The ID of the multi-part poll result, None for the first part.
+            result_part_number: The requested part of the poll result.
 
         Returns:
             Stream of STIX indicator data feed.
@@ -226,6 +273,9 @@ class TAXIIServer:
         if collection_name not in taxii_feeds:
             raise ValueError('Invalid message, unknown feed')
 
+        if result_part_number < 1:
+            raise ValueError('Invalid message, invalid result part number')
+
         if not inclusive_end_time:
             inclusive_end_time = datetime.utcnow().replace(tzinfo=pytz.utc)
 
@@ -235,13 +285,30 @@ class TAXIIServer:
             Streams the STIX indicators as XML string.
 
             """
+            indicator_query = self.collections[str(collection_name)]
+            poll_result_id = result_id
+            offset = 0
+            limit = None
+            more = False
+            if self.result_part_size:
+                # the response starts with the "more" attribute, so check if an indicator follows this part first
+                offset = (result_part_number - 1) * self.result_part_size
+                limit = self.result_part_size
+                next_indicators = find_indicators_by_time_frame(indicator_query, exclusive_begin_time,
+                                                                inclusive_end_time, offset + limit, 1)
+                more = next(next_indicators, None) is not None
+                if more and not poll_result_id:
+                    poll_result_id = self.save_poll_result(collection_name, exclusive_begin_time, inclusive_end_time)
+
+            result_id_attribute = f' result_id="{poll_result_id}"' if poll_result_id else ''
             # yield the opening tag of the Poll Response
             response = '<taxii_11:Poll_Response xmlns:taxii="http://taxii.mitre.org/messages/taxii_xml_binding-1"' \
                        ' xmlns:taxii_11="http://taxii.mitre.org/messages/taxii_xml_binding-1.1" ' \
                        'xmlns:tdq="http://taxii.mitre.org/query/taxii_default_query-1"' \
                        f' message_id="{generate_message_id()}"' \
                        f' in_response_to="{message_id}"' \
-                       f' collection_name="{collection_name}" more="false" result_part_number="1"> ' \
+                       f' collection_name="{collection_name}" more="{str(more).lower()}"{result_id_attribute}' \
+                       f' result_part_number="{result_part_number}"> ' \
                        f'<taxii_11:Inclusive_End_Timestamp>{inclusive_end_time.isoformat()}' \
                        '</taxii_11:Inclusive_End_Timestamp>'
 
@@ -252,18 +319,10 @@ class TAXIIServer:
             yield response
 
             # yield the content blocks
-            indicator_query = self.collections[str(collection_name)]
-
-            for indicator in find_indicators_by_time_frame(indicator_query, exclusive_begin_time, inclusive_end_time):
+            for indicator in find_indicators_by_time_frame(indicator_query, exclusive_begin_time, inclusive_end_time,
+                                                           offset, limit):
                 try:
-                    stix_xml_indicator = get_stix_indicator(indicator).to_xml(ns_dict={NAMESPACE_URI: NAMESPACE})
-                    content_block = ContentBlock(
-                        content_binding=CB_STIX_XML_11,
-                        content=stix_xml_indicator
-                    )
-
-                    content_xml = content_block.to_xml().decode('utf-8')
-                    yield f'{content_xml}\n'
+                    yield get_stix_content_block(indicator)
                 except Exception as e:
                     handle_long_running_error(f'Failed parsing indicator to STIX: {e}')
 
@@ -592,6 +651,37 @@ def get_stix_indicator(indicator: dict) -> stix.core.STIXPackage:
     return stix_package
 
 
+def get_stix_content_block(indicator: dict) -> str:
+    """
+    Get the TAXII content block of a Demisto indicator in STIX format.
+    The content blocks are cached by the indicator modification time, so unchanged indicators are not rendered again.
+    Args:
+        indicator: The Demisto indicator.
+
+    Returns:
+        The content block as XML string.
+    """
+    modified = indicator.get('modified')
+    cache_key = (indicator.get('indicator_type'), indicator.get('value'), modified)
+    if modified and cache_key in STIX_CACHE:
+        STIX_CACHE.move_to_end(cache_key)
+        return STIX_CACHE[cache_key]
+
+    stix_xml_indicator = get_stix_indicator(indicator).to_xml(ns_dict={NAMESPACE_URI: NAMESPACE})
+    content_block = ContentBlock(
+        content_binding=CB_STIX_XML_11,
+        content=stix_xml_indicator
+    )
+    content_xml = f'{content_block.to_xml().decode("utf-8")}\n'
+
+    if modified:
+        STIX_CACHE[cache_key] = content_xml
+        while len(STIX_CACHE) > STIX_CACHE_SIZE:
+            STIX_CACHE.popitem(last=False)
+
+    return content_xml
+
+
 ''' HELPER FUNCTIONS '''
 
 
@@ -719,13 +809,16 @@ def get_collections(params: dict = demisto.params()) -> dict:
     return collections
 
 
-def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, end_time: datetime) -> list:
+def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, end_time: datetime, offset: int = 0,
+                                  limit: Optional[int] = None) -> Iterator[dict]:
     """
     Find indicators according to a query and begin time/end time.
     Args:
         indicator_query: The indicator query.
         begin_time: The exclusive begin time.
         end_time: The inclusive end time.
+        offset: The number of indicators to skip.
+        limit: The maximum number of indicators to return, None to return all of them.
 
     Returns:
         Indicator query results from Demisto.
@@ -746,29 +839,35 @@ def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, en
         indicator_query += f'sourcetimestamp:<="{tz_end_time}"'
     demisto.info(f'Querying indicators by: {indicator_query}')
 
-    return find_indicators_loop(indicator_query)
+    return find_indicators_loop(indicator_query, offset, limit)
 
 
-def find_indicators_loop(indicator_query: str):
+def find_indicators_loop(indicator_query: str, offset: int = 0, limit: Optional[int] = None) -> Iterator[dict]:
     """
-    Find indicators in a loop according to a query.
+    Find indicators in a loop according to a query. The indicators are searched page by page while they are consumed.
     Args:
         indicator_query: The indicator query.
+        offset: The number of indicators to skip.
+        limit: The maximum number of indicators to return, None to return all of them.
 
     Returns:
         Indicator query results from Demisto.
     """
-    iocs: List[dict] = []
+    next_page, skip = divmod(offset, PAGE_SIZE)
     total_fetched = 0
-    next_page = 0
     last_found_len = PAGE_SIZE
     while last_found_len == PAGE_SIZE:
-        fetched_iocs = demisto.searchIndicators(query=indicator_query, page=next_page, size=PAGE_SIZE).get('iocs')
-        iocs.extend(fetched_iocs)
+        fetched_iocs = demisto.searchIndicators(query=indicator_query, page=next_page, size=PAGE_SIZE).get('iocs') or []
+        for ioc in fetched_iocs[skip:]:
+            if limit is not None and total_fetched >= limit:
+                return
+            total_fetched += 1
+            yield ioc
+        if limit is not None and total_fetched >= limit:
+            return
         last_found_len = len(fetched_iocs)
-        total_fetched += last_found_len
+        skip = 0
         next_page += 1
-    return iocs
 
 
 def taxii_make_response(taxii_message: TAXIIMessage):
@@ -843,12 +942,13 @@ def taxii_poll_service() -> Response:
             taxii_message = get_message_from_xml(request.data)
         else:
             raise ValueError('Invalid message')
+        poll_response = SERVER.get_poll_response(taxii_message)
     except Exception as e:
         error = f'Could not perform the polling request: {str(e)}'
         handle_long_running_error(error)
         return make_response(error, 400)
 
-    return SERVER.get_poll_response(taxii_message)
+    return poll_response
 
 
 ''' COMMAND FUNCTIONS '''
@@ -922,6 +1022,10 @@ def main():
     certificate: str = params.get('certificate', '')
     private_key: str = params.get('key', '')
     credentials: dict = params.get('credentials', None)
+    try:
+        result_part_size = int(params.get('result_part_size') or 0)
+    except ValueError:
+        raise ValueError('The poll result part size must be a number.')
     http_server = True
     if (certificate and not private_key) or (private_key and not certificate):
         raise ValueError('When using HTTPS connection, both certificate and private key must be provided.')
@@ -936,7 +1040,7 @@ def main():
         host_name = get_https_hostname(host_name)
 
     SERVER = TAXIIServer(f'{scheme}://{host_name}', port, collections,
-                         certificate, private_key, http_server, credentials)
+                         certificate, private_key, http_server, credentials, result_part_size)
 
     demisto.debug(f'Command being called is {command}')
     commands = {
@@ -386,8 +386,8 @@ def test_find_indicators_by_time_frame(mocker):
     import pytz
     from TAXIIServer import find_indicators_by_time_frame
 
-    def find_indicators(indicator_query):
-        if indicator_query == INDICATOR_QUERY:
+    def find_indicators(indicator_query, offset, limit):
+        if indicator_query == INDICATOR_QUERY and offset == 0 and limit is None:
             return 'yep'
         return 'nope'
 
@@ -412,13 +412,153 @@ def test_find_indicators_loop(mocker):
     mocker.patch.object(demisto, 'searchIndicators', return_value=json.loads(IP_INDICATORS))
 
     # Arrange
-    indicators = find_indicators_loop('q')
+    indicators = list(find_indicators_loop('q'))
 
     # Assert
     assert len(indicators) == 1
     assert indicators[0]['value'] == '52.218.100.20'
 
 
+@pytest.mark.parametrize('offset, limit, expected_values, expected_pages', [
+    (0, None, list(range(450)), [0, 1, 2]),
+    (250, 100, list(range(250, 350)), [1]),
+    (180, 30, list(range(180, 210)), [0, 1]),
+    (400, 200, list(range(400, 450)), [2]),
+])
+def test_find_indicators_loop_pages(mocker, offset, limit, expected_values, expected_pages):
+    """
+    Given
+    - A query matching 450 indicators, returned in pages of 200 indicators
+
+    When
+    - Finding the indicators from an offset, with and without a limit
+
+    Then
+    - The indicators are returned from the offset up to the limit
+    - Only the pages holding the returned indicators are searched
+    """
+    from TAXIIServer import find_indicators_loop, PAGE_SIZE
+
+    def search_indicators(query, page, size):
+        return {'iocs': [{'value': i} for i in range(page * size, min((page + 1) * size, 450))], 'total': 450}
+
+    search_mock = mocker.patch.object(demisto, 'searchIndicators', side_effect=search_indicators)
+
+    assert [indicator['value'] for indicator in find_indicators_loop('q', offset, limit)] == expected_values
+    assert [call[1]['page'] for call in search_mock.call_args_list] == expected_pages
+    assert all(call[1]['size'] == PAGE_SIZE for call in search_mock.call_args_list)
+
+
+def test_find_indicators_loop_is_lazy(mocker):
+    """
+    Given
+    - A query matching more than one page of indicators
+
+    When
+    - Consuming the first indicator
+
+    Then
+    - Only the first page is searched
+    """
+    from TAXIIServer import find_indicators_loop, PAGE_SIZE
+
+    search_mock = mocker.patch.object(demisto, 'searchIndicators',
+                                      return_value={'iocs': [{'value': i} for i in range(PAGE_SIZE)]})
+
+    indicators = find_indicators_loop('q')
+
+    assert search_mock.call_count == 0
+    assert next(indicators) == {'value': 0}
+    assert search_mock.call_count == 1
+
+
+def get_poll_response_data(taxii_server, taxii_message):
+    from TAXIIServer import APP
+
+    with APP.test_request_context():
+        return taxii_server.get_poll_response(taxii_message).get_data(as_text=True)
+
+
+def test_multi_part_poll_response(mocker):
+    """
+    Given
+    - A collection of 5 indicators and a result part size of 2
+
+    When
+    - Polling the collection and requesting the next parts by poll fulfillment requests
+
+    Then
+    - Every part holds the next 2 indicators, with more="true" and a result ID until the last part
+    - An unknown result ID is rejected
+    """
+    from TAXIIServer import TAXIIServer
+    from libtaxii.messages_11 import PollRequest, PollFulfillmentRequest
+
+    def search_indicators(query, page, size):
+        return {'iocs': [{'value': f'1.1.1.{i}'} for i in range(page * size, min((page + 1) * size, 5))]}
+
+    mocker.patch.object(demisto, 'searchIndicators', side_effect=search_indicators)
+    mocker.patch.object(demisto, 'info')
+    mocker.patch('TAXIIServer.get_stix_content_block', side_effect=lambda indicator: f'<{indicator["value"]}/>')
+    taxii_server = TAXIIServer('http://localhost', 9000, {'Collection': 'type:IP'}, '', '', True, {},
+                               result_part_size=2)
+
+    poll_request = PollRequest('1', collection_name='Collection',
+                               poll_parameters=PollRequest.PollParameters())
+    data = get_poll_response_data(taxii_server, poll_request)
+    assert 'more="true"' in data
+    assert 'result_part_number="1"' in data
+    assert '<1.1.1.0/><1.1.1.1/></taxii_11:Poll_Response>' in data
+    result_id = list(taxii_server.poll_results)[0]
+    assert f'result_id="{result_id}"' in data
+
+    fulfillment_request = PollFulfillmentRequest('2', collection_name='Collection', result_id=result_id,
+                                                 result_part_number=2)
+    data = get_poll_response_data(taxii_server, fulfillment_request)
+    assert 'more="true"' in data
+    assert 'result_part_number="2"' in data
+    assert '<1.1.1.2/><1.1.1.3/></taxii_11:Poll_Response>' in data
+
+    fulfillment_request = PollFulfillmentRequest('3', collection_name='Collection', result_id=result_id,
+                                                 result_part_number=3)
+    data = get_poll_response_data(taxii_server, fulfillment_request)
+    assert 'more="false"' in data
+    assert 'result_part_number="3"' in data
+    assert '<1.1.1.4/></taxii_11:Poll_Response>' in data
+
+    with pytest.raises(ValueError, match='unknown result ID'):
+        taxii_server.get_poll_response(PollFulfillmentRequest('4', collection_name='Collection', result_id='nope',
+                                                              result_part_number=2))
+
+
+def test_get_stix_content_block_cache(mocker):
+    """
+    Given
+    - An indicator rendered to STIX before
+
+    When
+    - Getting the content block of the indicator again, unchanged and after it was modified
+
+    Then
+    - The unchanged indicator is returned from the cache and the modified indicator is rendered again
+    """
+    import TAXIIServer
+
+    mocker.patch.object(TAXIIServer, 'STIX_CACHE', OrderedDict())
+    mocker.patch.object(TAXIIServer, 'STIX_CACHE_SIZE', 1)
+    render_spy = mocker.spy(TAXIIServer, 'get_stix_indicator')
+    indicator = json.loads(IP_INDICATORS)['iocs'][0]
+
+    content_block = TAXIIServer.get_stix_content_block(indicator)
+    assert TAXIIServer.get_stix_content_block(indicator) == content_block
+    assert render_spy.call_count == 1
+
+    modified_indicator = dict(indicator, modified='2020-02-14T18:45:38.997926+02:00')
+    assert TAXIIServer.get_stix_content_block(modified_indicator) != content_block
+    assert render_spy.call_count == 2
+    assert len(TAXIIServer.STIX_CACHE) == 1
+
+
 @pytest.mark.parametrize('indicator',
                          [json.loads(IP_INDICATORS)['iocs'][0], json.loads(URL_INDICATORS)['iocs'][0],
                           json.loads(EMAIL_INDICATORS)['iocs'][0], json.loads(CIDR_INDICATORS)['iocs'][0],
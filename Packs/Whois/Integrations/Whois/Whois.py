@@ -7,8 +7,17 @@ import sys
 from codecs import encode, decode
 import socks
 import errno
+import threading
+import time
+from multiprocessing.pool import ThreadPool
 
 SHOULD_ERROR = demisto.params().get('with_error', False)
+# Number of domains looked up at the same time by the domain command
+MAX_WORKERS = 10
+# Number of connections opened at the same time to a single WHOIS server, so the registries do not rate limit us
+MAX_CONNECTIONS_PER_SERVER = 2
+# Maximal number of raw results kept in the integration context
+WHOIS_CACHE_MAX_SIZE = 500
 
 # flake8: noqa
 
@@ -19,6952 +28,1625 @@ SHOULD_ERROR = demisto.params().get('with_error', False)
 
 ''' HELPER FUNCTIONS '''
 # About the drop some mean regex right now disable-secrets-detection-start
-tlds = {
-    "_": {
-        "schema": "2",
-        "updated": "2018-10-05 11:43:46 UTC"
-    },
-    "aaa": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "aarp": {
-        "_type": "newgtld",
-        "host": "whois.nic.aarp"
-    },
-    "abarth": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "abb": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "abbott": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "abbvie": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "abc": {
-        "_type": "newgtld",
-        "host": "whois.nic.abc"
-    },
-    "able": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "abogado": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.abogado"
-    },
-    "abudhabi": {
-        "_type": "newgtld",
-        "host": "whois.nic.abudhabi"
-    },
-    "ac": {
-        "host": "whois.nic.ac"
-    },
-    "academy": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.academy"
-    },
-    "accenture": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "accountant": {
-        "_type": "newgtld",
-        "host": "whois.nic.accountant"
-    },
-    "accountants": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.accountants"
-    },
-    "aco": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "active": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "actor": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.actor"
-    },
-    "ad": {
-        "adapter": "none"
-    },
-    "adac": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ads": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "adult": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "ae": {
-        "host": "whois.aeda.net.ae"
-    },
-    "aeg": {
-        "_type": "newgtld",
-        "host": "whois.nic.aeg"
-    },
-    "aero": {
-        "host": "whois.aero"
-    },
-    "aetna": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "af": {
-        "host": "whois.nic.af"
-    },
-    "afamilycompany": {
-        "_type": "newgtld",
-        "host": "whois.nic.afamilycompany"
-    },
-    "afl": {
-        "_type": "newgtld",
-        "host": "whois.nic.afl"
-    },
-    "africa": {
-        "_group": "zaregistry",
-        "_type": "newgtld",
-        "host": "africa-whois.registry.net.za"
-    },
-    "ag": {
-        "host": "whois.nic.ag"
-    },
-    "agakhan": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "agency": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.agency"
-    },
-    "ai": {
-        "host": "whois.nic.ai"
-    },
-    "aig": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "aigo": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "airbus": {
-        "_type": "newgtld",
-        "host": "whois.nic.airbus"
-    },
-    "airforce": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.airforce"
-    },
-    "airtel": {
-        "_type": "newgtld",
-        "host": "whois.nic.airtel"
-    },
-    "akdn": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "al": {
-        "adapter": "none"
-    },
-    "alfaromeo": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "alibaba": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.alibaba"
-    },
-    "alipay": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.alipay"
-    },
-    "allfinanz": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "allstate": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "ally": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.ally"
-    },
-    "alsace": {
-        "_group": "nicfr",
-        "_type": "newgtld",
-        "host": "whois-alsace.nic.fr"
-    },
-    "alstom": {
-        "_type": "newgtld",
-        "host": "whois.nic.alstom"
-    },
-    "am": {
-        "host": "whois.amnic.net"
-    },
-    "americanexpress": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "americanfamily": {
-        "_type": "newgtld",
-        "host": "whois.nic.americanfamily"
-    },
-    "amex": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "amfam": {
-        "_type": "newgtld",
-        "host": "whois.nic.amfam"
-    },
-    "amica": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "amsterdam": {
-        "_type": "newgtld",
-        "host": "whois.nic.amsterdam"
-    },
-    "analytics": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "android": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "anquan": {
-        "_group": "teleinfo",
-        "_type": "newgtld",
-        "host": "whois.teleinfo.cn"
-    },
-    "anz": {
-        "_type": "newgtld",
-        "host": "whois.nic.anz"
-    },
-    "ao": {
-        "adapter": "none"
-    },
-    "aol": {
-        "_type": "newgtld",
-        "host": "whois.nic.aol"
-    },
-    "apartments": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.apartments"
-    },
-    "app": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "apple": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "aq": {
-        "adapter": "none"
-    },
-    "aquarelle": {
-        "_group": "nicfr",
-        "_type": "newgtld",
-        "host": "whois-aquarelle.nic.fr"
-    },
-    "ar": {
-        "host": "whois.nic.ar"
-    },
-    "aramco": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "archi": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "army": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.army"
-    },
-    "arpa": {
-        "host": "whois.iana.org"
-    },
-    "e164.arpa": {
-        "host": "whois.ripe.net"
-    },
-    "in-addr.arpa": {
-        "adapter": "arpa"
-    },
-    "art": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.art"
-    },
-    "arte": {
-        "_type": "newgtld",
-        "host": "whois.nic.arte"
-    },
-    "as": {
-        "host": "whois.nic.as"
-    },
-    "asda": {
-        "_type": "newgtld",
-        "host": "whois.nic.asda"
-    },
-    "asia": {
-        "host": "whois.nic.asia"
-    },
-    "associates": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.associates"
-    },
-    "at": {
-        "host": "whois.nic.at"
-    },
-    "priv.at": {
-        "host": "whois.nic.priv.at"
-    },
-    "athleta": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "attorney": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.attorney"
-    },
-    "au": {
-        "host": "whois.auda.org.au"
-    },
-    "auction": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.auction"
-    },
-    "audi": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "audible": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "audio": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "auspost": {
-        "_type": "newgtld",
-        "host": "whois.nic.auspost"
-    },
-    "author": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "auto": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "autos": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "avianca": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "aw": {
-        "host": "whois.nic.aw"
-    },
-    "aws": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ax": {
-        "host": "whois.ax"
-    },
-    "axa": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "az": {
-        "adapter": "web",
-        "url": "http://www.nic.az/"
-    },
-    "azure": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ba": {
-        "adapter": "web",
-        "url": "http://nic.ba/lat/menu/view/13"
-    },
-    "baby": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "baidu": {
-        "_group": "knet",
-        "_type": "newgtld",
-        "host": "whois.gtld.knet.cn"
-    },
-    "banamex": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "bananarepublic": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "band": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.band"
-    },
-    "bank": {
-        "_type": "newgtld",
-        "host": "whois.nic.bank"
-    },
-    "bar": {
-        "_type": "newgtld",
-        "host": "whois.nic.bar"
-    },
-    "barcelona": {
-        "_type": "newgtld",
-        "host": "whois.nic.barcelona"
-    },
-    "barclaycard": {
-        "_type": "newgtld",
-        "host": "whois.nic.barclaycard"
-    },
-    "barclays": {
-        "_type": "newgtld",
-        "host": "whois.nic.barclays"
-    },
-    "barefoot": {
-        "_type": "newgtld",
-        "host": "whois.nic.barefoot"
-    },
-    "bargains": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.bargains"
-    },
-    "baseball": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "basketball": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.basketball"
-    },
-    "bauhaus": {
-        "_type": "newgtld",
-        "host": "whois.nic.bauhaus"
-    },
-    "bayern": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.bayern"
-    },
-    "bb": {
-        "adapter": "web",
-        "url": "http://whois.telecoms.gov.bb/search_domain.php"
-    },
-    "bbc": {
-        "_type": "newgtld",
-        "host": "whois.nic.bbc"
-    },
-    "bbt": {
-        "_type": "newgtld",
-        "host": "whois.nic.bbt"
-    },
-    "bbva": {
-        "_type": "newgtld",
-        "host": "whois.nic.bbva"
-    },
-    "bcg": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.bcg"
-    },
-    "bcn": {
-        "_type": "newgtld",
-        "host": "whois.nic.bcn"
-    },
-    "bd": {
-        "adapter": "web",
-        "url": "http://whois.btcl.net.bd/"
-    },
-    "be": {
-        "host": "whois.dns.be"
-    },
-    "beats": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "beauty": {
-        "_type": "newgtld",
-        "host": "whois.nic.beauty"
-    },
-    "beer": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.beer"
-    },
-    "bentley": {
-        "_type": "newgtld",
-        "host": "whois.nic.bentley"
-    },
-    "berlin": {
-        "_type": "newgtld",
-        "host": "whois.nic.berlin"
-    },
-    "best": {
-        "_type": "newgtld",
-        "host": "whois.nic.best"
-    },
-    "bestbuy": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.bestbuy"
-    },
-    "bet": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "bf": {
-        "adapter": "none"
-    },
-    "bg": {
-        "host": "whois.register.bg"
-    },
-    "bh": {
-        "adapter": "none"
-    },
-    "bharti": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "bi": {
-        "host": "whois1.nic.bi"
-    },
-    "bible": {
-        "_type": "newgtld",
-        "host": "whois.nic.bible"
-    },
-    "bid": {
-        "_type": "newgtld",
-        "host": "whois.nic.bid"
-    },
-    "bike": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.bike"
-    },
-    "bing": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "bingo": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.bingo"
-    },
-    "bio": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "biz": {
-        "host": "whois.biz"
-    },
-    "bj": {
-        "host": "whois.nic.bj"
-    },
-    "black": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "blackfriday": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "blanco": {
-        "_type": "newgtld",
-        "host": "whois.nic.blanco"
-    },
-    "blockbuster": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.blockbuster"
-    },
-    "blog": {
-        "_type": "newgtld",
-        "host": "whois.nic.blog"
-    },
-    "bloomberg": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "blue": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "bm": {
-        "adapter": "web",
-        "url": "http://www.bermudanic.bm/cgi-bin/lansaweb?procfun+BMWHO+BMWHO2+WHO"
-    },
-    "bms": {
-        "_type": "newgtld",
-        "host": "whois.nic.bms"
-    },
-    "bmw": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "bn": {
-        "host": "whois.bnnic.bn"
-    },
-    "bnl": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.bnl"
-    },
-    "bnpparibas": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "bo": {
-        "host": "whois.nic.bo"
-    },
-    "boats": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "boehringer": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "bofa": {
-        "_type": "newgtld",
-        "host": "whois.nic.bofa"
-    },
-    "bom": {
-        "_group": "nicbr",
-        "_type": "newgtld",
-        "host": "whois.gtlds.nic.br"
-    },
-    "bond": {
-        "_type": "newgtld",
-        "host": "whois.nic.bond"
-    },
-    "boo": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "book": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "booking": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "bosch": {
-        "_type": "newgtld",
-        "host": "whois.nic.bosch"
-    },
-    "bostik": {
-        "_group": "nicfr",
-        "_type": "newgtld",
-        "host": "whois-bostik.nic.fr"
-    },
-    "boston": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.boston"
-    },
-    "bot": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "boutique": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.boutique"
-    },
-    "box": {
-        "_group": "aridnrs",
-        "_type": "newgtld",
-        "host": "whois.aridnrs.net.au"
-    },
-    "br": {
-        "host": "whois.registro.br"
-    },
-    "bradesco": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.bradesco"
-    },
-    "bridgestone": {
-        "_type": "newgtld",
-        "host": "whois.nic.bridgestone"
-    },
-    "broadway": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.broadway"
-    },
-    "broker": {
-        "_type": "newgtld",
-        "host": "whois.nic.broker"
-    },
-    "brother": {
-        "_type": "newgtld",
-        "host": "whois.nic.brother"
-    },
-    "brussels": {
-        "_type": "newgtld",
-        "host": "whois.nic.brussels"
-    },
-    "bs": {
-        "adapter": "web",
-        "url": "http://www.nic.bs/cgi-bin/search.pl"
-    },
-    "bt": {
-        "adapter": "web",
-        "url": "http://www.nic.bt/"
-    },
-    "budapest": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois-dub.mm-registry.com"
-    },
-    "bugatti": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "build": {
-        "_type": "newgtld",
-        "host": "whois.nic.build"
-    },
-    "builders": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.builders"
-    },
-    "business": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.business"
-    },
-    "buy": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "buzz": {
-        "_type": "newgtld",
-        "host": "whois.nic.buzz"
-    },
-    "bv": {
-        "adapter": "none"
-    },
-    "bw": {
-        "host": "whois.nic.net.bw"
-    },
-    "by": {
-        "host": "whois.cctld.by"
-    },
-    "bz": {
-        "host": "whois.afilias-grs.info",
-        "adapter": "afilias"
-    },
-    "za.bz": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "bzh": {
-        "_group": "nicfr",
-        "_type": "newgtld",
-        "host": "whois.nic.bzh"
-    },
-    "ca": {
-        "host": "whois.cira.ca"
-    },
-    "co.ca": {
-        "host": "whois.co.ca"
-    },
-    "cab": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.cab"
-    },
-    "cafe": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.cafe"
-    },
-    "cal": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "call": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "calvinklein": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "cam": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "camera": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.camera"
-    },
-    "camp": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.camp"
-    },
-    "cancerresearch": {
-        "_type": "newgtld",
-        "host": "whois.nic.cancerresearch"
-    },
-    "canon": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.canon"
-    },
-    "capetown": {
-        "_group": "zaregistry",
-        "_type": "newgtld",
-        "host": "capetown-whois.registry.net.za"
-    },
-    "capital": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.capital"
-    },
-    "capitalone": {
-        "_type": "newgtld",
-        "host": "whois.nic.capitalone"
-    },
-    "car": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "caravan": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "cards": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.cards"
-    },
-    "care": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.care"
-    },
-    "career": {
-        "_type": "newgtld",
-        "host": "whois.nic.career"
-    },
-    "careers": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.careers"
-    },
-    "cars": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "cartier": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "casa": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.casa"
-    },
-    "case": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.case"
-    },
-    "caseih": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.caseih"
-    },
-    "cash": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.cash"
-    },
-    "casino": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.casino"
-    },
-    "cat": {
-        "host": "whois.nic.cat",
-        "adapter": "formatted",
-        "format": "-C US-ASCII ace %s"
-    },
-    "catering": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.catering"
-    },
-    "catholic": {
-        "_group": "aridnrs",
-        "_type": "newgtld",
-        "host": "whois.aridnrs.net.au"
-    },
-    "cba": {
-        "_type": "newgtld",
-        "host": "whois.nic.cba"
-    },
-    "cbn": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "cbre": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "cbs": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "cc": {
-        "host": "ccwhois.verisign-grs.com",
-        "adapter": "verisign"
-    },
-    "cd": {
-        "host": "whois.nic.cd"
-    },
-    "ceb": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "center": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.center"
-    },
-    "ceo": {
-        "_type": "newgtld",
-        "host": "whois.nic.ceo"
-    },
-    "cern": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "cf": {
-        "host": "whois.dot.cf"
-    },
-    "cfa": {
-        "_type": "newgtld",
-        "host": "whois.nic.cfa"
-    },
-    "cfd": {
-        "_type": "newgtld",
-        "host": "whois.nic.cfd"
-    },
-    "cg": {
-        "adapter": "none"
-    },
-    "ch": {
-        "host": "whois.nic.ch"
-    },
-    "chanel": {
-        "_type": "newgtld",
-        "host": "whois.nic.chanel"
-    },
-    "channel": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "charity": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.charity"
-    },
-    "chase": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "chat": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.chat"
-    },
-    "cheap": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.cheap"
-    },
-    "chintai": {
-        "_type": "newgtld",
-        "host": "whois.nic.chintai"
-    },
-    "christmas": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "chrome": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "chrysler": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "church": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.church"
-    },
-    "ci": {
-        "host": "whois.nic.ci"
-    },
-    "cipriani": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "circle": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "cisco": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "citadel": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "citi": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "citic": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "city": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.city"
-    },
-    "cityeats": {
-        "_type": "newgtld",
-        "host": "whois.nic.cityeats"
-    },
-    "ck": {
-        "adapter": "none"
-    },
-    "cl": {
-        "host": "whois.nic.cl"
-    },
-    "claims": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.claims"
-    },
-    "cleaning": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.cleaning"
-    },
-    "click": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "clinic": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.clinic"
-    },
-    "clinique": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.clinique"
-    },
-    "clothing": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.clothing"
-    },
-    "cloud": {
-        "_type": "newgtld",
-        "host": "whois.nic.cloud"
-    },
-    "club": {
-        "_type": "newgtld",
-        "host": "whois.nic.club"
-    },
-    "clubmed": {
-        "_type": "newgtld",
-        "host": "whois.nic.clubmed"
-    },
-    "cm": {
-        "host": "whois.netcom.cm"
-    },
-    "cn": {
-        "host": "whois.cnnic.cn"
-    },
-    "edu.cn": {
-        "adapter": "none"
-    },
-    "co": {
-        "host": "whois.nic.co"
-    },
-    "coach": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.coach"
-    },
-    "codes": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.codes"
-    },
-    "coffee": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.coffee"
-    },
-    "college": {
-        "_type": "newgtld",
-        "host": "whois.nic.college"
-    },
-    "cologne": {
-        "_group": "knipp",
-        "_type": "newgtld",
-        "host": "whois.ryce-rsp.com"
-    },
-    "com": {
-        "host": "whois.verisign-grs.com",
-        "adapter": "verisign"
-    },
-    "africa.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "ar.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "br.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "cn.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "co.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.net"
-    },
-    "de.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "eu.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "gb.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "gr.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "hk.com": {
-        "_group": "udrregistry",
-        "_type": "private",
-        "host": "whois.registry.hk.com"
-    },
-    "hu.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "jpn.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "kr.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "no.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "qc.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "ru.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "sa.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "se.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "uk.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "us.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "uy.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "za.com": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "comcast": {
-        "_type": "newgtld",
-        "host": "whois.nic.comcast"
-    },
-    "commbank": {
-        "_type": "newgtld",
-        "host": "whois.nic.commbank"
-    },
-    "community": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.community"
-    },
-    "company": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.company"
-    },
-    "compare": {
-        "_type": "newgtld",
-        "host": "whois.nic.compare"
-    },
-    "computer": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.computer"
-    },
-    "comsec": {
-        "_type": "newgtld",
-        "host": "whois.nic.comsec"
-    },
-    "condos": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.condos"
-    },
-    "construction": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.construction"
-    },
-    "consulting": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.consulting"
-    },
-    "contact": {
-        "_type": "newgtld",
-        "host": "whois.nic.contact"
-    },
-    "contractors": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.contractors"
-    },
-    "cooking": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.cooking"
-    },
-    "cookingchannel": {
-        "_type": "newgtld",
-        "host": "whois.nic.cookingchannel"
-    },
-    "cool": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.cool"
-    },
-    "coop": {
-        "host": "whois.nic.coop"
-    },
-    "corsica": {
-        "_group": "nicfr",
-        "_type": "newgtld",
-        "host": "whois-corsica.nic.fr"
-    },
-    "country": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois-dub.mm-registry.com"
-    },
-    "coupon": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "coupons": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.coupons"
-    },
-    "courses": {
-        "_group": "aridnrs",
-        "_type": "newgtld",
-        "host": "whois.aridnrs.net.au"
-    },
-    "cr": {
-        "host": "whois.nic.cr"
-    },
-    "credit": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.credit"
-    },
-    "creditcard": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.creditcard"
-    },
-    "creditunion": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "cricket": {
-        "_type": "newgtld",
-        "host": "whois.nic.cricket"
-    },
-    "crown": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "crs": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "cruise": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.cruise"
-    },
-    "cruises": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.cruises"
-    },
-    "csc": {
-        "_type": "newgtld",
-        "host": "whois.nic.csc"
-    },
-    "cu": {
-        "adapter": "web",
-        "url": "http://www.nic.cu/"
-    },
-    "cuisinella": {
-        "_type": "newgtld",
-        "host": "whois.nic.cuisinella"
-    },
-    "cv": {
-        "adapter": "web",
-        "url": "http://www.dns.cv/"
-    },
-    "cw": {
-        "adapter": "none"
-    },
-    "cx": {
-        "host": "whois.nic.cx"
-    },
-    "cy": {
-        "adapter": "web",
-        "url": "http://www.nic.cy/nslookup/online_database.php"
-    },
-    "cymru": {
-        "_type": "newgtld",
-        "host": "whois.nic.cymru"
-    },
-    "cyou": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.cyou"
-    },
-    "cz": {
-        "host": "whois.nic.cz"
-    },
-    "dabur": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "dad": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "dance": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.dance"
-    },
-    "data": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.data"
-    },
-    "date": {
-        "_type": "newgtld",
-        "host": "whois.nic.date"
-    },
-    "dating": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.dating"
-    },
-    "datsun": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.gmo"
-    },
-    "day": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "dclk": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "dds": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.dds"
-    },
-    "de": {
-        "host": "whois.denic.de",
-        "adapter": "formatted",
-        "format": "-T dn,ace %s"
-    },
-    "com.de": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "deal": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "dealer": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "deals": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.deals"
-    },
-    "degree": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.degree"
-    },
-    "delivery": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.delivery"
-    },
-    "dell": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "deloitte": {
-        "_type": "newgtld",
-        "host": "whois.nic.deloitte"
-    },
-    "delta": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.delta"
-    },
-    "democrat": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.democrat"
-    },
-    "dental": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.dental"
-    },
-    "dentist": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.dentist"
-    },
-    "desi": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "design": {
-        "_type": "newgtld",
-        "host": "whois.nic.design"
-    },
-    "dev": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "dhl": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "diamonds": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.diamonds"
-    },
-    "diet": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "digital": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.digital"
-    },
-    "direct": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.direct"
-    },
-    "directory": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.directory"
-    },
-    "discount": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.discount"
-    },
-    "discover": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "dish": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.dish"
-    },
-    "diy": {
-        "_type": "newgtld",
-        "host": "whois.nic.diy"
-    },
-    "dj": {
-        "adapter": "web",
-        "url": "http://www.nic.dj/whois.php"
-    },
-    "dk": {
-        "host": "whois.dk-hostmaster.dk",
-        "adapter": "formatted",
-        "format": "--show-handles %s"
-    },
-    "dm": {
-        "host": "whois.nic.dm"
-    },
-    "dnp": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "do": {
-        "adapter": "web",
-        "url": "http://www.nic.do/whois-h.php3"
-    },
-    "docs": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "doctor": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.doctor"
-    },
-    "dodge": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "dog": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.dog"
-    },
-    "doha": {
-        "_type": "newgtld",
-        "host": "whois.nic.doha"
-    },
-    "domains": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.domains"
-    },
-    "doosan": {
-        "host": "whois.nic.xn--cg4bki"
-    },
-    "dot": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.dot"
-    },
-    "download": {
-        "_type": "newgtld",
-        "host": "whois.nic.download"
-    },
-    "drive": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "dtv": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.dtv"
-    },
-    "dubai": {
-        "_type": "newgtld",
-        "host": "whois.nic.dubai"
-    },
-    "duck": {
-        "_type": "newgtld",
-        "host": "whois.nic.duck"
-    },
-    "dunlop": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.dunlop"
-    },
-    "duns": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "dupont": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "durban": {
-        "_group": "zaregistry",
-        "_type": "newgtld",
-        "host": "durban-whois.registry.net.za"
-    },
-    "dvag": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "dvr": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "dz": {
-        "host": "whois.nic.dz"
-    },
-    "earth": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "eat": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "ec": {
-        "host": "whois.nic.ec"
-    },
-    "eco": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "edeka": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "edu": {
-        "host": "whois.educause.edu"
-    },
-    "education": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.education"
-    },
-    "ee": {
-        "host": "whois.tld.ee"
-    },
-    "eg": {
-        "adapter": "web",
-        "url": "http://lookup.egregistry.eg/english.aspx"
-    },
-    "email": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.email"
-    },
-    "emerck": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "energy": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.energy"
-    },
-    "engineer": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.engineer"
-    },
-    "engineering": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.engineering"
-    },
-    "enterprises": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.enterprises"
-    },
-    "epost": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "epson": {
-        "_group": "aridnrs",
-        "_type": "newgtld",
-        "host": "whois.aridnrs.net.au"
-    },
-    "equipment": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.equipment"
-    },
-    "er": {
-        "adapter": "none"
-    },
-    "ericsson": {
-        "_type": "newgtld",
-        "host": "whois.nic.ericsson"
-    },
-    "erni": {
-        "_type": "newgtld",
-        "host": "whois.nic.erni"
-    },
-    "es": {
-        "host": "whois.nic.es"
-    },
-    "esq": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "estate": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.estate"
-    },
-    "esurance": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "et": {
-        "adapter": "none"
-    },
-    "etisalat": {
-        "_group": "centralnic",
-        "host": "whois.centralnic.com"
-    },
-    "eu": {
-        "host": "whois.eu"
-    },
-    "eurovision": {
-        "_type": "newgtld",
-        "host": "whois.nic.eurovision"
-    },
-    "eus": {
-        "_group": "coreregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.eus"
-    },
-    "events": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.events"
-    },
-    "everbank": {
-        "_type": "newgtld",
-        "host": "whois.nic.everbank"
-    },
-    "exchange": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.exchange"
-    },
-    "expert": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.expert"
-    },
-    "exposed": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.exposed"
-    },
-    "express": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.express"
-    },
-    "extraspace": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "fage": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "fail": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.fail"
-    },
-    "fairwinds": {
-        "_type": "newgtld",
-        "host": "whois.nic.fairwinds"
-    },
-    "faith": {
-        "_type": "newgtld",
-        "host": "whois.nic.faith"
-    },
-    "family": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.family"
-    },
-    "fan": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.fan"
-    },
-    "fans": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.fans"
-    },
-    "farm": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.farm"
-    },
-    "farmers": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "fashion": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.fashion"
-    },
-    "fast": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "fedex": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.fedex"
-    },
-    "feedback": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.feedback"
-    },
-    "ferrari": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.ferrari"
-    },
-    "ferrero": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "fi": {
-        "host": "whois.fi"
-    },
-    "fiat": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "fidelity": {
-        "_type": "newgtld",
-        "host": "whois.nic.fidelity"
-    },
-    "fido": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "film": {
-        "_type": "newgtld",
-        "host": "whois.nic.film"
-    },
-    "final": {
-        "_group": "nicbr",
-        "_type": "newgtld",
-        "host": "whois.gtlds.nic.br"
-    },
-    "finance": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.finance"
-    },
-    "financial": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.financial"
-    },
-    "fire": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "firestone": {
-        "_type": "newgtld",
-        "host": "whois.nic.firestone"
-    },
-    "firmdale": {
-        "_type": "newgtld",
-        "host": "whois.nic.firmdale"
-    },
-    "fish": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.fish"
-    },
-    "fishing": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.fishing"
-    },
-    "fit": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.fit"
-    },
-    "fitness": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.fitness"
-    },
-    "fj": {
-        "host": "whois.usp.ac.fj"
-    },
-    "fk": {
-        "adapter": "none"
-    },
-    "flickr": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "flights": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.flights"
-    },
-    "flir": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "florist": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.florist"
-    },
-    "flowers": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "fly": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "fm": {
-        "host": "whois.nic.fm"
-    },
-    "fo": {
-        "host": "whois.nic.fo"
-    },
-    "foo": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "food": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "foodnetwork": {
-        "_type": "newgtld",
-        "host": "whois.nic.foodnetwork"
-    },
-    "football": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.football"
-    },
-    "ford": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "forex": {
-        "_type": "newgtld",
-        "host": "whois.nic.forex"
-    },
-    "forsale": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.forsale"
-    },
-    "forum": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.forum"
-    },
-    "foundation": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.foundation"
-    },
-    "fox": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "fr": {
-        "host": "whois.nic.fr"
-    },
-    "aeroport.fr": {
-        "_group": "smallregistry",
-        "_type": "private",
-        "host": "whois.smallregistry.net"
-    },
-    "avocat.fr": {
-        "_group": "smallregistry",
-        "_type": "private",
-        "host": "whois.smallregistry.net"
-    },
-    "chambagri.fr": {
-        "_group": "smallregistry",
-        "_type": "private",
-        "host": "whois.smallregistry.net"
-    },
-    "chirurgiens-dentistes.fr": {
-        "_group": "smallregistry",
-        "_type": "private",
-        "host": "whois.smallregistry.net"
-    },
-    "experts-comptables.fr": {
-        "_group": "smallregistry",
-        "_type": "private",
-        "host": "whois.smallregistry.net"
-    },
-    "geometre-expert.fr": {
-        "_group": "smallregistry",
-        "_type": "private",
-        "host": "whois.smallregistry.net"
-    },
-    "medecin.fr": {
-        "_group": "smallregistry",
-        "_type": "private",
-        "host": "whois.smallregistry.net"
-    },
-    "notaires.fr": {
-        "_group": "smallregistry",
-        "_type": "private",
-        "host": "whois.smallregistry.net"
-    },
-    "pharmacien.fr": {
-        "_group": "smallregistry",
-        "_type": "private",
-        "host": "whois.smallregistry.net"
-    },
-    "port.fr": {
-        "_group": "smallregistry",
-        "_type": "private",
-        "host": "whois.smallregistry.net"
-    },
-    "veterinaire.fr": {
-        "_group": "smallregistry",
-        "_type": "private",
-        "host": "whois.smallregistry.net"
-    },
-    "free": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "fresenius": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "frl": {
-        "_type": "newgtld",
-        "host": "whois.nic.frl"
-    },
-    "frogans": {
-        "_group": "nicfr",
-        "_type": "newgtld",
-        "host": "whois.nic.frogans"
-    },
-    "frontdoor": {
-        "_type": "newgtld",
-        "host": "whois.nic.frontdoor"
-    },
-    "frontier": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ftr": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "fujitsu": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.gmo"
-    },
-    "fujixerox": {
-        "_type": "newgtld",
-        "host": "whois.nic.fujixerox"
-    },
-    "fun": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.fun"
-    },
-    "fund": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.fund"
-    },
-    "furniture": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.furniture"
-    },
-    "futbol": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.futbol"
-    },
-    "fyi": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.fyi"
-    },
-    "ga": {
-        "host": "whois.dot.ga"
-    },
-    "gal": {
-        "_group": "coreregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.gal"
-    },
-    "gallery": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.gallery"
-    },
-    "gallo": {
-        "_type": "newgtld",
-        "host": "whois.nic.gallo"
-    },
-    "gallup": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.gallup"
-    },
-    "game": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "games": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.games"
-    },
-    "gap": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "garden": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.garden"
-    },
-    "gb": {
-        "adapter": "none"
-    },
-    "gbiz": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "gd": {
-        "host": "whois.nic.gd"
-    },
-    "gdn": {
-        "_type": "newgtld",
-        "host": "whois.nic.gdn"
-    },
-    "ge": {
-        "host": "whois.registration.ge"
-    },
-    "gea": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "gent": {
-        "_type": "newgtld",
-        "host": "whois.nic.gent"
-    },
-    "genting": {
-        "_type": "newgtld",
-        "host": "whois.nic.genting"
-    },
-    "george": {
-        "_type": "newgtld",
-        "host": "whois.nic.george"
-    },
-    "gf": {
-        "host": "whois.mediaserv.net"
-    },
-    "gg": {
-        "host": "whois.gg"
-    },
-    "ggee": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.ggee"
-    },
-    "gh": {
-        "adapter": "web",
-        "url": "http://www.nic.gh/customer/search_c.htm"
-    },
-    "gi": {
-        "host": "whois.afilias-grs.info",
-        "adapter": "afilias"
-    },
-    "gift": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "gifts": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.gifts"
-    },
-    "gives": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.gives"
-    },
-    "giving": {
-        "_type": "newgtld",
-        "host": "whois.nic.giving"
-    },
-    "gl": {
-        "host": "whois.nic.gl"
-    },
-    "glade": {
-        "_type": "newgtld",
-        "host": "whois.nic.glade"
-    },
-    "glass": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.glass"
-    },
-    "gle": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "global": {
-        "_type": "newgtld",
-        "host": "whois.nic.global"
-    },
-    "globo": {
-        "_group": "nicbr",
-        "_type": "newgtld",
-        "host": "whois.gtlds.nic.br"
-    },
-    "gm": {
-        "adapter": "web",
-        "url": "http://www.nic.gm/htmlpages/whois.htm"
-    },
-    "gmail": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "gmbh": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.gmbh"
-    },
-    "gmoregistry": {
-        "_group": "gmo",
-        "adapter": "none"
-    },
-    "gmx": {
-        "_group": "knipp",
-        "_type": "newgtld",
-        "host": "whois-fe1.gmx.tango.knipp.de"
-    },
-    "gn": {
-        "adapter": "none"
-    },
-    "godaddy": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "gold": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.gold"
-    },
-    "goldpoint": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.goldpoint"
-    },
-    "golf": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.golf"
-    },
-    "goo": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.gmo"
-    },
-    "goodyear": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.goodyear"
-    },
-    "goog": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "google": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "gop": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.gop"
-    },
-    "got": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "gov": {
-        "host": "whois.dotgov.gov"
-    },
-    "gp": {
-        "adapter": "web",
-        "url": "https://www.dom-enic.com/whois.html"
-    },
-    "gq": {
-        "host": "whois.dominio.gq"
-    },
-    "gr": {
-        "adapter": "web",
-        "url": "https://grweb.ics.forth.gr/Whois?lang=en"
-    },
-    "grainger": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "graphics": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.graphics"
-    },
-    "gratis": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.gratis"
-    },
-    "green": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "gripe": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.gripe"
-    },
-    "grocery": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "group": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.group"
-    },
-    "gs": {
-        "host": "whois.nic.gs"
-    },
-    "gt": {
-        "adapter": "web",
-        "url": "http://www.gt/"
-    },
-    "gu": {
-        "adapter": "web",
-        "url": "http://gadao.gov.gu/domainsearch.htm"
-    },
-    "guardian": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "gucci": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "guge": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "guide": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.guide"
-    },
-    "guitars": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "guru": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.guru"
-    },
-    "gw": {
-        "adapter": "web",
-        "url": "http://nic.gw/en/whois/"
-    },
-    "gy": {
-        "host": "whois.registry.gy"
-    },
-    "hair": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "hamburg": {
-        "_type": "newgtld",
-        "host": "whois.nic.hamburg"
-    },
-    "hangout": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "haus": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.haus"
-    },
-    "hbo": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "hdfc": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.hdfc"
-    },
-    "hdfcbank": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.hdfcbank"
-    },
-    "health": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "healthcare": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.healthcare"
-    },
-    "help": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "helsinki": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.helsinki"
-    },
-    "here": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "hermes": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "hgtv": {
-        "_type": "newgtld",
-        "host": "whois.nic.hgtv"
-    },
-    "hiphop": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "hisamitsu": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.gmo"
-    },
-    "hitachi": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.gmo"
-    },
-    "hiv": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "hk": {
-        "host": "whois.hkirc.hk"
-    },
-    "inc.hk": {
-        "_group": "udrregistry",
-        "_type": "private",
-        "host": "whois.registry.hk.com"
-    },
-    "ltd.hk": {
-        "_group": "udrregistry",
-        "_type": "private",
-        "host": "whois.registry.hk.com"
-    },
-    "hkt": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.hkt"
-    },
-    "hm": {
-        "host": "whois.registry.hm"
-    },
-    "hn": {
-        "host": "whois.nic.hn"
-    },
-    "hockey": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.hockey"
-    },
-    "holdings": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.holdings"
-    },
-    "holiday": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.holiday"
-    },
-    "homedepot": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.homedepot"
-    },
-    "homegoods": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "homes": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "homesense": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "honda": {
-        "_type": "newgtld",
-        "host": "whois.nic.honda"
-    },
-    "honeywell": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "horse": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.horse"
-    },
-    "hospital": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.hospital"
-    },
-    "host": {
-        "_type": "newgtld",
-        "host": "whois.nic.host"
-    },
-    "hosting": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "hot": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "hoteles": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "hotels": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "hotmail": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "house": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.house"
-    },
-    "how": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "hr": {
-        "host": "whois.dns.hr"
-    },
-    "hsbc": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ht": {
-        "host": "whois.nic.ht"
-    },
-    "hu": {
-        "host": "whois.nic.hu"
-    },
-    "hughes": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.hughes"
-    },
-    "hyatt": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "hyundai": {
-        "_type": "newgtld",
-        "host": "whois.nic.hyundai"
-    },
-    "ibm": {
-        "_type": "newgtld",
-        "host": "whois.nic.ibm"
-    },
-    "icbc": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.icbc"
-    },
-    "ice": {
-        "_type": "newgtld",
-        "host": "whois.nic.ice"
-    },
-    "icu": {
-        "_type": "newgtld",
-        "host": "whois.nic.icu"
-    },
-    "id": {
-        "host": "whois.id"
-    },
-    "ie": {
-        "host": "whois.iedr.ie"
-    },
-    "ieee": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ifm": {
-        "_type": "newgtld",
-        "host": "whois.nic.ifm"
-    },
-    "ikano": {
-        "_type": "newgtld",
-        "host": "whois.ikano.tld-box.at"
-    },
-    "il": {
-        "host": "whois.isoc.org.il"
-    },
-    "co.il": {
-        "host": "whois.isoc.org.il"
-    },
-    "im": {
-        "host": "whois.nic.im"
-    },
-    "imamat": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "imdb": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "immo": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.immo"
-    },
-    "immobilien": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.immobilien"
-    },
-    "in": {
-        "host": "whois.inregistry.net"
-    },
-    "inc": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.inc"
-    },
-    "industries": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.industries"
-    },
-    "infiniti": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.gmo"
-    },
-    "info": {
-        "host": "whois.afilias.net"
-    },
-    "ing": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "ink": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.ink"
-    },
-    "institute": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.institute"
-    },
-    "insurance": {
-        "_type": "newgtld",
-        "host": "whois.nic.insurance"
-    },
-    "insure": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.insure"
-    },
-    "int": {
-        "host": "whois.iana.org"
-    },
-    "intel": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "international": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.international"
-    },
-    "intuit": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "investments": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.investments"
-    },
-    "io": {
-        "host": "whois.nic.io"
-    },
-    "ipiranga": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "iq": {
-        "host": "whois.cmc.iq"
-    },
-    "ir": {
-        "host": "whois.nic.ir"
-    },
-    "irish": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.irish"
-    },
-    "is": {
-        "host": "whois.isnic.is"
-    },
-    "iselect": {
-        "_type": "newgtld",
-        "host": "whois.nic.iselect"
-    },
-    "ismaili": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "ist": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "istanbul": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "it": {
-        "host": "whois.nic.it"
-    },
-    "itau": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "itv": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "iveco": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.iveco"
-    },
-    "jaguar": {
-        "_type": "newgtld",
-        "host": "whois.nic.jaguar"
-    },
-    "java": {
-        "_type": "newgtld",
-        "host": "whois.nic.java"
-    },
-    "jcb": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.gmo"
-    },
-    "jcp": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "je": {
-        "host": "whois.je"
-    },
-    "jeep": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "jetzt": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "adapter": "none",
-        "host": "whois.nic.jetzt"
-    },
-    "jewelry": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.jewelry"
-    },
-    "jio": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.jio"
-    },
-    "jll": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "jm": {
-        "adapter": "none"
-    },
-    "jmp": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "jnj": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "jo": {
-        "adapter": "web",
-        "url": "http://www.dns.jo/Whois.aspx"
-    },
-    "jobs": {
-        "host": "whois.nic.jobs",
-        "adapter": "verisign"
-    },
-    "joburg": {
-        "_group": "zaregistry",
-        "_type": "newgtld",
-        "host": "joburg-whois.registry.net.za"
-    },
-    "jot": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "joy": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "jp": {
-        "host": "whois.jprs.jp",
-        "adapter": "formatted",
-        "format": "%s/e"
-    },
-    "jpmorgan": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "jprs": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "juegos": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "juniper": {
-        "_type": "newgtld",
-        "host": "whois.nic.juniper"
-    },
-    "kaufen": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.kaufen"
-    },
-    "kddi": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.kddi"
-    },
-    "ke": {
-        "host": "whois.kenic.or.ke"
-    },
-    "kerryhotels": {
-        "_type": "newgtld",
-        "host": "whois.nic.kerryhotels"
-    },
-    "kerrylogistics": {
-        "_type": "newgtld",
-        "host": "whois.nic.kerrylogistics"
-    },
-    "kerryproperties": {
-        "_type": "newgtld",
-        "host": "whois.nic.kerryproperties"
-    },
-    "kfh": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.kfh"
-    },
-    "kg": {
-        "host": "whois.kg"
-    },
-    "kh": {
-        "adapter": "none"
-    },
-    "ki": {
-        "host": "whois.nic.ki"
-    },
-    "kia": {
-        "_type": "newgtld",
-        "host": "whois.nic.kia"
-    },
-    "kim": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "kinder": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "kindle": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "kitchen": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.kitchen"
-    },
-    "kiwi": {
-        "_type": "newgtld",
-        "host": "whois.nic.kiwi"
-    },
-    "km": {
-        "adapter": "none"
-    },
-    "kn": {
-        "host": "whois.nic.kn"
-    },
-    "koeln": {
-        "_group": "knipp",
-        "_type": "newgtld",
-        "host": "whois.ryce-rsp.com"
-    },
-    "komatsu": {
-        "_type": "newgtld",
-        "host": "whois.nic.komatsu"
-    },
-    "kosher": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.kosher"
-    },
-    "kp": {
-        "adapter": "none"
-    },
-    "kpmg": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "kpn": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "kr": {
-        "host": "whois.kr"
-    },
-    "krd": {
-        "_group": "aridnrs",
-        "_type": "newgtld",
-        "host": "whois.aridnrs.net.au"
-    },
-    "kred": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "kuokgroup": {
-        "_type": "newgtld",
-        "host": "whois.nic.kuokgroup"
-    },
-    "kw": {
-        "adapter": "web",
-        "url": "http://www.kw/"
-    },
-    "ky": {
-        "host": "whois.kyregistry.ky"
-    },
-    "kyoto": {
-        "_type": "newgtld",
-        "host": "whois.nic.kyoto"
-    },
-    "kz": {
-        "host": "whois.nic.kz"
-    },
-    "la": {
-        "host": "whois.nic.la"
-    },
-    "lacaixa": {
-        "_type": "newgtld",
-        "host": "whois.nic.lacaixa"
-    },
-    "ladbrokes": {
-        "_type": "newgtld",
-        "host": "whois.nic.ladbrokes"
-    },
-    "lamborghini": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "lamer": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.lamer"
-    },
-    "lancaster": {
-        "_group": "nicfr",
-        "_type": "newgtld",
-        "host": "whois-lancaster.nic.fr"
-    },
-    "lancia": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "lancome": {
-        "_type": "newgtld",
-        "host": "whois.nic.lancome"
-    },
-    "land": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.land"
-    },
-    "landrover": {
-        "_type": "newgtld",
-        "host": "whois.nic.landrover"
-    },
-    "lanxess": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "lasalle": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "lat": {
-        "_type": "newgtld",
-        "host": "whois.nic.lat"
-    },
-    "latino": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.latino"
-    },
-    "latrobe": {
-        "_type": "newgtld",
-        "host": "whois.nic.latrobe"
-    },
-    "law": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.law"
-    },
-    "lawyer": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.lawyer"
-    },
-    "lb": {
-        "adapter": "web",
-        "url": "http://www.aub.edu.lb/lbdr/"
-    },
-    "lc": {
-        "host": "whois.afilias-grs.info",
-        "adapter": "afilias"
-    },
-    "lds": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.lds"
-    },
-    "lease": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.lease"
-    },
-    "leclerc": {
-        "_group": "nicfr",
-        "_type": "newgtld",
-        "host": "whois-leclerc.nic.fr"
-    },
-    "lefrak": {
-        "_type": "newgtld",
-        "host": "whois.nic.lefrak"
-    },
-    "legal": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.legal"
-    },
-    "lego": {
-        "_type": "newgtld",
-        "host": "whois.nic.lego"
-    },
-    "lexus": {
-        "_type": "newgtld",
-        "host": "whois.nic.lexus"
-    },
-    "lgbt": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "li": {
-        "host": "whois.nic.li"
-    },
-    "liaison": {
-        "_type": "newgtld",
-        "host": "whois.nic.liaison"
-    },
-    "lidl": {
-        "_type": "newgtld",
-        "host": "whois.nic.lidl"
-    },
-    "life": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.life"
-    },
-    "lifeinsurance": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "lifestyle": {
-        "_type": "newgtld",
-        "host": "whois.nic.lifestyle"
-    },
-    "lighting": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.lighting"
-    },
-    "like": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "lilly": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "limited": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.limited"
-    },
-    "limo": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.limo"
-    },
-    "lincoln": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "linde": {
-        "_type": "newgtld",
-        "host": "whois.nic.linde"
-    },
-    "link": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "lipsy": {
-        "_type": "newgtld",
-        "host": "whois.nic.lipsy"
-    },
-    "live": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.live"
-    },
-    "living": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "lixil": {
-        "_type": "newgtld",
-        "host": "whois.nic.lixil"
-    },
-    "lk": {
-        "host": "whois.nic.lk"
-    },
-    "llc": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "loan": {
-        "_type": "newgtld",
-        "host": "whois.nic.loan"
-    },
-    "loans": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.loans"
-    },
-    "locker": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.locker"
-    },
-    "locus": {
-        "_type": "newgtld",
-        "host": "whois.nic.locus"
-    },
-    "loft": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "lol": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "london": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.london"
-    },
-    "lotte": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.lotte"
-    },
-    "lotto": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "love": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.love"
-    },
-    "lpl": {
-        "_type": "newgtld",
-        "host": "whois.nic.lpl"
-    },
-    "lplfinancial": {
-        "_type": "newgtld",
-        "host": "whois.nic.lplfinancial"
-    },
-    "lr": {
-        "adapter": "none"
-    },
-    "ls": {
-        "adapter": "web",
-        "url": "http://www.co.ls/co.asp"
-    },
-    "lt": {
-        "host": "whois.domreg.lt"
-    },
-    "ltd": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.ltd"
-    },
-    "ltda": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "lu": {
-        "host": "whois.dns.lu"
-    },
-    "lundbeck": {
-        "_type": "newgtld",
-        "host": "whois.nic.lundbeck"
-    },
-    "lupin": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "luxe": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.luxe"
-    },
-    "luxury": {
-        "_type": "newgtld",
-        "host": "whois.nic.luxury"
-    },
-    "lv": {
-        "host": "whois.nic.lv"
-    },
-    "ly": {
-        "host": "whois.nic.ly"
-    },
-    "ma": {
-        "host": "whois.registre.ma"
-    },
-    "macys": {
-        "_type": "newgtld",
-        "host": "whois.nic.macys"
-    },
-    "madrid": {
-        "_group": "corenic",
-        "_type": "newgtld",
-        "host": "whois.madrid.rs.corenic.net"
-    },
-    "maif": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "maison": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.maison"
-    },
-    "makeup": {
-        "_type": "newgtld",
-        "host": "whois.nic.makeup"
-    },
-    "man": {
-        "_type": "newgtld",
-        "host": "whois.nic.man"
-    },
-    "management": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.management"
-    },
-    "mango": {
-        "_group": "coreregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.mango"
-    },
-    "map": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "market": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.market"
-    },
-    "marketing": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.marketing"
-    },
-    "markets": {
-        "_type": "newgtld",
-        "host": "whois.nic.markets"
-    },
-    "marriott": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "marshalls": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "maserati": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.maserati"
-    },
-    "mattel": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "mba": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.mba"
-    },
-    "mc": {
-        "adapter": "none"
-    },
-    "mckinsey": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.mckinsey"
-    },
-    "md": {
-        "host": "whois.nic.md"
-    },
-    "me": {
-        "host": "whois.nic.me"
-    },
-    "med": {
-        "_type": "newgtld",
-        "host": "whois.nic.med"
-    },
-    "media": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.media"
-    },
-    "meet": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "melbourne": {
-        "_group": "aridnrs",
-        "_type": "newgtld",
-        "host": "whois.aridnrs.net.au"
-    },
-    "meme": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "memorial": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.memorial"
-    },
-    "men": {
-        "_type": "newgtld",
-        "host": "whois.nic.men"
-    },
-    "menu": {
-        "_type": "newgtld",
-        "host": "whois.nic.menu"
-    },
-    "merckmsd": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "metlife": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.metlife"
-    },
-    "mg": {
-        "host": "whois.nic.mg"
-    },
-    "mh": {
-        "adapter": "none"
-    },
-    "miami": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.miami"
-    },
-    "microsoft": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "mil": {
-        "adapter": "none"
-    },
-    "mini": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "mint": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "mit": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "mitsubishi": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.gmo"
-    },
-    "mk": {
-        "host": "whois.marnet.mk"
-    },
-    "ml": {
-        "host": "whois.dot.ml"
-    },
-    "mlb": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "mls": {
-        "_type": "newgtld",
-        "host": "whois.nic.mls"
-    },
-    "mm": {
-        "adapter": "none"
-    },
-    "mma": {
-        "_group": "nicfr",
-        "_type": "newgtld",
-        "host": "whois-mma.nic.fr"
-    },
-    "mn": {
-        "host": "whois.nic.mn"
-    },
-    "mo": {
-        "host": "whois.monic.mo"
-    },
-    "mobi": {
-        "_group": "afilias",
-        "host": "whois.afilias.net"
-    },
-    "mobile": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.mobile"
-    },
-    "mobily": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "moda": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.moda"
-    },
-    "moe": {
-        "_type": "newgtld",
-        "host": "whois.nic.moe"
-    },
-    "moi": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "mom": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "monash": {
-        "_type": "newgtld",
-        "host": "whois.nic.monash"
-    },
-    "money": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.money"
-    },
-    "monster": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.monster"
-    },
-    "montblanc": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "mopar": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "mormon": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.mormon"
-    },
-    "mortgage": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.mortgage"
-    },
-    "moscow": {
-        "_type": "newgtld",
-        "host": "whois.nic.moscow"
-    },
-    "moto": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "motorcycles": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "mov": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "movie": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.movie"
-    },
-    "movistar": {
-        "_group": "knipp",
-        "_type": "newgtld",
-        "host": "whois-fe.movistar.tango.knipp.de"
-    },
-    "mp": {
-        "adapter": "none"
-    },
-    "mq": {
-        "host": "whois.mediaserv.net"
-    },
-    "mr": {
-        "adapter": "none",
-        "host": "whois.nic.mr"
-    },
-    "ms": {
-        "host": "whois.nic.ms"
-    },
-    "msd": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "mt": {
-        "adapter": "web",
-        "url": "https://www.nic.org.mt/dotmt/"
-    },
-    "mtn": {
-        "_type": "newgtld",
-        "host": "whois.nic.mtn"
-    },
-    "mtr": {
-        "_type": "newgtld",
-        "host": "whois.nic.mtr"
-    },
-    "mu": {
-        "host": "whois.nic.mu"
-    },
-    "museum": {
-        "host": "whois.nic.museum"
-    },
-    "mutual": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "mv": {
-        "adapter": "none"
-    },
-    "mw": {
-        "adapter": "web",
-        "url": "http://www.registrar.mw/"
-    },
-    "mx": {
-        "host": "whois.nic.mx"
-    },
-    "my": {
-        "host": "whois.mynic.my"
-    },
-    "mz": {
-        "host": "whois.nic.mz"
-    },
-    "na": {
-        "host": "whois.na-nic.com.na"
-    },
-    "nab": {
-        "_type": "newgtld",
-        "host": "whois.nic.nab"
-    },
-    "nadex": {
-        "_type": "newgtld",
-        "host": "whois.nic.nadex"
-    },
-    "nagoya": {
-        "_type": "newgtld",
-        "host": "whois.nic.nagoya"
-    },
-    "name": {
-        "host": "whois.nic.name",
-        "adapter": "formatted",
-        "format": "domain=%s"
-    },
-    "nationwide": {
-        "_type": "newgtld",
-        "host": "whois.nic.nationwide"
-    },
-    "natura": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "navy": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.navy"
-    },
-    "nba": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "nc": {
-        "host": "whois.nc"
-    },
-    "ne": {
-        "adapter": "none"
-    },
-    "nec": {
-        "_type": "newgtld",
-        "host": "whois.nic.nec"
-    },
-    "net": {
-        "host": "whois.verisign-grs.com",
-        "adapter": "verisign"
-    },
-    "gb.net": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "hu.net": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "in.net": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "jp.net": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "se.net": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "uk.net": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "za.net": {
-        "host": "whois.za.net"
-    },
-    "netbank": {
-        "_type": "newgtld",
-        "host": "whois.nic.netbank"
-    },
-    "netflix": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "network": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.network"
-    },
-    "neustar": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "new": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "newholland": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.newholland"
-    },
-    "news": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.news"
-    },
-    "next": {
-        "_type": "newgtld",
-        "host": "whois.nic.next"
-    },
-    "nextdirect": {
-        "_type": "newgtld",
-        "host": "whois.nic.nextdirect"
-    },
-    "nexus": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "nf": {
-        "host": "whois.nic.nf"
-    },
-    "nfl": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ng": {
-        "host": "whois.nic.net.ng"
-    },
-    "ngo": {
-        "_group": "publicinterestregistry",
-        "_type": "newgtld",
-        "host": "whois.publicinterestregistry.net"
-    },
-    "nhk": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ni": {
-        "adapter": "web",
-        "url": "http://www.nic.ni/"
-    },
-    "nico": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.nico"
-    },
-    "nike": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "nikon": {
-        "_type": "newgtld",
-        "host": "whois.nic.nikon"
-    },
-    "ninja": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.ninja"
-    },
-    "nissan": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.gmo"
-    },
-    "nissay": {
-        "_type": "newgtld",
-        "host": "whois.nic.nissay"
-    },
-    "nl": {
-        "host": "whois.domain-registry.nl"
-    },
-    "no": {
-        "host": "whois.norid.no"
-    },
-    "nokia": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "northwesternmutual": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "norton": {
-        "_type": "newgtld",
-        "host": "whois.nic.norton"
-    },
-    "now": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "nowruz": {
-        "_group": "agitsys",
-        "_type": "newgtld",
-        "host": "whois.agitsys.net"
-    },
-    "nowtv": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.nowtv"
-    },
-    "np": {
-        "adapter": "web",
-        "url": "http://register.mos.com.np/np-whois-lookup"
-    },
-    "nr": {
-        "adapter": "web",
-        "url": "http://www.cenpac.net.nr/dns/whois.html"
-    },
-    "nra": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "nrw": {
-        "_type": "newgtld",
-        "host": "whois.nic.nrw"
-    },
-    "ntt": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "nu": {
-        "host": "whois.iis.nu"
-    },
-    "nyc": {
-        "_type": "newgtld",
-        "host": "whois.nic.nyc"
-    },
-    "nz": {
-        "host": "whois.srs.net.nz"
-    },
-    "obi": {
-        "_type": "newgtld",
-        "host": "whois.nic.obi"
-    },
-    "observer": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.observer"
-    },
-    "off": {
-        "_type": "newgtld",
-        "host": "whois.nic.off"
-    },
-    "office": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "okinawa": {
-        "_type": "newgtld",
-        "host": "whois.nic.okinawa"
-    },
-    "olayan": {
-        "_type": "newgtld",
-        "host": "whois.nic.olayan"
-    },
-    "olayangroup": {
-        "_type": "newgtld",
-        "host": "whois.nic.olayangroup"
-    },
-    "oldnavy": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ollo": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.ollo"
-    },
-    "om": {
-        "host": "whois.registry.om"
-    },
-    "omega": {
-        "_type": "newgtld",
-        "host": "whois.nic.omega"
-    },
-    "one": {
-        "_type": "newgtld",
-        "host": "whois.nic.one"
-    },
-    "ong": {
-        "_group": "publicinterestregistry",
-        "_type": "newgtld",
-        "host": "whois.publicinterestregistry.net"
-    },
-    "onl": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "online": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.online"
-    },
-    "onyourside": {
-        "_type": "newgtld",
-        "host": "whois.nic.onyourside"
-    },
-    "ooo": {
-        "_type": "newgtld",
-        "host": "whois.nic.ooo"
-    },
-    "open": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "oracle": {
-        "_type": "newgtld",
-        "host": "whois.nic.oracle"
-    },
-    "orange": {
-        "_type": "newgtld",
-        "host": "whois.nic.orange"
-    },
-    "org": {
-        "host": "whois.pir.org"
-    },
-    "ae.org": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "eu.org": {
-        "host": "whois.eu.org"
-    },
-    "hk.org": {
-        "_group": "udrregistry",
-        "_type": "private",
-        "host": "whois.registry.hk.com"
-    },
-    "us.org": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "za.org": {
-        "host": "whois.za.org"
-    },
-    "organic": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "orientexpress": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "origin": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "origins": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.origins"
-    },
-    "osaka": {
-        "_type": "newgtld",
-        "host": "whois.nic.osaka"
-    },
-    "otsuka": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ott": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.ott"
-    },
-    "ovh": {
-        "_group": "nicfr",
-        "_type": "newgtld",
-        "host": "whois-ovh.nic.fr"
-    },
-    "pa": {
-        "adapter": "web",
-        "url": "http://www.nic.pa/"
-    },
-    "page": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "panasonic": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.gmo"
-    },
-    "paris": {
-        "_group": "nicfr",
-        "_type": "newgtld",
-        "host": "whois-paris.nic.fr"
-    },
-    "pars": {
-        "_group": "agitsys",
-        "_type": "newgtld",
-        "host": "whois.agitsys.net"
-    },
-    "partners": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.partners"
-    },
-    "parts": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.parts"
-    },
-    "party": {
-        "_type": "newgtld",
-        "host": "whois.nic.party"
-    },
-    "passagens": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "pay": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "pccw": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.pccw"
-    },
-    "pe": {
-        "host": "kero.yachay.pe"
-    },
-    "pet": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "pf": {
-        "host": "whois.registry.pf"
-    },
-    "pfizer": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "pg": {
-        "adapter": "none"
-    },
-    "ph": {
-        "adapter": "web",
-        "url": "http://www.dot.ph/whois"
-    },
-    "pharmacy": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "phd": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "philips": {
-        "_type": "newgtld",
-        "host": "whois.nic.philips"
-    },
-    "phone": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.phone"
-    },
-    "photo": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "photography": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.photography"
-    },
-    "photos": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.photos"
-    },
-    "physio": {
-        "_group": "aridnrs",
-        "_type": "newgtld",
-        "host": "whois.nic.physio"
-    },
-    "piaget": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "pics": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "pictet": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "pictures": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.pictures"
-    },
-    "pid": {
-        "_type": "newgtld",
-        "host": "whois.nic.pid"
-    },
-    "pin": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ping": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "pink": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "pioneer": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.gmo"
-    },
-    "pizza": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.pizza"
-    },
-    "pk": {
-        "adapter": "web",
-        "url": "http://www.pknic.net.pk/"
-    },
-    "pl": {
-        "host": "whois.dns.pl"
-    },
-    "co.pl": {
-        "host": "whois.co.pl"
-    },
-    "place": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.place"
-    },
-    "play": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "playstation": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.playstation"
-    },
-    "plumbing": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.plumbing"
-    },
-    "plus": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.plus"
-    },
-    "pm": {
-        "host": "whois.nic.pm"
-    },
-    "pn": {
-        "adapter": "web",
-        "url": "http://www.pitcairn.pn/PnRegistry/"
-    },
-    "pnc": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.pnc"
-    },
-    "pohl": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "poker": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "politie": {
-        "_type": "newgtld",
-        "host": "whois.nicpolitie"
-    },
-    "porn": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "post": {
-        "host": "whois.dotpostregistry.net"
-    },
-    "pr": {
-        "_group": "afiliassrs",
-        "host": "whois.afilias-srs.net"
-    },
-    "pramerica": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "praxi": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "press": {
-        "_type": "newgtld",
-        "host": "whois.nic.press"
-    },
-    "prime": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "pro": {
-        "host": "whois.afilias.net"
-    },
-    "prod": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "productions": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.productions"
-    },
-    "prof": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "progressive": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "promo": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "properties": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.properties"
-    },
-    "property": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "protection": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.centralnic.com"
-    },
-    "pru": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "prudential": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ps": {
-        "host": "whois.pnina.ps"
-    },
-    "pt": {
-        "host": "whois.dns.pt"
-    },
-    "pub": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.pub"
-    },
-    "pw": {
-        "host": "whois.nic.pw"
-    },
-    "pwc": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "py": {
-        "adapter": "web",
-        "url": "http://www.nic.py/consulta-datos.php"
-    },
-    "qa": {
-        "host": "whois.registry.qa"
-    },
-    "qpon": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "quebec": {
-        "_type": "newgtld",
-        "host": "whois.nic.quebec"
-    },
-    "quest": {
-        "_type": "newgtld",
-        "host": "whois.nic.quest"
-    },
-    "qvc": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "racing": {
-        "_type": "newgtld",
-        "host": "whois.nic.racing"
-    },
-    "radio": {
-        "_type": "newgtld",
-        "host": "whois.nic.radio"
-    },
-    "raid": {
-        "_type": "newgtld",
-        "host": "whois.nic.raid"
-    },
-    "re": {
-        "host": "whois.nic.re"
-    },
-    "read": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "realestate": {
-        "_type": "newgtld",
-        "host": "whois.nic.realestate"
-    },
-    "realtor": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "realty": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.realty"
-    },
-    "recipes": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.recipes"
-    },
-    "red": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "redstone": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.redstone"
-    },
-    "redumbrella": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "rehab": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.rehab"
-    },
-    "reise": {
-        "_type": "newgtld",
-        "host": "whois.nic.reise"
-    },
-    "reisen": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.reisen"
-    },
-    "reit": {
-        "_type": "newgtld",
-        "host": "whois.nic.reit"
-    },
-    "reliance": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.reliance"
-    },
-    "ren": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "rent": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.rent"
-    },
-    "rentals": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.rentals"
-    },
-    "repair": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.repair"
-    },
-    "report": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.report"
-    },
-    "republican": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.republican"
-    },
-    "rest": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.rest"
-    },
-    "restaurant": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.restaurant"
-    },
-    "review": {
-        "_type": "newgtld",
-        "host": "whois.nic.review"
-    },
-    "reviews": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.reviews"
-    },
-    "rexroth": {
-        "_type": "newgtld",
-        "host": "whois.nic.rexroth"
-    },
-    "rich": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "richardli": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.richardli"
-    },
-    "ricoh": {
-        "_type": "newgtld",
-        "host": "whois.nic.ricoh"
-    },
-    "rightathome": {
-        "_type": "newgtld",
-        "host": "whois.nic.rightathome"
-    },
-    "ril": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.ril"
-    },
-    "rio": {
-        "_group": "nicbr",
-        "_type": "newgtld",
-        "host": "whois.gtlds.nic.br"
-    },
-    "rip": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.rip"
-    },
-    "rmit": {
-        "_group": "aridnrs",
-        "_type": "newgtld",
-        "host": "whois.aridnrs.net.au"
-    },
-    "ro": {
-        "host": "whois.rotld.ro"
-    },
-    "rocher": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "rocks": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.rocks"
-    },
-    "rodeo": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.rodeo"
-    },
-    "rogers": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "room": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "rs": {
-        "host": "whois.rnids.rs"
-    },
-    "rsvp": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "ru": {
-        "host": "whois.tcinet.ru"
-    },
-    "edu.ru": {
-        "host": "whois.informika.ru"
-    },
-    "rugby": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.centralnic.com"
-    },
-    "ruhr": {
-        "_type": "newgtld",
-        "host": "whois.nic.ruhr"
-    },
-    "run": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.run"
-    },
-    "rw": {
-        "host": "whois.ricta.org.rw"
-    },
-    "rwe": {
-        "_type": "newgtld",
-        "host": "whois.nic.rwe"
-    },
-    "ryukyu": {
-        "_type": "newgtld",
-        "host": "whois.nic.ryukyu"
-    },
-    "sa": {
-        "host": "whois.nic.net.sa"
-    },
-    "saarland": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "safe": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "safety": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "sakura": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "sale": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.sale"
-    },
-    "salon": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.salon"
-    },
-    "samsclub": {
-        "_type": "newgtld",
-        "host": "whois.nic.samsclub"
-    },
-    "samsung": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--cg4bki"
-    },
-    "sandvik": {
-        "_type": "newgtld",
-        "host": "whois.nic.sandvik"
-    },
-    "sandvikcoromant": {
-        "_type": "newgtld",
-        "host": "whois.nic.sandvikcoromant"
-    },
-    "sanofi": {
-        "_type": "newgtld",
-        "host": "whois.nic.sanofi"
-    },
-    "sap": {
-        "_type": "newgtld",
-        "host": "whois.nic.sap"
-    },
-    "sarl": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.sarl"
-    },
-    "sas": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "save": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "saxo": {
-        "_group": "aridnrs",
-        "_type": "newgtld",
-        "host": "whois.aridnrs.net.au"
-    },
-    "sb": {
-        "host": "whois.nic.net.sb"
-    },
-    "sbi": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.sbi"
-    },
-    "sbs": {
-        "_type": "newgtld",
-        "host": "whois.nic.sbs"
-    },
-    "sc": {
-        "host": "whois.afilias-grs.info",
-        "adapter": "afilias"
-    },
-    "sca": {
-        "_type": "newgtld",
-        "host": "whois.nic.sca"
-    },
-    "scb": {
-        "_type": "newgtld",
-        "host": "whois.nic.scb"
-    },
-    "schaeffler": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "schmidt": {
-        "_type": "newgtld",
-        "host": "whois.nic.schmidt"
-    },
-    "scholarships": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.scholarships"
-    },
-    "school": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.school"
-    },
-    "schule": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.schule"
-    },
-    "schwarz": {
-        "_type": "newgtld",
-        "host": "whois.nic.schwarz"
-    },
-    "science": {
-        "_type": "newgtld",
-        "host": "whois.nic.science"
-    },
-    "scjohnson": {
-        "_type": "newgtld",
-        "host": "whois.nic.scjohnson"
-    },
-    "scor": {
-        "_type": "newgtld",
-        "host": "whois.nic.scor"
-    },
-    "scot": {
-        "_group": "coreregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.scot"
-    },
-    "sd": {
-        "adapter": "none"
-    },
-    "se": {
-        "host": "whois.iis.se"
-    },
-    "com.se": {
-        "_group": "centralnic",
-        "_type": "private",
-        "host": "whois.centralnic.com"
-    },
-    "search": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "seat": {
-        "_type": "newgtld",
-        "host": "whois.nic.seat"
-    },
-    "secure": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "security": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.security"
-    },
-    "seek": {
-        "_type": "newgtld",
-        "host": "whois.nic.seek"
-    },
-    "select": {
-        "_type": "newgtld",
-        "host": "whois.nic.select"
-    },
-    "sener": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "services": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.services"
-    },
-    "ses": {
-        "_type": "newgtld",
-        "host": "whois.nic.ses"
-    },
-    "seven": {
-        "_type": "newgtld",
-        "host": "whois.nic.seven"
-    },
-    "sew": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "sex": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "sexy": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "sfr": {
-        "_type": "newgtld",
-        "host": "whois.nic.sfr"
-    },
-    "sg": {
-        "host": "whois.sgnic.sg"
-    },
-    "sh": {
-        "host": "whois.nic.sh"
-    },
-    "shangrila": {
-        "_type": "newgtld",
-        "host": "whois.nic.shangrila"
-    },
-    "sharp": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.gmo"
-    },
-    "shaw": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "shell": {
-        "_type": "newgtld",
-        "host": "whois.nic.shell"
-    },
-    "shia": {
-        "_group": "agitsys",
-        "_type": "newgtld",
-        "host": "whois.agitsys.net"
-    },
-    "shiksha": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "shoes": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.shoes"
-    },
-    "shop": {
-        "_type": "newgtld",
-        "host": "whois.nic.shop"
-    },
-    "shopping": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.shopping"
-    },
-    "shouji": {
-        "_group": "teleinfo",
-        "_type": "newgtld",
-        "host": "whois.teleinfo.cn"
-    },
-    "show": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.show"
-    },
-    "showtime": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "shriram": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "si": {
-        "host": "whois.register.si"
-    },
-    "silk": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "sina": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.sina"
-    },
-    "singles": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.singles"
-    },
-    "site": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.site"
-    },
-    "sj": {
-        "adapter": "none"
-    },
-    "sk": {
-        "host": "whois.sk-nic.sk"
-    },
-    "ski": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "skin": {
-        "_type": "newgtld",
-        "host": "whois.nic.skin"
-    },
-    "sky": {
-        "_type": "newgtld",
-        "host": "whois.nic.sky"
-    },
-    "skype": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "sl": {
-        "host": "whois.nic.sl"
-    },
-    "sling": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.sling"
-    },
-    "sm": {
-        "host": "whois.nic.sm"
-    },
-    "smart": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.smart"
-    },
-    "smile": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "sn": {
-        "host": "whois.nic.sn"
-    },
-    "sncf": {
-        "_group": "nicfr",
-        "_type": "newgtld",
-        "host": "whois-sncf.nic.fr"
-    },
-    "so": {
-        "host": "whois.nic.so"
-    },
-    "soccer": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.soccer"
-    },
-    "social": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.social"
-    },
-    "softbank": {
-        "_type": "newgtld",
-        "host": "whois.nic.softbank"
-    },
-    "software": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.software"
-    },
-    "sohu": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "solar": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.solar"
-    },
-    "solutions": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.solutions"
-    },
-    "song": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "sony": {
-        "_type": "newgtld",
-        "host": "whois.nic.sony"
-    },
-    "soy": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "space": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.space"
-    },
-    "spiegel": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "sport": {
-        "_type": "newgtld",
-        "host": "whois.nic.sport"
-    },
-    "spot": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "spreadbetting": {
-        "_type": "newgtld",
-        "host": "whois.nic.spreadbetting"
-    },
-    "sr": {
-        "adapter": "none"
-    },
-    "srl": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "srt": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "st": {
-        "host": "whois.nic.st"
-    },
-    "stada": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "staples": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "star": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.star"
-    },
-    "starhub": {
-        "_type": "newgtld",
-        "host": "whois.nic.starhub"
-    },
-    "statebank": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.statebank"
-    },
-    "statefarm": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "stc": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.stc"
-    },
-    "stcgroup": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.stcgroup"
-    },
-    "stockholm": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "storage": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.storage"
-    },
-    "store": {
-        "_type": "newgtld",
-        "host": "whois.nic.store"
-    },
-    "stream": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "studio": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.studio"
-    },
-    "study": {
-        "_type": "newgtld",
-        "host": "whois.nic.study"
-    },
-    "style": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.style"
-    },
-    "su": {
-        "host": "whois.tcinet.ru"
-    },
-    "sucks": {
-        "_type": "newgtld",
-        "host": "whois.nic.sucks"
-    },
-    "supplies": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.supplies"
-    },
-    "supply": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.supply"
-    },
-    "support": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.support"
-    },
-    "surf": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.surf"
-    },
-    "surgery": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.surgery"
-    },
-    "suzuki": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "sv": {
-        "adapter": "web",
-        "url": "http://www.svnet.org.sv/"
-    },
-    "swatch": {
-        "_type": "newgtld",
-        "host": "whois.nic.swatch"
-    },
-    "swiftcover": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "swiss": {
-        "_type": "newgtld",
-        "host": "whois.nic.swiss"
-    },
-    "sx": {
-        "host": "whois.sx"
-    },
-    "sy": {
-        "host": "whois.tld.sy"
-    },
-    "sydney": {
-        "_type": "newgtld",
-        "host": "whois.nic.sydney"
-    },
-    "symantec": {
-        "_type": "newgtld",
-        "host": "whois.nic.symantec"
-    },
-    "systems": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.systems"
-    },
-    "sz": {
-        "adapter": "none"
-    },
-    "tab": {
-        "_type": "newgtld",
-        "host": "whois.nic.tab"
-    },
-    "taipei": {
-        "_type": "newgtld",
-        "host": "whois.nic.taipei"
-    },
-    "talk": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "taobao": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "target": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "tatamotors": {
-        "_type": "newgtld",
-        "host": "whois.nic.tatamotors"
-    },
-    "tatar": {
-        "_type": "newgtld",
-        "host": "whois.nic.tatar"
-    },
-    "tattoo": {
-        "_group": "uniregistry",
-        "_type": "newgtld",
-        "host": "whois.uniregistry.net"
-    },
-    "tax": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.tax"
-    },
-    "taxi": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.taxi"
-    },
-    "tc": {
-        "host": "whois.nic.tc"
-    },
-    "tci": {
-        "_group": "agitsys",
-        "_type": "newgtld",
-        "host": "whois.agitsys.net"
-    },
-    "td": {
-        "adapter": "web",
-        "url": "http://www.nic.td/"
-    },
-    "tdk": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "team": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.team"
-    },
-    "tech": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.tech"
-    },
-    "technology": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.technology"
-    },
-    "tel": {
-        "host": "whois.nic.tel"
-    },
-    "telefonica": {
-        "_group": "knipp",
-        "_type": "newgtld",
-        "host": "whois-fe.telefonica.tango.knipp.de"
-    },
-    "temasek": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "tennis": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.tennis"
-    },
-    "teva": {
-        "_type": "newgtld",
-        "host": "whois.nic.teva"
-    },
-    "tf": {
-        "host": "whois.nic.fr"
-    },
-    "tg": {
-        "host": "whois.nic.tg"
-    },
-    "th": {
-        "host": "whois.thnic.co.th"
-    },
-    "thd": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.thd"
-    },
-    "theater": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.theater"
-    },
-    "theatre": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.theatre"
-    },
-    "tiaa": {
-        "_type": "newgtld",
-        "host": "whois.nic.tiaa"
-    },
-    "tickets": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.tickets"
-    },
-    "tienda": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.tienda"
-    },
-    "tiffany": {
-        "_type": "newgtld",
-        "host": "whois.nic.tiffany"
-    },
-    "tiia": {
-        "host": "whois.nic.tiia"
-    },
-    "tips": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.tips"
-    },
-    "tires": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.tires"
-    },
-    "tirol": {
-        "_type": "newgtld",
-        "host": "whois.nic.tirol"
-    },
-    "tj": {
-        "adapter": "web",
-        "url": "http://www.nic.tj/whois.html"
-    },
-    "tjmaxx": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "tjx": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "tk": {
-        "host": "whois.dot.tk"
-    },
-    "tkmaxx": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "tl": {
-        "host": "whois.nic.tl"
-    },
-    "tm": {
-        "host": "whois.nic.tm"
-    },
-    "tmall": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "tn": {
-        "host": "whois.ati.tn"
-    },
-    "to": {
-        "host": "whois.tonic.to"
-    },
-    "today": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.today"
-    },
-    "tokyo": {
-        "_type": "newgtld",
-        "host": "whois.nic.tokyo"
-    },
-    "tools": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.tools"
-    },
-    "top": {
-        "_type": "newgtld",
-        "host": "whois.nic.top"
-    },
-    "toray": {
-        "_type": "newgtld",
-        "host": "whois.nic.toray"
-    },
-    "toshiba": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.toshiba"
-    },
-    "total": {
-        "_group": "nicfr",
-        "_type": "newgtld",
-        "host": "whois-total.nic.fr"
-    },
-    "tours": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.tours"
-    },
-    "town": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.town"
-    },
-    "toyota": {
-        "_type": "newgtld",
-        "host": "whois.nic.toyota"
-    },
-    "toys": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.toys"
-    },
-    "tr": {
-        "host": "whois.nic.tr"
-    },
-    "trade": {
-        "_type": "newgtld",
-        "host": "whois.nic.trade"
-    },
-    "trading": {
-        "_type": "newgtld",
-        "host": "whois.nic.trading"
-    },
-    "training": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.training"
-    },
-    "travel": {
-        "host": "whois.nic.travel"
-    },
-    "travelchannel": {
-        "_type": "newgtld",
-        "host": "whois.nic.travelchannel"
-    },
-    "travelers": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "travelersinsurance": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "trust": {
-        "_type": "newgtld",
-        "host": "whois.nic.trust"
-    },
-    "trv": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "tt": {
-        "adapter": "web",
-        "url": "http://www.nic.tt/cgi-bin/search.pl"
-    },
-    "tube": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "tui": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "tunes": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "tushu": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "tv": {
-        "host": "tvwhois.verisign-grs.com",
-        "adapter": "verisign"
-    },
-    "tvs": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.tvs"
-    },
-    "tw": {
-        "host": "whois.twnic.net.tw"
-    },
-    "tz": {
-        "host": "whois.tznic.or.tz"
-    },
-    "ua": {
-        "host": "whois.ua"
-    },
-    "in.ua": {
-        "host": "whois.in.ua"
-    },
-    "ubank": {
-        "_type": "newgtld",
-        "host": "whois.nic.ubank"
-    },
-    "ubs": {
-        "_type": "newgtld",
-        "host": "whois.nic.ubs"
-    },
-    "uconnect": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "ug": {
-        "host": "whois.co.ug"
-    },
-    "uk": {
-        "host": "whois.nic.uk"
-    },
-    "ac.uk": {
-        "host": "whois.ja.net"
-    },
-    "bl.uk": {
-        "adapter": "none"
-    },
-    "british-library.uk": {
-        "adapter": "none"
-    },
-    "gov.uk": {
-        "host": "whois.ja.net"
-    },
-    "icnet.uk": {
-        "adapter": "none"
-    },
-    "jet.uk": {
-        "adapter": "none"
-    },
-    "mod.uk": {
-        "adapter": "none"
-    },
-    "nhs.uk": {
-        "adapter": "none"
-    },
-    "nls.uk": {
-        "adapter": "none"
-    },
-    "parliament.uk": {
-        "adapter": "none"
-    },
-    "police.uk": {
-        "adapter": "none"
-    },
-    "unicom": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "university": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.university"
-    },
-    "uno": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "uol": {
-        "_group": "nicbr",
-        "_type": "newgtld",
-        "host": "whois.gtlds.nic.br"
-    },
-    "ups": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.ups"
-    },
-    "us": {
-        "host": "whois.nic.us"
-    },
-    "uy": {
-        "host": "whois.nic.org.uy"
-    },
-    "com.uy": {
-        "adapter": "web",
-        "url": "https://nic.anteldata.com.uy/dns/consultaWhois/whois.action"
-    },
-    "uz": {
-        "host": "whois.cctld.uz"
-    },
-    "va": {
-        "adapter": "none"
-    },
-    "vacations": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.vacations"
-    },
-    "vana": {
-        "_type": "newgtld",
-        "host": "whois.nic.vana"
-    },
-    "vanguard": {
-        "_type": "newgtld",
-        "host": "whois.nic.vanguard"
-    },
-    "vc": {
-        "host": "whois.afilias-grs.info",
-        "adapter": "afilias"
-    },
-    "ve": {
-        "host": "whois.nic.ve"
-    },
-    "vegas": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "ventures": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.ventures"
-    },
-    "verisign": {
-        "_type": "newgtld",
-        "host": "whois.nic.verisign"
-    },
-    "versicherung": {
-        "_type": "newgtld",
-        "host": "whois.nic.versicherung"
-    },
-    "vet": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.vet"
-    },
-    "vg": {
-        "host": "whois.nic.vg"
-    },
-    "vi": {
-        "adapter": "web",
-        "url": "https://secure.nic.vi/whois-lookup/"
-    },
-    "viajes": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.viajes"
-    },
-    "video": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.video"
-    },
-    "vig": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "viking": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "villas": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.villas"
-    },
-    "vin": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.vin"
-    },
-    "vip": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.vip"
-    },
-    "virgin": {
-        "_type": "newgtld",
-        "host": "whois.nic.virgin"
-    },
-    "visa": {
-        "_type": "newgtld",
-        "host": "whois.nic.visa"
-    },
-    "vision": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.vision"
-    },
-    "vistaprint": {
-        "_type": "newgtld",
-        "host": "whois.nic.vistaprint"
-    },
-    "viva": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.viva"
-    },
-    "vivo": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "vlaanderen": {
-        "_type": "newgtld",
-        "host": "whois.nic.vlaanderen"
-    },
-    "vn": {
-        "adapter": "web",
-        "url": "http://www.vnnic.vn/en/domain"
-    },
-    "vodka": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.vodka"
-    },
-    "volkswagen": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "volvo": {
-        "_type": "newgtld",
-        "host": "whois.nic.volvo"
-    },
-    "vote": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "voting": {
-        "_type": "newgtld",
-        "host": "whois.voting.tld-box.at"
-    },
-    "voto": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "voyage": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.voyage"
-    },
-    "vu": {
-        "host": "vunic.vu"
-    },
-    "vuelos": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "wales": {
-        "_type": "newgtld",
-        "host": "whois.nic.wales"
-    },
-    "walmart": {
-        "_type": "newgtld",
-        "host": "whois.nic.walmart"
-    },
-    "walter": {
-        "_type": "newgtld",
-        "host": "whois.nic.walter"
-    },
-    "wang": {
-        "_group": "knet",
-        "_type": "newgtld",
-        "host": "whois.gtld.knet.cn"
-    },
-    "wanggou": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "warman": {
-        "_type": "newgtld",
-        "host": "whois.nic.warman"
-    },
-    "watch": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.watch"
-    },
-    "watches": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "weather": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "weatherchannel": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "webcam": {
-        "_type": "newgtld",
-        "host": "whois.nic.webcam"
-    },
-    "weber": {
-        "_type": "newgtld",
-        "host": "whois.nic.weber"
-    },
-    "website": {
-        "_type": "newgtld",
-        "host": "whois.nic.website"
-    },
-    "wed": {
-        "_type": "newgtld",
-        "host": "whois.nic.wed"
-    },
-    "wedding": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.wedding"
-    },
-    "weibo": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.weibo"
-    },
-    "weir": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "wf": {
-        "host": "whois.nic.wf"
-    },
-    "whoswho": {
-        "_type": "newgtld",
-        "host": "whois.nic.whoswho"
-    },
-    "wien": {
-        "_type": "newgtld",
-        "host": "whois.nic.wien"
-    },
-    "wiki": {
-        "_type": "newgtld",
-        "host": "whois.nic.wiki"
-    },
-    "williamhill": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "win": {
-        "_type": "newgtld",
-        "host": "whois.nic.win"
-    },
-    "windows": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "wine": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.wine"
-    },
-    "winners": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "wme": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.wme"
-    },
-    "wolterskluwer": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.wolterskluwer"
-    },
-    "woodside": {
-        "_type": "newgtld",
-        "host": "whois.nic.woodside"
-    },
-    "work": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.work"
-    },
-    "works": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.works"
-    },
-    "world": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.world"
-    },
-    "wow": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ws": {
-        "host": "whois.website.ws"
-    },
-    "wtc": {
-        "_type": "newgtld",
-        "host": "whois.nic.wtc"
-    },
-    "wtf": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.wtf"
-    },
-    "xbox": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xerox": {
-        "_type": "newgtld",
-        "host": "whois.nic.xerox"
-    },
-    "xfinity": {
-        "_type": "newgtld",
-        "host": "whois.nic.xfinity"
-    },
-    "xihuan": {
-        "_group": "teleinfo",
-        "_type": "newgtld",
-        "host": "whois.teleinfo.cn"
-    },
-    "xin": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.xin"
-    },
-    "xn--11b4c3d": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--11b4c3d"
-    },
-    "xn--1ck2e1b": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--1qqw23a": {
-        "_group": "ngtld",
-        "_type": "newgtld",
-        "host": "whois.ngtld.cn"
-    },
-    "xn--2scrj9c": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--30rr7y": {
-        "_group": "knet",
-        "_type": "newgtld",
-        "host": "whois.gtld.knet.cn"
-    },
-    "xn--3bst00m": {
-        "_group": "knet",
-        "_type": "newgtld",
-        "host": "whois.gtld.knet.cn"
-    },
-    "xn--3ds443g": {
-        "_group": "teleinfo",
-        "_type": "newgtld",
-        "host": "whois.teleinfo.cn"
-    },
-    "xn--3e0b707e": {
-        "host": "whois.kr"
-    },
-    "xn--3oq18vl8pn36a": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.xn--3oq18vl8pn36a"
-    },
-    "xn--3pxu8k": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--3pxu8k"
-    },
-    "xn--42c2d9a": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--42c2d9a"
-    },
-    "xn--45br5cyl": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--45brj9c": {
-        "host": "whois.inregistry.net"
-    },
-    "xn--45q11c": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--4gbrim": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "xn--54b7fta0cc": {
-        "adapter": "none"
-    },
-    "xn--55qw42g": {
-        "_type": "newgtld",
-        "host": "whois.conac.cn"
-    },
-    "xn--55qx5d": {
-        "_group": "ngtld",
-        "_type": "newgtld",
-        "host": "whois.ngtld.cn"
-    },
-    "xn--5su34j936bgsg": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--5su34j936bgsg"
-    },
-    "xn--5tzm5g": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "adapter": "none",
-        "host": "whois.nic.xn--5tzm5g"
-    },
-    "xn--6frz82g": {
-        "_group": "afilias",
-        "_type": "newgtld",
-        "host": "whois.afilias.net"
-    },
-    "xn--6qq986b3xl": {
-        "_group": "knet",
-        "_type": "newgtld",
-        "host": "whois.gtld.knet.cn"
-    },
-    "xn--80adxhks": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--80adxhks"
-    },
-    "xn--80ao21a": {
-        "host": "whois.nic.kz"
-    },
-    "xn--80aqecdr1a": {
-        "_group": "aridnrs",
-        "_type": "newgtld",
-        "host": "whois.aridnrs.net.au"
-    },
-    "xn--80asehdb": {
-        "_group": "corenic",
-        "_type": "newgtld",
-        "host": "whois.online.rs.corenic.net"
-    },
-    "xn--80aswg": {
-        "_group": "corenic",
-        "_type": "newgtld",
-        "host": "whois.online.rs.corenic.net"
-    },
-    "xn--8y0a063a": {
-        "_type": "newgtld",
-        "host": "whois.imena.bg"
-    },
-    "xn--90a3ac": {
-        "host": "whois.rnids.rs"
-    },
-    "xn--90ae": {
-        "adapter": "none"
-    },
-    "xn--90ais": {
-        "host": "whois.cctld.by"
-    },
-    "xn--9dbq2a": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--9dbq2a"
-    },
-    "xn--9et52u": {
-        "_group": "knet",
-        "_type": "newgtld",
-        "host": "whois.gtld.knet.cn"
-    },
-    "xn--9krt00a": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.xn--9krt00a"
-    },
-    "xn--b4w605ferd": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "xn--bck1b9a5dre4c": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--c1avg": {
-        "_group": "publicinterestregistry",
-        "_type": "newgtld",
-        "host": "whois.publicinterestregistry.net"
-    },
-    "xn--c2br7g": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--c2br7g"
-    },
-    "xn--cck2b3b": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--cg4bki": {
-        "_type": "newgtld",
-        "host": "whois.kr"
-    },
-    "xn--clchc0ea0b2g2a9gcd": {
-        "host": "whois.sgnic.sg"
-    },
-    "xn--czrs0t": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.xn--czrs0t"
-    },
-    "xn--czru2d": {
-        "_group": "knet",
-        "_type": "newgtld",
-        "host": "whois.gtld.knet.cn"
-    },
-    "xn--d1acj3b": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--d1acj3b"
-    },
-    "xn--d1alf": {
-        "host": "whois.marnet.mk"
-    },
-    "xn--e1a4c": {
-        "host": "whois.eu"
-    },
-    "xn--eckvdtc9d": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--efvy88h": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--efvy88h"
-    },
-    "xn--estv75g": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.xn--estv75g"
-    },
-    "xn--fct429k": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--fhbei": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--fhbei"
-    },
-    "xn--fiq228c5hs": {
-        "_group": "teleinfo",
-        "_type": "newgtld",
-        "host": "whois.teleinfo.cn"
-    },
-    "xn--fiq64b": {
-        "_type": "newgtld",
-        "host": "whois.gtld.knet.cn"
-    },
-    "xn--fiqs8s": {
-        "host": "cwhois.cnnic.cn"
-    },
-    "xn--fiqz9s": {
-        "host": "cwhois.cnnic.cn"
-    },
-    "xn--fjq720a": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.xn--fjq720a"
-    },
-    "xn--flw351e": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "xn--fpcrj9c3d": {
-        "host": "whois.inregistry.net"
-    },
-    "xn--fzc2c9e2c": {
-        "host": "whois.nic.lk"
-    },
-    "xn--fzys8d69uvgm": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.xn--fzys8d69uvgm"
-    },
-    "xn--g2xx48c": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "xn--gckr3f0f": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--gecrj9c": {
-        "host": "whois.inregistry.net"
-    },
-    "xn--gk3at1e": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--h2breg3eve": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--h2brj9c": {
-        "host": "whois.inregistry.net"
-    },
-    "xn--h2brj9c8c": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--hxt814e": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--hxt814e"
-    },
-    "xn--i1b6b1a6a2e": {
-        "_group": "publicinterestregistry",
-        "_type": "newgtld",
-        "host": "whois.publicinterestregistry.net"
-    },
-    "xn--imr513n": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--io0a7i": {
-        "_group": "ngtld",
-        "_type": "newgtld",
-        "host": "whois.ngtld.cn"
-    },
-    "xn--j1aef": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--j1aef"
-    },
-    "xn--j1amh": {
-        "host": "whois.dotukr.com"
-    },
-    "xn--j6w193g": {
-        "host": "whois.hkirc.hk"
-    },
-    "xn--jlq61u9w7b": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.xn--jlq61u9w7b"
-    },
-    "xn--jvr189m": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--kcrx77d1x4a": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--kcrx77d1x4a"
-    },
-    "xn--kprw13d": {
-        "host": "whois.twnic.net.tw"
-    },
-    "xn--kpry57d": {
-        "host": "whois.twnic.net.tw"
-    },
-    "xn--kpu716f": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--kput3i": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.nic.xn--kput3i"
-    },
-    "xn--l1acc": {
-        "adapter": "none"
-    },
-    "xn--lgbbat1ad8j": {
-        "host": "whois.nic.dz"
-    },
-    "xn--mgb9awbf": {
-        "host": "whois.registry.om"
-    },
-    "xn--mgba3a3ejt": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--mgba3a4f16a": {
-        "host": "whois.nic.ir"
-    },
-    "xn--mgba7c0bbn0a": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--mgba7c0bbn0a"
-    },
-    "xn--mgbaakc7dvf": {
-        "_group": "centralnic",
-        "host": "whois.centralnic.com"
-    },
-    "xn--mgbaam7a8h": {
-        "host": "whois.aeda.net.ae"
-    },
-    "xn--mgbab2bd": {
-        "_group": "coreregistry",
-        "_type": "newgtld",
-        "host": "whois.bazaar.coreregistry.net"
-    },
-    "xn--mgbai9azgqp6j": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--mgbayh7gpa": {
-        "adapter": "web",
-        "url": "http://idn.jo/whois_a.aspx"
-    },
-    "xn--mgbb9fbpob": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--mgbbh1a": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--mgbbh1a71e": {
-        "host": "whois.inregistry.net"
-    },
-    "xn--mgbc0a9azcg": {
-        "adapter": "none"
-    },
-    "xn--mgbca7dzdo": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "xn--mgberp4a5d4ar": {
-        "host": "whois.nic.net.sa"
-    },
-    "xn--mgbgu82a": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--mgbi4ecexp": {
-        "_group": "aridnrs",
-        "_type": "newgtld",
-        "host": "whois.aridnrs.net.au"
-    },
-    "xn--mgbpl2fh": {
-        "adapter": "none"
-    },
-    "xn--mgbt3dhd": {
-        "_group": "agitsys",
-        "_type": "newgtld",
-        "host": "whois.agitsys.net"
-    },
-    "xn--mgbtx2b": {
-        "host": "whois.cmc.iq"
-    },
-    "xn--mgbx4cd0ab": {
-        "host": "whois.mynic.my"
-    },
-    "xn--mix891f": {
-        "host": "whois.monic.mo"
-    },
-    "xn--mk1bu44c": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--mk1bu44c"
-    },
-    "xn--mxtq1m": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--mxtq1m"
-    },
-    "xn--ngbc5azd": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--ngbc5azd"
-    },
-    "xn--ngbe9e0a": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.xn--ngbe9e0a"
-    },
-    "xn--node": {
-        "host": "whois.itdc.ge"
-    },
-    "xn--nqv7f": {
-        "_group": "publicinterestregistry",
-        "_type": "newgtld",
-        "host": "whois.publicinterestregistry.net"
-    },
-    "xn--nqv7fs00ema": {
-        "_group": "publicinterestregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.xn--nqv7fs00ema"
-    },
-    "xn--nyqy26a": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--o3cw4h": {
-        "host": "whois.thnic.co.th"
-    },
-    "xn--ogbpf8fl": {
-        "host": "whois.tld.sy"
-    },
-    "xn--otu796d": {
-        "adapter": "none"
-    },
-    "xn--p1acf": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--p1acf"
-    },
-    "xn--p1ai": {
-        "host": "whois.tcinet.ru"
-    },
-    "xn--pbt977c": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--pgbs0dh": {
-        "adapter": "none"
-    },
-    "xn--pssy2u": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--pssy2u"
-    },
-    "xn--q9jyb4c": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "xn--qcka1pmc": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "xn--qxam": {
-        "adapter": "web",
-        "url": "https://grweb.ics.forth.gr/public/whois.jsp?lang=en"
-    },
-    "xn--rhqv96g": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--rovu88b": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--rvc1e0am3e": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "xn--s9brj9c": {
-        "host": "whois.inregistry.net"
-    },
-    "xn--ses554g": {
-        "_type": "newgtld",
-        "host": "whois.registry.knet.cn"
-    },
-    "xn--t60b56a": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--t60b56a"
-    },
-    "xn--tckwe": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--tckwe"
-    },
-    "xn--tiq49xqyj": {
-        "_group": "aridnrs",
-        "_type": "newgtld",
-        "host": "whois.aridnrs.net.au"
-    },
-    "xn--unup4y": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.xn--unup4y"
-    },
-    "xn--vermgensberater-ctb": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "xn--vermgensberatung-pwb": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "xn--vhquv": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.xn--vhquv"
-    },
-    "xn--vuq861b": {
-        "_group": "ngtld",
-        "_type": "newgtld",
-        "host": "whois.teleinfo.cn"
-    },
-    "xn--w4r85el8fhu5dnra": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--w4r85el8fhu5dnra"
-    },
-    "xn--w4rs40l": {
-        "_type": "newgtld",
-        "host": "whois.nic.xn--w4rs40l"
-    },
-    "xn--wgbh1c": {
-        "host": "whois.dotmasr.eg"
-    },
-    "xn--wgbl6a": {
-        "host": "whois.registry.qa"
-    },
-    "xn--xhq521b": {
-        "_group": "teleinfo",
-        "_type": "newgtld",
-        "host": "whois.teleinfo.cn"
-    },
-    "xn--xkc2al3hye2a": {
-        "host": "whois.nic.lk"
-    },
-    "xn--xkc2dl3a5ee0h": {
-        "host": "whois.inregistry.net"
-    },
-    "xn--y9a3aq": {
-        "host": "whois.amnic.net"
-    },
-    "xn--yfro4i67o": {
-        "host": "whois.sgnic.sg"
-    },
-    "xn--ygbi2ammx": {
-        "host": "whois.pnina.ps"
-    },
-    "xn--zfr164b": {
-        "_type": "newgtld",
-        "host": "whois.conac.cn"
-    },
-    "xxx": {
-        "host": "whois.nic.xxx"
-    },
-    "xyz": {
-        "_group": "centralnic",
-        "_type": "newgtld",
-        "host": "whois.nic.xyz"
-    },
-    "yachts": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "yahoo": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "yamaxun": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "yandex": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "ye": {
-        "adapter": "none"
-    },
-    "yodobashi": {
-        "_group": "gmo",
-        "_type": "newgtld",
-        "host": "whois.nic.gmo"
-    },
-    "yoga": {
-        "_group": "mmregistry",
-        "_type": "newgtld",
-        "host": "whois.nic.yoga"
-    },
-    "yokohama": {
-        "_type": "newgtld",
-        "host": "whois.nic.yokohama"
-    },
-    "you": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "youtube": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "yt": {
-        "host": "whois.nic.yt"
-    },
-    "yun": {
-        "_group": "teleinfo",
-        "_type": "newgtld",
-        "host": "whois.teleinfo.cn"
-    },
-    "za": {
-        "adapter": "none"
-    },
-    "ac.za": {
-        "host": "whois.ac.za"
-    },
-    "alt.za": {
-        "host": "whois.alt.za"
-    },
-    "co.za": {
-        "host": "coza-whois.registry.net.za"
-    },
-    "gov.za": {
-        "host": "whois.gov.za"
-    },
-    "net.za": {
-        "host": "net-whois.registry.net.za"
-    },
-    "org.za": {
-        "host": "org-whois.registry.net.za"
-    },
-    "web.za": {
-        "host": "web-whois.registry.net.za"
-    },
-    "zappos": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "zara": {
-        "_group": "afiliassrs",
-        "_type": "newgtld",
-        "host": "whois.afilias-srs.net"
-    },
-    "zero": {
-        "_group": "amazonregistry",
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "zip": {
-        "_group": "google",
-        "_type": "newgtld",
-        "host": "whois.nic.google"
-    },
-    "zippo": {
-        "_type": "newgtld",
-        "adapter": "none"
-    },
-    "zm": {
-        "host": "whois.nic.zm"
-    },
-    "zone": {
-        "_group": "donuts",
-        "_type": "newgtld",
-        "host": "whois.nic.zone"
-    },
-    "zuerich": {
-        "_group": "ksregistry",
-        "_type": "newgtld",
-        "host": "whois.ksregistry.net"
-    },
-    "zw": {
-        "adapter": "none"
-    }
-}
+# The root WHOIS server of every TLD, a "<tld> <server>" entry per line. The TLDs listed without a server have no WHOIS
+# server and are not supported. The table is parsed on the first lookup, see get_tld_servers.
+TLD_SERVERS = """
+aaa
+aarp whois.nic.aarp
+abarth whois.afilias-srs.net
+abb
+abbott whois.afilias-srs.net
+abbvie whois.afilias-srs.net
+abc whois.nic.abc
+able
+abogado whois.nic.abogado
+abudhabi whois.nic.abudhabi
+ac whois.nic.ac
+academy whois.nic.academy
+accenture
+accountant whois.nic.accountant
+accountants whois.nic.accountants
+aco whois.afilias-srs.net
+active whois.afilias-srs.net
+actor whois.nic.actor
+ad
+adac
+ads whois.nic.google
+adult whois.afilias-srs.net
+ae whois.aeda.net.ae
+aeg whois.nic.aeg
+aero whois.aero
+aetna
+af whois.nic.af
+afamilycompany whois.nic.afamilycompany
+afl whois.nic.afl
+africa africa-whois.registry.net.za
+ag whois.nic.ag
+agakhan whois.afilias-srs.net
+agency whois.nic.agency
+ai whois.nic.ai
+aig
+aigo whois.afilias-srs.net
+airbus whois.nic.airbus
+airforce whois.nic.airforce
+airtel whois.nic.airtel
+akdn whois.afilias-srs.net
+al
+alfaromeo whois.afilias-srs.net
+alibaba whois.nic.alibaba
+alipay whois.nic.alipay
+allfinanz whois.ksregistry.net
+allstate whois.afilias-srs.net
+ally whois.nic.ally
+alsace whois-alsace.nic.fr
+alstom whois.nic.alstom
+am whois.amnic.net
+americanexpress
+americanfamily whois.nic.americanfamily
+amex
+amfam whois.nic.amfam
+amica
+amsterdam whois.nic.amsterdam
+analytics
+android whois.nic.google
+anquan whois.teleinfo.cn
+anz whois.nic.anz
+ao
+aol whois.nic.aol
+apartments whois.nic.apartments
+app whois.nic.google
+apple whois.afilias-srs.net
+aq
+aquarelle whois-aquarelle.nic.fr
+ar whois.nic.ar
+aramco
+archi whois.afilias.net
+army whois.nic.army
+arpa whois.iana.org
+e164.arpa whois.ripe.net
+in-addr.arpa
+art whois.nic.art
+arte whois.nic.arte
+as whois.nic.as
+asda whois.nic.asda
+asia whois.nic.asia
+associates whois.nic.associates
+at whois.nic.at
+priv.at whois.nic.priv.at
+athleta
+attorney whois.nic.attorney
+au whois.auda.org.au
+auction whois.nic.auction
+audi whois.afilias-srs.net
+audible
+audio whois.uniregistry.net
+auspost whois.nic.auspost
+author
+auto whois.uniregistry.net
+autos whois.afilias.net
+avianca whois.afilias-srs.net
+aw whois.nic.aw
+aws
+ax whois.ax
+axa
+az
+azure
+ba
+baby
+baidu whois.gtld.knet.cn
+banamex
+bananarepublic
+band whois.nic.band
+bank whois.nic.bank
+bar whois.nic.bar
+barcelona whois.nic.barcelona
+barclaycard whois.nic.barclaycard
+barclays whois.nic.barclays
+barefoot whois.nic.barefoot
+bargains whois.nic.bargains
+baseball
+basketball whois.nic.basketball
+bauhaus whois.nic.bauhaus
+bayern whois.nic.bayern
+bb
+bbc whois.nic.bbc
+bbt whois.nic.bbt
+bbva whois.nic.bbva
+bcg whois.nic.bcg
+bcn whois.nic.bcn
+bd
+be whois.dns.be
+beats whois.afilias-srs.net
+beauty whois.nic.beauty
+beer whois.nic.beer
+bentley whois.nic.bentley
+berlin whois.nic.berlin
+best whois.nic.best
+bestbuy whois.nic.bestbuy
+bet whois.afilias.net
+bf
+bg whois.register.bg
+bh
+bharti
+bi whois1.nic.bi
+bible whois.nic.bible
+bid whois.nic.bid
+bike whois.nic.bike
+bing
+bingo whois.nic.bingo
+bio whois.afilias.net
+biz whois.biz
+bj whois.nic.bj
+black whois.afilias.net
+blackfriday whois.uniregistry.net
+blanco whois.nic.blanco
+blockbuster whois.nic.blockbuster
+blog whois.nic.blog
+bloomberg
+blue whois.afilias.net
+bm
+bms whois.nic.bms
+bmw whois.ksregistry.net
+bn whois.bnnic.bn
+bnl whois.nic.bnl
+bnpparibas whois.afilias-srs.net
+bo whois.nic.bo
+boats whois.afilias-srs.net
+boehringer whois.afilias-srs.net
+bofa whois.nic.bofa
+bom whois.gtlds.nic.br
+bond whois.nic.bond
+boo whois.nic.google
+book
+booking
+bosch whois.nic.bosch
+bostik whois-bostik.nic.fr
+boston whois.nic.boston
+bot
+boutique whois.nic.boutique
+box whois.aridnrs.net.au
+br whois.registro.br
+bradesco whois.nic.bradesco
+bridgestone whois.nic.bridgestone
+broadway whois.nic.broadway
+broker whois.nic.broker
+brother whois.nic.brother
+brussels whois.nic.brussels
+bs
+bt
+budapest whois-dub.mm-registry.com
+bugatti whois.afilias-srs.net
+build whois.nic.build
+builders whois.nic.builders
+business whois.nic.business
+buy whois.afilias-srs.net
+buzz whois.nic.buzz
+bv
+bw whois.nic.net.bw
+by whois.cctld.by
+bz whois.afilias-grs.info
+za.bz whois.centralnic.com
+bzh whois.nic.bzh
+ca whois.cira.ca
+co.ca whois.co.ca
+cab whois.nic.cab
+cafe whois.nic.cafe
+cal whois.nic.google
+call
+calvinklein
+cam whois.ksregistry.net
+camera whois.nic.camera
+camp whois.nic.camp
+cancerresearch whois.nic.cancerresearch
+canon whois.nic.canon
+capetown capetown-whois.registry.net.za
+capital whois.nic.capital
+capitalone whois.nic.capitalone
+car whois.uniregistry.net
+caravan
+cards whois.nic.cards
+care whois.nic.care
+career whois.nic.career
+careers whois.nic.careers
+cars whois.uniregistry.net
+cartier
+casa whois.nic.casa
+case whois.nic.case
+caseih whois.nic.caseih
+cash whois.nic.cash
+casino whois.nic.casino
+cat whois.nic.cat
+catering whois.nic.catering
+catholic whois.aridnrs.net.au
+cba whois.nic.cba
+cbn
+cbre
+cbs whois.afilias-srs.net
+cc ccwhois.verisign-grs.com
+cd whois.nic.cd
+ceb whois.afilias-srs.net
+center whois.nic.center
+ceo whois.nic.ceo
+cern whois.afilias-srs.net
+cf whois.dot.cf
+cfa whois.nic.cfa
+cfd whois.nic.cfd
+cg
+ch whois.nic.ch
+chanel whois.nic.chanel
+channel whois.nic.google
+charity whois.nic.charity
+chase
+chat whois.nic.chat
+cheap whois.nic.cheap
+chintai whois.nic.chintai
+christmas whois.uniregistry.net
+chrome whois.nic.google
+chrysler whois.afilias-srs.net
+church whois.nic.church
+ci whois.nic.ci
+cipriani whois.afilias-srs.net
+circle
+cisco
+citadel
+citi
+citic
+city whois.nic.city
+cityeats whois.nic.cityeats
+ck
+cl whois.nic.cl
+claims whois.nic.claims
+cleaning whois.nic.cleaning
+click whois.uniregistry.net
+clinic whois.nic.clinic
+clinique whois.nic.clinique
+clothing whois.nic.clothing
+cloud whois.nic.cloud
+club whois.nic.club
+clubmed whois.nic.clubmed
+cm whois.netcom.cm
+cn whois.cnnic.cn
+edu.cn
+co whois.nic.co
+coach whois.nic.coach
+codes whois.nic.codes
+coffee whois.nic.coffee
+college whois.nic.college
+cologne whois.ryce-rsp.com
+com whois.verisign-grs.com
+africa.com whois.centralnic.com
+ar.com whois.centralnic.com
+br.com whois.centralnic.com
+cn.com whois.centralnic.com
+co.com whois.centralnic.net
+de.com whois.centralnic.com
+eu.com whois.centralnic.com
+gb.com whois.centralnic.com
+gr.com whois.centralnic.com
+hk.com whois.registry.hk.com
+hu.com whois.centralnic.com
+jpn.com whois.centralnic.com
+kr.com whois.centralnic.com
+no.com whois.centralnic.com
+qc.com whois.centralnic.com
+ru.com whois.centralnic.com
+sa.com whois.centralnic.com
+se.com whois.centralnic.com
+uk.com whois.centralnic.com
+us.com whois.centralnic.com
+uy.com whois.centralnic.com
+za.com whois.centralnic.com
+comcast whois.nic.comcast
+commbank whois.nic.commbank
+community whois.nic.community
+company whois.nic.company
+compare whois.nic.compare
+computer whois.nic.computer
+comsec whois.nic.comsec
+condos whois.nic.condos
+construction whois.nic.construction
+consulting whois.nic.consulting
+contact whois.nic.contact
+contractors whois.nic.contractors
+cooking whois.nic.cooking
+cookingchannel whois.nic.cookingchannel
+cool whois.nic.cool
+coop whois.nic.coop
+corsica whois-corsica.nic.fr
+country whois-dub.mm-registry.com
+coupon
+coupons whois.nic.coupons
+courses whois.aridnrs.net.au
+cr whois.nic.cr
+credit whois.nic.credit
+creditcard whois.nic.creditcard
+creditunion whois.afilias-srs.net
+cricket whois.nic.cricket
+crown
+crs
+cruise whois.nic.cruise
+cruises whois.nic.cruises
+csc whois.nic.csc
+cu
+cuisinella whois.nic.cuisinella
+cv
+cw
+cx whois.nic.cx
+cy
+cymru whois.nic.cymru
+cyou whois.nic.cyou
+cz whois.nic.cz
+dabur whois.afilias-srs.net
+dad whois.nic.google
+dance whois.nic.dance
+data whois.nic.data
+date whois.nic.date
+dating whois.nic.dating
+datsun whois.nic.gmo
+day whois.nic.google
+dclk whois.nic.google
+dds whois.nic.dds
+de whois.denic.de
+com.de whois.centralnic.com
+deal
+dealer
+deals whois.nic.deals
+degree whois.nic.degree
+delivery whois.nic.delivery
+dell
+deloitte whois.nic.deloitte
+delta whois.nic.delta
+democrat whois.nic.democrat
+dental whois.nic.dental
+dentist whois.nic.dentist
+desi whois.ksregistry.net
+design whois.nic.design
+dev whois.nic.google
+dhl
+diamonds whois.nic.diamonds
+diet whois.uniregistry.net
+digital whois.nic.digital
+direct whois.nic.direct
+directory whois.nic.directory
+discount whois.nic.discount
+discover
+dish whois.nic.dish
+diy whois.nic.diy
+dj
+dk whois.dk-hostmaster.dk
+dm whois.nic.dm
+dnp
+do
+docs whois.nic.google
+doctor whois.nic.doctor
+dodge whois.afilias-srs.net
+dog whois.nic.dog
+doha whois.nic.doha
+domains whois.nic.domains
+doosan whois.nic.xn--cg4bki
+dot whois.nic.dot
+download whois.nic.download
+drive whois.nic.google
+dtv whois.nic.dtv
+dubai whois.nic.dubai
+duck whois.nic.duck
+dunlop whois.nic.dunlop
+duns
+dupont
+durban durban-whois.registry.net.za
+dvag whois.ksregistry.net
+dvr whois.afilias-srs.net
+dz whois.nic.dz
+earth
+eat whois.nic.google
+ec whois.nic.ec
+eco whois.afilias-srs.net
+edeka whois.afilias-srs.net
+edu whois.educause.edu
+education whois.nic.education
+ee whois.tld.ee
+eg
+email whois.nic.email
+emerck whois.afilias-srs.net
+energy whois.nic.energy
+engineer whois.nic.engineer
+engineering whois.nic.engineering
+enterprises whois.nic.enterprises
+epost
+epson whois.aridnrs.net.au
+equipment whois.nic.equipment
+er
+ericsson whois.nic.ericsson
+erni whois.nic.erni
+es whois.nic.es
+esq whois.nic.google
+estate whois.nic.estate
+esurance whois.afilias-srs.net
+et
+etisalat whois.centralnic.com
+eu whois.eu
+eurovision whois.nic.eurovision
+eus whois.nic.eus
+events whois.nic.events
+everbank whois.nic.everbank
+exchange whois.nic.exchange
+expert whois.nic.expert
+exposed whois.nic.exposed
+express whois.nic.express
+extraspace whois.afilias-srs.net
+fage whois.afilias-srs.net
+fail whois.nic.fail
+fairwinds whois.nic.fairwinds
+faith whois.nic.faith
+family whois.nic.family
+fan whois.nic.fan
+fans whois.nic.fans
+farm whois.nic.farm
+farmers
+fashion whois.nic.fashion
+fast
+fedex whois.nic.fedex
+feedback whois.nic.feedback
+ferrari whois.nic.ferrari
+ferrero
+fi whois.fi
+fiat whois.afilias-srs.net
+fidelity whois.nic.fidelity
+fido whois.afilias-srs.net
+film whois.nic.film
+final whois.gtlds.nic.br
+finance whois.nic.finance
+financial whois.nic.financial
+fire
+firestone whois.nic.firestone
+firmdale whois.nic.firmdale
+fish whois.nic.fish
+fishing whois.nic.fishing
+fit whois.nic.fit
+fitness whois.nic.fitness
+fj whois.usp.ac.fj
+fk
+flickr
+flights whois.nic.flights
+flir
+florist whois.nic.florist
+flowers whois.uniregistry.net
+fly whois.nic.google
+fm whois.nic.fm
+fo whois.nic.fo
+foo whois.nic.google
+food
+foodnetwork whois.nic.foodnetwork
+football whois.nic.football
+ford
+forex whois.nic.forex
+forsale whois.nic.forsale
+forum whois.nic.forum
+foundation whois.nic.foundation
+fox
+fr whois.nic.fr
+aeroport.fr whois.smallregistry.net
+avocat.fr whois.smallregistry.net
+chambagri.fr whois.smallregistry.net
+chirurgiens-dentistes.fr whois.smallregistry.net
+experts-comptables.fr whois.smallregistry.net
+geometre-expert.fr whois.smallregistry.net
+medecin.fr whois.smallregistry.net
+notaires.fr whois.smallregistry.net
+pharmacien.fr whois.smallregistry.net
+port.fr whois.smallregistry.net
+veterinaire.fr whois.smallregistry.net
+free
+fresenius whois.ksregistry.net
+frl whois.nic.frl
+frogans whois.nic.frogans
+frontdoor whois.nic.frontdoor
+frontier
+ftr
+fujitsu whois.nic.gmo
+fujixerox whois.nic.fujixerox
+fun whois.nic.fun
+fund whois.nic.fund
+furniture whois.nic.furniture
+futbol whois.nic.futbol
+fyi whois.nic.fyi
+ga whois.dot.ga
+gal whois.nic.gal
+gallery whois.nic.gallery
+gallo whois.nic.gallo
+gallup whois.nic.gallup
+game whois.uniregistry.net
+games whois.nic.games
+gap
+garden whois.nic.garden
+gb
+gbiz whois.nic.google
+gd whois.nic.gd
+gdn whois.nic.gdn
+ge whois.registration.ge
+gea whois.afilias-srs.net
+gent whois.nic.gent
+genting whois.nic.genting
+george whois.nic.george
+gf whois.mediaserv.net
+gg whois.gg
+ggee whois.nic.ggee
+gh
+gi whois.afilias-grs.info
+gift whois.uniregistry.net
+gifts whois.nic.gifts
+gives whois.nic.gives
+giving whois.nic.giving
+gl whois.nic.gl
+glade whois.nic.glade
+glass whois.nic.glass
+gle whois.nic.google
+global whois.nic.global
+globo whois.gtlds.nic.br
+gm
+gmail whois.nic.google
+gmbh whois.nic.gmbh
+gmoregistry
+gmx whois-fe1.gmx.tango.knipp.de
+gn
+godaddy whois.afilias-srs.net
+gold whois.nic.gold
+goldpoint whois.nic.goldpoint
+golf whois.nic.golf
+goo whois.nic.gmo
+goodyear whois.nic.goodyear
+goog whois.nic.google
+google whois.nic.google
+gop whois.nic.gop
+got
+gov whois.dotgov.gov
+gp
+gq whois.dominio.gq
+gr
+grainger
+graphics whois.nic.graphics
+gratis whois.nic.gratis
+green whois.afilias.net
+gripe whois.nic.gripe
+grocery
+group whois.nic.group
+gs whois.nic.gs
+gt
+gu
+guardian
+gucci
+guge whois.nic.google
+guide whois.nic.guide
+guitars whois.uniregistry.net
+guru whois.nic.guru
+gw
+gy whois.registry.gy
+hair
+hamburg whois.nic.hamburg
+hangout whois.nic.google
+haus whois.nic.haus
+hbo
+hdfc whois.nic.hdfc
+hdfcbank whois.nic.hdfcbank
+health
+healthcare whois.nic.healthcare
+help whois.uniregistry.net
+helsinki whois.nic.helsinki
+here whois.nic.google
+hermes whois.afilias-srs.net
+hgtv whois.nic.hgtv
+hiphop whois.uniregistry.net
+hisamitsu whois.nic.gmo
+hitachi whois.nic.gmo
+hiv whois.uniregistry.net
+hk whois.hkirc.hk
+inc.hk whois.registry.hk.com
+ltd.hk whois.registry.hk.com
+hkt whois.nic.hkt
+hm whois.registry.hm
+hn whois.nic.hn
+hockey whois.nic.hockey
+holdings whois.nic.holdings
+holiday whois.nic.holiday
+homedepot whois.nic.homedepot
+homegoods
+homes whois.afilias-srs.net
+homesense
+honda whois.nic.honda
+honeywell
+horse whois.nic.horse
+hospital whois.nic.hospital
+host whois.nic.host
+hosting whois.uniregistry.net
+hot
+hoteles
+hotels
+hotmail
+house whois.nic.house
+how whois.nic.google
+hr whois.dns.hr
+hsbc
+ht whois.nic.ht
+hu whois.nic.hu
+hughes whois.nic.hughes
+hyatt
+hyundai whois.nic.hyundai
+ibm whois.nic.ibm
+icbc whois.nic.icbc
+ice whois.nic.ice
+icu whois.nic.icu
+id whois.id
+ie whois.iedr.ie
+ieee
+ifm whois.nic.ifm
+ikano whois.ikano.tld-box.at
+il whois.isoc.org.il
+co.il whois.isoc.org.il
+im whois.nic.im
+imamat whois.afilias-srs.net
+imdb
+immo whois.nic.immo
+immobilien whois.nic.immobilien
+in whois.inregistry.net
+inc whois.nic.inc
+industries whois.nic.industries
+infiniti whois.nic.gmo
+info whois.afilias.net
+ing whois.nic.google
+ink whois.nic.ink
+institute whois.nic.institute
+insurance whois.nic.insurance
+insure whois.nic.insure
+int whois.iana.org
+intel
+international whois.nic.international
+intuit
+investments whois.nic.investments
+io whois.nic.io
+ipiranga
+iq whois.cmc.iq
+ir whois.nic.ir
+irish whois.nic.irish
+is whois.isnic.is
+iselect whois.nic.iselect
+ismaili whois.afilias-srs.net
+ist whois.afilias-srs.net
+istanbul whois.afilias-srs.net
+it whois.nic.it
+itau
+itv whois.afilias-srs.net
+iveco whois.nic.iveco
+jaguar whois.nic.jaguar
+java whois.nic.java
+jcb whois.nic.gmo
+jcp whois.afilias-srs.net
+je whois.je
+jeep whois.afilias-srs.net
+jetzt whois.nic.jetzt
+jewelry whois.nic.jewelry
+jio whois.nic.jio
+jll whois.afilias-srs.net
+jm
+jmp
+jnj
+jo
+jobs whois.nic.jobs
+joburg joburg-whois.registry.net.za
+jot
+joy
+jp whois.jprs.jp
+jpmorgan
+jprs
+juegos whois.uniregistry.net
+juniper whois.nic.juniper
+kaufen whois.nic.kaufen
+kddi whois.nic.kddi
+ke whois.kenic.or.ke
+kerryhotels whois.nic.kerryhotels
+kerrylogistics whois.nic.kerrylogistics
+kerryproperties whois.nic.kerryproperties
+kfh whois.nic.kfh
+kg whois.kg
+kh
+ki whois.nic.ki
+kia whois.nic.kia
+kim whois.afilias.net
+kinder
+kindle
+kitchen whois.nic.kitchen
+kiwi whois.nic.kiwi
+km
+kn whois.nic.kn
+koeln whois.ryce-rsp.com
+komatsu whois.nic.komatsu
+kosher whois.nic.kosher
+kp
+kpmg
+kpn
+kr whois.kr
+krd whois.aridnrs.net.au
+kred
+kuokgroup whois.nic.kuokgroup
+kw
+ky whois.kyregistry.ky
+kyoto whois.nic.kyoto
+kz whois.nic.kz
+la whois.nic.la
+lacaixa whois.nic.lacaixa
+ladbrokes whois.nic.ladbrokes
+lamborghini whois.afilias-srs.net
+lamer whois.nic.lamer
+lancaster whois-lancaster.nic.fr
+lancia whois.afilias-srs.net
+lancome whois.nic.lancome
+land whois.nic.land
+landrover whois.nic.landrover
+lanxess
+lasalle whois.afilias-srs.net
+lat whois.nic.lat
+latino whois.nic.latino
+latrobe whois.nic.latrobe
+law whois.nic.law
+lawyer whois.nic.lawyer
+lb
+lc whois.afilias-grs.info
+lds whois.nic.lds
+lease whois.nic.lease
+leclerc whois-leclerc.nic.fr
+lefrak whois.nic.lefrak
+legal whois.nic.legal
+lego whois.nic.lego
+lexus whois.nic.lexus
+lgbt whois.afilias.net
+li whois.nic.li
+liaison whois.nic.liaison
+lidl whois.nic.lidl
+life whois.nic.life
+lifeinsurance
+lifestyle whois.nic.lifestyle
+lighting whois.nic.lighting
+like
+lilly
+limited whois.nic.limited
+limo whois.nic.limo
+lincoln
+linde whois.nic.linde
+link whois.uniregistry.net
+lipsy whois.nic.lipsy
+live whois.nic.live
+living
+lixil whois.nic.lixil
+lk whois.nic.lk
+llc whois.afilias.net
+loan whois.nic.loan
+loans whois.nic.loans
+locker whois.nic.locker
+locus whois.nic.locus
+loft
+lol whois.uniregistry.net
+london whois.nic.london
+lotte whois.nic.lotte
+lotto whois.afilias.net
+love whois.nic.love
+lpl whois.nic.lpl
+lplfinancial whois.nic.lplfinancial
+lr
+ls
+lt whois.domreg.lt
+ltd whois.nic.ltd
+ltda whois.afilias-srs.net
+lu whois.dns.lu
+lundbeck whois.nic.lundbeck
+lupin
+luxe whois.nic.luxe
+luxury whois.nic.luxury
+lv whois.nic.lv
+ly whois.nic.ly
+ma whois.registre.ma
+macys whois.nic.macys
+madrid whois.madrid.rs.corenic.net
+maif
+maison whois.nic.maison
+makeup whois.nic.makeup
+man whois.nic.man
+management whois.nic.management
+mango whois.nic.mango
+map whois.nic.google
+market whois.nic.market
+marketing whois.nic.marketing
+markets whois.nic.markets
+marriott whois.afilias-srs.net
+marshalls
+maserati whois.nic.maserati
+mattel
+mba whois.nic.mba
+mc
+mckinsey whois.nic.mckinsey
+md whois.nic.md
+me whois.nic.me
+med whois.nic.med
+media whois.nic.media
+meet whois.nic.google
+melbourne whois.aridnrs.net.au
+meme whois.nic.google
+memorial whois.nic.memorial
+men whois.nic.men
+menu whois.nic.menu
+merckmsd
+metlife whois.nic.metlife
+mg whois.nic.mg
+mh
+miami whois.nic.miami
+microsoft
+mil
+mini whois.ksregistry.net
+mint
+mit whois.afilias-srs.net
+mitsubishi whois.nic.gmo
+mk whois.marnet.mk
+ml whois.dot.ml
+mlb
+mls whois.nic.mls
+mm
+mma whois-mma.nic.fr
+mn whois.nic.mn
+mo whois.monic.mo
+mobi whois.afilias.net
+mobile whois.nic.mobile
+mobily
+moda whois.nic.moda
+moe whois.nic.moe
+moi
+mom whois.uniregistry.net
+monash whois.nic.monash
+money whois.nic.money
+monster whois.nic.monster
+montblanc
+mopar whois.afilias-srs.net
+mormon whois.nic.mormon
+mortgage whois.nic.mortgage
+moscow whois.nic.moscow
+moto
+motorcycles whois.afilias-srs.net
+mov whois.nic.google
+movie whois.nic.movie
+movistar whois-fe.movistar.tango.knipp.de
+mp
+mq whois.mediaserv.net
+mr whois.nic.mr
+ms whois.nic.ms
+msd
+mt
+mtn whois.nic.mtn
+mtr whois.nic.mtr
+mu whois.nic.mu
+museum whois.nic.museum
+mutual
+mv
+mw
+mx whois.nic.mx
+my whois.mynic.my
+mz whois.nic.mz
+na whois.na-nic.com.na
+nab whois.nic.nab
+nadex whois.nic.nadex
+nagoya whois.nic.nagoya
+name whois.nic.name
+nationwide whois.nic.nationwide
+natura whois.afilias-srs.net
+navy whois.nic.navy
+nba
+nc whois.nc
+ne
+nec whois.nic.nec
+net whois.verisign-grs.com
+gb.net whois.centralnic.com
+hu.net whois.centralnic.com
+in.net whois.centralnic.com
+jp.net whois.centralnic.com
+se.net whois.centralnic.com
+uk.net whois.centralnic.com
+za.net whois.za.net
+netbank whois.nic.netbank
+netflix
+network whois.nic.network
+neustar
+new whois.nic.google
+newholland whois.nic.newholland
+news whois.nic.news
+next whois.nic.next
+nextdirect whois.nic.nextdirect
+nexus whois.nic.google
+nf whois.nic.nf
+nfl
+ng whois.nic.net.ng
+ngo whois.publicinterestregistry.net
+nhk
+ni
+nico whois.nic.nico
+nike
+nikon whois.nic.nikon
+ninja whois.nic.ninja
+nissan whois.nic.gmo
+nissay whois.nic.nissay
+nl whois.domain-registry.nl
+no whois.norid.no
+nokia whois.afilias-srs.net
+northwesternmutual
+norton whois.nic.norton
+now
+nowruz whois.agitsys.net
+nowtv whois.nic.nowtv
+np
+nr
+nra whois.afilias-srs.net
+nrw whois.nic.nrw
+ntt
+nu whois.iis.nu
+nyc whois.nic.nyc
+nz whois.srs.net.nz
+obi whois.nic.obi
+observer whois.nic.observer
+off whois.nic.off
+office
+okinawa whois.nic.okinawa
+olayan whois.nic.olayan
+olayangroup whois.nic.olayangroup
+oldnavy
+ollo whois.nic.ollo
+om whois.registry.om
+omega whois.nic.omega
+one whois.nic.one
+ong whois.publicinterestregistry.net
+onl whois.afilias-srs.net
+online whois.nic.online
+onyourside whois.nic.onyourside
+ooo whois.nic.ooo
+open
+oracle whois.nic.oracle
+orange whois.nic.orange
+org whois.pir.org
+ae.org whois.centralnic.com
+eu.org whois.eu.org
+hk.org whois.registry.hk.com
+us.org whois.centralnic.com
+za.org whois.za.org
+organic whois.afilias.net
+orientexpress whois.afilias-srs.net
+origin whois.afilias-srs.net
+origins whois.nic.origins
+osaka whois.nic.osaka
+otsuka
+ott whois.nic.ott
+ovh whois-ovh.nic.fr
+pa
+page whois.nic.google
+panasonic whois.nic.gmo
+paris whois-paris.nic.fr
+pars whois.agitsys.net
+partners whois.nic.partners
+parts whois.nic.parts
+party whois.nic.party
+passagens
+pay
+pccw whois.nic.pccw
+pe kero.yachay.pe
+pet whois.afilias.net
+pf whois.registry.pf
+pfizer
+pg
+ph
+pharmacy
+phd whois.nic.google
+philips whois.nic.philips
+phone whois.nic.phone
+photo whois.uniregistry.net
+photography whois.nic.photography
+photos whois.nic.photos
+physio whois.nic.physio
+piaget
+pics whois.uniregistry.net
+pictet
+pictures whois.nic.pictures
+pid whois.nic.pid
+pin
+ping
+pink whois.afilias.net
+pioneer whois.nic.gmo
+pizza whois.nic.pizza
+pk
+pl whois.dns.pl
+co.pl whois.co.pl
+place whois.nic.place
+play whois.nic.google
+playstation whois.nic.playstation
+plumbing whois.nic.plumbing
+plus whois.nic.plus
+pm whois.nic.pm
+pn
+pnc whois.nic.pnc
+pohl whois.ksregistry.net
+poker whois.afilias.net
+politie whois.nicpolitie
+porn whois.afilias-srs.net
+post whois.dotpostregistry.net
+pr whois.afilias-srs.net
+pramerica
+praxi
+press whois.nic.press
+prime
+pro whois.afilias.net
+prod whois.nic.google
+productions whois.nic.productions
+prof whois.nic.google
+progressive whois.afilias-srs.net
+promo whois.afilias.net
+properties whois.nic.properties
+property whois.uniregistry.net
+protection whois.centralnic.com
+pru
+prudential
+ps whois.pnina.ps
+pt whois.dns.pt
+pub whois.nic.pub
+pw whois.nic.pw
+pwc whois.afilias-srs.net
+py
+qa whois.registry.qa
+qpon
+quebec whois.nic.quebec
+quest whois.nic.quest
+qvc
+racing whois.nic.racing
+radio whois.nic.radio
+raid whois.nic.raid
+re whois.nic.re
+read
+realestate whois.nic.realestate
+realtor
+realty whois.nic.realty
+recipes whois.nic.recipes
+red whois.afilias.net
+redstone whois.nic.redstone
+redumbrella whois.afilias-srs.net
+rehab whois.nic.rehab
+reise whois.nic.reise
+reisen whois.nic.reisen
+reit whois.nic.reit
+reliance whois.nic.reliance
+ren
+rent whois.nic.rent
+rentals whois.nic.rentals
+repair whois.nic.repair
+report whois.nic.report
+republican whois.nic.republican
+rest whois.nic.rest
+restaurant whois.nic.restaurant
+review whois.nic.review
+reviews whois.nic.reviews
+rexroth whois.nic.rexroth
+rich whois.afilias-srs.net
+richardli whois.nic.richardli
+ricoh whois.nic.ricoh
+rightathome whois.nic.rightathome
+ril whois.nic.ril
+rio whois.gtlds.nic.br
+rip whois.nic.rip
+rmit whois.aridnrs.net.au
+ro whois.rotld.ro
+rocher
+rocks whois.nic.rocks
+rodeo whois.nic.rodeo
+rogers whois.afilias-srs.net
+room
+rs whois.rnids.rs
+rsvp whois.nic.google
+ru whois.tcinet.ru
+edu.ru whois.informika.ru
+rugby whois.centralnic.com
+ruhr whois.nic.ruhr
+run whois.nic.run
+rw whois.ricta.org.rw
+rwe whois.nic.rwe
+ryukyu whois.nic.ryukyu
+sa whois.nic.net.sa
+saarland whois.ksregistry.net
+safe
+safety
+sakura
+sale whois.nic.sale
+salon whois.nic.salon
+samsclub whois.nic.samsclub
+samsung whois.nic.xn--cg4bki
+sandvik whois.nic.sandvik
+sandvikcoromant whois.nic.sandvikcoromant
+sanofi whois.nic.sanofi
+sap whois.nic.sap
+sarl whois.nic.sarl
+sas
+save
+saxo whois.aridnrs.net.au
+sb whois.nic.net.sb
+sbi whois.nic.sbi
+sbs whois.nic.sbs
+sc whois.afilias-grs.info
+sca whois.nic.sca
+scb whois.nic.scb
+schaeffler whois.afilias-srs.net
+schmidt whois.nic.schmidt
+scholarships whois.nic.scholarships
+school whois.nic.school
+schule whois.nic.schule
+schwarz whois.nic.schwarz
+science whois.nic.science
+scjohnson whois.nic.scjohnson
+scor whois.nic.scor
+scot whois.nic.scot
+sd
+se whois.iis.se
+com.se whois.centralnic.com
+search whois.nic.google
+seat whois.nic.seat
+secure
+security whois.nic.security
+seek whois.nic.seek
+select whois.nic.select
+sener
+services whois.nic.services
+ses whois.nic.ses
+seven whois.nic.seven
+sew whois.afilias-srs.net
+sex whois.afilias-srs.net
+sexy whois.uniregistry.net
+sfr whois.nic.sfr
+sg whois.sgnic.sg
+sh whois.nic.sh
+shangrila whois.nic.shangrila
+sharp whois.nic.gmo
+shaw whois.afilias-srs.net
+shell whois.nic.shell
+shia whois.agitsys.net
+shiksha whois.afilias.net
+shoes whois.nic.shoes
+shop whois.nic.shop
+shopping whois.nic.shopping
+shouji whois.teleinfo.cn
+show whois.nic.show
+showtime whois.afilias-srs.net
+shriram whois.afilias-srs.net
+si whois.register.si
+silk
+sina whois.nic.sina
+singles whois.nic.singles
+site whois.nic.site
+sj
+sk whois.sk-nic.sk
+ski whois.afilias.net
+skin whois.nic.skin
+sky whois.nic.sky
+skype
+sl whois.nic.sl
+sling whois.nic.sling
+sm whois.nic.sm
+smart whois.nic.smart
+smile
+sn whois.nic.sn
+sncf whois-sncf.nic.fr
+so whois.nic.so
+soccer whois.nic.soccer
+social whois.nic.social
+softbank whois.nic.softbank
+software whois.nic.software
+sohu
+solar whois.nic.solar
+solutions whois.nic.solutions
+song
+sony whois.nic.sony
+soy whois.nic.google
+space whois.nic.space
+spiegel whois.ksregistry.net
+sport whois.nic.sport
+spot
+spreadbetting whois.nic.spreadbetting
+sr
+srl whois.afilias-srs.net
+srt whois.afilias-srs.net
+st whois.nic.st
+stada whois.afilias-srs.net
+staples
+star whois.nic.star
+starhub whois.nic.starhub
+statebank whois.nic.statebank
+statefarm
+stc whois.nic.stc
+stcgroup whois.nic.stcgroup
+stockholm whois.afilias-srs.net
+storage whois.nic.storage
+store whois.nic.store
+stream
+studio whois.nic.studio
+study whois.nic.study
+style whois.nic.style
+su whois.tcinet.ru
+sucks whois.nic.sucks
+supplies whois.nic.supplies
+supply whois.nic.supply
+support whois.nic.support
+surf whois.nic.surf
+surgery whois.nic.surgery
+suzuki
+sv
+swatch whois.nic.swatch
+swiftcover
+swiss whois.nic.swiss
+sx whois.sx
+sy whois.tld.sy
+sydney whois.nic.sydney
+symantec whois.nic.symantec
+systems whois.nic.systems
+sz
+tab whois.nic.tab
+taipei whois.nic.taipei
+talk
+taobao
+target
+tatamotors whois.nic.tatamotors
+tatar whois.nic.tatar
+tattoo whois.uniregistry.net
+tax whois.nic.tax
+taxi whois.nic.taxi
+tc whois.nic.tc
+tci whois.agitsys.net
+td
+tdk
+team whois.nic.team
+tech whois.nic.tech
+technology whois.nic.technology
+tel whois.nic.tel
+telefonica whois-fe.telefonica.tango.knipp.de
+temasek whois.afilias-srs.net
+tennis whois.nic.tennis
+teva whois.nic.teva
+tf whois.nic.fr
+tg whois.nic.tg
+th whois.thnic.co.th
+thd whois.nic.thd
+theater whois.nic.theater
+theatre whois.nic.theatre
+tiaa whois.nic.tiaa
+tickets whois.nic.tickets
+tienda whois.nic.tienda
+tiffany whois.nic.tiffany
+tiia whois.nic.tiia
+tips whois.nic.tips
+tires whois.nic.tires
+tirol whois.nic.tirol
+tj
+tjmaxx
+tjx
+tk whois.dot.tk
+tkmaxx
+tl whois.nic.tl
+tm whois.nic.tm
+tmall
+tn whois.ati.tn
+to whois.tonic.to
+today whois.nic.today
+tokyo whois.nic.tokyo
+tools whois.nic.tools
+top whois.nic.top
+toray whois.nic.toray
+toshiba whois.nic.toshiba
+total whois-total.nic.fr
+tours whois.nic.tours
+town whois.nic.town
+toyota whois.nic.toyota
+toys whois.nic.toys
+tr whois.nic.tr
+trade whois.nic.trade
+trading whois.nic.trading
+training whois.nic.training
+travel whois.nic.travel
+travelchannel whois.nic.travelchannel
+travelers whois.afilias-srs.net
+travelersinsurance whois.afilias-srs.net
+trust whois.nic.trust
+trv whois.afilias-srs.net
+tt
+tube
+tui whois.ksregistry.net
+tunes
+tushu
+tv tvwhois.verisign-grs.com
+tvs whois.nic.tvs
+tw whois.twnic.net.tw
+tz whois.tznic.or.tz
+ua whois.ua
+in.ua whois.in.ua
+ubank whois.nic.ubank
+ubs whois.nic.ubs
+uconnect whois.afilias-srs.net
+ug whois.co.ug
+uk whois.nic.uk
+ac.uk whois.ja.net
+bl.uk
+british-library.uk
+gov.uk whois.ja.net
+icnet.uk
+jet.uk
+mod.uk
+nhs.uk
+nls.uk
+parliament.uk
+police.uk
+unicom
+university whois.nic.university
+uno
+uol whois.gtlds.nic.br
+ups whois.nic.ups
+us whois.nic.us
+uy whois.nic.org.uy
+com.uy
+uz whois.cctld.uz
+va
+vacations whois.nic.vacations
+vana whois.nic.vana
+vanguard whois.nic.vanguard
+vc whois.afilias-grs.info
+ve whois.nic.ve
+vegas whois.afilias-srs.net
+ventures whois.nic.ventures
+verisign whois.nic.verisign
+versicherung whois.nic.versicherung
+vet whois.nic.vet
+vg whois.nic.vg
+vi
+viajes whois.nic.viajes
+video whois.nic.video
+vig whois.afilias-srs.net
+viking whois.afilias-srs.net
+villas whois.nic.villas
+vin whois.nic.vin
+vip whois.nic.vip
+virgin whois.nic.virgin
+visa whois.nic.visa
+vision whois.nic.vision
+vistaprint whois.nic.vistaprint
+viva whois.nic.viva
+vivo
+vlaanderen whois.nic.vlaanderen
+vn
+vodka whois.nic.vodka
+volkswagen whois.afilias-srs.net
+volvo whois.nic.volvo
+vote whois.afilias.net
+voting whois.voting.tld-box.at
+voto whois.afilias.net
+voyage whois.nic.voyage
+vu vunic.vu
+vuelos
+wales whois.nic.wales
+walmart whois.nic.walmart
+walter whois.nic.walter
+wang whois.gtld.knet.cn
+wanggou
+warman whois.nic.warman
+watch whois.nic.watch
+watches
+weather
+weatherchannel
+webcam whois.nic.webcam
+weber whois.nic.weber
+website whois.nic.website
+wed whois.nic.wed
+wedding whois.nic.wedding
+weibo whois.nic.weibo
+weir
+wf whois.nic.wf
+whoswho whois.nic.whoswho
+wien whois.nic.wien
+wiki whois.nic.wiki
+williamhill
+win whois.nic.win
+windows
+wine whois.nic.wine
+winners
+wme whois.nic.wme
+wolterskluwer whois.nic.wolterskluwer
+woodside whois.nic.woodside
+work whois.nic.work
+works whois.nic.works
+world whois.nic.world
+wow
+ws whois.website.ws
+wtc whois.nic.wtc
+wtf whois.nic.wtf
+xbox
+xerox whois.nic.xerox
+xfinity whois.nic.xfinity
+xihuan whois.teleinfo.cn
+xin whois.nic.xin
+xn--11b4c3d whois.nic.xn--11b4c3d
+xn--1ck2e1b
+xn--1qqw23a whois.ngtld.cn
+xn--2scrj9c
+xn--30rr7y whois.gtld.knet.cn
+xn--3bst00m whois.gtld.knet.cn
+xn--3ds443g whois.teleinfo.cn
+xn--3e0b707e whois.kr
+xn--3oq18vl8pn36a whois.nic.xn--3oq18vl8pn36a
+xn--3pxu8k whois.nic.xn--3pxu8k
+xn--42c2d9a whois.nic.xn--42c2d9a
+xn--45br5cyl
+xn--45brj9c whois.inregistry.net
+xn--45q11c
+xn--4gbrim whois.afilias-srs.net
+xn--54b7fta0cc
+xn--55qw42g whois.conac.cn
+xn--55qx5d whois.ngtld.cn
+xn--5su34j936bgsg whois.nic.xn--5su34j936bgsg
+xn--5tzm5g whois.nic.xn--5tzm5g
+xn--6frz82g whois.afilias.net
+xn--6qq986b3xl whois.gtld.knet.cn
+xn--80adxhks whois.nic.xn--80adxhks
+xn--80ao21a whois.nic.kz
+xn--80aqecdr1a whois.aridnrs.net.au
+xn--80asehdb whois.online.rs.corenic.net
+xn--80aswg whois.online.rs.corenic.net
+xn--8y0a063a whois.imena.bg
+xn--90a3ac whois.rnids.rs
+xn--90ae
+xn--90ais whois.cctld.by
+xn--9dbq2a whois.nic.xn--9dbq2a
+xn--9et52u whois.gtld.knet.cn
+xn--9krt00a whois.nic.xn--9krt00a
+xn--b4w605ferd whois.afilias-srs.net
+xn--bck1b9a5dre4c
+xn--c1avg whois.publicinterestregistry.net
+xn--c2br7g whois.nic.xn--c2br7g
+xn--cck2b3b
+xn--cg4bki whois.kr
+xn--clchc0ea0b2g2a9gcd whois.sgnic.sg
+xn--czrs0t whois.nic.xn--czrs0t
+xn--czru2d whois.gtld.knet.cn
+xn--d1acj3b whois.nic.xn--d1acj3b
+xn--d1alf whois.marnet.mk
+xn--e1a4c whois.eu
+xn--eckvdtc9d
+xn--efvy88h whois.nic.xn--efvy88h
+xn--estv75g whois.nic.xn--estv75g
+xn--fct429k
+xn--fhbei whois.nic.xn--fhbei
+xn--fiq228c5hs whois.teleinfo.cn
+xn--fiq64b whois.gtld.knet.cn
+xn--fiqs8s cwhois.cnnic.cn
+xn--fiqz9s cwhois.cnnic.cn
+xn--fjq720a whois.nic.xn--fjq720a
+xn--flw351e whois.nic.google
+xn--fpcrj9c3d whois.inregistry.net
+xn--fzc2c9e2c whois.nic.lk
+xn--fzys8d69uvgm whois.nic.xn--fzys8d69uvgm
+xn--g2xx48c whois.afilias-srs.net
+xn--gckr3f0f
+xn--gecrj9c whois.inregistry.net
+xn--gk3at1e
+xn--h2breg3eve
+xn--h2brj9c whois.inregistry.net
+xn--h2brj9c8c
+xn--hxt814e whois.nic.xn--hxt814e
+xn--i1b6b1a6a2e whois.publicinterestregistry.net
+xn--imr513n
+xn--io0a7i whois.ngtld.cn
+xn--j1aef whois.nic.xn--j1aef
+xn--j1amh whois.dotukr.com
+xn--j6w193g whois.hkirc.hk
+xn--jlq61u9w7b whois.nic.xn--jlq61u9w7b
+xn--jvr189m
+xn--kcrx77d1x4a whois.nic.xn--kcrx77d1x4a
+xn--kprw13d whois.twnic.net.tw
+xn--kpry57d whois.twnic.net.tw
+xn--kpu716f
+xn--kput3i whois.nic.xn--kput3i
+xn--l1acc
+xn--lgbbat1ad8j whois.nic.dz
+xn--mgb9awbf whois.registry.om
+xn--mgba3a3ejt
+xn--mgba3a4f16a whois.nic.ir
+xn--mgba7c0bbn0a whois.nic.xn--mgba7c0bbn0a
+xn--mgbaakc7dvf whois.centralnic.com
+xn--mgbaam7a8h whois.aeda.net.ae
+xn--mgbab2bd whois.bazaar.coreregistry.net
+xn--mgbai9azgqp6j
+xn--mgbayh7gpa
+xn--mgbb9fbpob
+xn--mgbbh1a
+xn--mgbbh1a71e whois.inregistry.net
+xn--mgbc0a9azcg
+xn--mgbca7dzdo whois.afilias-srs.net
+xn--mgberp4a5d4ar whois.nic.net.sa
+xn--mgbgu82a
+xn--mgbi4ecexp whois.aridnrs.net.au
+xn--mgbpl2fh
+xn--mgbt3dhd whois.agitsys.net
+xn--mgbtx2b whois.cmc.iq
+xn--mgbx4cd0ab whois.mynic.my
+xn--mix891f whois.monic.mo
+xn--mk1bu44c whois.nic.xn--mk1bu44c
+xn--mxtq1m whois.nic.xn--mxtq1m
+xn--ngbc5azd whois.nic.xn--ngbc5azd
+xn--ngbe9e0a whois.nic.xn--ngbe9e0a
+xn--node whois.itdc.ge
+xn--nqv7f whois.publicinterestregistry.net
+xn--nqv7fs00ema whois.nic.xn--nqv7fs00ema
+xn--nyqy26a
+xn--o3cw4h whois.thnic.co.th
+xn--ogbpf8fl whois.tld.sy
+xn--otu796d
+xn--p1acf whois.nic.xn--p1acf
+xn--p1ai whois.tcinet.ru
+xn--pbt977c
+xn--pgbs0dh
+xn--pssy2u whois.nic.xn--pssy2u
+xn--q9jyb4c whois.nic.google
+xn--qcka1pmc whois.nic.google
+xn--qxam
+xn--rhqv96g
+xn--rovu88b
+xn--rvc1e0am3e
+xn--s9brj9c whois.inregistry.net
+xn--ses554g whois.registry.knet.cn
+xn--t60b56a whois.nic.xn--t60b56a
+xn--tckwe whois.nic.xn--tckwe
+xn--tiq49xqyj whois.aridnrs.net.au
+xn--unup4y whois.nic.xn--unup4y
+xn--vermgensberater-ctb whois.ksregistry.net
+xn--vermgensberatung-pwb whois.ksregistry.net
+xn--vhquv whois.nic.xn--vhquv
+xn--vuq861b whois.teleinfo.cn
+xn--w4r85el8fhu5dnra whois.nic.xn--w4r85el8fhu5dnra
+xn--w4rs40l whois.nic.xn--w4rs40l
+xn--wgbh1c whois.dotmasr.eg
+xn--wgbl6a whois.registry.qa
+xn--xhq521b whois.teleinfo.cn
+xn--xkc2al3hye2a whois.nic.lk
+xn--xkc2dl3a5ee0h whois.inregistry.net
+xn--y9a3aq whois.amnic.net
+xn--yfro4i67o whois.sgnic.sg
+xn--ygbi2ammx whois.pnina.ps
+xn--zfr164b whois.conac.cn
+xxx whois.nic.xxx
+xyz whois.nic.xyz
+yachts whois.afilias-srs.net
+yahoo
+yamaxun
+yandex
+ye
+yodobashi whois.nic.gmo
+yoga whois.nic.yoga
+yokohama whois.nic.yokohama
+you
+youtube whois.nic.google
+yt whois.nic.yt
+yun whois.teleinfo.cn
+za
+ac.za whois.ac.za
+alt.za whois.alt.za
+co.za coza-whois.registry.net.za
+gov.za whois.gov.za
+net.za net-whois.registry.net.za
+org.za org-whois.registry.net.za
+web.za web-whois.registry.net.za
+zappos
+zara whois.afilias-srs.net
+zero
+zip whois.nic.google
+zippo
+zm whois.nic.zm
+zone whois.nic.zone
+zuerich whois.ksregistry.net
+zw
+"""
+tld_servers = None  # type: Optional[dict]
 
 grammar = {
     "_data": {
@@ -7122,23 +1804,13 @@ dble_ext_str = "chirurgiens-dentistes.fr,in-addr.arpa,uk.net,za.org,mod.uk,org.z
                "jp.net,gb.com,veterinaire.fr,edu.cn,qc.com,pharmacien.fr,ac.za,sa.com,medecin.fr,uy.com,se.net,co.pl," \
                "cn.com,hu.com,no.com,ac.uk,jpn.com,priv.at,za.net,nls.uk,nhs.uk,za.bz,experts-comptables.fr," \
                "chambagri.fr,gb.net,in.ua,notaires.fr,se.com,british-library.uk "
-dble_ext = dble_ext_str.split(",")
+dble_ext = set(dble_ext_str.split(","))
 
 
 def get_whois_raw(domain, server="", previous=None, rfc3490=True, never_cut=False, with_server_list=False,
                   server_list=None):
     previous = previous or []
     server_list = server_list or []
-    # Sometimes IANA simply won't give us the right root WHOIS server
-    exceptions = {
-        ".ac.uk": "whois.ja.net",
-        ".ps": "whois.pnina.ps",
-        ".buzz": "whois.nic.buzz",
-        ".moe": "whois.nic.moe",
-        # The following is a bit hacky, but IANA won't return the right answer for example.com because it's a direct
-        # registration.
-        "example.com": "whois.verisign-grs.com"
-    }
 
     if rfc3490:
         if sys.version_info < (3, 0):
@@ -7148,14 +1820,7 @@ def get_whois_raw(domain, server="", previous=None, rfc3490=True, never_cut=Fals
 
     if len(previous) == 0 and server == "":
         # Root query
-        is_exception = False
-        for exception, exc_serv in exceptions.items():
-            if domain.endswith(exception):
-                is_exception = True
-                target_server = exc_serv
-                break
-        if not is_exception:
-            target_server = get_root_server(domain)
+        target_server = get_cached_root_server(domain)
     else:
         target_server = server
     if target_server == "whois.jprs.jp":
@@ -7216,31 +1881,53 @@ def get_whois_raw(domain, server="", previous=None, rfc3490=True, never_cut=Fals
         return new_list
 
 
+# Sometimes IANA simply won't give us the right root WHOIS server
+root_server_exceptions = {
+    ".ac.uk": "whois.ja.net",
+    ".ps": "whois.pnina.ps",
+    ".buzz": "whois.nic.buzz",
+    ".moe": "whois.nic.moe",
+    # The following is a bit hacky, but IANA won't return the right answer for example.com because it's a direct
+    # registration.
+    "example.com": "whois.verisign-grs.com"
+}
+
+
+def get_domain_extension(domain):
+    """
+    Returns the TLD of the domain, either its last label or its two last labels if they are a known double extension.
+    """
+    labels = domain.split(".")
+    double_extension = ".".join(labels[-2:])
+    if len(labels) > 1 and double_extension in dble_ext:
+        return double_extension
+    return labels[-1]
+
+
+def get_tld_servers():
+    """
+    Returns the root WHOIS server of every TLD, None for the TLDs without a WHOIS server. The table is parsed from
+    TLD_SERVERS on the first call.
+    """
+    global tld_servers
+    if tld_servers is None:
+        servers = {}
+        for line in TLD_SERVERS.splitlines():
+            entry = line.split()
+            if entry:
+                servers[entry[0]] = entry[1] if len(entry) > 1 else None
+        tld_servers = servers
+    return tld_servers
+
+
 def get_root_server(domain):
-    ext = domain.split(".")[-1]
-    for dble in dble_ext:
-        if domain.endswith(dble):
-            ext = dble
+    ext = get_domain_extension(domain)
+    servers = get_tld_servers()
 
-    if ext in tlds.keys():
-        entry = tlds[ext]
-        try:
-            host = entry["host"]
-        except KeyError:
-            context = ({
-                outputPaths['domain']: {
-                    'Name': domain,
-                    'Whois': {
-                        'QueryStatus': 'Failed'
-                    }
-                },
-            })
-            if SHOULD_ERROR:
-                return_error('The domain - {} - is not supported by the Whois service'.format(domain),
-                             outputs=context)
-            else:
-                return_warning('The domain - {} - is not supported by the Whois service'.format(domain),
-                               exit=True, outputs=context)
+    if ext in servers:
+        host = servers[ext]
+        if host is None:
+            raise WhoisQueryFailed('The domain - {} - is not supported by the Whois service'.format(domain), domain)
 
         return host
 
@@ -7248,25 +1935,44 @@ def get_root_server(domain):
         raise WhoisException("No root WHOIS server found for domain.")
 
 
+def get_cached_root_server(domain):
+    """
+    Returns the root WHOIS server of the domain. The server is resolved once per TLD.
+    """
+    for exception, exc_serv in root_server_exceptions.items():
+        if domain.endswith(exception):
+            return exc_serv
+
+    tld = get_domain_extension(domain)
+    with LOOKUP_LOCK:
+        if tld not in root_servers_cache:
+            root_servers_cache[tld] = get_root_server(domain)
+        return root_servers_cache[tld]
+
+
+def get_server_semaphore(server):
+    with LOOKUP_LOCK:
+        if server not in server_semaphores:
+            server_semaphores[server] = threading.BoundedSemaphore(MAX_CONNECTIONS_PER_SERVER)
+        return server_semaphores[server]
+
+
 def whois_request(domain, server, port=43):
+    with get_server_semaphore(server):
+        start_time = time.time()
+        try:
+            return send_whois_request(domain, server, port)
+        finally:
+            with LOOKUP_LOCK:
+                server_latencies.setdefault(server, []).append(time.time() - start_time)
+
+
+def send_whois_request(domain, server, port=43):
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     try:
         sock.connect((server, port))
     except Exception as msg:
-        context = ({
-            outputPaths['domain']: {
-                'Name': domain,
-                'Whois': {
-                    'QueryStatus': 'Failed'
-                }
-            },
-        })
-
-        if SHOULD_ERROR:
-            return_error("Whois returned - Couldn't connect with the socket-server: {}".format(msg), outputs=context)
-        else:
-            return_warning("Whois returned - Couldn't connect with the socket-server: {}".format(msg),
-                           exit=True, outputs=context)
+        raise WhoisQueryFailed("Whois returned - Couldn't connect with the socket-server: {}".format(msg), domain)
 
     else:
         sock.send(("%s\r\n" % domain).encode("utf-8"))
@@ -7298,8 +2004,55 @@ class WhoisException(Exception):
     pass
 
 
+class WhoisQueryFailed(WhoisException):
+    """
+    The query could not be performed, the command returns a failed query status for the domain.
+    """
+    def __init__(self, message, domain):
+        super(WhoisQueryFailed, self).__init__(message)
+        self.domain = domain
+
+
+LOOKUP_LOCK = threading.Lock()
+root_servers_cache = {}  # type: dict
+server_semaphores = {}  # type: dict
+server_latencies = {}  # type: dict
+parsed_results_cache = {}  # type: dict
+raw_results_cache = {}  # type: dict
+raw_results_cache_loaded = False
+cache_statistics = {'hits': 0, 'misses': 0}
+
+
+class LazyRegex(object):
+    """
+    A regex compiled on its first search. A lookup uses only a few of the grammar and contact regexes, so compiling all
+    of them when the integration starts is a waste.
+    """
+    __slots__ = ('pattern', 'flags', '_compiled')
+
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        self.flags = flags
+        self._compiled = None
+
+    @property
+    def compiled(self):
+        if self._compiled is None:
+            self._compiled = re.compile(self.pattern, self.flags)
+        return self._compiled
+
+    def search(self, string):
+        return self.compiled.search(string)
+
+    def match(self, string):
+        return self.compiled.match(string)
+
+    def finditer(self, string):
+        return self.compiled.finditer(string)
+
+
 def precompile_regexes(source, flags=0):
-    return [re.compile(regex, flags) for regex in source]
+    return [LazyRegex(regex, flags) for regex in source]
 
 
 def preprocess_regex(regex):
@@ -7659,6 +2412,116 @@ else:
         return isinstance(data, str)
 
 
+REGEX_SPECIAL_CHARS = set(".^$*+?{}[]\\|()")
+REGEX_LITERAL_ESCAPES = {"n": "\n", "t": "\t"}
+required_literals = {}  # type: dict
+
+
+def get_required_literal(regex):
+    """
+    Returns a literal text every match of the regex starts with, lowercase for case insensitive regexes.
+    A text which does not contain the literal can't match the regex, so searching the text is skipped. Returns an empty
+    string when the regex does not start with a literal.
+    """
+    if regex in required_literals:
+        return required_literals[regex]
+
+    pattern = regex.pattern
+    literal = []
+    depth = 0
+    i = 0
+    # A top level alternation means the matches don't have to start with the literal
+    while i < len(pattern):
+        if pattern[i] == "\\":
+            i += 1
+        elif pattern[i] == "(":
+            depth += 1
+        elif pattern[i] == ")":
+            depth -= 1
+        elif pattern[i] == "|" and depth == 0:
+            break
+        elif pattern[i] == "[":
+            i = pattern.index("]", i + 2 if pattern.startswith("[^", i) else i + 1)
+        i += 1
+    else:
+        i = 1 if pattern.startswith("^") else 0
+        while i < len(pattern):
+            char = pattern[i]
+            if char == "\\" and i + 1 < len(pattern):
+                escaped = pattern[i + 1]
+                if escaped in REGEX_LITERAL_ESCAPES:
+                    char = REGEX_LITERAL_ESCAPES[escaped]
+                elif escaped.isalnum():
+                    break
+                else:
+                    char = escaped
+                i += 2
+            elif char in REGEX_SPECIAL_CHARS:
+                break
+            else:
+                i += 1
+            if pattern[i:i + 1] in ("*", "?", "{"):
+                # The last character is optional
+                break
+            literal.append(char)
+            if pattern[i:i + 1] == "+":
+                break
+
+    literal = "".join(literal)
+    if regex.flags & re.IGNORECASE:
+        literal = literal.lower()
+    required_literals[regex] = literal
+    return literal
+
+
+def scan_grammar_rules(segment, skip_rules):
+    """
+    Scans the lines of a segment for the values of the grammar rules. A line is searched only by the regexes whose
+    required literal it contains.
+
+    Args:
+        segment: The raw WHOIS segment.
+        skip_rules: The rules which already have values.
+
+    Returns:
+        list. The (rule, values) of the rules with values, in the order of the grammar rules.
+    """
+    rules = [(rule_key, [(regex, get_required_literal(regex), regex.flags & re.IGNORECASE) for regex in rule_regexes])
+             for rule_key, rule_regexes in grammar['_data'].items() if rule_key not in skip_rules]  # type: ignore
+
+    rule_values = {}  # type: dict
+    for line in segment.splitlines():
+        lower_line = line.lower()
+        for rule_key, rule_regexes in rules:
+            for regex, literal, ignore_case in rule_regexes:
+                if literal not in (lower_line if ignore_case else line):
+                    continue
+                result = regex.search(line)
+                if result is not None:
+                    val = result.group("val").strip()
+                    if val != "":
+                        rule_values.setdefault(rule_key, []).append(val)
+
+    return [(rule_key, rule_values[rule_key]) for rule_key, _ in rules if rule_key in rule_values]
+
+
+def search_first_contact(regexes, segments):
+    """
+    Returns the groups of the first regex matching the last segment any of the regexes match, None if none of them
+    match. A segment is searched only by the regexes whose required literal it contains.
+    """
+    contact = None
+    for segment in segments:
+        for regex in regexes:
+            if get_required_literal(regex) not in segment:
+                continue
+            match = regex.search(segment)
+            if match is not None:
+                contact = match.groupdict()
+                break
+    return contact
+
+
 def parse_raw_whois(raw_data, normalized=None, never_query_handles=True, handle_server=""):
     normalized = normalized or []
     data = {}  # type: dict
@@ -7666,19 +2529,8 @@ def parse_raw_whois(raw_data, normalized=None, never_query_handles=True, handle_
     raw_data = [segment.replace("\r", "") for segment in raw_data]  # Carriage returns are the devil
 
     for segment in raw_data:
-        for rule_key, rule_regexes in grammar['_data'].items():  # type: ignore
-            if (rule_key in data) == False:
-                for line in segment.splitlines():
-                    for regex in rule_regexes:
-                        result = re.search(regex, line)
-
-                        if result is not None:
-                            val = result.group("val").strip()
-                            if val != "":
-                                try:
-                                    data[rule_key].append(val)
-                                except KeyError as e:
-                                    data[rule_key] = [val]
+        for rule_key, values in scan_grammar_rules(segment, data):
+            data[rule_key] = values
 
         # Whois.com is a bit special... Fabulous.com also seems to use this format. As do some others.
         match = re.search("^\s?Name\s?[Ss]ervers:?\s*\n((?:\s*.+\n)+?\s?)\n", segment, re.MULTILINE)
@@ -7898,7 +2750,7 @@ def normalize_data(data, normalized):
                 new_lines = []
                 for i, line in enumerate(lines):
                     for regex in organization_regexes:
-                        if re.search(regex, line):
+                        if regex.search(line):
                             new_lines.append(line)
                             del lines[i]
                             break
@@ -7914,7 +2766,7 @@ def normalize_data(data, normalized):
                 lines = [x.strip() for x in contact["street"].splitlines()]
                 if len(lines) > 1:
                     for regex in organization_regexes:
-                        if re.search(regex, lines[0]):
+                        if regex.search(lines[0]):
                             contact["organization"] = lines[0]
                             contact["street"] = "\n".join(lines[1:])
                             break
@@ -7982,7 +2834,7 @@ def parse_dates(dates):
 
     for date in dates:
         for rule in grammar['_dateformats']:  # type: ignore
-            result = re.match(rule, date)
+            result = rule.match(date)
 
             if result is not None:
                 try:
@@ -8077,38 +2929,10 @@ def remove_suffixes(data):
 
 
 def parse_registrants(data, never_query_handles=True, handle_server=""):
-    registrant = None
-    tech_contact = None
-    billing_contact = None
-    admin_contact = None
-
-    for segment in data:
-        for regex in registrant_regexes:
-            match = re.search(regex, segment)
-            if match is not None:
-                registrant = match.groupdict()
-                break
-
-    for segment in data:
-        for regex in tech_contact_regexes:
-            match = re.search(regex, segment)
-            if match is not None:
-                tech_contact = match.groupdict()
-                break
-
-    for segment in data:
-        for regex in admin_contact_regexes:
-            match = re.search(regex, segment)
-            if match is not None:
-                admin_contact = match.groupdict()
-                break
-
-    for segment in data:
-        for regex in billing_contact_regexes:
-            match = re.search(regex, segment)
-            if match is not None:
-                billing_contact = match.groupdict()
-                break
+    registrant = search_first_contact(registrant_regexes, data)
+    tech_contact = search_first_contact(tech_contact_regexes, data)
+    admin_contact = search_first_contact(admin_contact_regexes, data)
+    billing_contact = search_first_contact(billing_contact_regexes, data)
 
     # Find NIC handle contact definitions
     handle_contacts = parse_nic_contact(data)
@@ -8118,7 +2942,7 @@ def parse_registrants(data, never_query_handles=True, handle_server=""):
     for category in nic_contact_references:
         for regex in nic_contact_references[category]:
             for segment in data:
-                match = re.search(regex, segment)
+                match = regex.search(segment)
                 if match is not None:
                     data_reference = match.groupdict()
                     if data_reference["handle"] == "-" or re.match("https?:\/\/", data_reference["handle"]) is not None:
@@ -8237,8 +3061,11 @@ def fetch_nic_contact(handle, lookup_server):
 def parse_nic_contact(data):
     handle_contacts = []
     for regex in nic_contact_regexes:
+        literal = get_required_literal(regex)
         for segment in data:
-            matches = re.finditer(regex, segment)
+            if literal not in segment:
+                continue
+            matches = regex.finditer(segment)
             for match in matches:
                 handle_contacts.append(match.groupdict())
 
@@ -8248,16 +3075,130 @@ def parse_nic_contact(data):
 def get_whois(domain, normalized=None):
     if normalized is None:
         normalized = []
-    raw_data, server_list = get_whois_raw(domain, with_server_list=True)
-    return parse_raw_whois(raw_data, normalized=normalized, never_query_handles=False,
-                           handle_server=server_list[-1])
+    cache_ttl = get_cache_ttl()
+    if cache_ttl and not normalized:
+        with LOOKUP_LOCK:
+            cached_result = parsed_results_cache.get(domain)
+            if cached_result and time.time() - cached_result['time'] < cache_ttl:
+                cache_statistics['hits'] += 1
+                return cached_result['result']
+
+    cached_raw = get_cached_whois_raw(domain) if cache_ttl else None
+    if cached_raw:
+        raw_data, server_list = cached_raw['raw'], cached_raw['servers']
+    else:
+        raw_data, server_list = get_whois_raw(domain, with_server_list=True)
+        with LOOKUP_LOCK:
+            cache_statistics['misses'] += 1
+            if cache_ttl:
+                raw_results_cache[domain] = {'raw': raw_data, 'servers': server_list, 'time': time.time()}
+
+    whois_result = parse_raw_whois(raw_data, normalized=normalized, never_query_handles=False,
+                                   handle_server=server_list[-1])
+    if cache_ttl and not normalized:
+        with LOOKUP_LOCK:
+            parsed_results_cache[domain] = {'result': whois_result, 'time': time.time()}
+    return whois_result
+
+
+def get_cache_ttl():
+    """
+    Returns the cache TTL in seconds, 0 when the cache is disabled.
+    """
+    try:
+        return max(int(demisto.params().get('cache_ttl') or 0), 0) * 60
+    except ValueError:
+        raise ValueError('The cache TTL must be a number of minutes.')
+
+
+def get_cached_whois_raw(domain):
+    """
+    Returns the raw result of the domain and the servers it was returned by if they were cached in the integration
+    context less than the cache TTL ago, None otherwise.
+    """
+    global raw_results_cache_loaded
+    with LOOKUP_LOCK:
+        if not raw_results_cache_loaded:
+            raw_results_cache.update(demisto.getIntegrationContext().get('whois_cache', {}))
+            raw_results_cache_loaded = True
+        cached_raw = raw_results_cache.get(domain)
+        if cached_raw and time.time() - cached_raw['time'] < get_cache_ttl():
+            cache_statistics['hits'] += 1
+            return cached_raw
+        return None
+
+
+def save_whois_cache():
+    """
+    Saves the raw results in the integration context, without the expired results and up to WHOIS_CACHE_MAX_SIZE of
+    the latest results.
+    """
+    if not raw_results_cache or not cache_statistics['misses']:
+        return
+    min_time = time.time() - get_cache_ttl()
+    cached_raw_results = sorted([(domain, cached_raw) for domain, cached_raw in raw_results_cache.items()
+                                 if cached_raw['time'] >= min_time], key=lambda item: item[1]['time'], reverse=True)
+    integration_context = demisto.getIntegrationContext()
+    integration_context['whois_cache'] = dict(cached_raw_results[:WHOIS_CACHE_MAX_SIZE])
+    demisto.setIntegrationContext(integration_context)
+
+
+def lookup_domains(domains):
+    """
+    Looks up the domains concurrently, with up to MAX_CONNECTIONS_PER_SERVER connections to every WHOIS server.
+
+    Returns:
+        dict. The whois result of every domain, or the exception its lookup failed with.
+    """
+    def lookup_domain(domain):
+        try:
+            return domain, get_whois(domain)
+        except Exception as e:
+            return domain, e
+
+    domains = list(set(domains))
+    if len(domains) < 2:
+        return dict(map(lookup_domain, domains))
+    pool = ThreadPool(min(MAX_WORKERS, len(domains)))
+    try:
+        return dict(pool.map(lookup_domain, domains))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def get_lookup_statistics():
+    """
+    Returns the human readable cache hit ratio and latency of every WHOIS server queried by the command.
+    """
+    lookups = cache_statistics['hits'] + cache_statistics['misses']
+    hit_ratio = 100.0 * cache_statistics['hits'] / lookups if lookups else 0.0
+    server_statistics = []
+    for server, latencies in sorted(server_latencies.items()):
+        server_statistics.append({
+            'Server': server,
+            'Queries': len(latencies),
+            'Average Latency (ms)': int(1000 * sum(latencies) / len(latencies)),
+            'Max Latency (ms)': int(1000 * max(latencies))
+        })
+    return tableToMarkdown('Whois lookup statistics', server_statistics,
+                           headers=['Server', 'Queries', 'Average Latency (ms)', 'Max Latency (ms)'],
+                           metadata='Cache hit ratio: {:.1f}% ({} of {} lookups)'.format(
+                               hit_ratio, cache_statistics['hits'], lookups))
 
 
 # Drops the mic disable-secrets-detection-end
 
 def get_domain_from_query(query):
-    # checks for largest matching suffix inside tlds dictionary
-    suffix_len = max([len(suffix) for suffix in tlds if query.endswith('.{}'.format(suffix))] or [0])
+    # checks for largest matching suffix inside the TLD table
+    servers = get_tld_servers()
+    labels = query.split('.')
+    suffix_len = 0
+    for i in range(1, len(labels)):
+        suffix = '.'.join(labels[i:])
+        if suffix in servers:
+            suffix_len = len(suffix)
+            break
     # if suffix(TLD) was found increase the length by one in order to add the dot before it. --> .com instead of com
     if suffix_len != 0:
         suffix_len += 1
@@ -8363,9 +3304,12 @@ def create_outputs(whois_result, domain, query=None):
 
 
 def domain_command():
-    domains = demisto.args().get('domain', [])
-    for domain in argToList(domains):
-        whois_result = get_whois(domain)
+    domains = argToList(demisto.args().get('domain', []))
+    whois_results = lookup_domains(domains)
+    for domain in domains:
+        whois_result = whois_results[domain]
+        if isinstance(whois_result, Exception):
+            raise whois_result
         md, standard_ec, dbot_score = create_outputs(whois_result, domain)
         demisto.results({
             'Type': entryTypes['note'],
@@ -8378,6 +3322,12 @@ def domain_command():
                     dbot_score
             }
         })
+    demisto.results({
+        'Type': entryTypes['note'],
+        'ContentsFormat': formats['json'],
+        'Contents': {'CacheStatistics': cache_statistics, 'ServerLatencies': server_latencies},
+        'HumanReadable': get_lookup_statistics()
+    })
 
 
 def whois_command():
@@ -8438,6 +3388,21 @@ def setup_proxy():
     socket.socket = socks.socksocket  # type: ignore
 
 
+def return_failed_query(error):
+    context = ({
+        outputPaths['domain']: {
+            'Name': error.domain,
+            'Whois': {
+                'QueryStatus': 'Failed'
+            }
+        },
+    })
+    if SHOULD_ERROR:
+        return_error(str(error), outputs=context)
+    else:
+        return_warning(str(error), exit=True, outputs=context)
+
+
 ''' EXECUTION CODE '''
 
 
@@ -8453,6 +3418,9 @@ def main():
             whois_command()
         elif command == 'domain':
             domain_command()
+        save_whois_cache()
+    except WhoisQueryFailed as e:
+        return_failed_query(e)
     except Exception as e:
         LOG(e)
         return_error(str(e))
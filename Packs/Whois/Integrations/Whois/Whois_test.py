@@ -1,4 +1,6 @@
 import datetime
+import json
+import re
 
 import Whois
 import demistomock as demisto
@@ -28,13 +30,61 @@ def test_test_command(mocker):
     'query,expected',
     [("app.paloaltonetwork.com", "paloaltonetwork.com"),
      ("test.this.google.co.il", "google.co.il"),
-     ("app.XSOAR.test", "app.XSOAR.test")]
+     ("app.XSOAR.test", "app.XSOAR.test"),
+     ("www.registry.e164.arpa", "registry.e164.arpa"),
+     ("paloaltonetwork.com", "paloaltonetwork.com")]
 )
 def test_get_domain_from_query(query, expected):
     from Whois import get_domain_from_query
     assert get_domain_from_query(query) == expected
 
 
+@pytest.mark.parametrize('domain, expected', [
+    ('paloaltonetwork.com', 'whois.verisign-grs.com'),
+    ('google.co.il', 'whois.isoc.org.il'),
+    ('example.de.com', 'whois.centralnic.com'),
+    ('example.ltd.hk', 'whois.registry.hk.com'),
+])
+def test_get_root_server(domain, expected):
+    assert Whois.get_root_server(domain) == expected
+
+
+def test_get_root_server_unsupported_tld():
+    """
+    Given
+    - A domain of a TLD without a WHOIS server, and a domain of an unknown TLD
+
+    When
+    - Resolving the root WHOIS server of the domains
+
+    Then
+    - The query of the first domain fails as not supported, no root server is found for the second
+    """
+    with pytest.raises(Whois.WhoisQueryFailed, match='is not supported'):
+        Whois.get_root_server('example.aaa')
+    with pytest.raises(Whois.WhoisException, match='No root WHOIS server found'):
+        Whois.get_root_server('example.notatld')
+
+
+def test_lazy_regex():
+    """
+    Given
+    - A grammar regex which was not used yet
+
+    When
+    - Searching a text by the regex
+
+    Then
+    - The regex is compiled on the first search only
+    """
+    regex = Whois.LazyRegex(r'Registrar:\s*(?P<val>.+)', re.IGNORECASE)
+    assert regex._compiled is None
+    assert regex.search('registrar: MarkMonitor').group('val') == 'MarkMonitor'
+    compiled = regex._compiled
+    assert regex.finditer('Registrar: a\nRegistrar: b') and regex._compiled is compiled
+    assert regex.match('no registrar') is None
+
+
 def test_socks_proxy_fail(mocker):
     mocker.patch.object(demisto, 'params', return_value={'proxy_url': 'socks5://localhost:1180'})
     mocker.patch.object(demisto, 'command', return_value='test-module')
@@ -141,3 +191,200 @@ def test_query_result(whois_result, domain, expected):
     from Whois import create_outputs
     md, standard_ec, dbot_score = create_outputs(whois_result, domain)
     assert standard_ec['Whois']['QueryResult'] == expected
+
+
+@pytest.fixture
+def lookup_state(mocker):
+    mocker.patch.object(Whois, 'root_servers_cache', {})
+    mocker.patch.object(Whois, 'server_semaphores', {})
+    mocker.patch.object(Whois, 'server_latencies', {})
+    mocker.patch.object(Whois, 'parsed_results_cache', {})
+    mocker.patch.object(Whois, 'raw_results_cache', {})
+    mocker.patch.object(Whois, 'raw_results_cache_loaded', False)
+    mocker.patch.object(Whois, 'cache_statistics', {'hits': 0, 'misses': 0})
+
+
+def test_lookup_domains_concurrency_per_server(mocker, lookup_state):
+    """
+    Given
+    - Domains of two TLDs served by different WHOIS servers
+
+    When
+    - Looking up the domains concurrently
+
+    Then
+    - Every domain gets its result
+    - No more than MAX_CONNECTIONS_PER_SERVER connections are open at a time to the same server
+    - The root server is resolved once per TLD
+    """
+    import threading
+    open_connections = {}
+    max_open_connections = {}
+    lock = threading.Lock()
+
+    def send_whois_request(domain, server, port=43):
+        with lock:
+            open_connections[server] = open_connections.get(server, 0) + 1
+            max_open_connections[server] = max(max_open_connections.get(server, 0), open_connections[server])
+        time.sleep(0.05)
+        with lock:
+            open_connections[server] -= 1
+        return 'Domain Name: {}\nRegistrar: Registrar of {}\n'.format(domain.lstrip('='), domain.lstrip('='))
+
+    mocker.patch.object(demisto, 'params', return_value={'cache_ttl': '0'})
+    mocker.patch.object(Whois, 'send_whois_request', side_effect=send_whois_request)
+    root_server_spy = mocker.spy(Whois, 'get_root_server')
+    domains = ['domain{}.com'.format(i) for i in range(6)] + ['domain{}.org'.format(i) for i in range(6)]
+
+    whois_results = Whois.lookup_domains(domains)
+
+    assert sorted(whois_results) == sorted(domains)
+    assert whois_results['domain3.org']['registrar'] == ['Registrar of domain3.org']
+    assert max_open_connections == {'whois.verisign-grs.com': Whois.MAX_CONNECTIONS_PER_SERVER,
+                                    'whois.pir.org': Whois.MAX_CONNECTIONS_PER_SERVER}
+    assert root_server_spy.call_count == 2
+    assert len(Whois.server_latencies['whois.pir.org']) == 6
+
+
+def test_domain_command_cache(mocker, lookup_state):
+    """
+    Given
+    - A domain whose raw result is cached in the integration context, a domain whose cached raw result expired
+      and a domain which is not cached
+
+    When
+    - Running the domain command with the domains, one of them twice
+
+    Then
+    - Only the expired and the not cached domains are queried, once each
+    - The results are returned in the order of the domains, followed by the lookup statistics
+    - The integration context holds the raw results of all the domains
+    """
+    def send_whois_request(domain, server, port=43):
+        return 'Domain Name: {}\n'.format(domain.lstrip('='))
+
+    integration_context = {'whois_cache': {
+        'cached.com': {'raw': ['Domain Name: cached.com\n'], 'servers': ['whois.verisign-grs.com'],
+                       'time': time.time() - 60},
+        'expired.com': {'raw': ['Domain Name: expired.com\n'], 'servers': ['whois.verisign-grs.com'],
+                        'time': time.time() - 7200}
+    }}
+    mocker.patch.object(demisto, 'params', return_value={'cache_ttl': '60'})
+    mocker.patch.object(demisto, 'args', return_value={'domain': 'cached.com,expired.com,new.com,cached.com'})
+    mocker.patch.object(demisto, 'getIntegrationContext', return_value=integration_context)
+    mocker.patch.object(demisto, 'setIntegrationContext')
+    mocker.patch.object(demisto, 'results')
+    send_mock = mocker.patch.object(Whois, 'send_whois_request', side_effect=send_whois_request)
+
+    Whois.domain_command()
+    Whois.save_whois_cache()
+
+    assert sorted(call[0][0] for call in send_mock.call_args_list) == ['=expired.com', '=new.com']
+    results = [call[0][0] for call in demisto.results.call_args_list]
+    assert [result['EntryContext']['Domain(val.Name && val.Name == obj.Name)']['Name'] for result in results[:4]] == \
+        ['cached.com', 'expired.com', 'new.com', 'cached.com']
+    assert 'Cache hit ratio: 33.3% (1 of 3 lookups)' in results[4]['HumanReadable']
+    assert 'whois.verisign-grs.com' in results[4]['HumanReadable']
+    saved_cache = demisto.setIntegrationContext.call_args[0][0]['whois_cache']
+    assert sorted(saved_cache) == ['cached.com', 'expired.com', 'new.com']
+    assert saved_cache['expired.com']['time'] > time.time() - 60
+
+
+def test_domain_command_failed_query(mocker, lookup_state):
+    """
+    Given
+    - A domain of a TLD which has no WHOIS server
+
+    When
+    - Running the domain command
+
+    Then
+    - A failed query status is returned for the domain
+    """
+    mocker.patch.object(demisto, 'params', return_value={})
+    mocker.patch.object(demisto, 'command', return_value='domain')
+    mocker.patch.object(demisto, 'args', return_value={'domain': 'domain.ad'})
+    mocker.patch.object(demisto, 'results')
+
+    with pytest.raises(SystemExit):
+        Whois.main()
+
+    result = demisto.results.call_args[0][0]
+    assert 'is not supported by the Whois service' in result['Contents']
+    assert result['EntryContext']['Domain(val.Name && val.Name == obj.Name)']['Whois']['QueryStatus'] == 'Failed'
+
+
+@pytest.mark.parametrize('pattern, flags, expected', [
+    (r'Domain ID:[ ]*(?P<val>.+)', re.IGNORECASE, 'domain id:'),
+    (r'^state:\s*(?P<val>.+)', re.IGNORECASE, 'state:'),
+    (r'\[Created on\]\s*(?P<val>.+)', re.IGNORECASE, '[created on]'),
+    (r'Exp(?:iry)? Date\s?[.]*:\s?(?P<val>.+)', re.IGNORECASE, 'exp'),
+    (r'Created\s?[.]*:?\s*?(?P<val>.+)', re.IGNORECASE, 'created'),
+    (r'(C|c)hanged:\s*(?P<val>.+)', re.IGNORECASE, ''),
+    (r'\tName:\t\s(?P<val>.+)', re.IGNORECASE, '\tname:\t'),
+    (r'Registrant:\n  (?P<name>.+)\n', 0, 'Registrant:\n  '),
+    (r'Registrants?:(?P<name>.+)', 0, 'Registrant'),
+    (r'owner:|holder:(?P<name>.+)', 0, ''),
+])
+def test_get_required_literal(pattern, flags, expected):
+    from Whois import get_required_literal
+    assert get_required_literal(re.compile(pattern, flags)) == expected
+
+
+def test_required_literals_of_corpus_matches():
+    """
+    Given
+    - A corpus of saved WHOIS responses
+
+    When
+    - Searching the responses by the grammar and contact regexes
+
+    Then
+    - Every line or segment a regex matches contains the required literal of the regex
+    """
+    with open('test_data/whois_corpus.json') as corpus_file:
+        corpus = json.load(corpus_file)
+    segments = [segment.replace('\r', '') for record in corpus for segment in record['raw']]
+    lines = [line for segment in segments for line in segment.splitlines()]
+
+    for rule_regexes in Whois.grammar['_data'].values():
+        for regex in rule_regexes:
+            literal = Whois.get_required_literal(regex)
+            for line in lines:
+                if regex.search(line):
+                    assert literal in line.lower()
+
+    for regexes in (Whois.registrant_regexes, Whois.tech_contact_regexes, Whois.admin_contact_regexes,
+                    Whois.billing_contact_regexes, Whois.nic_contact_regexes):
+        for regex in regexes:
+            literal = Whois.get_required_literal(regex)
+            for segment in segments:
+                if regex.search(segment):
+                    assert literal in segment
+
+
+def test_parse_raw_whois_corpus():
+    """
+    Given
+    - Saved WHOIS responses of a registrar and of a registry with NIC handle contacts
+
+    When
+    - Parsing the responses
+
+    Then
+    - The dates, name servers, registrar and contacts are parsed
+    """
+    with open('test_data/whois_corpus.json') as corpus_file:
+        corpus = {record['domain']: record['raw'] for record in json.load(corpus_file)}
+
+    com_result = Whois.parse_raw_whois(corpus['example-shop.com'])
+    assert com_result['creation_date'] == [datetime.datetime(1997, 9, 15, 0, 0)]
+    assert com_result['nameservers'] == ['ns1.example-shop.com', 'ns2.example-shop.com', 'ns3.example-shop.com',
+                                         'ns4.example-shop.com']
+    assert com_result['registrar'] == ['MarkMonitor, Inc.']
+    assert com_result['contacts']['registrant']['organization'] == 'Example Shop LLC'
+
+    fr_result = Whois.parse_raw_whois(corpus['exemple-boutique.fr'])
+    assert fr_result['nameservers'] == ['ns-1.gandi.net', 'ns-2.gandi.net', 'ns-3.gandi.net']
+    assert fr_result['contacts']['registrant']['name'] == 'Exemple Boutique SARL'
+    assert fr_result['contacts']['tech']['handle'] == 'TS5678-FRNIC'
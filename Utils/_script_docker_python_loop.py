@@ -1,8 +1,15 @@
+import __future__
 import os
 import threading
 import sys
 import json
 import traceback
+import copy
+import hashlib
+import inspect
+import marshal
+import types
+from collections import OrderedDict
 
 if sys.version_info[0] < 3:
     import Queue as queue
@@ -388,6 +395,237 @@ print = demisto_print
 ###CODE_HERE###
 '''
 
+# cache of compiled script code objects, keyed by a digest of the template flavour and the script text.
+# the server prepends CommonServerPython to every script, so compiling is expensive and the same
+# handful of scripts are executed over and over again in a long living container.
+DEFAULT_CODE_CACHE_SIZE = 32
+try:
+    CODE_CACHE_SIZE = int(os.environ.get('SCRIPT_CODE_CACHE_SIZE', DEFAULT_CODE_CACHE_SIZE))
+except ValueError:
+    CODE_CACHE_SIZE = DEFAULT_CODE_CACHE_SIZE
+# optional directory to persist the compiled code objects (marshal format) so a warm container starts instantly
+CODE_CACHE_DIR = os.environ.get('SCRIPT_CODE_CACHE_DIR', '')
+
+
+class CodeCache(object):
+    """Bounded LRU cache of compiled code objects with an optional on-disk marshal layer"""
+
+    def __init__(self, max_size, cache_dir=''):
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(flavour, template, code_string):
+        # marshal output is only valid for the interpreter version that created it, and persisted code
+        # must not survive a change of the template it was compiled with
+        sha = hashlib.sha256()
+        sha.update('{}:{}:'.format(flavour, sys.version).encode('utf-8'))
+        sha.update(hashlib.sha256(template.encode('utf-8')).hexdigest().encode('utf-8'))
+        sha.update(code_string.encode('utf-8'))
+        return sha.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + '.marshal')
+
+    def _load_from_disk(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return marshal.load(f)
+        except Exception:
+            # missing or corrupted cache files are simply recompiled
+            return None
+
+    def _save_to_disk(self, key, code):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with open(tmp_path, 'wb') as f:
+                marshal.dump(code, f)
+            os.rename(tmp_path, path)
+        except Exception:
+            # the disk cache is best effort only
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _put(self, key, code):
+        if self.max_size <= 0:
+            return
+        self.entries[key] = code
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def get_code(self, flavour, template, code_string):
+        key = self.digest(flavour, template, code_string)
+        code = self.entries.pop(key, None)
+        if code is not None:
+            self.hits += 1
+            self._put(key, code)
+            return code
+
+        code = self._load_from_disk(key)
+        if code is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            code = compile(template.replace('###CODE_HERE###', code_string), '<string>', 'exec')
+            self._save_to_disk(key, code)
+        self._put(key, code)
+        return code
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'diskHits': self.disk_hits,
+            'misses': self.misses,
+            'size': len(self.entries),
+            'maxSize': self.max_size
+        }
+
+
+code_cache = CodeCache(CODE_CACHE_SIZE, CODE_CACHE_DIR)
+
+# optional path to the CommonServerPython source the server prepends to every script. when set, CommonServerPython
+# is imported once as a real module and every script gets a copy of its namespace instead of re-executing it.
+COMMON_SERVER_PATH = os.environ.get('SCRIPT_COMMON_SERVER_PATH', '')
+
+# the script code is compiled on its own in the pre-imported mode, keep the future import of the template
+script_only_template_code = 'from __future__ import print_function\n###CODE_HERE###'
+
+# the server strips the print_function import from the prepended CommonServerPython, it is compiled with the flag
+PRINT_FUNCTION_FLAG = __future__.print_function.compiler_flag
+
+# re-creates the module level state of CommonServerPython which must not leak between executions
+common_server_reset_code = '''
+LOG = IntegrationLogger()
+get_demisto_version = GetDemistoVersion()
+_requests_logger = None
+try:
+    if is_debug_mode():
+        _requests_logger = DebugLogger()
+        _requests_logger.log_start_debug()
+except Exception as ex:
+    demisto.info('Failed initializing DebugLogger: {}'.format(ex))
+'''
+
+
+class CommonServerModule(object):
+    """CommonServerPython imported once as a module, handing out a fresh namespace per execution.
+
+    State shared between executions is limited to what must not change: functions, classes and immutable values.
+    Class attributes added or rebound by a script are reverted, mutable containers (dict, list, set) at module and
+    class level are restored to their state right after the import whenever a script changed them, and the module
+    level objects in ``common_server_reset_code`` are re-created before every execution.
+    """
+
+    # module attributes of the CommonServerPython module, a script must see the values of a plain exec instead
+    module_attributes = ('__name__', '__doc__', '__package__', '__loader__', '__spec__', '__file__')
+    mutable_types = (dict, list, set, bytearray)
+
+    def __init__(self, path):
+        self.source = ''
+        self.module = None
+        self.snapshot = None
+        self.mutable_state = []
+        self.class_snapshots = []
+        self.reset_code = compile(common_server_reset_code, '<CommonServerPython>', 'exec', PRINT_FUNCTION_FLAG,
+                                  dont_inherit=True)
+        if path:
+            with open(path, 'rb') as f:
+                self.source = f.read().decode('utf-8')
+
+    def split(self, code_string):
+        """Returns the script code without the CommonServerPython prefix,
+        or None if the script was not prefixed with the pre-imported CommonServerPython"""
+        if self.source and code_string.startswith(self.source):
+            return code_string[len(self.source):]
+        return None
+
+    def _track(self, owner, name, value):
+        try:
+            self.mutable_state.append((owner, name, copy.deepcopy(value)))
+        except Exception:
+            # containers which can not be copied are shared as they are
+            pass
+
+    def _collect_class_state(self, cls, seen):
+        if cls in seen:
+            return
+        seen.add(cls)
+        self.class_snapshots.append((cls, dict(vars(cls))))
+        for name, value in list(vars(cls).items()):
+            if isinstance(value, self.mutable_types):
+                self._track(cls, name, value)
+            elif inspect.isclass(value) and value.__module__ == self.module.__name__:
+                self._collect_class_state(value, seen)
+
+    def _collect_mutable_state(self, execution_globals):
+        """Keeps a pristine copy of every mutable container defined by CommonServerPython"""
+        seen = set()
+        for name, value in self.snapshot.items():
+            if name in execution_globals or name.startswith('__'):
+                continue
+            if isinstance(value, self.mutable_types):
+                self._track(self.snapshot, name, value)
+            elif inspect.isclass(value) and value.__module__ == self.module.__name__:
+                self._collect_class_state(value, seen)
+
+    def _restore_mutable_state(self):
+        for cls, attributes in self.class_snapshots:
+            current = vars(cls)
+            for name in [name for name in current if name not in attributes]:
+                delattr(cls, name)
+            for name, value in attributes.items():
+                if current.get(name) is not value:
+                    setattr(cls, name, value)
+        for owner, name, pristine in self.mutable_state:
+            if isinstance(owner, dict):
+                if owner.get(name) != pristine:
+                    owner[name] = copy.deepcopy(pristine)
+            elif vars(owner).get(name) != pristine:
+                setattr(owner, name, copy.deepcopy(pristine))
+
+    def namespace(self, execution_globals):
+        """Returns a new namespace for a script, holding CommonServerPython and the execution globals.
+
+        The script may rebind any name in its own copy. The module namespace itself is restored from the
+        snapshot taken right after the import, so CommonServerPython functions never see a previous execution.
+        """
+        if self.module is None:
+            self.module = types.ModuleType('CommonServerPython')
+            module_globals = self.module.__dict__
+            module_globals.update(execution_globals)
+            code = compile(self.source, '<CommonServerPython>', 'exec', PRINT_FUNCTION_FLAG, dont_inherit=True)
+            exec(code, module_globals, module_globals)  # guardrails-disable-line
+            self.snapshot = dict(module_globals)
+            self._collect_mutable_state(execution_globals)
+            sys.modules['CommonServerPython'] = self.module
+        else:
+            self._restore_mutable_state()
+            module_globals = self.module.__dict__
+            module_globals.clear()
+            module_globals.update(self.snapshot)
+            module_globals.update(execution_globals)
+            exec(self.reset_code, module_globals, module_globals)  # guardrails-disable-line
+        script_globals = dict(module_globals)
+        for name in self.module_attributes:
+            script_globals.pop(name, None)
+        return script_globals
+
+
+common_server = CommonServerModule(COMMON_SERVER_PATH)
+
 # rollback file system to its previous state
 # delete home dir and tmp dir
 
@@ -395,7 +633,7 @@ print = demisto_print
 # notifies demisto server that the current executed script is completed
 # and the process is ready to execute the next script
 def send_script_completed():
-    json.dump({'type': 'completed'}, sys.stdout)
+    json.dump({'type': 'completed', 'codeCache': code_cache.stats()}, sys.stdout)
     sys.stdout.write('\\n')
     sys.stdout.flush()
 
@@ -403,7 +641,7 @@ def send_script_completed():
 def send_script_exception(exc_type, exc_value, exc_traceback):
     ex_string = traceback.format_exception(exc_type, exc_value, exc_traceback)
     if ex_string == 'None\n':
-        ex_string = str(ex)
+        ex_string = str(exc_value)
 
     json.dump({'type': 'exception', 'args': {'exception': ex_string}}, sys.stdout)
     sys.stdout.write('\\n')
@@ -438,52 +676,66 @@ def rollback_system():
         os.environ[key] = backup_env_vars[key]
 
 
-while True:
-    contextString = do_ping_pong()
-    if contextString == '':
-        # finish executing python
-        break
-
-    contextJSON = json.loads(contextString)
+def execute_script(code_string, context_json, is_integ_script):
+    if is_integ_script:
+        flavour, template = 'integration', integ_template_code
+    else:
+        flavour, template = 'script', template_code
 
-    code_string = contextJSON['script']
-    contextJSON.pop('script', None)
+    sub_globals = {
+        '__readWhileAvailable': __readWhileAvailable,
+        'context': context_json,
+        'win': win
+    }
 
-    is_integ_script = contextJSON['integration']
-    complete_code = ''
-    if is_integ_script:
-        complete_code = integ_template_code.replace('###CODE_HERE###', code_string)
+    script_code = common_server.split(code_string)
+    if script_code is None:
+        code = code_cache.get_code(flavour, template, code_string)
     else:
-        complete_code = template_code.replace('###CODE_HERE###', code_string)
+        # run only the template (demisto instance, print override) and reuse the imported CommonServerPython
+        exec(code_cache.get_code(flavour, template, ''), sub_globals, sub_globals)  # guardrails-disable-line
+        sub_globals = common_server.namespace(sub_globals)
+        code = code_cache.get_code('script-only', script_only_template_code, script_code)
 
-    try:
-        code = compile(complete_code, '<string>', 'exec')
+    exec(code, sub_globals, sub_globals)  # guardrails-disable-line
 
-        sub_globals = {
-            '__readWhileAvailable': __readWhileAvailable,
-            'context': contextJSON,
-            'win': win
-        }
 
-        exec(code, sub_globals, sub_globals)  # guardrails-disable-line
+def main():
+    while True:
+        contextString = do_ping_pong()
+        if contextString == '':
+            # finish executing python
+            break
+
+        contextJSON = json.loads(contextString)
+
+        code_string = contextJSON['script']
+        contextJSON.pop('script', None)
 
-    except Exception as ex:
-        exc_type, exc_value, exc_traceback = sys.exc_info()
-        send_script_exception(exc_type, exc_value, exc_traceback)
-    except SystemExit:
-        # print 'Will not stop on sys.exit(0)'
-        pass
+        is_integ_script = contextJSON['integration']
 
-    rollback_system()
+        try:
+            execute_script(code_string, contextJSON, is_integ_script)
+        except Exception:
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            send_script_exception(exc_type, exc_value, exc_traceback)
+        except SystemExit:
+            # print 'Will not stop on sys.exit(0)'
+            pass
 
-    # ping back to Demisto server that script is completed
-    send_script_completed()
+        rollback_system()
+
+        # ping back to Demisto server that script is completed
+        send_script_completed()
+
+        # if the script running on native python then terminate the process after finished the script
+        is_python_native = contextJSON['native']
+        if is_python_native:
+            break
 
-    # if the script running on native python then terminate the process after finished the script
-    is_python_native = contextJSON['native']
-    if is_python_native:
-        break
+    if __read_thread:
+        __read_thread.join(timeout=1)
 
 
-if __read_thread:
-    __read_thread.join(timeout=1)
+if __name__ == '__main__':
+    main()
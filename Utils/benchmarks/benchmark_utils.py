@@ -0,0 +1,25 @@
+"""Helpers shared by the benchmarks: importing content code outside of the server and measuring resources."""
+import os
+import resource
+import sys
+import types
+
+CONTENT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def add_content_paths(*paths):
+    """Makes demistomock, CommonServerPython and the given content directories (relative to the content root)
+    importable, the way the lint environment of the integrations does"""
+    for path in ('Tests/demistomock', 'Packs/Base/Scripts/CommonServerPython') + paths:
+        full_path = os.path.join(CONTENT_ROOT, path)
+        if full_path not in sys.path:
+            sys.path.insert(0, full_path)
+    if 'CommonServerUserPython' not in sys.modules:
+        sys.modules['CommonServerUserPython'] = types.ModuleType('CommonServerUserPython')
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of the current process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB on linux
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
@@ -0,0 +1,139 @@
+"""Measures rows/sec and peak RSS of CSVFeedApiModule fetching a synthetic gzipped CSV feed from a local server.
+
+Every mode runs in its own process so the peak RSS of one does not hide the other:
+- buffered: reads the whole response, decompresses, decodes and splits it before parsing (the previous behaviour)
+  and collects all the indicators before batching them.
+- stream: decompresses, decodes and parses the response while it arrives and submits the batches on the way.
+
+Usage: python Utils/benchmarks/csv_feed_benchmark.py [--megabytes 1024]
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from benchmark_utils import add_content_paths, peak_rss_mb
+
+FIELDNAMES = 'value,firstseen,lastseen,malware,port'
+
+
+def write_feed(path, megabytes):
+    """Writes a gzipped CSV of the given uncompressed size, returns the number of rows"""
+    size = megabytes * 1024 * 1024
+    written = rows = 0
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        f.write('# synthetic feed\n')
+        while written < size:
+            lines = []
+            for i in range(rows, rows + 10000):
+                lines.append('{}.{}.{}.{},2020-01-{:02d} 10:00:00,2020-02-{:02d} 12:00:00,Malware{},{}\n'.format(
+                    i >> 24 & 255, i >> 16 & 255, i >> 8 & 255, i & 255, i % 28 + 1, i % 28 + 1, i % 97, i % 65535))
+            chunk = ''.join(lines)
+            f.write(chunk)
+            written += len(chunk)
+            rows += len(lines)
+    return rows
+
+
+def serve_file(path):
+    """Serves the file in a background thread, returns the server"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/gzip')
+            self.send_header('Content-Length', str(os.path.getsize(path)))
+            self.end_headers()
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, self.wfile, 1024 * 1024)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def buffered_lines(client, url, raw_response):
+    """The lines of the feed as they were read before the streaming parser"""
+    return gzip.decompress(raw_response.content).decode(client.encoding).split('\n')
+
+
+def run_mode(mode, url):
+    add_content_paths('Packs/ApiModules/Scripts/CSVFeedApiModule')
+    import CSVFeedApiModule
+    from CommonServerPython import batch
+
+    # newer python versions reject the default empty escapechar
+    feed_url_to_config = {
+        url: {
+            'fieldnames': FIELDNAMES.split(','),
+            'indicator_type': 'IP',
+            'is_zipped_file': True,
+            'mapping': {'malwarefamily': 'malware'}
+        }
+    }
+    client = CSVFeedApiModule.Client(url=url, feed_url_to_config=feed_url_to_config, ignore_regex='^#',
+                                     encoding='utf-8', escapechar=None)
+    created = [0]
+
+    def create_indicators(indicators):
+        created[0] += len(indicators)
+
+    start = time.time()
+    if mode == 'buffered':
+        client.get_feed_content_divided_to_lines = lambda url, raw_response: buffered_lines(client, url, raw_response)
+        indicators = CSVFeedApiModule.fetch_indicators_command(client, 'IP', False)
+    else:
+        indicators = CSVFeedApiModule.iterate_indicators(client, 'IP', False)
+    for indicators_batch in batch(indicators, batch_size=CSVFeedApiModule.BATCH_SIZE):
+        create_indicators(indicators_batch)
+    elapsed = time.time() - start
+    print(json.dumps({'created': created[0], 'seconds': elapsed, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CSVFeedApiModule fetch')
+    parser.add_argument('--megabytes', type=int, default=1024, help='Uncompressed size of the synthetic feed in MB')
+    parser.add_argument('--modes', default='buffered,stream', help='Comma separated modes to run')
+    parser.add_argument('--mode', choices=['buffered', 'stream'], help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.mode:
+        run_mode(options.mode, options.url)
+        return
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'feed.csv.gz')
+        rows = write_feed(path, options.megabytes)
+        print('feed: {} rows, {}MB uncompressed, {:.1f}MB gzipped'.format(
+            rows, options.megabytes, os.path.getsize(path) / (1024.0 * 1024.0)))
+        server = serve_file(path)
+        url = 'http://127.0.0.1:{}/feed.csv.gz'.format(server.server_address[1])
+        try:
+            for mode in options.modes.split(','):
+                output = subprocess.check_output([sys.executable, __file__, '--mode', mode, '--url', url])
+                result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+                if result['created'] != rows:
+                    raise RuntimeError('{} mode created {} indicators out of {} rows'.format(
+                        mode, result['created'], rows))
+                print('{:<9} {:>12,.0f} rows/sec  peak RSS: {:8.1f}MB'.format(
+                    mode, rows / result['seconds'], result['peak_rss_mb']))
+        finally:
+            server.shutdown()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Measures the time and peak RSS of the query command of GenericSQL with limit=50 against a local SQLite database
+with millions of rows.
+
+Every mode runs in its own process so the peak RSS of one does not hide the other:
+- fetchall: reads every row of the query with fetchall and slices the page in python, the way the command did before.
+- pushdown: the query command, the limit and the skip are pushed into the query.
+- stream: the query command with a positional bind variable, which is not limited in the database, the rows are read
+  in chunks until the page is full.
+
+GenericSQL runs on python 3 with sqlalchemy 1.3, run the benchmark with python 3 and sqlalchemy 1.3 installed.
+
+Usage: python Utils/benchmarks/genericsql_sqlite_benchmark.py [--rows 3000000] [--limit 50] [--skip 1000]
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark_utils import add_content_paths, peak_rss_mb
+
+GENERIC_SQL_PATH = 'Packs/GenericSQL/Integrations/GenericSQL'
+MODES = ('fetchall', 'pushdown', 'stream')
+QUERY = 'select id, created, host, message from events where id >= 0'
+POSITIONAL_QUERY = 'select id, created, host, message from events where id >= ?'
+
+
+def create_database(path, rows):
+    """Creates the events table with the given number of rows"""
+    connection = sqlite3.connect(path)
+    connection.execute('create table events (id integer primary key, created text, host text, message text)')
+    connection.executemany('insert into events values (?, ?, ?, ?)', (
+        (i, '2020-09-04T09:{:02}:{:02}Z'.format(i // 60 % 60, i % 60), '10.0.{}.{}'.format(i >> 8 & 255, i & 255),
+         'Process started by user{} on host{} with command line c:\\windows\\system32\\cmd.exe /c {}'.format(
+             i % 1000, i % 5000, i))
+        for i in range(rows)))
+    connection.commit()
+    connection.close()
+
+
+def legacy_query(client, sql_query, limit, skip):
+    """The query command as it was before the limit was pushed into the query, returns the rows of the page"""
+    from sqlalchemy.sql import text
+    result = client.connection.execute(text(sql_query), {})
+    table = [{str(key): str(value) for key, value in dict(row).items()} for row in result.fetchall()]
+    return table[skip:skip + limit]
+
+
+def run_mode(mode, path, limit, skip):
+    add_content_paths(GENERIC_SQL_PATH)
+    import sqlalchemy
+    import GenericSQL
+
+    engine = sqlalchemy.create_engine('sqlite:///{}'.format(path), poolclass=sqlalchemy.pool.NullPool)
+    GenericSQL.Client._create_engine_and_connect = lambda self: engine.connect()
+    client = GenericSQL.Client('SQLite', '', '', '', '', path, '', False)
+    args = {'query': QUERY, 'limit': str(limit), 'skip': str(skip)}
+    if mode == 'stream':
+        args.update({'query': POSITIONAL_QUERY, 'bind_variables_values': '0'})
+    start = time.time()
+    if mode == 'fetchall':
+        table = legacy_query(client, QUERY, limit, skip)
+    else:
+        _, _, table = GenericSQL.sql_query_execute(client, args)
+    elapsed = time.time() - start
+    client.connection.close()
+    print(json.dumps({'returned': [row['id'] for row in table], 'seconds': elapsed, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the query command of GenericSQL')
+    parser.add_argument('--rows', type=int, default=3000000, help='Number of rows in the table')
+    parser.add_argument('--limit', type=int, default=50, help='The limit argument of the query command')
+    parser.add_argument('--skip', type=int, default=1000, help='The skip argument of the query command')
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.mode:
+        run_mode(options.mode, options.database, options.limit, options.skip)
+        return
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, 'events.db')
+        start = time.time()
+        create_database(path, options.rows)
+        print('{:,} rows ({:.0f}MB) created in {:.1f}s, limit={} skip={}'.format(
+            options.rows, os.path.getsize(path) / 1024 / 1024, time.time() - start, options.limit, options.skip))
+        expected = [str(i) for i in range(options.skip, options.skip + options.limit)]
+        for mode in MODES:
+            output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--mode', mode,
+                                              '--database', path, '--limit', str(options.limit),
+                                              '--skip', str(options.skip)])
+            result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+            if result['returned'] != expected:
+                raise RuntimeError('{} mode returned rows {}'.format(mode, result['returned']))
+            print('{:<9} {:10.3f}s  peak RSS: {:8.1f}MB'.format(mode, result['seconds'], result['peak_rss_mb']))
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Measures lines/sec and peak RSS of HTTPFeedApiModule fetching a synthetic DShield-like feed.
+
+Every mode runs in its own process so the peak RSS of one does not hide the other:
+- list: collects all the indicators with fetch_indicators_command and batches them afterwards.
+- stream: submits the batches while the lines arrive (feed_main fetch-indicators).
+
+Usage: python Utils/benchmarks/http_feed_benchmark.py [--lines 5000000]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from benchmark_utils import add_content_paths, peak_rss_mb
+
+FEED_URL = 'https://www.dshield.org/block.txt'
+INDICATOR = {
+    'regex': r'^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})\t[\d.]*\t(\d{1,2})',
+    'transform': '\\1/\\2'
+}
+FIELDS = {
+    'numberofattacks': {'regex': '^.*\\t.*\\t[0-9]+\\t([0-9]+)', 'transform': '\\1'},
+    'networkname': {'regex': '^.*\\t.*\\t[0-9]+\\t[0-9]+\\t([^\\t]+)', 'transform': '\\1'},
+    'geocountry': {'regex': '^.*\\t.*\\t[0-9]+\\t[0-9]+\\t[^\\t]+\\t([A-Z]+)', 'transform': '\\1'},
+}
+
+
+def feed_lines(count):
+    for i in range(count):
+        yield '{}.{}.{}.0\t{}.{}.{}.255\t24\t{}\tNetwork {}\tUS\tabuse@example.com'.format(
+            i >> 16 & 255, i >> 8 & 255, i & 255, i >> 16 & 255, i >> 8 & 255, i & 255, i % 1000, i)
+
+
+def run_mode(mode, lines):
+    add_content_paths('Packs/ApiModules/Scripts/HTTPFeedApiModule')
+    import demistomock as demisto
+    import HTTPFeedApiModule
+    from CommonServerPython import batch
+
+    client = HTTPFeedApiModule.Client(url=FEED_URL, indicator=json.dumps(INDICATOR), fields=json.dumps(FIELDS),
+                                      indicator_type='CIDR')
+    client.build_iterator = lambda **kwargs: [{FEED_URL: feed_lines(lines)}]
+    created = [0]
+
+    def create_indicators(indicators):
+        created[0] += len(indicators)
+
+    demisto.createIndicators = create_indicators
+    start = time.time()
+    if mode == 'list':
+        indicators = HTTPFeedApiModule.fetch_indicators_command(client, [], None, 'CIDR', False)
+        for indicators_batch in batch(indicators, batch_size=HTTPFeedApiModule.BATCH_SIZE):
+            create_indicators(indicators_batch)
+    else:
+        indicators_batch = []
+        for indicator in HTTPFeedApiModule.iterate_indicators(client, [], None, 'CIDR', False):
+            indicators_batch.append(indicator)
+            if len(indicators_batch) == HTTPFeedApiModule.BATCH_SIZE:
+                create_indicators(indicators_batch)
+                indicators_batch = []
+        if indicators_batch:
+            create_indicators(indicators_batch)
+    elapsed = time.time() - start
+    print(json.dumps({'created': created[0], 'seconds': elapsed, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTTPFeedApiModule fetch')
+    parser.add_argument('--lines', type=int, default=5000000, help='Number of lines in the synthetic feed')
+    parser.add_argument('--mode', choices=['list', 'stream'], help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.mode:
+        run_mode(options.mode, options.lines)
+        return
+
+    for mode in ('list', 'stream'):
+        output = subprocess.check_output([sys.executable, __file__, '--mode', mode, '--lines', str(options.lines)])
+        result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        if result['created'] != options.lines:
+            raise RuntimeError('{} mode created {} indicators out of {} lines'.format(
+                mode, result['created'], options.lines))
+        print('{:<8} {:>12,.0f} lines/sec  peak RSS: {:8.1f}MB'.format(
+            mode, options.lines / result['seconds'], result['peak_rss_mb']))
+
+
+if __name__ == '__main__':
+    main()
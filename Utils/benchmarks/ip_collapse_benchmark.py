@@ -0,0 +1,77 @@
+"""Measures the time IPCollapseApiModule takes to collapse IPs to ranges and CIDRs, and compares it with the group
+scan EDL and ExportIndicators used before on a sample small enough for the quadratic scan to finish.
+
+Usage: python Utils/benchmarks/ip_collapse_benchmark.py [--ips 1000000] [--sample 5000] [--repeat 3]
+"""
+import argparse
+import random
+import time
+
+from benchmark_utils import add_content_paths
+
+
+def random_ips(count, seed=0):
+    """Returns IPv4 addresses clustered in runs of consecutive addresses, the way blocklists usually are"""
+    randomizer = random.Random(seed)
+    ips = []
+    while len(ips) < count:
+        first = randomizer.randrange(2 ** 32 - 256)
+        for value in range(first, first + randomizer.randrange(1, 64)):
+            ips.append('{}.{}.{}.{}'.format(value >> 24 & 255, value >> 16 & 255, value >> 8 & 255, value & 255))
+    randomizer.shuffle(ips)
+    return ips[:count]
+
+
+def group_scan_ranges(ips):
+    """The collapse to ranges as it was done before the collapse engine"""
+    from netaddr import IPAddress
+
+    ips_range_groups = []
+    ips = sorted(IPAddress(ip) for ip in ips)
+    if len(ips) > 0:
+        ips_range_groups.append([ips[0]])
+    for ip in ips[1:]:
+        appended = False
+        for group in ips_range_groups:
+            if IPAddress(int(ip) + 1) in group or IPAddress(int(ip) - 1) in group:
+                group.append(ip)
+                appended = True
+        if not appended:
+            ips_range_groups.append([ip])
+    return [str(group[0]) if len(group) == 1 else '{}-{}'.format(group[0], group[-1])
+            for group in ips_range_groups]
+
+
+def measure(name, function, ips, repeat=1):
+    """Runs the function repeat times, prints the best time and returns the result"""
+    elapsed = []
+    for _ in range(repeat):
+        start = time.time()
+        result = function(ips)
+        elapsed.append(time.time() - start)
+    print('{:<34} {:>9,} IPs -> {:>9,} entries in {:8.3f}s'.format(name, len(ips), len(result), min(elapsed)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the IP collapse engine')
+    parser.add_argument('--ips', type=int, default=1000000, help='Number of IPs to collapse')
+    parser.add_argument('--sample', type=int, default=5000, help='Number of IPs to collapse with the group scan')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of collapse engine runs, the best is reported')
+    options = parser.parse_args()
+
+    add_content_paths('Packs/ApiModules/Scripts/IPCollapseApiModule')
+    from IPCollapseApiModule import collapse_ips_to_cidrs, collapse_ips_to_ranges
+
+    sample = random_ips(options.sample)
+    if measure('group scan to ranges', group_scan_ranges, sample) != measure(
+            'collapse engine to ranges', collapse_ips_to_ranges, sample):
+        raise RuntimeError('The collapse engine returned different ranges than the group scan')
+
+    ips = random_ips(options.ips)
+    measure('collapse engine to ranges', collapse_ips_to_ranges, ips, options.repeat)
+    measure('collapse engine to CIDRs', collapse_ips_to_cidrs, ips, options.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Measures the per-execution latency of Utils/_script_docker_python_loop.py without the code cache, with it, and
+with pre-imported CommonServerPython (SCRIPT_COMMON_SERVER_PATH). Fails if the modes return different results.
+
+Usage: python Utils/benchmarks/script_docker_python_loop_benchmark.py [--executions 200]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+CONTENT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+LOOP_PATH = os.path.join(CONTENT_ROOT, 'Utils', '_script_docker_python_loop.py')
+COMMON_SERVER_PATH = os.path.join(CONTENT_ROOT, 'Packs', 'Base', 'Scripts', 'CommonServerPython',
+                                  'CommonServerPython.py')
+
+# a script shaped like the repository scripts, doing its work in a guarded main()
+SCRIPT = '''
+def main():
+    args = demisto.args()
+    indicators = argToList(args.get('indicators', '1.1.1.1,8.8.8.8,example.com'))
+    outputs = [{'Indicator': indicator, 'IsIP': is_ip_valid(indicator)} for indicator in indicators]
+    return_outputs(tableToMarkdown('Benchmark', outputs), {'Benchmark': outputs}, outputs)
+
+
+if __name__ in ('__main__', '__builtin__', 'builtins'):
+    main()
+'''
+
+
+# lines removed from CommonServerPython before the server prepends it to scripts (the template provides them)
+REMOVED_COMMON_SERVER_LINES = ('import demistomock as demisto', 'from __future__ import print_function')
+
+
+def load_common_server():
+    """Returns CommonServerPython the way the server prepends it to scripts"""
+    with open(COMMON_SERVER_PATH) as f:
+        lines = [line for line in f.read().splitlines() if line.strip() not in REMOVED_COMMON_SERVER_LINES]
+    return '\n'.join(lines) + '\n'
+
+
+def read_messages(stream, buffered):
+    """Reads the messages the loop writes until the script is completed, returns them and the unread output"""
+    decoder = json.JSONDecoder()
+    messages = []
+    while True:
+        # the completed message is terminated by a literal '\\n'
+        buffered = buffered.lstrip()
+        while buffered.startswith('\\n'):
+            buffered = buffered[2:].lstrip()
+        try:
+            message, end = decoder.raw_decode(buffered)
+        except ValueError:
+            chunk = os.read(stream.fileno(), 65536)
+            if not chunk:
+                raise RuntimeError('The python loop exited unexpectedly')
+            buffered += chunk.decode('utf-8')
+            continue
+        buffered = buffered[end:]
+        if message['type'] == 'completed':
+            return messages, buffered
+        messages.append(message)
+
+
+def run_loop(common_server, executions, env):
+    """Executes the script in a new loop process, returns the latency of every execution and the script results"""
+    context = json.dumps({
+        'script': common_server + SCRIPT,
+        'integration': False,
+        'native': False,
+        'args': {}
+    }) + '\n'
+    process = subprocess.Popen([sys.executable, LOOP_PATH], stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+    latencies = []
+    results = None
+    buffered = ''
+    try:
+        for _ in range(executions):
+            start = time.time()
+            process.stdin.write(context.encode('utf-8'))
+            process.stdin.flush()
+            messages, buffered = read_messages(process.stdout, buffered)
+            latencies.append(time.time() - start)
+            for message in messages:
+                if message['type'] == 'exception':
+                    raise RuntimeError('The script failed: {}'.format(''.join(message['args']['exception'])))
+            execution_results = [message['results'] for message in messages if message['type'] == 'result']
+            if not execution_results:
+                raise RuntimeError('The script returned no results')
+            if results is not None and execution_results != results:
+                raise RuntimeError('The executions returned different results')
+            results = execution_results
+    finally:
+        process.stdin.close()
+        process.wait()
+    return latencies, results
+
+
+def summarize(name, latencies):
+    # the first execution pays the import/compile either way
+    warm = sorted(latencies) if len(latencies) == 1 else sorted(latencies[1:])
+    print('{:<28} first: {:8.2f}ms  median: {:8.2f}ms  p95: {:8.2f}ms'.format(
+        name,
+        latencies[0] * 1000,
+        warm[len(warm) // 2] * 1000,
+        warm[int(len(warm) * 0.95) - 1 if len(warm) > 1 else 0] * 1000
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the docker python loop')
+    parser.add_argument('--executions', type=int, default=200, help='Number of script executions per mode')
+    options = parser.parse_args()
+
+    common_server = load_common_server()
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as f:
+        f.write(common_server)
+        common_server_file = f.name
+    try:
+        env = dict(os.environ)
+        env.pop('SCRIPT_COMMON_SERVER_PATH', None)
+        env.pop('SCRIPT_CODE_CACHE_DIR', None)
+        env['SCRIPT_CODE_CACHE_SIZE'] = '0'
+        latencies, results = run_loop(common_server, options.executions, env)
+        summarize('no code cache', latencies)
+
+        env.pop('SCRIPT_CODE_CACHE_SIZE')
+        latencies, cached_results = run_loop(common_server, options.executions, env)
+        summarize('code cache', latencies)
+        if cached_results != results:
+            raise RuntimeError('The code cache returned different results')
+
+        env['SCRIPT_COMMON_SERVER_PATH'] = common_server_file
+        pre_imported_latencies, pre_imported_results = run_loop(common_server, options.executions, env)
+        summarize('code cache + pre-imported', pre_imported_latencies)
+
+        if pre_imported_results != results:
+            raise RuntimeError('The pre-imported CommonServer returned different results')
+        print('All modes returned the same results.')
+    finally:
+        os.remove(common_server_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Measures the time and peak RSS of downloading the attachments of a ServiceNow ticket with ServiceNowv2, against a
+local stand-in of the attachment API which waits a fixed time before answering every download.
+
+Every mode runs in its own process so the peak RSS of one does not hide the other:
+- sequential: downloads the attachments one after another with requests.get and keeps every file in memory before
+  writing it with fileResult, the way get_ticket_attachment_entries did before.
+- concurrent: get_ticket_attachment_entries, which streams the files to disk on a pooled session, concurrently.
+
+ServiceNowv2 runs on python 3, run the benchmark with python 3.
+
+Usage: python Utils/benchmarks/servicenow_attachments_benchmark.py [--attachments 20] [--size-mb 20]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from benchmark_utils import add_content_paths, peak_rss_mb
+
+SERVICENOW_PATH = 'Packs/ServiceNow/Integrations/ServiceNowv2'
+MODES = ('sequential', 'concurrent')
+CHUNK = b'x' * (1024 * 1024)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def start_servicenow_server(attachments, size_mb, latency):
+    """Starts the stand-in of the ServiceNow attachment API in a thread, returns the server"""
+    class ServiceNowHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.startswith('/attachment?'):
+                port = self.server.server_address[1]
+                body = json.dumps({'result': [
+                    {'sys_id': str(i), 'file_name': '{}.bin'.format(i),
+                     'download_link': 'http://127.0.0.1:{}/attachment/{}/file'.format(port, i)}
+                    for i in range(attachments)
+                ]}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(size_mb * len(CHUNK)))
+            self.end_headers()
+            for _ in range(size_mb):
+                self.wfile.write(CHUNK)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ServiceNowHandler)
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+    return server
+
+
+def legacy_get_ticket_attachment_entries(ServiceNowv2, client, ticket_id):
+    """get_ticket_attachment_entries as it was before the concurrent download"""
+    entries = []
+    attachments_res = client.get_ticket_attachments(ticket_id)
+    links = [(attachment.get('download_link', ''), attachment.get('file_name', ''))
+             for attachment in attachments_res['result']]
+    for link in links:
+        file_res = ServiceNowv2.requests.get(link[0], auth=(client._username, client._password),
+                                             verify=client._verify, proxies=client._proxies)
+        if file_res is not None:
+            entries.append(ServiceNowv2.fileResult(link[1], file_res.content))
+    return entries
+
+
+def run_mode(mode, port):
+    add_content_paths(SERVICENOW_PATH)
+    import demistomock as demisto
+    import ServiceNowv2
+
+    demisto.investigation = lambda: {'id': 'benchmark'}
+    client = ServiceNowv2.Client(server_url='http://127.0.0.1:{}/'.format(port), sc_server_url='', username='admin',
+                                 password='admin', verify=False, fetch_time='1 day', sysparm_query='',
+                                 sysparm_limit=10, timestamp_field='opened_at', ticket_type='incident',
+                                 get_attachments=True, incident_name='number')
+    start = time.time()
+    if mode == 'sequential':
+        entries = legacy_get_ticket_attachment_entries(ServiceNowv2, client, 'ticket')
+    else:
+        entries = client.get_ticket_attachment_entries('ticket')
+    elapsed = time.time() - start
+    downloaded = sum(os.path.getsize('benchmark_' + entry['FileID']) for entry in entries)
+    print(json.dumps({'seconds': elapsed, 'bytes': downloaded, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the attachment download of ServiceNowv2')
+    parser.add_argument('--attachments', type=int, default=20, help='Number of attachments of the ticket')
+    parser.add_argument('--size-mb', type=int, default=20, help='Size of every attachment in MB')
+    parser.add_argument('--latency', type=float, default=0.2,
+                        help='Seconds the stand-in server waits before answering a download')
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.mode:
+        run_mode(options.mode, options.port)
+        return
+
+    server = start_servicenow_server(options.attachments, options.size_mb, options.latency)
+    expected_bytes = options.attachments * options.size_mb * len(CHUNK)
+    print('{} attachments of {}MB'.format(options.attachments, options.size_mb))
+    for mode in MODES:
+        work_dir = tempfile.mkdtemp()
+        try:
+            output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--mode', mode,
+                                              '--port', str(server.server_address[1])], cwd=work_dir)
+        finally:
+            shutil.rmtree(work_dir)
+        result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        if result['bytes'] != expected_bytes:
+            raise RuntimeError('{} mode downloaded {} bytes out of {}'.format(mode, result['bytes'], expected_bytes))
+        print('{:<11} {:8.2f}s  {:8.1f}MB/s  peak RSS: {:8.1f}MB'.format(
+            mode, result['seconds'], expected_bytes / result['seconds'] / len(CHUNK), result['peak_rss_mb']))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Measures the cost of the user lookups the Slack long running execution does for every incoming message, in a
+workspace whose users are all saved in the integration context: by ID (the sender of a message) and by email (the
+users invited to a mirrored channel).
+
+- context scan: loads the users JSON of the integration context and scans it, the way the lookups did before.
+- directory: gets the user from the in-memory directory.
+
+The Slack integration runs on python 3, run the benchmark with python 3.8 and the slackclient package installed.
+
+Usage: python Utils/benchmarks/slack_directory_benchmark.py [--users 20000] [--lookups 200]
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmark_utils import add_content_paths
+
+SLACK_PATH = 'Packs/Slack/Integrations/Slack'
+
+
+def synthetic_user(i):
+    return {
+        'id': 'U{:08X}'.format(i),
+        'team_id': 'T012AB3C4',
+        'name': 'user{}'.format(i),
+        'real_name': 'User Number {}'.format(i),
+        'tz': 'America/Los_Angeles',
+        'profile': {
+            'real_name': 'User Number {}'.format(i),
+            'display_name': 'user{}'.format(i),
+            'email': 'user{}@example.com'.format(i),
+            'team': 'T012AB3C4',
+        },
+        'is_admin': False,
+        'is_bot': False,
+    }
+
+
+def legacy_get_user(integration_context, user_id='', email=''):
+    """The lookup as it was done before the directory"""
+    users = json.loads(integration_context['users'])
+    if user_id:
+        user_filter = list(filter(lambda u: u['id'] == user_id, users))
+    else:
+        user_filter = list(filter(lambda u: u.get('name', '').lower() == email
+                                  or u.get('profile', {}).get('email', '').lower() == email
+                                  or u.get('real_name', '').lower() == email, users))
+    return user_filter[0] if user_filter else {}
+
+
+def measure(lookup, users, lookups):
+    """Looks up random users by ID and by email, returns the average ms per lookup"""
+    rng = random.Random(0)
+    start = time.time()
+    for _ in range(lookups):
+        user = users[rng.randrange(len(users))]
+        if not (lookup(user_id=user['id']) and lookup(email=user['profile']['email'])):
+            raise RuntimeError('User {} was not found'.format(user['id']))
+    return (time.time() - start) * 1000 / (2 * lookups)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the user lookups of the Slack integration')
+    parser.add_argument('--users', type=int, default=20000, help='Number of users in the integration context')
+    parser.add_argument('--lookups', type=int, default=200, help='Number of users looked up by ID and by email')
+    options = parser.parse_args()
+
+    add_content_paths(SLACK_PATH)
+    import demistomock as demisto
+    import Slack
+
+    users = [synthetic_user(i) for i in range(options.users)]
+    integration_context = {'users': json.dumps(users)}
+    demisto.getIntegrationContext = lambda: integration_context
+    demisto.getIntegrationContextVersioned = lambda refresh=False: {'context': integration_context, 'version': 1}
+    directory = Slack.SlackDirectory()
+
+    def directory_get_user(user_id='', email=''):
+        return directory.get('users', user_id, email)
+
+    print('{:,} users in the integration context, {:,} lookups'.format(options.users, 2 * options.lookups))
+    legacy_ms = measure(lambda **kwargs: legacy_get_user(integration_context, **kwargs), users, options.lookups)
+    print('{:<14} {:10.3f}ms per lookup'.format('context scan', legacy_ms))
+    directory_ms = measure(directory_get_user, users, options.lookups)
+    print('{:<14} {:10.3f}ms per lookup ({:,.0f}x)'.format('directory', directory_ms, legacy_ms / directory_ms))
+
+
+if __name__ == '__main__':
+    main()
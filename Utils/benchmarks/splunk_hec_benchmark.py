@@ -0,0 +1,142 @@
+"""Measures events/sec of the splunk-submit-event-hec command of SplunkPy against a local stand-in of the HTTP Event
+Collector, which accepts gzip compressed and concatenated events, and answers every --busy-every request with 503
+(server is busy) the way HEC does when its queue is full.
+
+Every mode runs in its own process, the stand-in counts the events it accepted:
+- single: a request per event, the way the command sent events before.
+- batch: the events are sent with the batch_event_data argument, in gzip compressed batches over a pooled session
+  that sends a batch answered with 503 again.
+
+SplunkPy runs on python 2, run the benchmark with python 2.
+
+Usage: python Utils/benchmarks/splunk_hec_benchmark.py [--events 20000] [--batch-size 1000]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from benchmark_utils import add_content_paths
+
+SPLUNK_PATH = 'Packs/SplunkPy/Integrations/SplunkPy'
+MODES = ('single', 'batch')
+
+
+def synthetic_event(i):
+    return {
+        'event': 'InsertedAt="2020-03-29 06:21:43"; EventID="{}"; EventType="Application control"; '
+                 'ComputerName="ACME-code-{:03}"; ComputerIPAddress="10.0.{}.{}";'.format(
+                     i, i % 1000, i >> 8 & 255, i & 255),
+        'host': '10.0.{}.{}'.format(i >> 8 & 255, i & 255),
+    }
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def start_hec_server(busy_every):
+    """Starts the stand-in of HEC in a thread, returns the server, its accepted_events attribute counts the events"""
+    lock = threading.Lock()
+
+    class HECHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def respond(self, status, body):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            with lock:
+                server.requests += 1
+                busy = busy_every and server.requests % busy_every == 0
+            if busy:
+                self.respond(503, '{"text":"Server is busy","code":9}')
+                return
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+            events = body.count('"event": ')
+            with lock:
+                server.accepted_events += events
+            self.respond(200, '{"text":"Success","code":0}')
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), HECHandler)
+    server.requests = 0
+    server.accepted_events = 0
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+    return server
+
+
+def legacy_submit_event_hec(SplunkPy, hec_token, baseurl, event, host):
+    """Sends an event the way splunk_submit_event_hec did before the batches"""
+    args = SplunkPy.assign_params(event=event, host=host)
+    headers = {
+        'Authorization': 'Splunk {}'.format(hec_token),
+        'Content-Type': 'application/json'
+    }
+    return SplunkPy.requests.post(baseurl + '/services/collector/event', data=json.dumps(args), headers=headers,
+                                  verify=SplunkPy.VERIFY_CERTIFICATE)
+
+
+def run_mode(mode, port, options):
+    add_content_paths(SPLUNK_PATH)
+    import demistomock as demisto
+    import SplunkPy
+
+    baseurl = 'http://127.0.0.1:{}'.format(port)
+    events = [synthetic_event(i) for i in range(options.events)]
+    start = time.time()
+    if mode == 'single':
+        for event in events:
+            legacy_submit_event_hec(SplunkPy, 'token', baseurl, event['event'], event['host'])
+    else:
+        demisto.params = lambda: {'hec_token': 'token', 'hec_url': baseurl}
+        demisto.args = lambda: {'batch_event_data': events, 'batch_size': str(options.batch_size)}
+        demisto.results = lambda results: None
+        SplunkPy.splunk_submit_event_hec_command()
+    elapsed = time.time() - start
+    print(json.dumps({'seconds': elapsed}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the splunk-submit-event-hec command of SplunkPy')
+    parser.add_argument('--events', type=int, default=20000, help='Number of events sent')
+    parser.add_argument('--batch-size', type=int, default=1000, help='The batch_size argument of the command')
+    parser.add_argument('--busy-every', type=int, default=10,
+                        help='The stand-in answers every this many requests with 503, 0 to never answer with 503')
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.mode:
+        run_mode(options.mode, options.port, options)
+        return
+
+    print('{:,} events, batches of {:,}, 503 every {} requests'.format(
+        options.events, options.batch_size, options.busy_every))
+    for mode in MODES:
+        server = start_hec_server(options.busy_every)
+        output = subprocess.check_output([sys.executable, __file__, '--mode', mode, '--port',
+                                          str(server.server_address[1]), '--events', str(options.events),
+                                          '--batch-size', str(options.batch_size)])
+        result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        server.shutdown()
+        print('{:<8} {:>10,.0f} events/sec  {:>6,} requests  {:>7,} of {:,} events accepted'.format(
+            mode, options.events / result['seconds'], server.requests, server.accepted_events, options.events))
+
+
+if __name__ == '__main__':
+    main()
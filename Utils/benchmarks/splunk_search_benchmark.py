@@ -0,0 +1,248 @@
+"""Measures rows/sec and peak RSS of the splunk-search command of SplunkPy against a local stand-in of the Splunk REST
+API, which serves a finished search job with synthetic results in the Atom/XML and JSON output modes and waits a fixed
+time per request plus a time per returned row, the way a search head reads results from the dispatch directory.
+
+Every mode runs in its own process so the peak RSS of one does not hide the other:
+- xml: gets one batch at a time and parses it with results.ResultsReader, the way the command did before.
+- json: gets one batch at a time in JSON output mode (max_concurrent_requests=1).
+- parallel: gets max_concurrent_requests batches at the same time in JSON output mode.
+- stream: like parallel, and returns every batch in its own entry (results_per_entry).
+
+SplunkPy runs on python 2, run the benchmark with python 2.
+
+Usage: python Utils/benchmarks/splunk_search_benchmark.py [--rows 100000] [--batch-limit 10000]
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from urlparse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+from benchmark_utils import add_content_paths, peak_rss_mb
+
+SPLUNK_PATH = 'Packs/SplunkPy/Integrations/SplunkPy'
+SID = '1600000000.42'
+MODES = ('xml', 'json', 'parallel', 'stream')
+FIELDS = ('_bkt', '_cd', '_indextime', '_raw', '_serial', '_si', '_sourcetype', '_time', 'host', 'index',
+          'linecount', 'source', 'sourcetype', 'splunk_server')
+
+
+def synthetic_row(i):
+    return {
+        '_bkt': 'main~445~66D21DF4-F4FD-4886-A986-82E72ADCBFE9',
+        '_cd': '445:{}'.format(i),
+        '_indextime': str(1585462906 + i),
+        '_raw': 'InsertedAt="2020-03-29 06:21:43"; EventID="{}"; EventType="Application control"; Action="None"; '
+                'ComputerName="ACME-code-{:03}"; ComputerIPAddress="10.0.{}.{}"; Name="LogMeIn";'.format(
+                    i, i % 1000, i >> 8 & 255, i & 255),
+        '_serial': str(i),
+        '_si': ['ip-172-31-44-193', 'main'],
+        '_sourcetype': 'sophos:appcontrol',
+        '_time': '2020-03-28T23:21:43.000-07:00',
+        'host': '10.0.{}.{}'.format(i >> 8 & 255, i & 255),
+        'index': 'main',
+        'linecount': '2',
+        'source': 'eventgen',
+        'sourcetype': 'sophos:appcontrol',
+        'splunk_server': 'ip-172-31-44-193',
+    }
+
+
+def xml_row(i, row):
+    fields = []
+    for key in FIELDS:
+        values = row[key] if isinstance(row[key], list) else [row[key]]
+        if key == '_raw':
+            fields.append("<field k='_raw'><v xml:space='preserve' trunc='0'>{}</v></field>".format(
+                escape(values[0])))
+        else:
+            fields.append("<field k='{}'>{}</field>".format(key, ''.join(
+                '<value><text>{}</text></value>'.format(escape(value)) for value in values)))
+    return "<result offset='{}'>{}</result>".format(i, ''.join(fields))
+
+
+class SearchResults(object):
+    """The results of the search job, encoded once in both output modes"""
+
+    def __init__(self, rows):
+        synthetic_rows = [synthetic_row(i) for i in range(rows)]
+        self.xml_rows = [xml_row(i, row) for i, row in enumerate(synthetic_rows)]
+        self.json_rows = [json.dumps(row) for row in synthetic_rows]
+
+    def page(self, output_mode, offset, count):
+        end = len(self.json_rows) if count == 0 else offset + count
+        if output_mode == 'json':
+            return '{{"preview":false,"init_offset":{},"messages":[],"fields":{},"results":[{}]}}'.format(
+                offset, json.dumps([{'name': field} for field in FIELDS]), ','.join(self.json_rows[offset:end]))
+        field_order = ''.join('<field>{}</field>'.format(field) for field in FIELDS)
+        return ("<?xml version='1.0' encoding='UTF-8'?>\n<results preview='0'>\n<meta><fieldOrder>{}</fieldOrder>"
+                "</meta>\n{}\n</results>\n").format(field_order, '\n'.join(self.xml_rows[offset:end]))
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def start_splunk_server(search_results, request_latency, row_latency):
+    """Starts the stand-in of the Splunk REST API in a thread, returns the server"""
+    job_entry = ('<?xml version="1.0" encoding="UTF-8"?>\n<entry xmlns="http://www.w3.org/2005/Atom" '
+                 'xmlns:s="http://dev.splunk.com/ns/rest"><title>search *</title><id>/services/search/jobs/{sid}</id>'
+                 '<link href="/services/search/jobs/{sid}" rel="alternate"/><content type="text/xml"><s:dict>'
+                 '<s:key name="sid">{sid}</s:key><s:key name="isDone">1</s:key><s:key name="dispatchState">DONE'
+                 '</s:key><s:key name="resultCount">{count}</s:key><s:key name="eai:acl"><s:dict><s:key name="owner">'
+                 'admin</s:key><s:key name="app">search</s:key><s:key name="sharing">global</s:key></s:dict></s:key>'
+                 '</s:dict></content></entry>').format(
+        sid=SID, count=len(search_results.json_rows))
+
+    class SplunkHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def respond(self, status, body, content_type='text/xml'):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            # Like splunkd, otherwise the SDK closes the connection before reading the body
+            self.send_header('Connection', 'Keep-Alive')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.path.endswith('/auth/login'):
+                self.respond(200, '<response><sessionKey>benchmark</sessionKey></response>')
+            else:
+                self.respond(201, '<response><sid>{}</sid></response>'.format(SID))
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if re.search(r'/search/jobs/[^/]+/results$', url.path):
+                query = parse_qs(url.query)
+                output_mode = query.get('output_mode', ['xml'])[0]
+                offset = int(query.get('offset', ['0'])[0])
+                count = int(query.get('count', ['100'])[0])
+                body = search_results.page(output_mode, offset, count)
+                rows = min(count or len(search_results.json_rows), len(search_results.json_rows) - offset)
+                time.sleep(request_latency + rows * row_latency)
+                self.respond(200, body, 'application/json' if output_mode == 'json' else 'text/xml')
+            else:
+                self.respond(200, job_entry)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SplunkHandler)
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+    return server
+
+
+def legacy_search(SplunkPy, service, args):
+    """The splunk-search command as it was before the JSON output mode, returns the number of results"""
+    import io
+    import splunklib.results as results
+
+    class ResponseReaderWrapper(io.RawIOBase):
+        def __init__(self, responseReader):
+            self.responseReader = responseReader
+
+        def readable(self):
+            return True
+
+        def close(self):
+            self.responseReader.close()
+
+        def read(self, n):
+            return self.responseReader.read(n)
+
+        def readinto(self, b):
+            sz = len(b)
+            data = self.responseReader.read(sz)
+            for idx, ch in enumerate(data):
+                b[idx] = ch
+            return len(data)
+
+    search_job = service.jobs.create(SplunkPy.build_search_query(args), **SplunkPy.build_search_kwargs(args))
+    num_of_results_from_query = int(search_job['resultCount'])
+    batch_size = int(args['batch_limit'])
+    results_offset = 0
+    total_parsed_results = []
+    dbot_scores = []
+    while len(total_parsed_results) < num_of_results_from_query:
+        current_batch_of_results = search_job.results(count=batch_size, offset=results_offset)
+        for item in results.ResultsReader(io.BufferedReader(ResponseReaderWrapper(current_batch_of_results))):
+            if isinstance(item, dict):
+                if item.get('host'):
+                    dbot_scores.append({'Indicator': item['host'], 'Type': 'hostname', 'Vendor': 'Splunk',
+                                        'Score': 0, 'isTypedIndicator': True})
+                total_parsed_results.append(item)
+        results_offset += batch_size
+    SplunkPy.build_search_human_readable(args, total_parsed_results)
+    return len(total_parsed_results)
+
+
+def run_mode(mode, port, options):
+    add_content_paths(SPLUNK_PATH)
+    import demistomock as demisto
+    import SplunkPy
+    import splunklib.client as client
+
+    service = client.connect(host='127.0.0.1', port=port, scheme='http', username='admin', password='changeme')
+    args = {'query': 'index=main', 'event_limit': '0', 'batch_limit': str(options.batch_limit)}
+    if mode == 'json':
+        args['max_concurrent_requests'] = '1'
+    elif mode == 'stream':
+        args['results_per_entry'] = str(options.batch_limit)
+    returned = [0]
+
+    def results(entry):
+        returned[0] += len(entry['Contents'])
+
+    demisto.args = lambda: args
+    demisto.results = results
+    start = time.time()
+    if mode == 'xml':
+        returned[0] = legacy_search(SplunkPy, service, args)
+    else:
+        SplunkPy.splunk_search_command(service)
+    elapsed = time.time() - start
+    print(json.dumps({'returned': returned[0], 'seconds': elapsed, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the splunk-search command of SplunkPy')
+    parser.add_argument('--rows', type=int, default=100000, help='Number of results of the search job')
+    parser.add_argument('--batch-limit', type=int, default=10000, help='The batch_limit argument of the search')
+    parser.add_argument('--request-latency', type=float, default=0.05,
+                        help='Seconds the stand-in server waits before answering a results request')
+    parser.add_argument('--row-latency', type=float, default=0.00005,
+                        help='Seconds the stand-in server waits per returned result')
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.mode:
+        run_mode(options.mode, options.port, options)
+        return
+
+    server = start_splunk_server(SearchResults(options.rows), options.request_latency, options.row_latency)
+    port = server.server_address[1]
+    print('{:,} results in batches of {:,}'.format(options.rows, options.batch_limit))
+    for mode in MODES:
+        output = subprocess.check_output([sys.executable, __file__, '--mode', mode, '--port', str(port),
+                                          '--batch-limit', str(options.batch_limit)])
+        result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        if result['returned'] != options.rows:
+            raise RuntimeError('{} mode returned {} results out of {}'.format(mode, result['returned'], options.rows))
+        print('{:<10} {:>10,.0f} rows/sec  peak RSS: {:8.1f}MB'.format(
+            mode, options.rows / result['seconds'], result['peak_rss_mb']))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
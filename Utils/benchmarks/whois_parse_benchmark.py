@@ -0,0 +1,109 @@
+"""Measures the time parse_raw_whois takes to parse a corpus of saved WHOIS responses when every line is searched only
+by the grammar regexes whose required literal it contains, and compares it with the per-line, per-regex scan used
+before. The parsed output of both must be identical.
+
+The Whois integration runs on python 2, run the benchmark with python 2 or python 3.6.
+
+Usage: python Utils/benchmarks/whois_parse_benchmark.py [--repeat 20]
+"""
+import argparse
+import json
+import os
+import time
+
+from benchmark_utils import CONTENT_ROOT, add_content_paths
+
+WHOIS_PATH = 'Packs/Whois/Integrations/Whois'
+
+
+def legacy_scan_grammar_rules(Whois):
+    """The grammar scan as it was done before the literal dispatch"""
+    def scan_grammar_rules(segment, skip_rules):
+        data = {}
+        for rule_key, rule_regexes in Whois.grammar['_data'].items():
+            if rule_key not in skip_rules:
+                for line in segment.splitlines():
+                    for regex in rule_regexes:
+                        result = regex.search(line)
+                        if result is not None:
+                            val = result.group("val").strip()
+                            if val != "":
+                                data.setdefault(rule_key, []).append(val)
+        return [(rule_key, data[rule_key]) for rule_key in Whois.grammar['_data'] if rule_key in data]
+    return scan_grammar_rules
+
+
+def legacy_search_first_contact(regexes, segments):
+    """The contact search as it was done before the literal dispatch"""
+    contact = None
+    for segment in segments:
+        for regex in regexes:
+            match = regex.search(segment)
+            if match is not None:
+                contact = match.groupdict()
+                break
+    return contact
+
+
+def legacy_parse_nic_contact(Whois):
+    def parse_nic_contact(data):
+        handle_contacts = []
+        for regex in Whois.nic_contact_regexes:
+            for segment in data:
+                for match in regex.finditer(segment):
+                    handle_contacts.append(match.groupdict())
+        return handle_contacts
+    return parse_nic_contact
+
+
+def parse_corpus(Whois, corpus, repeat):
+    """Parses the corpus repeat times, returns the best time and the parsed records"""
+    elapsed = []
+    parsed = []
+    for _ in range(repeat):
+        start = time.time()
+        parsed = [Whois.parse_raw_whois(record['raw'], normalized=[]) for record in corpus]
+        elapsed.append(time.time() - start)
+    return min(elapsed), parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Whois grammar parsing')
+    parser.add_argument('--repeat', type=int, default=20, help='Number of corpus parses, the best is reported')
+    options = parser.parse_args()
+
+    add_content_paths(WHOIS_PATH)
+    import Whois
+
+    with open(os.path.join(CONTENT_ROOT, WHOIS_PATH, 'test_data', 'whois_corpus.json')) as corpus_file:
+        corpus = json.load(corpus_file)
+    lines = sum(len(segment.splitlines()) for record in corpus for segment in record['raw'])
+
+    dispatch_time, dispatch_parsed = parse_corpus(Whois, corpus, options.repeat)
+
+    scan_grammar_rules = Whois.scan_grammar_rules
+    search_first_contact = Whois.search_first_contact
+    parse_nic_contact = Whois.parse_nic_contact
+    Whois.scan_grammar_rules = legacy_scan_grammar_rules(Whois)
+    Whois.search_first_contact = legacy_search_first_contact
+    Whois.parse_nic_contact = legacy_parse_nic_contact(Whois)
+    try:
+        legacy_time, legacy_parsed = parse_corpus(Whois, corpus, options.repeat)
+    finally:
+        Whois.scan_grammar_rules = scan_grammar_rules
+        Whois.search_first_contact = search_first_contact
+        Whois.parse_nic_contact = parse_nic_contact
+
+    for record, dispatch_result, legacy_result in zip(corpus, dispatch_parsed, legacy_parsed):
+        if repr(dispatch_result) != repr(legacy_result):
+            raise RuntimeError('The literal dispatch parsed {} differently:\n{!r}\n{!r}'.format(
+                record['domain'], dispatch_result, legacy_result))
+
+    print('corpus: {} records, {} lines'.format(len(corpus), lines))
+    print('{:<18} {:8.2f}ms per corpus parse'.format('per-regex scan', legacy_time * 1000))
+    print('{:<18} {:8.2f}ms per corpus parse ({:.1f}x)'.format(
+        'literal dispatch', dispatch_time * 1000, legacy_time / dispatch_time))
+
+
+if __name__ == '__main__':
+    main()
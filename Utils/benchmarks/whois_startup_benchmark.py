@@ -0,0 +1,87 @@
+"""Measures the startup-to-first-query latency of the Whois integration: compiling and executing Whois.py the way the
+server runs an integration (without a cached bytecode file), then resolving the root server of a domain and parsing a
+saved WHOIS response, as the first lookup does. Every run is done in a new process.
+
+The Whois integration runs on python 2, run the benchmark with python 2 or python 3.6.
+
+Usage: python Utils/benchmarks/whois_startup_benchmark.py [--runs 10] [--source path/to/Whois.py]
+    --source measures another version of the integration, e.g. one saved with `git show <rev>:<path> > old.py`
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmark_utils import CONTENT_ROOT, add_content_paths
+
+WHOIS_PATH = 'Packs/Whois/Integrations/Whois'
+STAGES = ('compile', 'execute', 'first query')
+
+
+def measure_startup(source_path, record):
+    """Runs the integration once in this process, returns the duration of every stage in ms"""
+    add_content_paths(WHOIS_PATH)
+    import demistomock  # noqa: F401
+    import CommonServerPython  # noqa: F401
+
+    with open(source_path) as source_file:
+        source = source_file.read()
+
+    start = time.time()
+    code = compile(source, 'Whois.py', 'exec')
+    compiled = time.time()
+    namespace = {'__name__': 'Whois'}
+    exec(code, namespace)
+    executed = time.time()
+    namespace['get_root_server'](record['domain'])
+    namespace['get_domain_from_query']('www.' + record['domain'])
+    namespace['parse_raw_whois'](record['raw'], normalized=[])
+    queried = time.time()
+
+    return {
+        'compile': (compiled - start) * 1000,
+        'execute': (executed - compiled) * 1000,
+        'first query': (queried - executed) * 1000,
+    }
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the startup of the Whois integration')
+    parser.add_argument('--runs', type=int, default=10, help='Number of processes started, the median is reported')
+    parser.add_argument('--source', default=os.path.join(CONTENT_ROOT, WHOIS_PATH, 'Whois.py'),
+                        help='The integration code to measure')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    with open(os.path.join(CONTENT_ROOT, WHOIS_PATH, 'test_data', 'whois_corpus.json')) as corpus_file:
+        record = json.load(corpus_file)[0]
+
+    if options.child:
+        print(json.dumps(measure_startup(options.source, record)))
+        return
+
+    runs = []
+    for _ in range(options.runs):
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child',
+                                          '--source', options.source])
+        runs.append(json.loads(output.decode('utf-8').strip().splitlines()[-1]))
+
+    print('{} ({} runs, first query: {})'.format(options.source, options.runs, record['domain']))
+    total = 0.0
+    for stage in STAGES:
+        stage_time = median([run[stage] for run in runs])
+        total += stage_time
+        print('{:<12} {:8.2f}ms'.format(stage, stage_time))
+    print('{:<12} {:8.2f}ms'.format('total', total))
+
+
+if __name__ == '__main__':
+    main()
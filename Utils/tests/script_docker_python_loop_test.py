@@ -0,0 +1,241 @@
+import json
+import os
+import sys
+
+import pytest
+
+from Utils import _script_docker_python_loop as python_loop
+from Utils._script_docker_python_loop import CodeCache, CommonServerModule
+from Utils.benchmarks.script_docker_python_loop_benchmark import load_common_server
+
+TEMPLATE = 'result = 1\n###CODE_HERE###'
+
+
+def run_code(code):
+    namespace = {}
+    exec(code, namespace, namespace)
+    return namespace
+
+
+def test_code_cache_hits_and_misses():
+    """
+    Given
+    - An empty code cache
+
+    When
+    - Getting the same script twice and another script once
+
+    Then
+    - The repeated script is compiled once and served from memory the second time
+    """
+    cache = CodeCache(2)
+    first = cache.get_code('script', TEMPLATE, 'result += 1')
+    assert cache.get_code('script', TEMPLATE, 'result += 1') is first
+    cache.get_code('script', TEMPLATE, 'result += 2')
+    assert run_code(first)['result'] == 2
+    assert cache.stats() == {'hits': 1, 'diskHits': 0, 'misses': 2, 'size': 2, 'maxSize': 2}
+
+
+def test_code_cache_lru_eviction():
+    """
+    Given
+    - A code cache of two entries holding scripts a and b
+
+    When
+    - Using a again and then adding c
+
+    Then
+    - The least recently used script (b) is evicted
+    """
+    cache = CodeCache(2)
+    cache.get_code('script', TEMPLATE, 'a = 1')
+    cache.get_code('script', TEMPLATE, 'b = 1')
+    cache.get_code('script', TEMPLATE, 'a = 1')
+    cache.get_code('script', TEMPLATE, 'c = 1')
+    assert cache.digest('script', TEMPLATE, 'b = 1') not in cache.entries
+    assert cache.digest('script', TEMPLATE, 'a = 1') in cache.entries
+    assert cache.stats()['size'] == 2
+
+
+def test_code_cache_key_includes_flavour_and_template():
+    """
+    Given
+    - The same script text
+
+    When
+    - Computing the cache key with different flavours or templates
+
+    Then
+    - Every flavour/template combination gets its own key
+    """
+    keys = {
+        CodeCache.digest('script', TEMPLATE, 'a = 1'),
+        CodeCache.digest('integration', TEMPLATE, 'a = 1'),
+        CodeCache.digest('script', 'result = 2\n###CODE_HERE###', 'a = 1'),
+    }
+    assert len(keys) == 3
+
+
+def test_code_cache_disk(tmpdir):
+    """
+    Given
+    - A code cache persisting to disk
+
+    When
+    - A new cache (a restarted container) gets the same script
+
+    Then
+    - The code is loaded from disk instead of being compiled
+    """
+    CodeCache(2, str(tmpdir)).get_code('script', TEMPLATE, 'result += 1')
+    cache = CodeCache(2, str(tmpdir))
+    assert run_code(cache.get_code('script', TEMPLATE, 'result += 1'))['result'] == 2
+    assert cache.stats() == {'hits': 0, 'diskHits': 1, 'misses': 0, 'size': 1, 'maxSize': 2}
+
+
+def test_code_cache_corrupted_file(tmpdir):
+    """
+    Given
+    - A corrupted cache file on disk
+
+    When
+    - Getting the script it belongs to
+
+    Then
+    - The script is recompiled and the cache file is rewritten
+    """
+    cache = CodeCache(2, str(tmpdir))
+    path = os.path.join(str(tmpdir), cache.digest('script', TEMPLATE, 'result += 1') + '.marshal')
+    with open(path, 'wb') as f:
+        f.write(b'not marshal')
+    assert run_code(cache.get_code('script', TEMPLATE, 'result += 1'))['result'] == 2
+    assert cache.stats()['misses'] == 1
+    assert run_code(CodeCache(2, str(tmpdir)).get_code('script', TEMPLATE, 'result += 1'))['result'] == 2
+
+
+def test_send_script_completed_reports_stats(mocker, capsys):
+    """
+    Given
+    - A code cache with one miss
+
+    When
+    - Notifying the server the script is completed
+
+    Then
+    - The cache counters are sent along with the completed message
+    """
+    cache = CodeCache(2)
+    cache.get_code('script', TEMPLATE, 'a = 1')
+    mocker.patch.object(python_loop, 'code_cache', cache)
+    python_loop.send_script_completed()
+    message = json.loads(capsys.readouterr().out.split('\\n')[0])
+    assert message == {'type': 'completed', 'codeCache': cache.stats()}
+
+
+GUARDED_SCRIPT = '''
+def main():
+    demisto.results('main ran, name={}'.format(__name__))
+
+
+if __name__ in ('__main__', '__builtin__', 'builtins'):
+    main()
+'''
+
+MUTATING_SCRIPT = '''
+import CommonServerPython
+LOG('first execution')
+INDICATOR_TYPE_TO_CONTEXT_KEY['leaked'] = 'leaked'
+CommonServerPython.outputPaths.clear()
+CommonServerPython.brands = {}
+Common.leaked = True
+Common.DBotScore.NONE = 'leaked'
+'''
+
+REPORTING_SCRIPT = '''
+import CommonServerPython
+LOG('second execution')
+demisto.results(json.dumps({
+    'log': LOG.messages,
+    'leaked_key': 'leaked' in CommonServerPython.INDICATOR_TYPE_TO_CONTEXT_KEY,
+    'output_paths': bool(outputPaths) and bool(CommonServerPython.outputPaths),
+    'brands': bool(CommonServerPython.brands),
+    'leaked_class_attribute': hasattr(Common, 'leaked'),
+    'dbot_none': Common.DBotScore.NONE
+}))
+'''
+
+
+@pytest.fixture
+def common_server(tmpdir, mocker):
+    common_server_source = load_common_server()
+    path = tmpdir.join('CommonServerPython.py')
+    path.write(common_server_source.encode('utf-8'), mode='wb')
+    mocker.patch.dict(sys.modules)
+    module = CommonServerModule(str(path))
+    mocker.patch.object(python_loop, 'common_server', module)
+    mocker.patch.object(python_loop, 'code_cache', CodeCache(8))
+    return common_server_source
+
+
+def execute(code_string, capsys):
+    python_loop.execute_script(code_string, {'args': {}, 'context': {}}, False)
+    return [json.loads(line)['results'][0]['Contents'] for line in capsys.readouterr().out.splitlines()
+            if line.startswith('{"type": "result"')]
+
+
+def test_common_server_split(common_server):
+    """
+    Given
+    - A pre-imported CommonServerPython
+
+    When
+    - Splitting a script prefixed with it and a script prefixed with a different CommonServerPython
+
+    Then
+    - The script code is returned for the first, None (fall back to a full execution) for the second
+    """
+    assert python_loop.common_server.split(common_server + 'a = 1') == 'a = 1'
+    assert python_loop.common_server.split('# changed\n' + common_server + 'a = 1') is None
+    assert CommonServerModule('').split(common_server + 'a = 1') is None
+
+
+def test_pre_imported_script_name(common_server, capsys):
+    """
+    Given
+    - A script running its main() only when __name__ is the builtins module
+
+    When
+    - Executing it with and without the pre-imported CommonServerPython
+
+    Then
+    - main() runs and sees the same __name__ in both modes
+    """
+    plain_results = execute('# changed prefix\n' + common_server + GUARDED_SCRIPT, capsys)
+    pre_imported_results = execute(common_server + GUARDED_SCRIPT, capsys)
+    assert plain_results == pre_imported_results
+    assert len(pre_imported_results) == 1
+    assert pre_imported_results[0].startswith('main ran, name=__builtin__' if sys.version_info[0] < 3
+                                              else 'main ran, name=builtins')
+
+
+def test_pre_imported_state_does_not_leak(common_server, capsys):
+    """
+    Given
+    - A script changing CommonServerPython module and class level state
+
+    When
+    - Executing another script afterwards with the pre-imported CommonServerPython
+
+    Then
+    - The second script sees none of the changes of the first one
+    """
+    execute(common_server + MUTATING_SCRIPT, capsys)
+    results = execute(common_server + REPORTING_SCRIPT, capsys)
+    assert json.loads(results[0]) == {
+        'log': ['second execution'],
+        'leaked_key': False,
+        'output_paths': True,
+        'brands': True,
+        'leaked_class_attribute': False,
+        'dbot_none': 0
+    }